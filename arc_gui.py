@@ -8,7 +8,8 @@ from PySide6.QtCore import QThread, Signal, Qt, QTimer, QUrl, QObject
 from PySide6.QtWidgets import (QApplication, QMainWindow, QVBoxLayout, QHBoxLayout, 
                                QPushButton, QLabel, QLineEdit, QTextEdit, QProgressBar, 
                                QTabWidget, QWidget, QGroupBox, QListWidget, QListWidgetItem,
-                               QFileDialog, QCheckBox, QComboBox, QFrame, QMessageBox, QMenu)
+                               QFileDialog, QCheckBox, QComboBox, QFrame, QMessageBox, QMenu,
+                               QAbstractItemView)
 from PySide6.QtGui import QDragEnterEvent, QDropEvent, QPalette
 from qfluentwidgets import *
 
@@ -16,7 +17,20 @@ from con import CON
 from support.toggle import ThemeManager
 # Add the current directory to Python path to import convertzip module
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
-from support.archive_manager import create_archive, extract_archive, add_to_archive, list_archive_contents, SUPPORTED_ARCHIVE_FORMATS
+from support.archive_manager import (create_archive, extract_archive, extract_members, add_to_archive,
+                                     iter_archive_contents, SUPPORTED_ARCHIVE_FORMATS)
+from support.compression_options import CompressionOptions, PRESET_NAMES
+from support.contents_model import ArchiveContentsModel
+
+# Entries handed from the listing worker to the contents model per signal
+LIST_CHUNK_SIZE = 5000
+
+# Extract tab permission choices mapped to archive_manager exec policies
+EXEC_POLICY_LABELS = {
+    "Keep from archive": "archive",
+    "Detect scripts and binaries": "detect",
+    "Mark all executable": "all",
+}
 
 # Remove the problematic reconfigure calls
 # sys.stdout.reconfigure(encoding='utf-8')
@@ -27,16 +41,18 @@ class CreateZipWorker(QObject):
     progress_updated = Signal(str, int)
     conversion_error = Signal(str)
 
-    def __init__(self, output_path, sources, archive_format):
+    def __init__(self, output_path, sources, archive_format, options=None):
         super().__init__()
         self.output_path = output_path
         
         self.sources = sources
         self.archive_format = archive_format
+        self.options = options
 
     def run(self):
         try:
-            create_archive(self.output_path, self.sources, self.archive_format, self._update_progress_callback)
+            create_archive(self.output_path, self.sources, self.archive_format, self._update_progress_callback,
+                           options=self.options)
             self.finished.emit()
         except NotImplementedError as e:
             self.conversion_error.emit(str(e))
@@ -51,14 +67,16 @@ class ExtractZipWorker(QObject):
     progress_updated = Signal(str, int)
     conversion_error = Signal(str)
 
-    def __init__(self, zip_path, dest_path):
+    def __init__(self, zip_path, dest_path, exec_policy="archive"):
         super().__init__()
         self.archive_path = zip_path # Renamed for clarity with generic archive_manager
         self.extract_to = dest_path
+        self.exec_policy = exec_policy
 
     def run(self):
         try:
-            extract_archive(self.archive_path, self.extract_to, self._update_progress_callback)
+            extract_archive(self.archive_path, self.extract_to, self._update_progress_callback,
+                            exec_policy=self.exec_policy)
             self.finished.emit()
         except Exception as e:
             self.conversion_error.emit(str(e))
@@ -66,6 +84,32 @@ class ExtractZipWorker(QObject):
     def _update_progress_callback(self, message, percentage):
         self.progress_updated.emit(message, percentage)
 
+class ExtractMembersWorker(QObject):
+    finished = Signal()
+    progress_updated = Signal(str, int)
+    conversion_error = Signal(str)
+
+    def __init__(self, archive_path, members, dest_path):
+        super().__init__()
+        self.archive_path = archive_path
+        self.members = members
+        self.extract_to = dest_path
+        self.error_message = ""
+
+    def run(self):
+        try:
+            if extract_members(self.archive_path, self.members, self.extract_to, self._update_progress_callback):
+                self.finished.emit()
+            else:
+                self.conversion_error.emit(self.error_message)
+        except Exception as e:
+            self.conversion_error.emit(str(e))
+
+    def _update_progress_callback(self, message, percentage):
+        if percentage < 0:
+            self.error_message = message
+        self.progress_updated.emit(message, percentage)
+
 class AddToZipWorker(QObject):
     finished = Signal()
     progress_updated = Signal(str, int)
@@ -75,27 +119,26 @@ class AddToZipWorker(QObject):
         super().__init__()
         self.archive_path = zip_path # Renamed for clarity with generic archive_manager
         self.files_to_add = file_paths if isinstance(file_paths, list) else [file_paths]
+        self.error_message = ""
 
     def run(self):
         try:
-            # Handle multiple files
-            total_files = len(self.files_to_add)
-            for i, file_path in enumerate(self.files_to_add):
-                self._update_progress_callback(f"Adding file {i+1}/{total_files}: {os.path.basename(file_path)}", (i/total_files)*100)
-                add_to_archive(self.archive_path, file_path, None)  # No individual progress for each file
-            
-            self._update_progress_callback(f"Added {total_files} files to archive", 100)
-            self.finished.emit()
-        except NotImplementedError as e:
-            self.conversion_error.emit(str(e))
+            # One call for all files: the archive is rewritten (or rar is run) once
+            if add_to_archive(self.archive_path, self.files_to_add, self._update_progress_callback):
+                self.finished.emit()
+            else:
+                self.conversion_error.emit(self.error_message)
         except Exception as e:
             self.conversion_error.emit(str(e))
 
     def _update_progress_callback(self, message, percentage):
-        self.progress_updated.emit(message, percentage)
+        if percentage < 0:
+            self.error_message = message
+        self.progress_updated.emit(message, int(percentage))
 
 class ListZipContentsWorker(QObject):
-    finished = Signal(list) # Emits list of contents
+    chunk_ready = Signal(object) # Emits a list of ArchiveEntry records
+    finished = Signal(int) # Emits the total number of entries
     conversion_error = Signal(str)
     password_required = Signal(str) # Emits error message when password is required
 
@@ -105,8 +148,20 @@ class ListZipContentsWorker(QObject):
 
     def run(self):
         try:
-            contents = list_archive_contents(self.archive_path)
-            self.finished.emit(contents)
+            # Feed the view a chunk at a time as the listing is read, so the first
+            # rows appear without waiting for the rest
+            total = 0
+            chunk = []
+            for entry in iter_archive_contents(self.archive_path):
+                chunk.append(entry)
+                if len(chunk) >= LIST_CHUNK_SIZE:
+                    self.chunk_ready.emit(chunk)
+                    total += len(chunk)
+                    chunk = []
+            if chunk:
+                self.chunk_ready.emit(chunk)
+                total += len(chunk)
+            self.finished.emit(total)
         except RuntimeError as e:
             # 处理需要密码的情况
             if "password" in str(e).lower() or "encrypted" in str(e).lower():
@@ -177,6 +232,7 @@ class ZipGUI(QMainWindow):
         self.create_sources = []
         self.create_output_path = ""
         self.create_archive_format = "zip" # Default to zip
+        self.create_compression_preset = "normal"
         self.create_zip_worker_thread = None # Renamed to generic for clarity
         self.create_zip_worker = None # Renamed to generic for clarity
         
@@ -185,6 +241,8 @@ class ZipGUI(QMainWindow):
         self.extract_dest_path = ""
         self.extract_zip_worker_thread = None # Renamed to generic for clarity
         self.extract_zip_worker = None # Renamed to generic for clarity
+        self.extract_members_worker_thread = None
+        self.extract_members_worker = None
         
         # Variables for Add to ZIP tab
         self.add_zip_path = ""
@@ -277,6 +335,18 @@ class ZipGUI(QMainWindow):
         format_layout.addWidget(self.create_format_combo, 1)
         tab_sizer.addLayout(format_layout)
 
+        # Compression level selection (speed <-> ratio)
+        compression_layout = QHBoxLayout()
+        compression_label = QLabel("Compression:")
+        self.create_compression_combo = ModelComboBox()
+        self.create_compression_combo.addItems([name.capitalize() for name in PRESET_NAMES])
+        self.create_compression_combo.setCurrentText("Normal")
+        setCustomStyleSheet(self.create_compression_combo, CON.qss_combo, CON.qss_combo)
+        self.create_compression_combo.currentIndexChanged.connect(self.on_create_compression_change)
+        compression_layout.addWidget(compression_label)
+        compression_layout.addWidget(self.create_compression_combo, 1)
+        tab_sizer.addLayout(compression_layout)
+
         # Source files list
         sources_box = QGroupBox("Source Files/Directories")
         sources_box_sizer = QVBoxLayout(sources_box)
@@ -355,6 +425,16 @@ class ZipGUI(QMainWindow):
         dest_box_sizer.addWidget(dest_button)
         tab_sizer.addWidget(dest_box)
 
+        # Execute permission handling for extracted files
+        permissions_layout = QHBoxLayout()
+        permissions_label = QLabel("Permissions:")
+        self.extract_permissions_combo = ModelComboBox()
+        self.extract_permissions_combo.addItems(list(EXEC_POLICY_LABELS))
+        setCustomStyleSheet(self.extract_permissions_combo, CON.qss_combo, CON.qss_combo)
+        permissions_layout.addWidget(permissions_label)
+        permissions_layout.addWidget(self.extract_permissions_combo, 1)
+        tab_sizer.addLayout(permissions_layout)
+
         # Progress bar
         self.extract_progress_label = QLabel("")
         tab_sizer.addWidget(self.extract_progress_label)
@@ -448,12 +528,29 @@ class ZipGUI(QMainWindow):
         contents_box = QGroupBox("Archive Contents") # Changed group box title
         contents_box_sizer = QVBoxLayout(contents_box)
 
-        self.contents_listbox = ListWidget()
-        self.contents_listbox.setMinimumHeight(250)  # 设置更大的最小高度
-        contents_box_sizer.addWidget(self.contents_listbox, 3)  # 增加拉伸权重
+        self.contents_filter_text = LineEdit()
+        self.contents_filter_text.setPlaceholderText("Filter by name...")
+        self.contents_filter_text.setClearButtonEnabled(True)
+        setCustomStyleSheet(self.contents_filter_text, CON.qss_line, CON.qss_line)
+        self.contents_filter_text.textChanged.connect(self.on_contents_filter_change)
+        contents_box_sizer.addWidget(self.contents_filter_text)
+
+        # Virtual tree: rows are created on demand by the model, not one widget item per entry
+        self.contents_model = ArchiveContentsModel(self)
+        self.contents_view = TreeView()
+        self.contents_view.setModel(self.contents_model)
+        self.contents_view.setUniformRowHeights(True)
+        self.contents_view.setSortingEnabled(True)
+        self.contents_view.setSelectionMode(QAbstractItemView.SelectionMode.ExtendedSelection)
+        self.contents_view.sortByColumn(0, Qt.SortOrder.AscendingOrder)
+        self.contents_view.setMinimumHeight(250)  # 设置更大的最小高度
+        contents_box_sizer.addWidget(self.contents_view, 3)  # 增加拉伸权重
         # 设置右键菜单
-        self.contents_listbox.setContextMenuPolicy(Qt.ContextMenuPolicy.CustomContextMenu)
-        self.contents_listbox.customContextMenuRequested.connect(self.show_contents_context_menu)
+        self.contents_view.setContextMenuPolicy(Qt.ContextMenuPolicy.CustomContextMenu)
+        self.contents_view.customContextMenuRequested.connect(self.show_contents_context_menu)
+
+        self.contents_status_label = QLabel("")
+        contents_box_sizer.addWidget(self.contents_status_label)
         tab_sizer.addWidget(contents_box, 2) # Give contents box more stretch
 
         # List button
@@ -474,6 +571,9 @@ class ZipGUI(QMainWindow):
             self.create_output_path = f"{base_name}.{selected_format}"
             self.create_output_text.setText(self.create_output_path)
 
+    def on_create_compression_change(self):
+        self.create_compression_preset = self.create_compression_combo.currentText().lower()
+
     def browse_create_output(self):
         file_dialog = QFileDialog(self)
         selected_format = self.create_archive_format
@@ -574,7 +674,8 @@ class ZipGUI(QMainWindow):
         self.create_progress_label.setText("Starting archive creation...")
         self.create_progress.setValue(0)
         
-        self.create_zip_worker = CreateZipWorker(self.create_output_path, self.create_sources, self.create_archive_format)
+        options = CompressionOptions.preset(self.create_compression_preset)
+        self.create_zip_worker = CreateZipWorker(self.create_output_path, self.create_sources, self.create_archive_format, options)
         self.create_zip_worker_thread = QThread()
         self.create_zip_worker.moveToThread(self.create_zip_worker_thread)
 
@@ -680,7 +781,8 @@ class ZipGUI(QMainWindow):
         self.extract_progress_label.setText("Starting archive extraction...")
         self.extract_progress.setValue(0)
 
-        self.extract_zip_worker = ExtractZipWorker(self.extract_zip_path, self.extract_dest_path)
+        exec_policy = EXEC_POLICY_LABELS.get(self.extract_permissions_combo.currentText(), "archive")
+        self.extract_zip_worker = ExtractZipWorker(self.extract_zip_path, self.extract_dest_path, exec_policy)
         self.extract_zip_worker_thread = QThread()
         self.extract_zip_worker.moveToThread(self.extract_zip_worker_thread)
 
@@ -908,34 +1010,93 @@ class ZipGUI(QMainWindow):
     
     def show_contents_context_menu(self, position):
         """显示archive contents列表的右键菜单"""
-        item = self.contents_listbox.itemAt(position)
-        if not item:
+        index = self.contents_view.indexAt(position)
+        if not index.isValid():
             return
         
         menu = QMenu()
         copy_action = menu.addAction("Copy File")
+        extract_action = menu.addAction("Extract Selected...")
         
         # 检查文件是否受密码保护
         if self.is_password_protected:
             copy_action.setEnabled(False)
             copy_action.setText("Copy File (Disabled - Password Protected)")
+            extract_action.setEnabled(False)
+            extract_action.setText("Extract Selected (Disabled - Password Protected)")
         
-        action = menu.exec(self.contents_listbox.mapToGlobal(position))
+        action = menu.exec(self.contents_view.viewport().mapToGlobal(position))
         if action == copy_action and copy_action.isEnabled():
-            self.copy_archive_content(item)
+            self.copy_archive_content(index)
+        elif action == extract_action and extract_action.isEnabled():
+            self.extract_selected_contents(index)
+
+    def extract_selected_contents(self, clicked_index):
+        """Extract the selected rows of the contents view (or the clicked row)"""
+        selection = self.contents_view.selectionModel()
+        indexes = selection.selectedRows(0)
+        if clicked_index.siblingAtColumn(0) not in indexes:
+            indexes = [clicked_index.siblingAtColumn(0)]
+        members = [self.contents_model.path_for_index(index) for index in indexes]
+
+        dest_path = QFileDialog.getExistingDirectory(self, "Extract Selected To",
+                                                     os.path.dirname(self.list_zip_path))
+        if not dest_path:
+            return
+
+        self.contents_status_label.setText(f"Extracting {len(members)} selected items...")
+        self.extract_members_worker = ExtractMembersWorker(self.list_zip_path, members, dest_path)
+        self.extract_members_worker_thread = QThread()
+        self.extract_members_worker.moveToThread(self.extract_members_worker_thread)
+
+        self.extract_members_worker.finished.connect(self.on_extract_members_finished)
+        self.extract_members_worker.progress_updated.connect(self.update_extract_members_progress)
+        self.extract_members_worker.conversion_error.connect(self.on_extract_members_error)
+        self.extract_members_worker_thread.started.connect(self.extract_members_worker.run)
+        self.extract_members_worker_thread.start()
+
+    def update_extract_members_progress(self, message, progress):
+        self.contents_status_label.setText(message)
+
+    def _stop_extract_members_thread(self):
+        if self.extract_members_worker_thread and self.extract_members_worker_thread.isRunning():
+            self.extract_members_worker_thread.quit()
+            self.extract_members_worker_thread.wait()
+
+    def on_extract_members_finished(self):
+        self._stop_extract_members_thread()
+        InfoBar.success(
+            title='Success',
+            content='Selected items extracted successfully!',
+            orient=Qt.Orientation.Horizontal,
+            isClosable=True,
+            position=InfoBarPosition.TOP,
+            duration=2000,
+            parent=self
+        )
+
+    def on_extract_members_error(self, error_message):
+        self._stop_extract_members_thread()
+        PopupTeachingTip.create(
+            target=self.contents_view,
+            icon=InfoBarIcon.ERROR,
+            title='Error',
+            content=f'Error extracting selected items: {str(error_message)}',
+            isClosable=True,
+            tailPosition=TeachingTipTailPosition.TOP,
+            duration=2000,
+            parent=self
+        )
     
-    def copy_archive_content(self, item):
+    def copy_archive_content(self, index):
         """复制archive content文件路径到剪贴板"""
-        content_text = item.text()
-        
-        # 提取文件名（去掉大小信息）
-        filename = content_text.split()[0] if content_text else content_text
+        filename = self.contents_model.path_for_index(index)
         
         clipboard = QApplication.clipboard()
         clipboard.setText(filename)
         
         PopupTeachingTip.create(
-            target=self.contents_listbox,
+            target=self.contents_view,
             icon=InfoBarIcon.SUCCESS,
             title='Success',
             content=f'Content path copied: {filename}',
@@ -959,29 +1120,32 @@ class ZipGUI(QMainWindow):
             )
             return
 
-        self.contents_listbox.clear()
-        self.contents_listbox.addItem("Listing contents...")
+        self.contents_model.clear()
+        self.contents_status_label.setText("Listing contents...")
+        # 重置密码保护状态
+        self.is_password_protected = False
 
         self.list_zip_worker = ListZipContentsWorker(self.list_zip_path)
         self.list_zip_worker_thread = QThread()
         self.list_zip_worker.moveToThread(self.list_zip_worker_thread)
 
+        self.list_zip_worker.chunk_ready.connect(self.contents_model.append_entries)
         self.list_zip_worker.finished.connect(self.update_contents_list)
         self.list_zip_worker.conversion_error.connect(self.on_list_archive_error)
         self.list_zip_worker.password_required.connect(self.on_password_required)
         self.list_zip_worker_thread.started.connect(self.list_zip_worker.run)
         self.list_zip_worker_thread.start()
 
-    def update_contents_list(self, contents):
+    def on_contents_filter_change(self, text):
+        self.contents_model.set_filter(text)
+
+    def update_contents_list(self, total_entries):
         if self.list_zip_worker_thread and self.list_zip_worker_thread.isRunning():
             self.list_zip_worker_thread.quit()
             self.list_zip_worker_thread.wait()
-        self.contents_listbox.clear()
-        # 重置密码保护状态
-        self.is_password_protected = False
-        if contents:
-            for item in contents:
-                    self.contents_listbox.addItem(item)
+        self.contents_model.finish_loading()
+        if total_entries:
+            self.contents_status_label.setText(f"{total_entries} entries")
             InfoBar.success(
                 title='Success',
                 content='Archive contents listed successfully!',
@@ -992,9 +1156,9 @@ class ZipGUI(QMainWindow):
                 parent=self
             )
         else:
-            self.contents_listbox.addItem("No contents found or invalid archive.")
+            self.contents_status_label.setText("No contents found or invalid archive.")
             PopupTeachingTip.create(
-                target=self.contents_listbox,
+                target=self.contents_view,
                 icon=InfoBarIcon.WARNING,
                 title='Warning',
                 content='No contents found or invalid archive.',
@@ -1014,7 +1178,7 @@ class ZipGUI(QMainWindow):
         self.is_password_protected = True
         
         PopupTeachingTip.create(
-            target=self.contents_listbox,
+            target=self.contents_view,
             icon=InfoBarIcon.WARNING,
             title='Password Required',
             content=f'This archive is password protected: {str(error_message)}',
@@ -1023,15 +1187,15 @@ class ZipGUI(QMainWindow):
             duration=3000,
             parent=self
         )
-        self.contents_listbox.clear()
-        self.contents_listbox.addItem("Password protected archive - contents cannot be listed")
+        self.contents_model.clear()
+        self.contents_status_label.setText("Password protected archive - contents cannot be listed")
 
     def on_list_archive_error(self, error_message):
         if self.list_zip_worker_thread and self.list_zip_worker_thread.isRunning():
             self.list_zip_worker_thread.quit()
             self.list_zip_worker_thread.wait()
         PopupTeachingTip.create(
-            target=self.contents_listbox,
+            target=self.contents_view,
             icon=InfoBarIcon.ERROR,
             title='Error',
             content=f'Error listing archive contents: {str(error_message)}',
@@ -1040,8 +1204,8 @@ class ZipGUI(QMainWindow):
             duration=3000,
             parent=self
         )
-        self.contents_listbox.clear()
-        self.contents_listbox.addItem("Error listing contents.")
+        self.contents_model.clear()
+        self.contents_status_label.setText("Error listing contents.")
 
     # --- Drag and Drop Event Handlers ---
     def dragEnterEvent(self, event: QDragEnterEvent):
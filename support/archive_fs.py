@@ -0,0 +1,238 @@
+"""
+Read-only filesystem view of an archive
+
+ArchiveFS lists an archive once and indexes its members by normalized path,
+so ``stat``, ``listdir`` and lookups are dictionary hits instead of scans of
+the listing; directories that only appear as path prefixes are filled in.
+Member data is decompressed on first ``open`` and kept in an LRU cache
+bounded by total bytes, so tools reading a few files out of many archives
+(the image converter reading assets straight out of ZIPs) neither extract to
+disk nor decompress the same member twice. ZIP, RAR, ISO and CAB archives
+stay open between reads; other formats go through read_archive_member.
+"""
+
+import errno
+import io
+import os
+import posixpath
+import stat
+import threading
+import zipfile
+from collections import OrderedDict
+
+import rarfile
+
+from support.archive_listing import ArchiveEntry
+from support.archive_manager import get_archive_type, list_archive_contents, read_archive_member
+from support.cabfile import CabFile
+from support.iso9660 import IsoFile
+from support.split_volumes import open_source
+
+# Decompressed member bytes kept in memory per ArchiveFS
+DEFAULT_CACHE_BYTES = 64 * 1024 * 1024
+
+_DEFAULT_DIR_MODE = stat.S_IFDIR | 0o755
+_DEFAULT_FILE_MODE = stat.S_IFREG | 0o644
+
+
+class ArchiveFS:
+    """
+    Read-only view of the members of one archive as files and directories.
+
+    Paths use "/" and are relative to the archive root ("" or "/" is the root).
+    Missing paths raise FileNotFoundError, like the os functions they mirror.
+    Safe to share between threads.
+    """
+
+    def __init__(self, path, cache_bytes=DEFAULT_CACHE_BYTES):
+        self.path = path
+        self.cache_bytes = cache_bytes
+        self.archive_type = get_archive_type(path)
+        self._lock = threading.RLock()
+        self._cache = OrderedDict()
+        self._cached_bytes = 0
+        self._handle = None
+        self._source = None
+        self._entries = {}
+        self._children = {"": {}}
+        self._index(self._list())
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def close(self):
+        """Close the archive handle and drop the cached members."""
+        with self._lock:
+            if self._handle is not None:
+                self._handle.close()
+                self._handle = None
+            if self._source is not None:
+                self._source.close()
+                self._source = None
+            self._cache.clear()
+            self._cached_bytes = 0
+
+    # --- Index ---
+
+    def _list(self):
+        errors = []
+
+        def on_progress(message, percentage):
+            if percentage < 0:
+                errors.append(message)
+
+        entries = list_archive_contents(self.path, on_progress)
+        if errors:
+            raise OSError(errno.EIO, errors[-1], self.path)
+        return entries
+
+    def _index(self, entries):
+        for entry in entries:
+            name = _normalize(entry.name)
+            if not name:
+                continue
+            if entry.is_dir and name in self._entries:
+                continue  # Keep the first record of a directory listed twice
+            self._add_parents(name)
+            self._entries[name] = entry
+            if entry.is_dir:
+                self._children.setdefault(name, {})
+            parent, _, base = name.rpartition("/")
+            self._children[parent][base] = None
+
+    def _add_parents(self, name):
+        parent = posixpath.dirname(name)
+        missing = []
+        while parent and parent not in self._children:
+            missing.append(parent)
+            parent = posixpath.dirname(parent)
+        for directory in reversed(missing):
+            self._entries.setdefault(directory, ArchiveEntry(directory + "/", 0, is_dir=True))
+            self._children[directory] = {}
+            grandparent, _, base = directory.rpartition("/")
+            self._children[grandparent][base] = None
+
+    def _entry(self, path):
+        name = _normalize(path)
+        entry = self._entries.get(name)
+        if entry is None and name:
+            raise FileNotFoundError(errno.ENOENT, "No such file or directory in archive", path)
+        return name, entry
+
+    # --- Queries ---
+
+    def exists(self, path):
+        return _normalize(path) in self._children or _normalize(path) in self._entries
+
+    def isdir(self, path):
+        return _normalize(path) in self._children
+
+    def isfile(self, path):
+        entry = self._entries.get(_normalize(path))
+        return entry is not None and not entry.is_dir
+
+    def stat(self, path):
+        """os.stat_result of a member; directories that are only implied get defaults."""
+        name, entry = self._entry(path)
+        if entry is None:
+            return _stat_result(_DEFAULT_DIR_MODE, 0, 0)
+        mode = entry.mode or 0
+        if not stat.S_IFMT(mode):
+            mode |= stat.S_IFDIR if entry.is_dir else stat.S_IFREG
+        if not stat.S_IMODE(mode):
+            mode |= stat.S_IMODE(_DEFAULT_DIR_MODE if entry.is_dir else _DEFAULT_FILE_MODE)
+        return _stat_result(mode, entry.size or 0, entry.mtime or 0)
+
+    def listdir(self, path=""):
+        """Names in a directory of the archive, sorted."""
+        name, _ = self._entry(path)
+        children = self._children.get(name)
+        if children is None:
+            raise NotADirectoryError(errno.ENOTDIR, "Not a directory in archive", path)
+        return sorted(children)
+
+    def walk(self, top=""):
+        """Like os.walk (top-down): yields (dirpath, dirnames, filenames) for every directory under ``top``."""
+        name, _ = self._entry(top)
+        if name not in self._children:
+            return
+        pending = [name]
+        while pending:
+            directory = pending.pop()
+            dirnames, filenames = [], []
+            for child in sorted(self._children[directory]):
+                child_path = f"{directory}/{child}" if directory else child
+                (dirnames if child_path in self._children else filenames).append(child)
+            yield directory, dirnames, filenames
+            # Descend in listing order; callers may prune dirnames as with os.walk
+            pending.extend(f"{directory}/{child}" if directory else child for child in reversed(dirnames))
+
+    # --- Data ---
+
+    def open(self, path, mode="rb", encoding=None, errors=None):
+        """File object over a member's data: bytes for "rb", text for "r"."""
+        if mode not in ("r", "rb"):
+            raise ValueError(f"ArchiveFS is read-only; unsupported mode {mode!r}")
+        data = io.BytesIO(self.read_bytes(path))
+        if mode == "rb":
+            return data
+        return io.TextIOWrapper(data, encoding=encoding or "utf-8", errors=errors)
+
+    def read_bytes(self, path):
+        """The whole decompressed member, from the cache when it was read before."""
+        name, entry = self._entry(path)
+        if entry is None or entry.is_dir:
+            raise IsADirectoryError(errno.EISDIR, "Is a directory in archive", path)
+        with self._lock:
+            data = self._cache.get(name)
+            if data is not None:
+                self._cache.move_to_end(name)
+                return data
+            data = self._read_member(entry.name)
+            self._remember(name, data)
+        return data
+
+    def _remember(self, name, data):
+        if len(data) > self.cache_bytes:
+            return
+        self._cache[name] = data
+        self._cached_bytes += len(data)
+        while self._cached_bytes > self.cache_bytes:
+            _, evicted = self._cache.popitem(last=False)
+            self._cached_bytes -= len(evicted)
+
+    def _read_member(self, member_name):
+        handle = self._open_handle()
+        if handle is None:
+            return read_archive_member(self.path, member_name)
+        return handle.read(member_name)
+
+    def _open_handle(self):
+        """Archive object kept open across reads for the formats with random access, else None."""
+        if self._handle is None:
+            if self.archive_type == "zip":
+                self._source = open_source(self.path)
+                self._handle = zipfile.ZipFile(self._source, "r")
+            elif self.archive_type == "rar":
+                self._handle = rarfile.RarFile(self.path, "r")
+            elif self.archive_type == "iso":
+                self._handle = IsoFile(self.path)
+            elif self.archive_type == "cab":
+                self._handle = CabFile(self.path, verify=True)
+        return self._handle
+
+
+def _normalize(path):
+    """Archive member path in index form: "/" separators, no leading "/" or "./", no trailing "/"."""
+    path = str(path).replace("\\", "/").strip("/")
+    if not path:
+        return ""
+    path = posixpath.normpath(path)
+    return "" if path == "." else path.lstrip("/")
+
+
+def _stat_result(mode, size, mtime):
+    return os.stat_result((mode, 0, 0, 1, 0, 0, size, mtime, mtime, mtime))
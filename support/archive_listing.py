@@ -0,0 +1,284 @@
+"""
+Metadata-only archive listing
+
+Each lister reads just the archive's index and produces compact ArchiveEntry
+records without decompressing member data. The iter_* generators yield them
+as they are read, so a caller can show the first entries of a huge archive
+early; list_* collect them. The ZIP central directory is located with one
+seek to the end of the file, RAR and 7z headers come from rarfile/py7zr, ISO
+directory records and CAB file tables are parsed from the memory-mapped
+image, and tar headers are walked by seeking over payloads.
+Compressed tars have no index, so they are decompressed once, front to back.
+ZIP, 7z and tar listers read split sets ("a.zip.001") through their joined volumes.
+"""
+
+import bz2
+import contextlib
+import gzip
+import lzma
+import os
+import stat
+import struct
+import tarfile
+import time
+
+import py7zr
+import rarfile
+
+from support.cabfile import CabFile
+from support.iso9660 import IsoFile
+from support.split_volumes import open_source
+
+# End of central directory record plus the longest possible comment
+_EOCD_SEARCH_SIZE = 22 + 0xFFFF + 20
+
+_END_RECORD = struct.Struct("<4s4H2LH")
+_END_LOCATOR64 = struct.Struct("<4sLQL")
+_END_RECORD64 = struct.Struct("<4sQ2H2L4Q")
+# Central directory header, skipping the fields a listing does not need
+_CENTRAL_HEADER = struct.Struct("<4sxBxxH2x2H3L3H4xL4x")
+
+_FLAG_UTF8 = 0x800
+_MSDOS_DIR = 0x10
+_UNIX_HOST = 3
+
+_TAR_DECOMPRESSORS = {
+    "gz": gzip.open,
+    "bz2": bz2.open,
+    "xz": lzma.open,
+}
+
+# 100ns intervals between 1601-01-01 (Windows FILETIME) and the Unix epoch
+_FILETIME_EPOCH = 116444736000000000
+
+
+class ArchiveEntry:
+    """One member of an archive as reported by a listing."""
+
+    __slots__ = ("name", "size", "compressed_size", "crc", "mode", "is_dir", "_mtime", "_dos_time")
+
+    def __init__(self, name, size, compressed_size=None, crc=None, mtime=None, mode=0, is_dir=False,
+                 dos_time=None):
+        self.name = name
+        self.size = size
+        self.compressed_size = size if compressed_size is None else compressed_size
+        self.crc = crc
+        self.mode = mode
+        self.is_dir = is_dir
+        self._mtime = mtime
+        self._dos_time = dos_time
+
+    @property
+    def mtime(self):
+        """Modification time as an epoch timestamp (ZIP DOS times are converted on first use)."""
+        if self._mtime is None and self._dos_time is not None:
+            self._mtime = _dos_to_epoch(self._dos_time)
+        return self._mtime
+
+    @property
+    def date(self):
+        """Alias of ``mtime`` matching the key used by the older dict listings."""
+        return self.mtime
+
+    def as_dict(self):
+        """The entry in the dict form the listing functions used to return."""
+        return {
+            "name": self.name,
+            "size": self.size,
+            "compressed_size": self.compressed_size,
+            "date": self.mtime,
+            "is_dir": self.is_dir,
+        }
+
+    def __str__(self):
+        return f"{self.name:<40} {self.size:>10} bytes"
+
+    def __repr__(self):
+        return f"ArchiveEntry({self.name!r}, size={self.size}, is_dir={self.is_dir})"
+
+
+def _dos_to_epoch(dos_time):
+    """Convert a packed (date << 16 | time) DOS timestamp to epoch seconds."""
+    date, tm = dos_time >> 16, dos_time & 0xFFFF
+    try:
+        return time.mktime(((date >> 9) + 1980, (date >> 5) & 0xF, date & 0x1F,
+                            tm >> 11, (tm >> 5) & 0x3F, (tm & 0x1F) * 2, 0, 1, -1))
+    except (OverflowError, ValueError):
+        return 0
+
+
+def list_zip(path):
+    """List a ZIP archive from its central directory."""
+    return list(iter_zip(path))
+
+
+def iter_zip(path):
+    """Yield the entries of a ZIP archive from its central directory."""
+    with open_source(path) as f:
+        f.seek(0, os.SEEK_END)
+        file_size = f.tell()
+        tail_size = min(file_size, _EOCD_SEARCH_SIZE)
+        f.seek(file_size - tail_size)
+        tail = f.read(tail_size)
+
+        pos = tail.rfind(b"PK\x05\x06")
+        if pos < 0 or pos + _END_RECORD.size > len(tail):
+            raise ValueError("Not a ZIP file: end of central directory not found")
+        _, _, _, _, count, cd_size, cd_offset, _ = _END_RECORD.unpack_from(tail, pos)
+        eocd_offset = file_size - tail_size + pos
+        cd_end = eocd_offset
+
+        locator = pos - _END_LOCATOR64.size
+        if locator >= 0 and tail[locator:locator + 4] == b"PK\x06\x07":
+            record_offset = eocd_offset - _END_LOCATOR64.size - _END_RECORD64.size
+            f.seek(record_offset)
+            record = f.read(_END_RECORD64.size)
+            if len(record) == _END_RECORD64.size and record[:4] == b"PK\x06\x06":
+                _, _, _, _, _, _, _, count, cd_size, cd_offset = _END_RECORD64.unpack(record)
+                cd_end = record_offset
+
+        # Data prepended to the archive (self-extractors) shifts every stored offset
+        prefix = max(cd_end - cd_size - cd_offset, 0)
+        f.seek(cd_offset + prefix)
+        directory = f.read(cd_size)
+
+    yield from _parse_central_directory(directory, count)
+
+
+def _parse_central_directory(directory, count):
+    parsed = 0
+    unpack = _CENTRAL_HEADER.unpack_from
+    header_size = _CENTRAL_HEADER.size
+    pos = 0
+    end = len(directory)
+    while pos + header_size <= end:
+        (signature, create_system, flags, dos_time, dos_date, crc, compress_size, file_size,
+         name_len, extra_len, comment_len, external_attr) = unpack(directory, pos)
+        if signature != b"PK\x01\x02":
+            break
+        pos += header_size
+        raw_name = directory[pos:pos + name_len]
+        if flags & _FLAG_UTF8 or raw_name.isascii():
+            name = raw_name.decode("utf-8")
+        else:
+            name = raw_name.decode("cp437")
+        pos += name_len
+        if extra_len and (file_size == 0xFFFFFFFF or compress_size == 0xFFFFFFFF):
+            file_size, compress_size = _zip64_sizes(directory[pos:pos + extra_len], file_size, compress_size)
+        pos += extra_len + comment_len
+
+        is_dir = name.endswith("/") or bool(external_attr & _MSDOS_DIR)
+        mode = external_attr >> 16 if create_system == _UNIX_HOST else 0
+        parsed += 1
+        yield ArchiveEntry(name, file_size, compress_size, crc, None, mode, is_dir, (dos_date << 16) | dos_time)
+    if parsed < count:
+        raise ValueError(f"Truncated ZIP central directory: {parsed} of {count} entries")
+
+
+def _zip64_sizes(extra, file_size, compress_size):
+    """Pick the 64-bit sizes out of a ZIP64 extended information field."""
+    pos = 0
+    while pos + 4 <= len(extra):
+        header_id, data_size = struct.unpack_from("<2H", extra, pos)
+        pos += 4
+        if header_id == 0x0001:
+            field = pos
+            if file_size == 0xFFFFFFFF and field + 8 <= pos + data_size:
+                file_size = struct.unpack_from("<Q", extra, field)[0]
+                field += 8
+            if compress_size == 0xFFFFFFFF and field + 8 <= pos + data_size:
+                compress_size = struct.unpack_from("<Q", extra, field)[0]
+            break
+        pos += data_size
+    return file_size, compress_size
+
+
+def list_rar(path):
+    """List a RAR archive from its file headers."""
+    return list(iter_rar(path))
+
+
+def iter_rar(path):
+    """Yield the entries of a RAR archive from its file headers."""
+    with rarfile.RarFile(path) as rf:
+        for info in rf.infolist():
+            if info.mtime is not None:
+                mtime = info.mtime.timestamp()
+            else:
+                mtime = time.mktime(tuple(info.date_time) + (0, 1, -1))
+            yield ArchiveEntry(info.filename, info.file_size, info.compress_size, info.CRC,
+                               mtime, info.mode or 0, info.is_dir())
+
+
+def list_7z(path):
+    """List a 7z archive from its header database."""
+    return list(iter_7z(path))
+
+
+def iter_7z(path):
+    """Yield the entries of a 7z archive from its header database."""
+    with open_source(path) as source, py7zr.SevenZipFile(source, "r") as szf:
+        for f in szf.files:
+            mtime = None
+            if f.lastwritetime is not None:
+                mtime = (int(f.lastwritetime) - _FILETIME_EPOCH) / 10_000_000
+            mode = f.posix_mode or 0
+            if mode and f.st_fmt:
+                mode |= f.st_fmt
+            yield ArchiveEntry(f.filename, f.uncompressed or 0, f.compressed, f.crc32, mtime, mode, f.is_directory)
+
+
+def list_tar(path, compression=None):
+    """List a tar archive (see iter_tar)."""
+    return list(iter_tar(path, compression))
+
+
+def iter_tar(path, compression=None):
+    """
+    Yield the entries of a tar archive as its headers are read.
+
+    Headers are read in random-access mode, where tarfile seeks over each
+    member's data. For ``compression`` ("gz", "bz2" or "xz") the archive is
+    read through the codec's own file object, so those seeks decompress and
+    discard the payload in one front-to-back pass (tarfile's ``r|`` stream
+    mode re-slices its whole decompression buffer on every header read).
+    """
+    with open_source(path) as source, \
+            (_TAR_DECOMPRESSORS[compression](source, "rb") if compression else contextlib.nullcontext(source)) \
+            as fileobj, tarfile.open(fileobj=fileobj, mode="r:") as tar:
+        for member in tar:
+            yield ArchiveEntry(member.name, member.size, None, None, member.mtime, _tar_mode(member), member.isdir())
+            # Only the records above are needed; don't let tarfile keep every TarInfo
+            tar.members = []
+
+
+def _tar_mode(member):
+    if member.isdir():
+        return stat.S_IFDIR | member.mode
+    if member.issym():
+        return stat.S_IFLNK | member.mode
+    return stat.S_IFREG | member.mode
+
+
+def list_iso(path):
+    """List an ISO 9660 image from its directory records."""
+    return list(iter_iso(path))
+
+
+def iter_iso(path):
+    """Yield the entries of an ISO 9660 image from its directory records."""
+    with IsoFile(path) as iso:
+        for info in iso.infolist():
+            yield ArchiveEntry(info.filename, info.file_size, None, None, info.mtime, info.mode, info.is_dir())
+
+
+def list_cab(path):
+    """List a CAB archive from its file table."""
+    return list(iter_cab(path))
+
+
+def iter_cab(path):
+    """Yield the entries of a CAB archive from its file table."""
+    with CabFile(path) as cab:
+        for info in cab.infolist():
+            yield ArchiveEntry(info.filename, info.file_size, None, None, info.mtime, 0, False)
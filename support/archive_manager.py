@@ -2,55 +2,165 @@ import os
 import zipfile
 import rarfile
 import py7zr
+import py7zr.callbacks
+import py7zr.exceptions
+import py7zr.io
 import tarfile # Import tarfile for .tar and .tar.gz
 import subprocess
 import platform
+import shutil
+import sqlite3
+import stat
+import struct
+import contextlib
+import fnmatch
+import functools
+import io
+import re
+import tempfile
+import threading
+import zlib
+import gzip
+import bz2
+import lzma
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from pathlib import Path
 
+from support.parallel_zip import ParallelZipWriter, ZIP_DEFLATED, ZIP_STORED, raw_entry
+from support.archive_listing import (ArchiveEntry, iter_7z, iter_cab, iter_iso, iter_rar, iter_tar, iter_zip, list_7z,
+                                     list_cab, list_iso, list_rar, list_tar, list_zip)
+from support.cabfile import CabFile
+from support.compression_options import CompressionOptions
+from support.extract_journal import ExtractionJournal
+from support.format_detect import detect_format
+from support.iso9660 import IsoFile
+from support.listing_cache import get_listing_cache
+from support.mapped_io import open_input, open_mapped
+from support.progress import CountingReader, CountingWriter, ProgressTracker
+from support.sevenzip_writer import COPY as SEVENZIP_COPY, SevenZipWriter
+from support.split_volumes import VolumeReader, VolumeWriter, is_split_path, open_source, source_size, split_base
+from support.stream_copy import copy_stream, preallocate
+from support.tar_index import SeekableCompressedWriter
+from support import archive_stream, tar_index
+
+# How extracted files get execute permission: "archive" keeps the modes stored in
+# the archive, "all" marks every file executable and "detect" only scripts and binaries
+EXEC_POLICIES = ("archive", "all", "detect")
+# What extract_archive does with files already in the destination: "overwrite" rewrites
+# them; "skip_identical" keeps those matching their archive entry and resumes an
+# interrupted extraction from its journal
+OVERWRITE_POLICIES = ("overwrite", "skip_identical")
+# File and entry mtimes this many seconds apart still count as equal (ZIP stores 2 s steps)
+MTIME_TOLERANCE = 2
+# Leading bytes of files "detect" treats as executable (shebang, ELF, Mach-O)
+_EXECUTABLE_MAGIC = (b"#!", b"\x7fELF", b"\xcf\xfa\xed\xfe", b"\xce\xfa\xed\xfe", b"\xca\xfe\xba\xbe")
+
+# File types whose content is already compressed and is stored as-is in ZIP/7z
+INCOMPRESSIBLE_EXTENSIONS = {
+    ".jpg", ".jpeg", ".png", ".gif", ".webp", ".heic", ".heif", ".avif",
+    ".mp4", ".m4v", ".mov", ".mkv", ".avi", ".webm", ".mp3", ".m4a", ".aac", ".ogg", ".opus", ".flac",
+    ".zip", ".zipx", ".7z", ".rar", ".gz", ".tgz", ".bz2", ".tbz2", ".xz", ".txz", ".lzma", ".zst",
+    ".jar", ".apk", ".ipa", ".dmg", ".docx", ".xlsx", ".pptx", ".odt", ".epub",
+}
+
+# Paths longer than this in total are passed to rar through a list file
+# (Windows limits a command line to 32767 characters)
+RAR_MAX_COMMAND_LENGTH = 24000
+# Percentages rar prints while it works
+_RAR_PERCENT = re.compile(rb"(\d{1,3})%")
+
+# Formats whose listing means decompressing the whole archive or running an external
+# tool; their listings are kept in the persistent listing cache
+CACHED_LISTING_TYPES = {"tar.gz", "tar.bz2", "tar.xz", "arj", "lzh"}
+
+# Uncompressed size field of a .lzma header when the size is not recorded
+_LZMA_UNKNOWN_SIZE = 0xFFFFFFFFFFFFFFFF
+
+# Codec of each tar-based format, as used by support.tar_index
+TAR_COMPRESSION = {"tar": None, "tar.gz": "gz", "tar.bz2": "bz2", "tar.xz": "xz"}
+
+# Formats create_archive can split into volumes (options.volume_size); rar writes its
+# own .partN.rar volumes, the others are cut into .001, .002, ... files
+SPLIT_ARCHIVE_FORMATS = ("zip", "7z", "tar", "tar.gz", "tar.bz2", "tar.xz", "rar")
+# Formats read from .001, .002, ... volume sets
+_JOINED_VOLUME_FORMATS = ("zip", "7z", "tar", "tar.gz", "tar.bz2", "tar.xz")
+
+# Formats sync_archive can update
+SYNC_ARCHIVE_FORMATS = ("zip", "7z", "rar", "tar", "tar.gz", "tar.bz2", "tar.xz")
+
+# Archive mtimes are compared with this tolerance (ZIP stores them with 2 s resolution)
+SYNC_MTIME_TOLERANCE = 2
+
+# Bytes read per call when test_archive decodes a member into the discard sink
+TEST_READ_SIZE = 1024 * 1024
+
+# Archives transcode_archive can read members from and write them to
+TRANSCODE_SOURCE_FORMATS = ("zip", "rar", "7z", "tar", "tar.gz", "tar.bz2", "tar.xz")
+TRANSCODE_TARGET_FORMATS = ("zip", "7z", "tar", "tar.gz", "tar.bz2", "tar.xz")
+
 # Define supported formats
 SUPPORTED_ARCHIVE_FORMATS = ["zip", "rar", "7z", "tar", "tar.gz", "bz2", "tar.bz2", "xz", "tar.xz", "lzma", "zipx", "iso", "cab", "arj", "lzh"]
 
+def get_archive_type(file_path):
+    """Archive format of a file ("zip", "7z", "tar.gz", ...) as used by the functions here, or None."""
+    return _get_archive_type(file_path)
+
 def _get_archive_type(file_path):
-    """Determines the archive type based on file extension."""
-    file_path_str = str(file_path).lower()
-    
-    # Check for multi-part extensions first
-    if file_path_str.endswith('.tar.bz2') or file_path_str.endswith('.tbz2'):
-        return "tar.bz2"
-    elif file_path_str.endswith('.tar.gz') or file_path_str.endswith('.tgz'):
-        return "tar.gz"
-    elif file_path_str.endswith('.tar.xz') or file_path_str.endswith('.txz'):
-        return "tar.xz"
-    
-    # Check for single extensions
-    ext = Path(file_path).suffix.lower()
-    if ext == ".zip":
-        return "zip"
-    elif ext == ".rar":
-        return "rar"
-    elif ext == ".7z":
-        return "7z"
-    elif ext == ".tar":
-        return "tar"
-    elif ext == ".bz2":
-        return "bz2"
-    elif ext == ".xz":
-        return "xz"
-    elif ext == ".lzma":
+    """
+    Determines the archive type from the file's magic bytes, falling back to its
+    extension for files that do not exist yet or carry no known signature.
+    The first volume of a split set ("a.zip.001") stands for the whole set.
+    """
+    if is_split_path(file_path):
+        detected = detect_format(file_path)
+        if detected not in _JOINED_VOLUME_FORMATS:
+            # A small first volume may end before the tar header inside gzip/bzip2/xz
+            detected = _archive_type_from_extension(split_base(file_path))
+        return detected if detected in _JOINED_VOLUME_FORMATS else None
+    detected = detect_format(file_path)
+    if detected == "xz" and _archive_type_from_extension(file_path) == "lzma":
+        # .lzma files may hold an xz stream; both decode the same, keep the name-based handling
         return "lzma"
-    elif ext == ".zipx":
-        return "zipx"
-    elif ext == ".iso":
-        return "iso"
-    elif ext == ".cab":
-        return "cab"
-    elif ext == ".arj":
-        return "arj"
-    elif ext == ".lzh" or ext == ".lha":
-        return "lzh"
-    return None
+    if detected in SUPPORTED_ARCHIVE_FORMATS:
+        return detected
+    if detected is not None:
+        # Recognised, but not an archive format we handle (an image, plain gzip)
+        return None
+    return _archive_type_from_extension(file_path)
 
-def create_archive(output_path, source_paths, archive_format, progress_callback=None):
+def _archive_type_from_extension(file_path):
+    """Determines the archive type based on file extension."""
+    name = Path(file_path).name.lower()
+    # Multi-part extensions first
+    for suffix, archive_type in _COMPOUND_EXTENSIONS:
+        if name.endswith(suffix):
+            return archive_type
+    return _ARCHIVE_EXTENSIONS.get(Path(name).suffix)
+
+_COMPOUND_EXTENSIONS = (
+    (".tar.bz2", "tar.bz2"), (".tbz2", "tar.bz2"),
+    (".tar.gz", "tar.gz"), (".tgz", "tar.gz"),
+    (".tar.xz", "tar.xz"), (".txz", "tar.xz"),
+)
+
+_ARCHIVE_EXTENSIONS = {
+    ".zip": "zip",
+    ".rar": "rar",
+    ".7z": "7z",
+    ".tar": "tar",
+    ".bz2": "bz2",
+    ".xz": "xz",
+    ".lzma": "lzma",
+    ".zipx": "zipx",
+    ".iso": "iso",
+    ".cab": "cab",
+    ".arj": "arj",
+    ".lzh": "lzh",
+    ".lha": "lzh",
+}
+
+def create_archive(output_path, source_paths, archive_format, progress_callback=None, stats_callback=None,
+                   options=None):
     """
     Create an archive file from the specified source paths.
 
@@ -59,40 +169,20 @@ def create_archive(output_path, source_paths, archive_format, progress_callback=
         source_paths (list): List of file/directory paths to include in the archive.
         archive_format (str): The format of the archive to create ("zip", "rar", "7z", "tar", "tar.gz", "bz2", "tar.bz2", "xz", "tar.xz", "lzma", "zipx", "iso", "cab", "arj", "lzh").
         progress_callback (function): Optional callback for progress updates.
+        stats_callback (function): Optional callback receiving ProgressStats (bytes, MB/s, ETA).
+        options (CompressionOptions): Optional level/dictionary/thread settings; library defaults when omitted.
+            With ``volume_size`` set the archive is split into volumes as it is written:
+            output_path.001, .002, ... (rar: output.partN.rar).
     """
+    progress_callback = ProgressTracker(progress_callback, stats_callback)
+    options = options or CompressionOptions()
     try:
-        if archive_format == "zip":
-            _create_zip(output_path, source_paths, progress_callback)
-        elif archive_format == "rar":
-            _create_rar(output_path, source_paths, progress_callback)
-        elif archive_format == "7z":
-            _create_7z(output_path, source_paths, progress_callback)
-        elif archive_format == "tar":
-            _create_tar(output_path, source_paths, progress_callback)
-        elif archive_format == "tar.gz":
-            _create_tar_gz(output_path, source_paths, progress_callback)
-        elif archive_format == "bz2":
-            _create_bz2(output_path, source_paths, progress_callback)
-        elif archive_format == "tar.bz2":
-            _create_tar_bz2(output_path, source_paths, progress_callback)
-        elif archive_format == "xz":
-            _create_xz(output_path, source_paths, progress_callback)
-        elif archive_format == "tar.xz":
-            _create_tar_xz(output_path, source_paths, progress_callback)
-        elif archive_format == "lzma":
-            _create_lzma(output_path, source_paths, progress_callback)
-        elif archive_format == "zipx":
-            _create_zipx(output_path, source_paths, progress_callback)
-        elif archive_format == "iso":
-            _create_iso(output_path, source_paths, progress_callback)
-        elif archive_format == "cab":
-            _create_cab(output_path, source_paths, progress_callback)
-        elif archive_format == "arj":
-            _create_arj(output_path, source_paths, progress_callback)
-        elif archive_format == "lzh":
-            _create_lzh(output_path, source_paths, progress_callback)
-        else:
+        creator = _ARCHIVE_CREATORS.get(archive_format)
+        if creator is None:
             raise ValueError(f"Unsupported archive format for creation: {archive_format}")
+        if options.volume_size and archive_format not in SPLIT_ARCHIVE_FORMATS:
+            raise ValueError(f"Split volumes are not supported for {archive_format} archives")
+        creator(output_path, source_paths, progress_callback, options)
 
         if progress_callback:
             progress_callback(f"Archive created: {output_path}", 100)
@@ -103,206 +193,245 @@ def create_archive(output_path, source_paths, archive_format, progress_callback=
             progress_callback(f"Error creating archive: {str(e)}", -1)
         return False
 
-def _create_zip(output_path, source_paths, progress_callback=None):
-    total_files = _count_files_in_sources(source_paths)
-    processed_files = 0
-    with zipfile.ZipFile(output_path, 'w', zipfile.ZIP_DEFLATED) as zipf:
-        for source_path in source_paths:
-            path = Path(source_path)
-            if path.is_file():
-                arcname = path.name
-                zipf.write(path, arcname)
-                processed_files += 1
-                if progress_callback:
-                    progress_callback(f"Adding {arcname}", (processed_files / total_files) * 100)
-            elif path.is_dir():
-                for file_path in path.rglob('*'):
-                    if file_path.is_file():
-                        arcname = file_path.relative_to(path.parent)
-                        zipf.write(file_path, arcname)
-                        processed_files += 1
-                        if progress_callback:
-                            progress_callback(f"Adding {arcname}", (processed_files / total_files) * 100)
-
-def _create_7z(output_path, source_paths, progress_callback=None):
+def _create_zip(output_path, source_paths, progress_callback=None, options=None):
+    options = options or CompressionOptions()
+    progress = ProgressTracker.wrap(progress_callback)
+    manifest = _scan_sources(source_paths, progress)
+    progress.start(manifest.total_bytes)
+    reported_written = 0
+    stored_files = 0
+    stored_bytes = 0
+
+    def on_entry_written(entry):
+        nonlocal reported_written, stored_files, stored_bytes
+        written = zipw.bytes_written - reported_written
+        reported_written += written
+        if entry.method == ZIP_STORED:
+            stored_files += 1
+            stored_bytes += entry.file_size
+        progress.advance(written=written, message=f"Adding {entry.arcname}")
+
+    def on_read(count):
+        progress.advance(read=count)
+
+    # Entries are deflated concurrently and written in order by a single writer
+    with _open_output(output_path, options) as output, \
+            ParallelZipWriter(output, compresslevel=options.zlib_level(), workers=options.threads,
+                              on_entry_written=on_entry_written, on_read=on_read) as zipw:
+        for entry in manifest.files():
+            # Known compressed formats are stored outright; the workers trial-compress the rest
+            if options.level == 0 or _has_incompressible_extension(entry.path):
+                method = ZIP_STORED
+            else:
+                method = ZIP_DEFLATED
+            zipw.add_file(entry.path, entry.arcname, method, mtime=entry.mtime, mode=entry.mode)
+
+    if progress and stored_files and options.level != 0:
+        progress(f"Stored {stored_files} already-compressed files ({_format_size(stored_bytes)}) without compression", 100)
+
+def _create_7z(output_path, source_paths, progress_callback=None, options=None):
+    options = options or CompressionOptions()
     if progress_callback:
         progress_callback("Starting 7z archive creation...", 0)
 
-    with py7zr.SevenZipFile(output_path, 'w') as szf:
-        for source_path in source_paths:
-            path = Path(source_path)
-            if path.is_file():
-                szf.write(path, arcname=path.name)
-            elif path.is_dir():
-                szf.writeall(path, arcname=path.name)
-    
+    progress = ProgressTracker.wrap(progress_callback)
+    manifest = _scan_sources(source_paths, progress)
+    progress.start(manifest.total_bytes)
+    reported_written = 0
+    stored_files = 0
+    stored_bytes = 0
+
+    def on_block_written(block):
+        nonlocal reported_written, stored_files, stored_bytes
+        written = szw.bytes_written - reported_written
+        reported_written += written
+        if block.filters == SEVENZIP_COPY:
+            stored_files += len(block.files)
+            stored_bytes += block.unpack_size
+        progress.advance(written=written, message=f"Adding {block.files[-1].arcname}")
+
+    def on_read(count):
+        progress.advance(read=count)
+
+    # Files are grouped into solid blocks with a filter chain per file type; the
+    # blocks are compressed concurrently and written in order by a single writer
+    with _open_output(output_path, options) as output, \
+            SevenZipWriter(output, on_read=on_read, on_block_written=on_block_written,
+                           **_sevenzip_writer_options(options)) as szw:
+        for entry in manifest.entries:
+            if entry.is_dir:
+                szw.add_directory(entry.arcname, mtime=entry.mtime, mode=entry.mode)
+            else:
+                szw.add_file(entry.path, entry.arcname, entry.size, mtime=entry.mtime, mode=entry.mode,
+                             store=_has_incompressible_extension(entry.path))
+    progress.advance(written=szw.bytes_written - reported_written)
+
+    if progress and stored_files and options.level != 0:
+        progress(f"Stored {stored_files} already-compressed files ({_format_size(stored_bytes)}) without compression", 100)
     if progress_callback:
         progress_callback("7z archive created.", 100)
 
-def _create_tar(output_path, source_paths, progress_callback=None):
-    total_files = _count_files_in_sources(source_paths)
-    processed_files = 0
-    if progress_callback:
-        progress_callback("Starting TAR archive creation...", 0)
-    with tarfile.open(output_path, 'w') as tarf:
-        for source_path in source_paths:
-            path = Path(source_path)
-            if path.is_file():
-                tarf.add(path, arcname=path.name)
-                processed_files += 1
-                if progress_callback:
-                    progress_callback(f"Adding {path.name}", (processed_files / total_files) * 100)
-            elif path.is_dir():
-                # tarfile.add can add directories recursively
-                tarf.add(path, arcname=path.name)
-                # For progress, we need to count files inside the added directory
-                # This is a simplification; a more accurate progress would require pre-counting
-                processed_files += sum(1 for _ in path.rglob('*') if _.is_file())
-                if progress_callback:
-                    progress_callback(f"Adding directory {path.name}/", (processed_files / total_files) * 100)
-    if progress_callback:
-        progress_callback("TAR archive created.", 100)
+def _sevenzip_writer_options(options):
+    """SevenZipWriter settings from CompressionOptions, shared by create, add, sync and transcode."""
+    return dict(preset=options.lzma_preset(), dict_size=options.dictionary_size,
+                solid_block_size=options.solid_block_size, filters=options.sevenzip_filters(),
+                workers=options.threads)
+
+def _open_output(output_path, options):
+    """Writable file for a new archive; a VolumeWriter when the options ask for split volumes."""
+    if options.volume_size:
+        return VolumeWriter(output_path, options.volume_size)
+    return open(output_path, 'wb')
+
+def _has_incompressible_extension(path):
+    """True for file types that are already compressed (media, nested archives)."""
+    return os.path.splitext(path)[1].lower() in INCOMPRESSIBLE_EXTENSIONS
+
+def _format_size(num_bytes):
+    """Human readable size, e.g. '1.5 MB'."""
+    value = float(num_bytes)
+    for unit in ("B", "KB", "MB", "GB"):
+        if value < 1024:
+            return f"{value:.1f} {unit}"
+        value /= 1024
+    return f"{value:.1f} TB"
+
+def _create_tar(output_path, source_paths, progress_callback=None, options=None):
+    _write_tar(output_path, source_paths, None, "TAR", progress_callback, options)
+
+def _create_tar_gz(output_path, source_paths, progress_callback=None, options=None):
+    _write_tar(output_path, source_paths, "gz", "TAR.GZ", progress_callback, options)
+
+def _write_tar(output_path, source_paths, compression, label, progress_callback=None, options=None):
+    """
+    Write a tar archive from a single scan of the sources.
 
-def _create_tar_gz(output_path, source_paths, progress_callback=None):
-    total_files = _count_files_in_sources(source_paths)
-    processed_files = 0
-    if progress_callback:
-        progress_callback("Starting TAR.GZ archive creation...", 0)
-    with tarfile.open(output_path, 'w:gz') as tarf:
-        for source_path in source_paths:
-            path = Path(source_path)
-            if path.is_file():
-                tarf.add(path, arcname=path.name)
-                processed_files += 1
-                if progress_callback:
-                    progress_callback(f"Adding {path.name}", (processed_files / total_files) * 100)
-            elif path.is_dir():
-                tarf.add(path, arcname=path.name)
-                processed_files += sum(1 for _ in path.rglob('*') if _.is_file())
-                if progress_callback:
-                    progress_callback(f"Adding directory {path.name}/", (processed_files / total_files) * 100)
-    if progress_callback:
-        progress_callback("TAR.GZ archive created.", 100)
+    ``compression`` is None, "gz", "bz2" or "xz"; the codec stream is opened
+    here rather than by tarfile so the compression options reach it.
+    """
+    options = options or CompressionOptions()
+    progress = ProgressTracker.wrap(progress_callback)
+    manifest = _scan_sources(source_paths, progress)
+    progress.start(manifest.total_bytes)
+    if progress:
+        progress(f"Starting {label} archive creation...", 0)
+
+    def on_read(count):
+        progress.advance(read=count)
+
+    def on_write(count):
+        progress.advance(written=count)
+
+    with _open_output(output_path, options) as raw, \
+            _open_compressed_writer(CountingWriter(raw, on_write), compression, options) as stream, \
+            tarfile.open(fileobj=stream, mode='w') as tarf:
+        for entry in manifest.entries:
+            _add_tar_entry(tarf, entry, progress, on_read)
+    if progress:
+        progress(f"{label} archive created.", 100)
+
+def _add_tar_entry(tarf, entry, progress, on_read=None):
+    """Write one ManifestEntry to an open tarfile, using the metadata from the scan."""
+    info = tarfile.TarInfo(entry.arcname)
+    info.mode = stat.S_IMODE(entry.mode)
+    info.mtime = entry.mtime
+    info.uid = entry.uid
+    info.gid = entry.gid
+    if entry.is_dir:
+        info.type = tarfile.DIRTYPE
+        tarf.addfile(info)
+        return
+    info.size = entry.size
+    progress.advance(message=f"Adding {entry.arcname}")
+    with open(entry.path, 'rb') as f:
+        tarf.addfile(info, CountingReader(f, on_read) if on_read else f)
+
+def _open_compressed_writer(fileobj, compression, options):
+    """
+    Wrap ``fileobj`` in a gzip/bz2/xz writer configured from ``options``.
 
-def _create_bz2(output_path, source_paths, progress_callback=None):
+    The output is a plain single-stream file unless ``options.indexed`` asks
+    for codec restarts every few MiB, which give the tarball checkpoints for
+    random access (see support.tar_index).
+    """
+    if compression and options.indexed:
+        if compression == "xz":
+            return SeekableCompressedWriter(fileobj, "xz", filters=options.lzma_filters())
+        level = options.gzip_level() if compression == "gz" else options.bz2_level()
+        return SeekableCompressedWriter(fileobj, compression, compresslevel=level)
+    if compression == "gz":
+        return gzip.GzipFile(fileobj=fileobj, mode='wb', compresslevel=options.gzip_level())
+    if compression == "bz2":
+        return bz2.BZ2File(fileobj, 'wb', compresslevel=options.bz2_level())
+    if compression == "xz":
+        return lzma.LZMAFile(fileobj, 'wb', format=lzma.FORMAT_XZ, filters=options.lzma_filters())
+    return contextlib.nullcontext(fileobj)
+
+def _create_bz2(output_path, source_paths, progress_callback=None, options=None):
     """Create a bz2 compressed file (single file only)."""
     import bz2
     
-    if len(source_paths) != 1 or not os.path.isfile(source_paths[0]):
-        raise ValueError("bz2 format only supports compressing a single file")
-    
-    source_file = source_paths[0]
+    options = options or CompressionOptions()
     
-    with open(source_file, 'rb') as f_in:
-        with bz2.open(output_path, 'wb') as f_out:
-            while True:
-                chunk = f_in.read(8192)
-                if not chunk:
-                    break
-                f_out.write(chunk)
-    
-    if progress_callback:
-        progress_callback(f"Compressed {source_file}", 100)
+    def open_compressed(fileobj, mode):
+        return bz2.open(fileobj, mode, compresslevel=options.bz2_level())
     
-    return True
+    return _compress_single_file(output_path, source_paths, open_compressed, "bz2", progress_callback)
 
-def _create_tar_bz2(output_path, source_paths, progress_callback=None):
+def _create_tar_bz2(output_path, source_paths, progress_callback=None, options=None):
     """Create a tar.bz2 archive."""
-    import tarfile
-    
-    total_files = _count_files_in_sources(source_paths)
-    processed_files = 0
-    
-    with tarfile.open(output_path, "w:bz2") as tar:
-        for source_path in source_paths:
-            if os.path.isfile(source_path):
-                tar.add(source_path, arcname=os.path.basename(source_path))
-                processed_files += 1
-            elif os.path.isdir(source_path):
-                for root, dirs, files in os.walk(source_path):
-                    for file in files:
-                        file_path = os.path.join(root, file)
-                        arcname = os.path.relpath(file_path, source_path)
-                        tar.add(file_path, arcname=arcname)
-                        processed_files += 1
-                        
-                        if progress_callback:
-                            progress = int((processed_files / total_files) * 100)
-                            progress_callback(f"Adding {file}", progress)
-    
+    _write_tar(output_path, source_paths, "bz2", "TAR.BZ2", progress_callback, options)
     return True
 
-def _create_xz(output_path, source_paths, progress_callback=None):
+def _create_xz(output_path, source_paths, progress_callback=None, options=None):
     """Create a xz compressed file (single file only)."""
     import lzma
     
-    if len(source_paths) != 1 or not os.path.isfile(source_paths[0]):
-        raise ValueError("xz format only supports compressing a single file")
-    
-    source_file = source_paths[0]
-    
-    with open(source_file, 'rb') as f_in:
-        with lzma.open(output_path, 'wb') as f_out:
-            while True:
-                chunk = f_in.read(8192)
-                if not chunk:
-                    break
-                f_out.write(chunk)
+    options = options or CompressionOptions()
     
-    if progress_callback:
-        progress_callback(f"Compressed {source_file}", 100)
+    def open_compressed(fileobj, mode):
+        return lzma.open(fileobj, mode, filters=options.lzma_filters())
     
-    return True
+    return _compress_single_file(output_path, source_paths, open_compressed, "xz", progress_callback)
 
-def _create_tar_xz(output_path, source_paths, progress_callback=None):
+def _create_tar_xz(output_path, source_paths, progress_callback=None, options=None):
     """Create a tar.xz archive."""
-    import tarfile
-    
-    total_files = _count_files_in_sources(source_paths)
-    processed_files = 0
-    
-    with tarfile.open(output_path, "w:xz") as tar:
-        for source_path in source_paths:
-            if os.path.isfile(source_path):
-                tar.add(source_path, arcname=os.path.basename(source_path))
-                processed_files += 1
-            elif os.path.isdir(source_path):
-                for root, dirs, files in os.walk(source_path):
-                    for file in files:
-                        file_path = os.path.join(root, file)
-                        arcname = os.path.relpath(file_path, source_path)
-                        tar.add(file_path, arcname=arcname)
-                        processed_files += 1
-                        
-                        if progress_callback:
-                            progress = int((processed_files / total_files) * 100)
-                            progress_callback(f"Adding {file}", progress)
-    
+    _write_tar(output_path, source_paths, "xz", "TAR.XZ", progress_callback, options)
     return True
 
-def _create_lzma(output_path, source_paths, progress_callback=None):
+def _create_lzma(output_path, source_paths, progress_callback=None, options=None):
     """Create a lzma compressed file (single file only)."""
     import lzma
     
+    options = options or CompressionOptions()
+    
+    def open_compressed(fileobj, mode):
+        return lzma.open(fileobj, mode, filters=options.lzma_filters())
+    
+    return _compress_single_file(output_path, source_paths, open_compressed, "lzma", progress_callback)
+
+def _compress_single_file(output_path, source_paths, open_compressed, format_name, progress_callback=None):
+    """Compress one source file through a file-like codec such as bz2.open or lzma.open."""
+    progress = ProgressTracker.wrap(progress_callback)
+    
     if len(source_paths) != 1 or not os.path.isfile(source_paths[0]):
-        raise ValueError("lzma format only supports compressing a single file")
+        raise ValueError(f"{format_name} format only supports compressing a single file")
     
     source_file = source_paths[0]
+    progress.start(os.path.getsize(source_file))
+    message = f"Compressing {os.path.basename(source_file)}"
     
-    with open(source_file, 'rb') as f_in:
-        with lzma.open(output_path, 'wb') as f_out:
-            while True:
-                chunk = f_in.read(8192)
-                if not chunk:
-                    break
-                f_out.write(chunk)
+    with open(source_file, 'rb') as f_in, open(output_path, 'wb') as raw:
+        with open_compressed(CountingWriter(raw, lambda count: progress.advance(written=count)), 'wb') as f_out:
+            # Reading the source overlaps with compressing and writing the previous chunk
+            copy_stream(f_in, f_out, on_read=lambda count: progress.advance(read=count, message=message))
     
-    if progress_callback:
-        progress_callback(f"Compressed {source_file}", 100)
+    if progress:
+        progress(f"Compressed {source_file}", 100)
     
     return True
 
-def _create_zipx(output_path, source_paths, progress_callback=None):
+def _create_zipx(output_path, source_paths, progress_callback=None, options=None):
     """Create a zipx archive (using patool for better compression)."""
     try:
         import patoolib
@@ -332,7 +461,7 @@ def _create_zipx(output_path, source_paths, progress_callback=None):
     finally:
         shutil.rmtree(temp_dir)
 
-def _create_iso(output_path, source_paths, progress_callback=None):
+def _create_iso(output_path, source_paths, progress_callback=None, options=None):
     """Create an ISO image (using patool)."""
     try:
         import patoolib
@@ -350,7 +479,7 @@ def _create_iso(output_path, source_paths, progress_callback=None):
     
     return True
 
-def _create_cab(output_path, source_paths, progress_callback=None):
+def _create_cab(output_path, source_paths, progress_callback=None, options=None):
     """Create a CAB archive (using patool)."""
     try:
         import patoolib
@@ -364,7 +493,7 @@ def _create_cab(output_path, source_paths, progress_callback=None):
     
     return True
 
-def _create_arj(output_path, source_paths, progress_callback=None):
+def _create_arj(output_path, source_paths, progress_callback=None, options=None):
     """Create an ARJ archive (using patool)."""
     try:
         import patoolib
@@ -378,7 +507,7 @@ def _create_arj(output_path, source_paths, progress_callback=None):
     
     return True
 
-def _create_lzh(output_path, source_paths, progress_callback=None):
+def _create_lzh(output_path, source_paths, progress_callback=None, options=None):
     """Create an LZH archive (using patool)."""
     try:
         import patoolib
@@ -392,63 +521,84 @@ def _create_lzh(output_path, source_paths, progress_callback=None):
     
     return True
 
-def _create_rar(output_path, source_paths, progress_callback=None):
+def _create_rar(output_path, source_paths, progress_callback=None, options=None):
     """Create RAR archive using system rar command."""
-    rar_cmd = _get_rar_command_name()
-    if not rar_cmd:
-        raise RuntimeError("RAR command not found. Please install RAR: https://www.rarlab.com/download.htm")
-    
     if progress_callback:
         progress_callback("Starting RAR archive creation...", 0)
-    
-    try:
-        # Build the rar command
-        cmd = [rar_cmd, 'a', '-r', output_path]
-        
-        # Add source paths to the command
-        for source_path in source_paths:
-            cmd.append(str(Path(source_path).absolute()))
-        
-        # Run the command
-        result = subprocess.run(cmd, capture_output=True, text=True, check=True)
-        
-        if progress_callback:
-            progress_callback("RAR archive created.", 100)
-            
-    except subprocess.CalledProcessError as e:
-        error_msg = f"Failed to create RAR archive: {e.stderr if e.stderr else str(e)}"
-        raise RuntimeError(error_msg)
-    except Exception as e:
-        raise RuntimeError(f"Error creating RAR archive: {str(e)}")
+    options = options or CompressionOptions()
+    _run_rar('a', ['-r'] + options.rar_switches(), output_path, source_paths, progress_callback,
+             "Creating RAR archive", "Failed to create RAR archive")
+    if progress_callback:
+        progress_callback("RAR archive created.", 100)
 
-def _add_to_rar(archive_path, file_to_add_path, progress_callback=None):
-    """Add file to RAR archive using system rar command."""
-    rar_cmd = _get_rar_command_name()
-    if not rar_cmd:
-        raise RuntimeError("RAR command not found. Please install RAR: https://www.rarlab.com/download.htm")
-    
+def _add_to_rar(archive_path, files_to_add, progress_callback=None, options=None):
+    """Add files to RAR archive with a single run of the system rar command."""
     if progress_callback:
         progress_callback("Starting adding to RAR archive...", 0)
-    
-    try:
-        # Build the rar command to add file
-        cmd = [rar_cmd, 'a', archive_path, str(Path(file_to_add_path).absolute())]
-        
-        # Run the command
-        result = subprocess.run(cmd, capture_output=True, text=True, check=True)
-        
-        if progress_callback:
-            file_name = os.path.basename(file_to_add_path)
-            progress_callback(f"Added {file_name} to RAR archive", 100)
-            
-    except subprocess.CalledProcessError as e:
-        error_msg = f"Failed to add to RAR archive: {e.stderr if e.stderr else str(e)}"
-        raise RuntimeError(error_msg)
-    except Exception as e:
-        raise RuntimeError(f"Error adding to RAR archive: {str(e)}")
-
+    options = options or CompressionOptions()
+    _run_rar('a', options.rar_switches(), archive_path, files_to_add, progress_callback,
+             "Adding to RAR archive", "Failed to add to RAR archive")
+    if progress_callback:
+        progress_callback(f"Added {len(files_to_add)} files to RAR archive", 100)
 
-def extract_archive(archive_path, extract_to, progress_callback=None):
+def _run_rar(command, switches, archive_path, paths, progress_callback, label, error_prefix):
+    """
+    Run one rar command over all ``paths``, reporting the percentage rar prints
+    as it works. Long path lists go through a list file instead of the command line.
+    """
+    rar_cmd = _get_rar_command_name()
+    if not rar_cmd:
+        raise RuntimeError("RAR command not found. Please install RAR: https://www.rarlab.com/download.htm")
+    paths = [str(Path(path).absolute()) for path in paths]
+    with contextlib.ExitStack() as stack:
+        if sum(len(path) + 1 for path in paths) > RAR_MAX_COMMAND_LENGTH:
+            fd, list_path = tempfile.mkstemp(prefix="rar-", suffix=".lst")
+            stack.callback(os.remove, list_path)
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                f.write("\n".join(paths) + "\n")
+            # -sc8l: the list file is UTF-8
+            switches = switches + ['-sc8l']
+            paths = ['@' + list_path]
+        cmd = [rar_cmd, command, '-y'] + switches + ['--', archive_path] + paths
+        process = subprocess.Popen(cmd, stdin=subprocess.DEVNULL, stdout=subprocess.PIPE,
+                                   stderr=subprocess.STDOUT)
+        # rar redraws its percentage with backspaces, so read whatever arrives rather than lines
+        output_tail = b""
+        percent = -1
+        with process.stdout:
+            for chunk in iter(lambda: process.stdout.read1(65536), b""):
+                output_tail = (output_tail + chunk)[-4096:]
+                matches = _RAR_PERCENT.findall(chunk)
+                if progress_callback and matches and int(matches[-1]) != percent:
+                    percent = int(matches[-1])
+                    progress_callback(f"{label}... {percent}%", min(percent, 99))
+        if process.wait() != 0:
+            # Drop the progress lines (redrawn with backspaces) and keep rar's last messages
+            lines = [line.strip() for line in output_tail.decode(errors="replace").splitlines()
+                     if line.strip() and "\b" not in line]
+            message = "\n".join(lines[-3:]) or f"rar exited with code {process.returncode}"
+            raise RuntimeError(f"{error_prefix}: {message}")
+
+_ARCHIVE_CREATORS = {
+    "zip": _create_zip,
+    "rar": _create_rar,
+    "7z": _create_7z,
+    "tar": _create_tar,
+    "tar.gz": _create_tar_gz,
+    "bz2": _create_bz2,
+    "tar.bz2": _create_tar_bz2,
+    "xz": _create_xz,
+    "tar.xz": _create_tar_xz,
+    "lzma": _create_lzma,
+    "zipx": _create_zipx,
+    "iso": _create_iso,
+    "cab": _create_cab,
+    "arj": _create_arj,
+    "lzh": _create_lzh,
+}
+
+def extract_archive(archive_path, extract_to, progress_callback=None, stats_callback=None, exec_policy="archive",
+                    overwrite="overwrite"):
     """
     Extract an archive file to the specified directory.
 
@@ -456,44 +606,31 @@ def extract_archive(archive_path, extract_to, progress_callback=None):
         archive_path (str): Path to the archive file to extract.
         extract_to (str): Directory to extract files to.
         progress_callback (function): Optional callback for progress updates.
+        stats_callback (function): Optional callback receiving ProgressStats (bytes, MB/s, ETA).
+        exec_policy (str): One of EXEC_POLICIES; controls execute permission on extracted files.
+        overwrite (str): One of OVERWRITE_POLICIES. With "skip_identical" files already present
+            with the entry's size and mtime (or CRC) are left alone, and a run that was
+            interrupted resumes after the last member it completed.
     """
+    progress_callback = ProgressTracker(progress_callback, stats_callback)
     try:
         archive_format = _get_archive_type(archive_path)
         if not archive_format:
             raise ValueError(f"Unknown archive format for extraction: {archive_path}")
+        if exec_policy not in EXEC_POLICIES:
+            raise ValueError(f"Unknown exec policy: {exec_policy}")
+        if overwrite not in OVERWRITE_POLICIES:
+            raise ValueError(f"Unknown overwrite policy: {overwrite}")
 
         os.makedirs(extract_to, exist_ok=True)
 
-        if archive_format == "zip":
-            _extract_zip(archive_path, extract_to, progress_callback)
-        elif archive_format == "rar":
-            _extract_rar(archive_path, extract_to, progress_callback)
-        elif archive_format == "7z":
-            _extract_7z(archive_path, extract_to, progress_callback)
-        elif archive_format == "tar":
-            _extract_tar(archive_path, extract_to, progress_callback)
-        elif archive_format == "tar.gz":
-            _extract_tar_gz(archive_path, extract_to, progress_callback)
-        elif archive_format == "bz2":
-            _extract_bz2(archive_path, extract_to, progress_callback)
-        elif archive_format == "tar.bz2":
-            _extract_tar_bz2(archive_path, extract_to, progress_callback)
-        elif archive_format == "xz":
-            _extract_xz(archive_path, extract_to, progress_callback)
-        elif archive_format == "tar.xz":
-            _extract_tar_xz(archive_path, extract_to, progress_callback)
-        elif archive_format == "lzma":
-            _extract_lzma(archive_path, extract_to, progress_callback)
-        elif archive_format == "zipx":
-            _extract_zipx(archive_path, extract_to, progress_callback)
-        elif archive_format == "iso":
-            _extract_iso(archive_path, extract_to, progress_callback)
-        elif archive_format == "cab":
-            _extract_cab(archive_path, extract_to, progress_callback)
-        elif archive_format == "arj":
-            _extract_arj(archive_path, extract_to, progress_callback)
-        elif archive_format == "lzh":
-            _extract_lzh(archive_path, extract_to, progress_callback)
+        if overwrite == "skip_identical":
+            _extract_skipping_identical(archive_format, archive_path, extract_to, progress_callback, exec_policy)
+        elif archive_format in _ARCHIVE_EXTRACTORS:
+            _ARCHIVE_EXTRACTORS[archive_format](archive_path, extract_to, progress_callback, exec_policy)
+        elif archive_format in _WHOLE_ARCHIVE_EXTRACTORS:
+            # Single-file codecs and external tools have no per-member modes to apply
+            _WHOLE_ARCHIVE_EXTRACTORS[archive_format](archive_path, extract_to, progress_callback)
         else:
             raise ValueError(f"Unsupported archive format for extraction: {archive_format}")
 
@@ -506,97 +643,347 @@ def extract_archive(archive_path, extract_to, progress_callback=None):
             progress_callback(f"Error extracting archive: {str(e)}", -1)
         return False
 
-def _extract_zip(zip_path, extract_to, progress_callback=None):
-    with zipfile.ZipFile(zip_path, 'r') as zipf:
-        file_list = zipf.namelist()
-        total_files = len(file_list)
-        for i, file_name in enumerate(file_list):
-            zipf.extract(file_name, extract_to)
-            # Add execute permission to extracted files
-            extracted_path = os.path.join(extract_to, file_name)
-            if os.path.isfile(extracted_path):
-                try:
-                    os.chmod(extracted_path, os.stat(extracted_path).st_mode | 0o111)
-                except (OSError, PermissionError):
-                    pass  # Ignore permission errors
-            if progress_callback:
-                progress = ((i + 1) / total_files) * 100
-                progress_callback(f"Extracting {file_name}", progress)
+def _extract_zip(zip_path, extract_to, progress_callback=None, exec_policy="archive"):
+    _extract_zip_members(zip_path, None, extract_to, progress_callback, exec_policy)
 
-def _extract_rar(rar_path, extract_to, progress_callback=None):
+def _extract_rar(rar_path, extract_to, progress_callback=None, exec_policy="archive"):
     with rarfile.RarFile(rar_path, 'r') as rar_ref:
-        file_list = rar_ref.namelist()
-        total_files = len(file_list)
-        for i, file_name in enumerate(file_list):
-            rar_ref.extract(file_name, extract_to)
-            # Add execute permission to extracted files
-            extracted_path = os.path.join(extract_to, file_name)
-            if os.path.isfile(extracted_path):
-                try:
-                    os.chmod(extracted_path, os.stat(extracted_path).st_mode | 0o111)
-                except (OSError, PermissionError):
-                    pass  # Ignore permission errors
+        if rar_ref.is_solid():
+            # Solid members can only be decoded in order, so let unrar do a single pass
             if progress_callback:
-                progress = ((i + 1) / total_files) * 100
-                progress_callback(f"Extracting {file_name}", progress)
+                progress_callback("Extracting solid RAR archive...", 0)
+            rar_ref.extractall(extract_to)
+            _apply_exec_policy(_member_paths(extract_to, rar_ref.infolist()), exec_policy)
+            return
+        infos = rar_ref.infolist()
+    _extract_entries_parallel(lambda: rarfile.RarFile(rar_path, 'r'), infos, extract_to, progress_callback,
+                              mode_of=_rar_member_mode, exec_policy=exec_policy)
+
+def _zip_stored_range(mapped, info):
+    """
+    (data offset, CRC) of a ZIP member whose bytes lie uncompressed in the
+    mapped archive, or None. The offset comes from the member's local header,
+    whose extra field can differ from the central directory's.
+    """
+    if info.compress_type != ZIP_STORED or info.flag_bits & 0x1 or info.compress_size != info.file_size:
+        return None
+    with mapped.view(info.header_offset, 30) as header:
+        if len(header) < 30 or header[:4] != b"PK\x03\x04":
+            # Let zipfile report the damage
+            return None
+        name_length, extra_length = struct.unpack_from("<HH", header, 26)
+    return info.header_offset + 30 + name_length + extra_length, info.CRC
+
+def _zip_member_mode(info):
+    """Unix mode stored in a ZIP entry's external attributes, or None."""
+    if info.create_system == 3:
+        return (info.external_attr >> 16) or None
+    return None
 
-def _extract_7z(sz_path, extract_to, progress_callback=None):
-    if progress_callback:
-        progress_callback("Starting 7z archive extraction...", 0)
-    with py7zr.SevenZipFile(sz_path, mode='r') as sz_ref:
-        sz_ref.extractall(path=extract_to)
-    # Add execute permission to extracted files
-    for root, dirs, files in os.walk(extract_to):
-        for file in files:
-            file_path = os.path.join(root, file)
+def _rar_member_mode(info):
+    """Unix mode stored in a RAR entry, or None for archives made on Windows."""
+    if info.host_os == rarfile.RAR_OS_UNIX:
+        return info.mode or None
+    return None
+
+def _member_mode(stored_mode, head, exec_policy):
+    """
+    Permission bits for an extracted file, or None to keep the default ones.
+
+    Stored modes lose setuid/setgid and group/other write, as tarfile's 'data'
+    filter does; ``head`` holds the file's first bytes for the "detect" policy.
+    """
+    mode = None
+    if stored_mode:
+        mode = (stat.S_IMODE(stored_mode) & 0o755) | stat.S_IRUSR | stat.S_IWUSR
+    if exec_policy == "all" or (exec_policy == "detect" and head.startswith(_EXECUTABLE_MAGIC)):
+        base = 0o644 if mode is None else mode
+        # Execute permission follows read permission, as with chmod +x
+        mode = base | (base & 0o444) >> 2
+    return mode
+
+def _member_paths(extract_to, infos):
+    """Destination paths of the regular files among ``infos``."""
+    return [_safe_extract_path(extract_to, info.filename) for info in infos if not info.is_dir()]
+
+def _apply_exec_policy(paths, exec_policy):
+    """
+    Add execute permission to already extracted files according to ``exec_policy``.
+
+    Used where the library writes the files itself; only the listed files are touched.
+    """
+    if exec_policy == "archive":
+        return
+    for path in paths:
+        try:
+            head = b""
+            if exec_policy == "detect":
+                with open(path, 'rb') as f:
+                    head = f.read(4)
+            mode = _member_mode(os.stat(path).st_mode, head, exec_policy)
+            if mode is not None:
+                os.chmod(path, mode)
+        except (OSError, PermissionError):
+            pass  # Ignore permission errors
+
+def _extract_entries_parallel(open_archive, infos, extract_to, progress_callback=None, workers=None,
+                              mode_of=None, exec_policy="archive", mapped=None, stored_range=None,
+                              on_extracted=None):
+    """
+    Extract members concurrently, each worker thread reading through its own archive handle.
+
+    Directories are created once up front and the largest members are scheduled first
+    so small files fill in the gaps at the end. ``mode_of`` returns the Unix mode stored
+    for an entry (or None); it is applied through the open file as the member is written.
+    When the archive is ``mapped``, ``stored_range`` returns the (offset, CRC or None)
+    of members stored uncompressed in it; those are copied in the kernel instead.
+    ``on_extracted(name, path)`` is called from the worker once a file is complete.
+    """
+    directories = set()
+    targets = []
+    for info in infos:
+        target = _safe_extract_path(extract_to, info.filename)
+        if info.is_dir():
+            directories.add(target)
+        else:
+            directories.add(os.path.dirname(target))
+            targets.append((info, target))
+    for directory in sorted(directories):
+        os.makedirs(directory, exist_ok=True)
+    targets.sort(key=lambda item: item[0].file_size, reverse=True)
+
+    progress = ProgressTracker.wrap(progress_callback)
+    progress.start(sum(info.file_size for info, _ in targets), basis="written")
+
+    local = threading.local()
+    handles = []
+    handles_lock = threading.Lock()
+
+    def extract_one(info, target):
+        handle = getattr(local, "handle", None)
+        if handle is None:
+            handle = local.handle = open_archive()
+            with handles_lock:
+                handles.append(handle)
+        message = f"Extracting {info.filename}"
+        located = stored_range(info) if stored_range else None
+        if located is not None:
+            _copy_stored_member(mapped, info, located, target, mode_of, exec_policy,
+                                lambda count: progress.advance(written=count, message=message))
+            progress.advance(read=info.compress_size)
+            if on_extracted:
+                on_extracted(info.filename, target)
+            return
+        with handle.open(info) as src, open(target, 'wb') as dst:
+            head = b""
+            if exec_policy == "detect":
+                head = src.read(4)
+                dst.write(head)
+                progress.advance(written=len(head))
+            copy_stream(src, dst, size_hint=info.file_size - len(head),
+                        on_write=lambda count: progress.advance(written=count, message=message))
+            mode = _member_mode(mode_of(info) if mode_of else None, head, exec_policy)
+            if mode is not None and hasattr(os, "fchmod"):
+                os.fchmod(dst.fileno(), mode)
+        progress.advance(read=info.compress_size)
+        if on_extracted:
+            on_extracted(info.filename, target)
+
+    try:
+        with ThreadPoolExecutor(max_workers=workers or _extract_workers()) as executor:
+            futures = [executor.submit(extract_one, info, target) for info, target in targets]
             try:
-                os.chmod(file_path, os.stat(file_path).st_mode | 0o111)
-            except (OSError, PermissionError):
-                pass  # Ignore permission errors
+                for future in as_completed(futures):
+                    future.result()
+            except BaseException:
+                for future in futures:
+                    future.cancel()
+                raise
+    finally:
+        for handle in handles:
+            handle.close()
+
+def _copy_stored_member(mapped, info, located, target, mode_of, exec_policy, on_write):
+    """Copy an uncompressed member out of the mapped archive without reading it into Python."""
+    offset, expected_crc = located
+    with open(target, 'wb') as dst:
+        head = b""
+        if exec_policy == "detect":
+            with mapped.view(offset, min(4, info.file_size)) as view:
+                head = view.tobytes()
+        preallocate(dst, info.file_size)
+        crc = mapped.copy_to(dst, offset, info.file_size, on_write=on_write, crc=expected_crc is not None)
+        if crc != expected_crc:
+            raise zipfile.BadZipFile(f"Bad CRC-32 for file {info.filename!r}")
+        mode = _member_mode(mode_of(info) if mode_of else None, head, exec_policy)
+        if mode is not None and hasattr(os, "fchmod"):
+            os.fchmod(dst.fileno(), mode)
+
+def _open_mapped_archive(path):
+    """MappedFile for a large archive, or None; split sets are not one file and are never mapped."""
+    if is_split_path(path):
+        return None
+    return open_mapped(path)
+
+@contextlib.contextmanager
+def _open_7z(path):
+    """SevenZipFile for reading an archive, or the joined volumes of a split set."""
+    with contextlib.ExitStack() as stack:
+        source = stack.enter_context(VolumeReader(path)) if is_split_path(path) else path
+        with py7zr.SevenZipFile(source, mode='r') as szf:
+            yield szf
+
+def _safe_extract_path(extract_to, member_name):
+    """Map an archive member name to a path inside extract_to, dropping absolute and '..' parts."""
+    parts = []
+    for part in member_name.replace('\\', '/').split('/'):
+        part = os.path.splitdrive(part)[1]
+        if part in ('', '.', '..'):
+            continue
+        parts.append(part)
+    return os.path.join(extract_to, *parts)
+
+def _extract_workers():
+    """Extraction is dominated by per-file syscalls, so use more threads than cores."""
+    return min(32, (os.cpu_count() or 1) * 2)
+
+class _SevenZipProgress(py7zr.callbacks.ExtractCallback):
+    """Feeds py7zr's per-file extraction reports into a ProgressTracker, and optionally ``on_end(name)``."""
+
+    def __init__(self, progress, on_end=None):
+        self.progress = progress
+        self.on_end = on_end
+
+    def report_start_preparation(self):
+        pass
+
+    def report_start(self, processing_file_path, processing_bytes):
+        pass
+
+    def report_update(self, decompressed_bytes):
+        pass
+
+    def report_end(self, processing_file_path, wrote_bytes):
+        self.progress.advance(written=int(wrote_bytes or 0), message=f"Extracting {processing_file_path}")
+        if self.on_end:
+            self.on_end(processing_file_path)
+
+    def report_warning(self, message):
+        pass
+
+    def report_postprocess(self):
+        pass
+
+def _extract_7z(sz_path, extract_to, progress_callback=None, exec_policy="archive"):
+    progress = ProgressTracker.wrap(progress_callback)
+    if progress:
+        progress("Starting 7z archive extraction...", 0)
+    with _open_7z(sz_path) as sz_ref:
+        progress.start(sum(f.uncompressed or 0 for f in sz_ref.files), basis="written")
+        # py7zr applies the stored POSIX modes as it writes each file
+        sz_ref.extractall(path=extract_to, callback=_SevenZipProgress(progress) if progress else None)
+        files = [f.filename for f in sz_ref.files if not f.is_directory]
+    _apply_exec_policy([_safe_extract_path(extract_to, name) for name in files], exec_policy)
     if progress_callback:
         progress_callback("7z archive extracted.", 100)
 
-def _extract_tar(tar_path, extract_to, progress_callback=None):
-    if progress_callback:
-        progress_callback("Starting TAR archive extraction...", 0)
-    with tarfile.open(tar_path, 'r') as tarf:
-        file_list = tarf.getnames()
-        total_files = len(file_list)
-        for i, member in enumerate(tarf.getmembers()):
-            tarf.extract(member, path=extract_to)
-            # Add execute permission to extracted files
-            extracted_path = os.path.join(extract_to, member.name)
-            if member.isfile() and os.path.isfile(extracted_path):
-                try:
-                    os.chmod(extracted_path, os.stat(extracted_path).st_mode | 0o111)
-                except (OSError, PermissionError):
-                    pass  # Ignore permission errors
-            if progress_callback:
-                progress = ((i + 1) / total_files) * 100
-                progress_callback(f"Extracting {member.name}", progress)
-    if progress_callback:
-        progress_callback("TAR archive extracted.", 100)
+def _extract_tar(tar_path, extract_to, progress_callback=None, exec_policy="archive"):
+    _extract_tar_stream(tar_path, None, extract_to, "TAR", progress_callback, exec_policy=exec_policy)
 
-def _extract_tar_gz(tar_gz_path, extract_to, progress_callback=None):
-    if progress_callback:
-        progress_callback("Starting TAR.GZ archive extraction...", 0)
-    with tarfile.open(tar_gz_path, 'r:gz') as tarf:
-        file_list = tarf.getnames()
-        total_files = len(file_list)
-        for i, member in enumerate(tarf.getmembers()):
-            tarf.extract(member, path=extract_to)
-            # Add execute permission to extracted files
-            extracted_path = os.path.join(extract_to, member.name)
-            if member.isfile() and os.path.isfile(extracted_path):
-                try:
-                    os.chmod(extracted_path, os.stat(extracted_path).st_mode | 0o111)
-                except (OSError, PermissionError):
-                    pass  # Ignore permission errors
-            if progress_callback:
-                progress = ((i + 1) / total_files) * 100
-                progress_callback(f"Extracting {member.name}", progress)
-    if progress_callback:
-        progress_callback("TAR.GZ archive extracted.", 100)
+def _extract_tar_gz(tar_gz_path, extract_to, progress_callback=None, exec_policy="archive"):
+    _extract_tar_stream(tar_gz_path, "gz", extract_to, "TAR.GZ", progress_callback, exec_policy=exec_policy)
+
+def _extract_tar_stream(archive_path, compression, extract_to, label, progress_callback=None, selected=None,
+                        exec_policy="archive", on_extracted=None):
+    """
+    Extract a tarball in one forward pass.
+
+    The archive is decoded through the codec's file object and read by tarfile
+    in stream mode, so nothing is decompressed twice and there are no backward
+    seeks; tarfile's own "r|gz" is avoided because it stops after the first gzip
+    member. A large uncompressed tarball is memory-mapped instead: tarfile only
+    reads the headers and file data is copied in the kernel. Progress follows
+    the compressed bytes consumed, which is known up front without a listing
+    pass. ``selected`` optionally limits which members are extracted, and
+    ``on_extracted(name, path)`` is called as each regular file is completed.
+    Returns the number of members extracted.
+    """
+    progress = ProgressTracker.wrap(progress_callback)
+    if progress:
+        progress(f"Starting {label} archive extraction...", 0)
+    progress.start(source_size(archive_path), basis="read")
+    extracted = []
+
+    def report_previous():
+        # tarfile asks for the next member only once the previous one is written
+        if on_extracted and extracted and extracted[-1].isfile():
+            on_extracted(extracted[-1].name, _safe_extract_path(extract_to, extracted[-1].name))
+
+    def members(tarf):
+        for member in tarf:
+            if selected is not None and not selected(member.name):
+                continue
+            report_previous()
+            extracted.append(member)
+            progress.advance(message=f"Extracting {member.name}")
+            yield member
+
+    with contextlib.ExitStack() as stack:
+        mapped = _open_mapped_archive(archive_path)
+        if mapped is not None:
+            raw = stack.enter_context(mapped).reader()
+        else:
+            raw = stack.enter_context(open_source(archive_path))
+        counted = CountingReader(raw, lambda size: progress.advance(read=size))
+        opener = _TAR_STREAM_OPENERS.get(compression)
+        if opener is None and mapped is not None:
+            tarf = stack.enter_context(_MappedTarFile.open(fileobj=counted, mode='r:'))
+            tarf.mapped = mapped
+            tarf.on_copy = lambda size: progress.advance(read=size)
+        else:
+            stream = stack.enter_context(opener(counted) if opener else contextlib.nullcontext(counted))
+            tarf = stack.enter_context(tarfile.open(fileobj=stream, mode='r|'))
+        # extractall defers directory attributes until their contents are written
+        if hasattr(tarfile, "data_filter"):
+            tarf.extractall(extract_to, members=members(tarf), filter="data")
+        else:
+            tarf.extractall(extract_to, members=members(tarf))
+        report_previous()
+    # tarfile applies the stored modes itself
+    _apply_exec_policy([_safe_extract_path(extract_to, member.name) for member in extracted if member.isfile()],
+                       exec_policy)
+    if progress:
+        progress(f"{label} archive extracted.", 100)
+    return len(extracted)
+
+class _MappedTarFile(tarfile.TarFile):
+    """TarFile over a memory-mapped tarball that copies regular file data in the kernel."""
+
+    mapped = None
+    on_copy = None
+
+    def makefile(self, tarinfo, targetpath):
+        if self.mapped is None or tarinfo.sparse is not None:
+            return super().makefile(tarinfo, targetpath)
+        with open(targetpath, 'wb') as target:
+            preallocate(target, tarinfo.size)
+            self.mapped.copy_to(target, tarinfo.offset_data, tarinfo.size, on_write=self.on_copy)
+
+def _open_gzip_stream(fileobj):
+    import gzip
+    return gzip.GzipFile(fileobj=fileobj, mode='rb')
+
+def _open_bz2_stream(fileobj):
+    import bz2
+    return bz2.BZ2File(fileobj, 'rb')
+
+def _open_xz_stream(fileobj):
+    import lzma
+    return lzma.LZMAFile(fileobj, 'rb')
+
+# Codec file objects used to read tarballs; unlike tarfile's own stream mode they
+# handle multi-member gzip and multi-stream bz2/xz files
+_TAR_STREAM_OPENERS = {"gz": _open_gzip_stream, "bz2": _open_bz2_stream, "xz": _open_xz_stream}
 
 def _extract_bz2(archive_path, extract_to, progress_callback=None):
     """Extract bz2 compressed file."""
@@ -611,42 +998,16 @@ def _extract_bz2(archive_path, extract_to, progress_callback=None):
     
     output_path = os.path.join(extract_to, output_filename)
     
-    with bz2.open(archive_path, 'rb') as f_in:
-        with open(output_path, 'wb') as f_out:
-            while True:
-                chunk = f_in.read(8192)
-                if not chunk:
-                    break
-                f_out.write(chunk)
+    _decompress_single_file(archive_path, output_path, bz2.open, progress_callback)
     
     if progress_callback:
         progress_callback(f"Extracted {output_filename}", 100)
     
     return True
 
-def _extract_tar_bz2(archive_path, extract_to, progress_callback=None):
+def _extract_tar_bz2(archive_path, extract_to, progress_callback=None, exec_policy="archive"):
     """Extract tar.bz2 archive."""
-    import tarfile
-    
-    with tarfile.open(archive_path, "r:bz2") as tar:
-        members = tar.getmembers()
-        total_members = len(members)
-        
-        for i, member in enumerate(members):
-            tar.extract(member, extract_to)
-            
-            # Try to set executable permissions if it's a file
-            if member.isfile():
-                extracted_path = os.path.join(extract_to, member.name)
-                try:
-                    os.chmod(extracted_path, 0o755)
-                except:
-                    pass
-            
-            if progress_callback:
-                progress = int((i + 1) / total_members * 100)
-                progress_callback(f"Extracting {member.name}", progress)
-    
+    _extract_tar_stream(archive_path, "bz2", extract_to, "TAR.BZ2", progress_callback, exec_policy=exec_policy)
     return True
 
 def _extract_xz(archive_path, extract_to, progress_callback=None):
@@ -662,42 +1023,16 @@ def _extract_xz(archive_path, extract_to, progress_callback=None):
     
     output_path = os.path.join(extract_to, output_filename)
     
-    with lzma.open(archive_path, 'rb') as f_in:
-        with open(output_path, 'wb') as f_out:
-            while True:
-                chunk = f_in.read(8192)
-                if not chunk:
-                    break
-                f_out.write(chunk)
+    _decompress_single_file(archive_path, output_path, lzma.open, progress_callback)
     
     if progress_callback:
         progress_callback(f"Extracted {output_filename}", 100)
     
     return True
 
-def _extract_tar_xz(archive_path, extract_to, progress_callback=None):
+def _extract_tar_xz(archive_path, extract_to, progress_callback=None, exec_policy="archive"):
     """Extract tar.xz archive."""
-    import tarfile
-    
-    with tarfile.open(archive_path, "r:xz") as tar:
-        members = tar.getmembers()
-        total_members = len(members)
-        
-        for i, member in enumerate(members):
-            tar.extract(member, extract_to)
-            
-            # Try to set executable permissions if it's a file
-            if member.isfile():
-                extracted_path = os.path.join(extract_to, member.name)
-                try:
-                    os.chmod(extracted_path, 0o755)
-                except:
-                    pass
-            
-            if progress_callback:
-                progress = int((i + 1) / total_members * 100)
-                progress_callback(f"Extracting {member.name}", progress)
-    
+    _extract_tar_stream(archive_path, "xz", extract_to, "TAR.XZ", progress_callback, exec_policy=exec_policy)
     return True
 
 def _extract_lzma(archive_path, extract_to, progress_callback=None):
@@ -711,19 +1046,25 @@ def _extract_lzma(archive_path, extract_to, progress_callback=None):
     
     output_path = os.path.join(extract_to, output_filename)
     
-    with lzma.open(archive_path, 'rb') as f_in:
-        with open(output_path, 'wb') as f_out:
-            while True:
-                chunk = f_in.read(8192)
-                if not chunk:
-                    break
-                f_out.write(chunk)
+    _decompress_single_file(archive_path, output_path, lzma.open, progress_callback)
     
     if progress_callback:
         progress_callback(f"Extracted {output_filename}", 100)
     
     return True
 
+def _decompress_single_file(archive_path, output_path, open_compressed, progress_callback=None):
+    """Decompress a single-file codec, with progress measured on the compressed input."""
+    progress = ProgressTracker.wrap(progress_callback)
+    progress.start(os.path.getsize(archive_path))
+    message = f"Extracting {os.path.basename(output_path)}"
+    
+    with open_input(archive_path) as raw, \
+            open_compressed(CountingReader(raw, lambda count: progress.advance(read=count)), 'rb') as f_in, \
+            open(output_path, 'wb') as f_out:
+        # Decompression runs on the reader thread while the previous chunk is written
+        copy_stream(f_in, f_out, on_write=lambda count: progress.advance(written=count, message=message))
+
 def _extract_zipx(archive_path, extract_to, progress_callback=None):
     """Extract zipx archive (using patool)."""
     try:
@@ -738,34 +1079,39 @@ def _extract_zipx(archive_path, extract_to, progress_callback=None):
     
     return True
 
-def _extract_iso(archive_path, extract_to, progress_callback=None):
-    """Extract ISO image (using patool)."""
-    try:
-        import patoolib
-    except ImportError:
-        raise ImportError("patool is required for ISO format support")
-    
-    patoolib.extract_archive(archive_path, outdir=extract_to)
+def _extract_iso(archive_path, extract_to, progress_callback=None, exec_policy="archive"):
+    """Extract ISO image; files are copied out of the memory-mapped image in parallel."""
+    _extract_iso_members(archive_path, None, extract_to, progress_callback, exec_policy)
     
     if progress_callback:
         progress_callback("ISO image extracted", 100)
     
     return True
 
-def _extract_cab(archive_path, extract_to, progress_callback=None):
-    """Extract CAB archive (using patool)."""
+def _iso_member_mode(info):
+    """Rock Ridge mode of an ISO entry, or None."""
+    return info.mode or None
+
+def _extract_cab(archive_path, extract_to, progress_callback=None, exec_policy="archive"):
+    """Extract CAB archive; LZX and Quantum cabinets are left to patool."""
     try:
-        import patoolib
-    except ImportError:
-        raise ImportError("patool is required for CAB format support")
-    
-    patoolib.extract_archive(archive_path, outdir=extract_to)
+        _extract_cab_members(archive_path, None, extract_to, progress_callback, exec_policy)
+    except NotImplementedError:
+        _extract_cab_with_patool(archive_path, extract_to, progress_callback)
     
     if progress_callback:
         progress_callback("CAB archive extracted", 100)
     
     return True
 
+def _extract_cab_with_patool(archive_path, extract_to, progress_callback=None):
+    try:
+        import patoolib
+    except ImportError:
+        raise ImportError("patool is required for LZX and Quantum compressed CAB archives")
+    
+    patoolib.extract_archive(archive_path, outdir=extract_to)
+
 def _extract_arj(archive_path, extract_to, progress_callback=None):
     """Extract ARJ archive (using patool)."""
     try:
@@ -795,475 +1141,1514 @@ def _extract_lzh(archive_path, extract_to, progress_callback=None):
     return True
 
 
-def add_to_archive(archive_path, file_to_add_path, progress_callback=None):
+def extract_members(archive_path, members, extract_to, progress_callback=None, stats_callback=None,
+                    exec_policy="archive"):
     """
-    Add a file to an existing archive file.
+    Extract only the chosen members of an archive.
+
+    ZIP, RAR and 7z go straight to the selected entries; tarballs are read in a
+    single forward pass (or through their cached index when one exists), so a
+    single file never costs a full extraction.
 
     Args:
-        archive_path (str): Path to the existing archive file.
-        file_to_add_path (str): Path to the file to add.
+        archive_path (str): Path to the archive file.
+        members (iterable of str): Member names as listed by list_archive_contents,
+            folder names (everything below them is extracted) or glob patterns such as "*.cfg".
+        extract_to (str): Directory to extract files to.
         progress_callback (function): Optional callback for progress updates.
+        stats_callback (function): Optional callback receiving ProgressStats (bytes, MB/s, ETA).
+        exec_policy (str): One of EXEC_POLICIES; controls execute permission on extracted files.
     """
+    progress_callback = ProgressTracker(progress_callback, stats_callback)
     try:
         archive_format = _get_archive_type(archive_path)
         if not archive_format:
-            raise ValueError(f"Unknown archive format for adding: {archive_path}")
+            raise ValueError(f"Unknown archive format for extraction: {archive_path}")
+        if exec_policy not in EXEC_POLICIES:
+            raise ValueError(f"Unknown exec policy: {exec_policy}")
+        selected = _member_selector(members)
 
-        if archive_format == "zip":
-            _add_to_zip(archive_path, file_to_add_path, progress_callback)
-        elif archive_format == "rar":
-            _add_to_rar(archive_path, file_to_add_path, progress_callback)
-        elif archive_format == "7z":
-            _add_to_7z(archive_path, file_to_add_path, progress_callback)
-        elif archive_format == "tar":
-            _add_to_tar(archive_path, file_to_add_path, progress_callback)
-        elif archive_format == "tar.gz":
-            _add_to_tar_gz(archive_path, file_to_add_path, progress_callback)
-        elif archive_format == "tar.bz2":
-            _add_to_tar_bz2(archive_path, file_to_add_path, progress_callback)
-        elif archive_format == "tar.xz":
-            _add_to_tar_xz(archive_path, file_to_add_path, progress_callback)
-        elif archive_format == "zipx":
-            _add_to_zipx(archive_path, file_to_add_path, progress_callback)
-        elif archive_format == "cab":
-            _add_to_cab(archive_path, file_to_add_path, progress_callback)
-        elif archive_format == "arj":
-            _add_to_arj(archive_path, file_to_add_path, progress_callback)
-        elif archive_format == "lzh":
-            _add_to_lzh(archive_path, file_to_add_path, progress_callback)
-        else:
-            raise ValueError(f"Unsupported archive format for adding files: {archive_format}")
-        
+        os.makedirs(extract_to, exist_ok=True)
+
+        count = _extract_selected(archive_format, archive_path, selected, extract_to, progress_callback, exec_policy)
+        if not count:
+            raise ValueError("No archive members match the selection")
         if progress_callback:
-            progress_callback(f"File added to archive: {file_to_add_path}", 100)
+            progress_callback(f"Extracted {count} members to: {extract_to}", 100)
         return True
 
     except Exception as e:
         if progress_callback:
-            progress_callback(f"Error adding to archive: {str(e)}", -1)
+            progress_callback(f"Error extracting archive: {str(e)}", -1)
         return False
 
-def _add_to_zip(zip_path, file_to_add_path, progress_callback=None):
-    temp_zip_path = zip_path + ".temp"
-    with zipfile.ZipFile(zip_path, 'r') as original_zip:
-        with zipfile.ZipFile(temp_zip_path, 'w', zipfile.ZIP_DEFLATED) as new_zip:
-            for item in original_zip.namelist():
-                new_zip.writestr(item, original_zip.read(item))
-            file_name = os.path.basename(file_to_add_path)
-            new_zip.write(file_to_add_path, file_name)
-            if progress_callback:
-                progress_callback(f"Added {file_name} to ZIP", 100)
-    os.replace(temp_zip_path, zip_path)
+def _extract_selected(archive_format, archive_path, selected, extract_to, progress_callback=None,
+                      exec_policy="archive", on_extracted=None):
+    """Extract the members accepted by ``selected`` with the format's backend; returns how many matched."""
+    if archive_format == "zip":
+        return _extract_zip_members(archive_path, selected, extract_to, progress_callback, exec_policy,
+                                    on_extracted)
+    if archive_format == "rar":
+        return _extract_rar_members(archive_path, selected, extract_to, progress_callback, exec_policy,
+                                    on_extracted)
+    if archive_format == "7z":
+        return _extract_7z_members(archive_path, selected, extract_to, progress_callback, exec_policy,
+                                   on_extracted)
+    if archive_format in TAR_COMPRESSION:
+        return _extract_tar_members(archive_path, TAR_COMPRESSION[archive_format], selected, extract_to,
+                                    progress_callback, exec_policy, on_extracted)
+    if archive_format == "iso":
+        return _extract_iso_members(archive_path, selected, extract_to, progress_callback, exec_policy,
+                                    on_extracted)
+    if archive_format == "cab":
+        return _extract_cab_members(archive_path, selected, extract_to, progress_callback, exec_policy,
+                                    on_extracted)
+    if archive_format in _WHOLE_ARCHIVE_EXTRACTORS:
+        return _extract_members_via_temp(archive_path, _WHOLE_ARCHIVE_EXTRACTORS[archive_format], selected,
+                                         extract_to, progress_callback, on_extracted)
+    raise ValueError(f"Unsupported archive format for extraction: {archive_format}")
+
+def _extract_skipping_identical(archive_format, archive_path, extract_to, progress_callback=None,
+                                exec_policy="archive"):
+    """
+    Extract only the members whose files in ``extract_to`` are missing or differ.
 
-def _add_to_7z(sz_path, file_to_add_path, progress_callback=None):
-    if progress_callback:
-        progress_callback("Starting adding to 7z archive...", 0)
-    with py7zr.SevenZipFile(sz_path, mode='a') as szf: # 'a' for append
-        szf.write(file_to_add_path, arcname=Path(file_to_add_path).name)
-    if progress_callback:
-        progress_callback("File added to 7z archive.", 100)
-
-def _add_to_tar(tar_path, file_to_add_path, progress_callback=None):
-    # tarfile.add can add directly if in 'a' mode, but it's safer to rewrite for progress tracking
-    # For simplicity, we'll rewrite the archive for now, similar to ZIP.
-    temp_tar_path = tar_path + ".temp"
-    with tarfile.open(tar_path, 'r') as original_tar:
-        with tarfile.open(temp_tar_path, 'w') as new_tar:
-            for member in original_tar.getmembers():
-                # Read content of each member and add to new archive
-                extracted_file = original_tar.extractfile(member)
-                if extracted_file:
-                    # Write to a temporary file, then add to new_tar
-                    temp_file_path = Path(temp_tar_path).parent / member.name # Simplified temp path
-                    temp_file_path.parent.mkdir(parents=True, exist_ok=True)
-                    with open(temp_file_path, 'wb') as f:
-                        f.write(extracted_file.read())
-                    new_tar.add(temp_file_path, arcname=member.name)
-                    os.remove(temp_file_path) # Clean up temp file
-            # Add the new file
-            file_name = os.path.basename(file_to_add_path)
-            new_tar.add(file_to_add_path, arcname=file_name)
+    Files completed by an interrupted run are recognised from its journal with
+    one stat each. Any other file is identical when its size matches the entry
+    and so does its mtime or, failing that, its CRC-32; only that last check
+    reads file data, on worker threads. Extracted files are given the entry's
+    mtime, so a later run finds them by metadata alone.
+    """
+    listing = _list_with_cache(archive_format, archive_path)
+    entries = {_normalize_member_name(entry.name): entry for entry in listing if not entry.is_dir}
+    with ExtractionJournal(archive_path, extract_to) as journal:
+        def present_name(item):
+            name, entry = item
+            if _is_identical(entry, _safe_extract_path(extract_to, entry.name), journal.is_complete, name):
+                return name
+            return None
+
+        with ThreadPoolExecutor(max_workers=_extract_workers()) as executor:
+            present = set(executor.map(present_name, entries.items()))
+        present.discard(None)
+        if progress_callback and present:
+            progress_callback(f"Skipping {len(present)} of {len(entries)} files already extracted", 0)
+        # Directories are only created: selecting one would make py7zr extract everything below it
+        for entry in listing:
+            if entry.is_dir:
+                os.makedirs(_safe_extract_path(extract_to, entry.name), exist_ok=True)
+        missing = entries.keys() - present
+        if not missing:
+            return
+
+        def on_extracted(name, target):
+            name = _normalize_member_name(name)
+            entry = entries.get(name)
+            if entry is not None and entry.mtime:
+                os.utime(target, (entry.mtime, entry.mtime))
+            journal.record(name, target)
+
+        _extract_selected(archive_format, archive_path, lambda name: _normalize_member_name(name) in missing,
+                          extract_to, progress_callback, exec_policy, on_extracted)
+
+def _is_identical(entry, path, journalled, name):
+    """True when ``path`` already holds the data of archive ``entry``; ``journalled(name, st)`` trusts a journal."""
+    try:
+        st = os.stat(path)
+    except OSError:
+        return False
+    if not stat.S_ISREG(st.st_mode):
+        return False
+    if journalled(name, st):
+        return True
+    if entry.size is None or st.st_size != entry.size:
+        return False  # A format that does not record the size (bz2) is always extracted again
+    if entry.mtime and abs(st.st_mtime - entry.mtime) <= MTIME_TOLERANCE:
+        return True
+    if entry.crc is None:
+        return False
+    crc = 0
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            crc = zlib.crc32(chunk, crc)
+    return crc == entry.crc
+
+def _normalize_member_name(name):
+    name = name.replace('\\', '/')
+    while name.startswith('./'):
+        name = name[2:]
+    return name.strip('/')
+
+def _member_selector(members):
+    """
+    Predicate telling whether a member name is selected.
+
+    Plain names match the member itself and, for folders, everything below it;
+    names containing glob characters are matched with fnmatch.
+    """
+    names = set()
+    patterns = []
+    for member in members:
+        name = _normalize_member_name(member)
+        if any(char in name for char in "*?["):
+            patterns.append(name)
+        elif name:
+            names.add(name)
+    prefixes = tuple(f"{name}/" for name in names)
+
+    def selected(member_name):
+        name = _normalize_member_name(member_name)
+        return (name in names or name.startswith(prefixes)
+                or any(fnmatch.fnmatchcase(name, pattern) for pattern in patterns))
+    return selected
+
+def _extract_zip_members(zip_path, selected, extract_to, progress_callback=None, exec_policy="archive",
+                         on_extracted=None):
+    """
+    Extract the ZIP entries accepted by ``selected`` (all of them for None).
+
+    Large archives are memory-mapped: every worker's ZipFile reads from the one
+    mapping, and stored entries are copied to disk in the kernel. The volumes of
+    a split set are read through a VolumeReader per worker.
+    """
+    with _open_mapped_archive(zip_path) or contextlib.nullcontext() as mapped, \
+            contextlib.ExitStack() as readers:
+        if mapped is not None:
+            open_zip = lambda: zipfile.ZipFile(mapped.reader(), 'r')
+            stored_range = lambda info: _zip_stored_range(mapped, info)
+        elif is_split_path(zip_path):
+            open_zip = lambda: zipfile.ZipFile(readers.enter_context(VolumeReader(zip_path)), 'r')
+            stored_range = None
+        else:
+            open_zip = lambda: zipfile.ZipFile(zip_path, 'r')
+            stored_range = None
+        with open_zip() as zipf:
+            infos = [info for info in zipf.infolist() if selected is None or selected(info.filename)]
+        _extract_entries_parallel(open_zip, infos, extract_to, progress_callback, mode_of=_zip_member_mode,
+                                  exec_policy=exec_policy, mapped=mapped, stored_range=stored_range,
+                                  on_extracted=on_extracted)
+    return len(infos)
+
+def _extract_rar_members(rar_path, selected, extract_to, progress_callback=None, exec_policy="archive",
+                         on_extracted=None):
+    with rarfile.RarFile(rar_path, 'r') as rar_ref:
+        infos = [info for info in rar_ref.infolist() if selected(info.filename)]
+        if infos and rar_ref.is_solid():
+            # Solid members can only be decoded in order; unrar skips the unselected ones
             if progress_callback:
-                progress_callback(f"Added {file_name} to TAR", 100)
-    os.replace(temp_tar_path, tar_path)
+                progress_callback("Extracting from solid RAR archive...", 0)
+            rar_ref.extractall(extract_to, members=infos)
+            _apply_exec_policy(_member_paths(extract_to, infos), exec_policy)
+            if on_extracted:
+                for info in infos:
+                    if not info.is_dir():
+                        on_extracted(info.filename, _safe_extract_path(extract_to, info.filename))
+            return len(infos)
+    _extract_entries_parallel(lambda: rarfile.RarFile(rar_path, 'r'), infos, extract_to, progress_callback,
+                              mode_of=_rar_member_mode, exec_policy=exec_policy, on_extracted=on_extracted)
+    return len(infos)
+
+def _extract_7z_members(sz_path, selected, extract_to, progress_callback=None, exec_policy="archive",
+                        on_extracted=None):
+    progress = ProgressTracker.wrap(progress_callback)
+    with _open_7z(sz_path) as sz_ref:
+        files = [f for f in sz_ref.files if selected(f.filename)]
+        if not files:
+            return 0
+        progress.start(sum(f.uncompressed or 0 for f in files), basis="written")
+        # py7zr only decodes the folders (solid blocks) holding the targets
+        on_end = None
+        if on_extracted:
+            # py7zr also reports the unselected files it decodes on the way through a solid block
+            wanted = {f.filename for f in files if not f.is_directory}
+            on_end = lambda name: on_extracted(name, _safe_extract_path(extract_to, name)) if name in wanted else None
+        sz_ref.extract(path=extract_to, targets=[f.filename for f in files],
+                       callback=_SevenZipProgress(progress, on_end) if progress or on_end else None)
+    _apply_exec_policy([_safe_extract_path(extract_to, f.filename) for f in files if not f.is_directory],
+                       exec_policy)
+    return len(files)
+
+def _extract_tar_members(archive_path, compression, selected, extract_to, progress_callback=None,
+                         exec_policy="archive", on_extracted=None):
+    """
+    Extract the selected members of a (compressed) tarball.
 
-def _add_to_tar_gz(archive_path, file_to_add_path, progress_callback=None):
-    """Add file to tar.gz archive."""
-    import tarfile
-    
-    # For tar.gz, we need to extract, add, and recompress
-    import tempfile
-    import shutil
-    
-    temp_dir = tempfile.mkdtemp()
+    With a valid cached index only the data of the chosen members is decoded,
+    unless decoding each from its checkpoint would cost more than one pass;
+    otherwise the archive is read once, front to back, skipping everything else.
+    """
+    progress = ProgressTracker.wrap(progress_callback)
+    index = tar_index.TarIndex.load(archive_path) if compression else None
+    names = [name for name in index.members if selected(name)] if index is not None else []
+    if index is not None and sum(index.decode_cost(name) for name in names) < index.stream_size:
+        progress.start(sum(index.members[name][2] for name in names), basis="written")
+        paths = []
+        for name in names:
+            paths.append(tar_index.extract_member(archive_path, name, extract_to, index))
+            progress.advance(written=index.members[name][2], message=f"Extracting {name}")
+            if on_extracted and os.path.isfile(paths[-1]):
+                on_extracted(name, paths[-1])
+        if exec_policy != "archive":
+            _apply_exec_policy([path for path in paths if os.path.isfile(path)], exec_policy)
+        return len(names)
+
+    label = f"TAR.{compression.upper()}" if compression else "TAR"
+    return _extract_tar_stream(archive_path, compression, extract_to, label, progress_callback, selected,
+                               exec_policy, on_extracted)
+
+def _extract_iso_members(archive_path, selected, extract_to, progress_callback=None, exec_policy="archive",
+                         on_extracted=None):
+    """Extract the ISO entries accepted by ``selected`` (all of them for None)."""
+    with IsoFile(archive_path) as iso:
+        infos = [info for info in iso.infolist() if selected is None or selected(info.filename)]
+    with _open_mapped_archive(archive_path) or contextlib.nullcontext() as mapped:
+        # Files are stored as-is, so single-extent ones can be copied in the kernel
+        stored_range = None
+        if mapped is not None:
+            stored_range = lambda info: (info.extents[0][0], None) if len(info.extents) == 1 else None
+        _extract_entries_parallel(lambda: IsoFile(archive_path), infos, extract_to, progress_callback,
+                                  mode_of=_iso_member_mode, exec_policy=exec_policy, mapped=mapped,
+                                  stored_range=stored_range, on_extracted=on_extracted)
+    return len(infos)
+
+def _extract_cab_members(archive_path, selected, extract_to, progress_callback=None, exec_policy="archive",
+                         on_extracted=None):
+    """
+    Extract the CAB files accepted by ``selected`` (all of them for None).
+
+    Each folder is one compressed stream, so the files are written in folder
+    order while the stream is decoded once. Raises NotImplementedError for
+    compression methods without a built-in decoder.
+    """
+    progress = ProgressTracker.wrap(progress_callback)
     try:
-        # Extract existing archive
-        with tarfile.open(archive_path, "r:gz") as tar:
-            tar.extractall(temp_dir)
-        
-        # Add new file
-        file_name = os.path.basename(file_to_add_path)
-        shutil.copy2(file_to_add_path, os.path.join(temp_dir, file_name))
-        
-        # Recreate archive
-        with tarfile.open(archive_path, "w:gz") as tar:
-            for root, dirs, files in os.walk(temp_dir):
-                for file in files:
-                    file_path = os.path.join(root, file)
-                    arcname = os.path.relpath(file_path, temp_dir)
-                    tar.add(file_path, arcname=arcname)
-        
-        if progress_callback:
-            progress_callback(f"File added to tar.gz archive", 100)
-        
-        return True
+        with CabFile(archive_path, verify=True) as cab:
+            if not cab.can_decode:
+                raise NotImplementedError("LZX and Quantum compressed cabinets have no built-in decoder")
+            infos = [info for info in cab.infolist() if selected is None or selected(info.filename)]
+            progress.start(sum(info.file_size for info in infos), basis="written")
+            chosen = set(map(id, infos))
+            paths = []
+            for info, reader in cab.iter_members():
+                if id(info) not in chosen:
+                    continue
+                target = _safe_extract_path(extract_to, info.filename)
+                os.makedirs(os.path.dirname(target), exist_ok=True)
+                message = f"Extracting {info.filename}"
+                with open(target, 'wb') as dst:
+                    copy_stream(reader, dst, size_hint=info.file_size,
+                                on_write=lambda count: progress.advance(written=count, message=message))
+                paths.append(target)
+                if on_extracted:
+                    on_extracted(info.filename, target)
+    except NotImplementedError:
+        if selected is None:
+            raise
+        return _extract_members_via_temp(archive_path, _extract_cab_with_patool, selected, extract_to,
+                                         progress_callback)
+    _apply_exec_policy(paths, exec_policy)
+    return len(infos)
+
+def _extract_members_via_temp(archive_path, extract_whole, selected, extract_to, progress_callback=None,
+                              on_extracted=None):
+    """
+    Formats without member selection (patool tools, single-file codecs) are
+    extracted to a scratch folder inside ``extract_to`` with ``extract_whole``
+    and the matches moved out.
+    """
+    scratch = tempfile.mkdtemp(prefix=".extract-", dir=extract_to)
+    try:
+        extract_whole(archive_path, scratch, progress_callback)
+        count = 0
+        for root, dirs, files in os.walk(scratch):
+            for name in dirs + files:
+                source = os.path.join(root, name)
+                member_name = os.path.relpath(source, scratch).replace(os.sep, '/')
+                if not selected(member_name):
+                    continue
+                count += 1
+                target = os.path.join(extract_to, os.path.relpath(source, scratch))
+                if os.path.isdir(source):
+                    os.makedirs(target, exist_ok=True)
+                else:
+                    os.makedirs(os.path.dirname(target), exist_ok=True)
+                    os.replace(source, target)
+                    if on_extracted:
+                        on_extracted(member_name, target)
+        return count
     finally:
-        shutil.rmtree(temp_dir)
+        shutil.rmtree(scratch, ignore_errors=True)
+
+# Extractors that take an exec policy
+_ARCHIVE_EXTRACTORS = {
+    "zip": _extract_zip,
+    "rar": _extract_rar,
+    "7z": _extract_7z,
+    "tar": _extract_tar,
+    "tar.gz": _extract_tar_gz,
+    "tar.bz2": _extract_tar_bz2,
+    "tar.xz": _extract_tar_xz,
+    "iso": _extract_iso,
+    "cab": _extract_cab,
+}
+
+_WHOLE_ARCHIVE_EXTRACTORS = {
+    "bz2": _extract_bz2,
+    "xz": _extract_xz,
+    "lzma": _extract_lzma,
+    "zipx": _extract_zipx,
+    "arj": _extract_arj,
+    "lzh": _extract_lzh,
+}
+
+def read_archive_member(archive_path, member_name):
+    """
+    Read one member of an archive into memory without extracting anything else.
 
+    ZIP, RAR, 7z, ISO, CAB and plain tars seek to the member through their headers.
+    Compressed tarballs use an index (built on first use and kept under
+    ~/.converter/cache) so decoding starts at the nearest checkpoint before the
+    member instead of at the start of the file.
 
-def _add_to_tar_bz2(archive_path, file_to_add_path, progress_callback=None):
-    """Add file to tar.bz2 archive."""
-    import tarfile
-    
-    # For tar.bz2, we need to extract, add, and recompress
-    import tempfile
-    import shutil
-    
-    temp_dir = tempfile.mkdtemp()
+    Args:
+        archive_path (str): Path to the archive file.
+        member_name (str): Name of the member as shown by list_archive_contents.
+
+    Returns:
+        bytes: The member's contents.
+    """
+    archive_type = _get_archive_type(archive_path)
+    if archive_type == "zip":
+        with open_source(archive_path) as source, zipfile.ZipFile(source, 'r') as zipf:
+            return zipf.read(member_name)
+    if archive_type == "rar":
+        with rarfile.RarFile(archive_path, 'r') as rarf:
+            return rarf.read(member_name)
+    if archive_type == "7z":
+        with _open_7z(archive_path) as szf:
+            info = szf.getinfo(member_name)
+            factory = py7zr.io.BytesIOFactory(info.uncompressed)
+            szf.extract(targets=[member_name], factory=factory)
+            member = factory.get(member_name)
+            member.seek(0)
+            return member.read()
+    if archive_type == "iso":
+        with IsoFile(archive_path) as iso:
+            return iso.read(member_name)
+    if archive_type == "cab":
+        with CabFile(archive_path, verify=True) as cab:
+            return cab.read(member_name)
+    if archive_type in TAR_COMPRESSION:
+        if is_split_path(archive_path):
+            raise ValueError("Reading single members of split tar archives is not supported; extract them instead")
+        compression = TAR_COMPRESSION[archive_type]
+        if compression is None:
+            # Finding a member of a plain tar only seeks over the data before it
+            with tarfile.open(archive_path, 'r:') as tar:
+                member = tar.extractfile(member_name)
+                if member is None:
+                    raise ValueError(f"{member_name} is not a regular file")
+                return member.read()
+        return tar_index.read_member(archive_path, member_name,
+                                     tar_index.load_or_build_index(archive_path, compression))
+    raise ValueError(f"Reading single members is not supported for {archive_type} archives")
+
+def test_archive(archive_path, workers=None, progress_callback=None, stats_callback=None):
+    """
+    Verify an archive without extracting it.
+
+    Every member is decompressed into a discard sink and its size and CRC are
+    checked against the archive's headers; nothing is written to disk. ZIP and
+    RAR members, and the solid blocks of a 7z archive, are decoded on parallel
+    worker threads, each reading through its own archive handle. A tarball is
+    one compressed stream, so it is checked in a single pass whose codec verifies
+    its own checksums. Other formats are tested by their external tool.
+
+    Args:
+        archive_path (str): Path to the archive file.
+        workers (int): Number of decoding threads; defaults to the extraction thread count.
+        progress_callback (function): Optional callback for progress updates.
+        stats_callback (function): Optional callback receiving ProgressStats (bytes, MB/s, ETA).
+
+    Returns:
+        ArchiveTestReport: Members checked and the ones found corrupted; true when the archive is intact.
+    """
+    progress_callback = ProgressTracker(progress_callback, stats_callback)
+    report = ArchiveTestReport(archive_path)
     try:
-        # Extract existing archive
-        with tarfile.open(archive_path, "r:bz2") as tar:
-            tar.extractall(temp_dir)
-        
-        # Add new file
-        file_name = os.path.basename(file_to_add_path)
-        shutil.copy2(file_to_add_path, os.path.join(temp_dir, file_name))
-        
-        # Recreate archive
-        with tarfile.open(archive_path, "w:bz2") as tar:
-            for root, dirs, files in os.walk(temp_dir):
-                for file in files:
-                    file_path = os.path.join(root, file)
-                    arcname = os.path.relpath(file_path, temp_dir)
-                    tar.add(file_path, arcname=arcname)
-        
+        archive_format = _get_archive_type(archive_path)
+        tester = _ARCHIVE_TESTERS.get(archive_format)
+        if tester is None:
+            raise ValueError(f"Unsupported archive format for testing: {archive_format}")
         if progress_callback:
-            progress_callback(f"File added to tar.bz2 archive", 100)
-        
-        return True
+            progress_callback(f"Testing {os.path.basename(archive_path)}...", 0)
+        tester(archive_path, archive_format, report, progress_callback, workers or _extract_workers())
+
+        if report.corrupted:
+            if progress_callback:
+                progress_callback(f"Archive test failed: {len(report.corrupted)} of {report.tested} entries "
+                                  f"are corrupted", -1)
+        elif progress_callback:
+            progress_callback(f"Archive OK: {report.tested} entries tested", 100)
+
+    except Exception as e:
+        report.error = str(e)
+        if progress_callback:
+            progress_callback(f"Error testing archive: {str(e)}", -1)
+    return report
+
+class ArchiveTestReport:
+    """What test_archive found in an archive."""
+
+    def __init__(self, archive_path):
+        self.archive_path = archive_path
+        self.tested = 0
+        self.tested_bytes = 0
+        # Member name -> description of the problem
+        self.corrupted = {}
+        # Set when the archive as a whole could not be read
+        self.error = None
+        self._lock = threading.Lock()
+
+    @property
+    def ok(self):
+        return self.error is None and not self.corrupted
+
+    def __bool__(self):
+        return self.ok
+
+    def record(self, name, size=0, problem=None):
+        """Count one checked member, noting ``problem`` if it failed."""
+        with self._lock:
+            self.tested += 1
+            self.tested_bytes += size
+            if problem is not None:
+                self.corrupted[name] = problem
+
+def _discard_stream(src, on_read=None):
+    """Read ``src`` to EOF, dropping the data; returns (size, crc32)."""
+    size = 0
+    crc = 0
+    while True:
+        chunk = src.read(TEST_READ_SIZE)
+        if not chunk:
+            return size, crc
+        size += len(chunk)
+        crc = zlib.crc32(chunk, crc)
+        if on_read:
+            on_read(len(chunk))
+
+def _check_member(expected_size, expected_crc, size, crc):
+    """Describe a size or CRC mismatch, or None when the member is intact."""
+    if size != expected_size:
+        return f"size mismatch: expected {expected_size} bytes, decoded {size}"
+    if expected_crc is not None and crc != expected_crc:
+        return f"CRC mismatch: expected {expected_crc:08x}, computed {crc:08x}"
+    return None
+
+def _test_zip(archive_path, archive_format, report, progress, workers):
+    with contextlib.ExitStack() as sources:
+        open_zip = lambda: zipfile.ZipFile(sources.enter_context(open_source(archive_path)), 'r')
+        with open_zip() as zipf:
+            infos = zipf.infolist()
+        _test_entries_parallel(open_zip, infos, report, progress, workers)
+
+def _test_rar(archive_path, archive_format, report, progress, workers):
+    with rarfile.RarFile(archive_path, 'r') as rarf:
+        infos = rarf.infolist()
+    _test_entries_parallel(lambda: rarfile.RarFile(archive_path, 'r'), infos, report, progress, workers)
+
+def _test_entries_parallel(open_archive, infos, report, progress, workers):
+    """
+    Decode ZIP/RAR members on a thread pool, each worker reading through its own
+    archive handle; the largest members are scheduled first.
+    """
+    infos = [info for info in infos if not info.is_dir()]
+    infos.sort(key=lambda info: info.file_size, reverse=True)
+    progress.start(sum(info.file_size for info in infos), basis="read")
+
+    local = threading.local()
+    handles = []
+    handles_lock = threading.Lock()
+
+    def test_one(info):
+        handle = getattr(local, "handle", None)
+        if handle is None:
+            handle = local.handle = open_archive()
+            with handles_lock:
+                handles.append(handle)
+        message = f"Testing {info.filename}"
+        size = 0
+        try:
+            with handle.open(info) as src:
+                size, crc = _discard_stream(src, lambda count: progress.advance(read=count, message=message))
+            problem = _check_member(info.file_size, getattr(info, "CRC", None), size, crc)
+        except Exception as e:
+            # The libraries check CRCs themselves and raise on a mismatch
+            problem = str(e) or type(e).__name__
+        report.record(info.filename, size, problem)
+
+    try:
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            for future in as_completed([executor.submit(test_one, info) for info in infos]):
+                future.result()
     finally:
-        shutil.rmtree(temp_dir)
+        for handle in handles:
+            handle.close()
 
+class _DiscardIO(py7zr.io.Py7zIO):
+    """py7zr output that keeps only the size and CRC of what is written."""
 
-def _add_to_tar_xz(archive_path, file_to_add_path, progress_callback=None):
-    """Add file to tar.xz archive."""
-    import tarfile
-    
-    # For tar.xz, we need to extract, add, and recompress
-    import tempfile
-    import shutil
-    
-    temp_dir = tempfile.mkdtemp()
+    def __init__(self, on_write):
+        self.length = 0
+        self.crc = 0
+        self._on_write = on_write
+
+    def write(self, s):
+        self.length += len(s)
+        self.crc = zlib.crc32(s, self.crc)
+        self._on_write(len(s))
+        return len(s)
+
+    def read(self, size=None):
+        return b""
+
+    def seek(self, offset, whence=0):
+        return 0
+
+    def flush(self):
+        pass
+
+    def size(self):
+        return self.length
+
+class _DiscardFactory(py7zr.io.WriterFactory):
+    """Hands out one _DiscardIO per decoded member, in archive order."""
+
+    def __init__(self, on_write):
+        self.outputs = []
+        self._on_write = on_write
+
+    def create(self, filename):
+        output = _DiscardIO(self._on_write)
+        self.outputs.append(output)
+        return output
+
+def _test_7z(archive_path, archive_format, report, progress, workers):
+    """
+    Decode a 7z archive one solid block at a time. The blocks are spread over
+    the workers, each opening the archive itself, so a corrupted block only
+    affects the members stored in it.
+    """
+    with _open_7z(archive_path) as szf:
+        files = [f for f in szf.files if not f.is_directory]
+    blocks = {}
+    for f in files:
+        if f.emptystream:
+            report.record(f.filename)
+        else:
+            blocks.setdefault(id(f.folder), []).append(f)
+    blocks = sorted(blocks.values(), key=lambda block: sum(f.uncompressed for f in block), reverse=True)
+    progress.start(sum(f.uncompressed for block in blocks for f in block), basis="read")
+    if not blocks:
+        return
+
+    # Largest blocks first, each to the least loaded worker
+    buckets = [[] for _ in range(min(workers, len(blocks)))]
+    loads = [0] * len(buckets)
+    for block in blocks:
+        i = loads.index(min(loads))
+        buckets[i].append(block)
+        loads[i] += sum(f.uncompressed for f in block)
+
+    def test_blocks(bucket):
+        # A file object keeps py7zr from starting threads of its own
+        with open_source(archive_path) as fp, py7zr.SevenZipFile(fp, 'r') as szf:
+            for n, block in enumerate(bucket):
+                if n:
+                    szf.reset()
+                _test_7z_block(szf, block, report, progress)
+
+    with ThreadPoolExecutor(max_workers=len(buckets)) as executor:
+        for future in as_completed([executor.submit(test_blocks, bucket) for bucket in buckets]):
+            future.result()
+
+def _test_7z_block(szf, members, report, progress):
+    factory = _DiscardFactory(lambda count: progress.advance(read=count))
+    failure = None
     try:
-        # Extract existing archive
-        with tarfile.open(archive_path, "r:xz") as tar:
-            tar.extractall(temp_dir)
-        
-        # Add new file
-        file_name = os.path.basename(file_to_add_path)
-        shutil.copy2(file_to_add_path, os.path.join(temp_dir, file_name))
-        
-        # Recreate archive
-        with tarfile.open(archive_path, "w:xz") as tar:
-            for root, dirs, files in os.walk(temp_dir):
-                for file in files:
-                    file_path = os.path.join(root, file)
-                    arcname = os.path.relpath(file_path, temp_dir)
-                    tar.add(file_path, arcname=arcname)
-        
+        szf.extract(targets=[f.filename for f in members], factory=factory)
+    except py7zr.exceptions.CrcError:
+        failure = "CRC mismatch"
+    except Exception as e:
+        failure = str(e) or type(e).__name__
+    # py7zr decodes the members of a block in order, one output each
+    outputs = factory.outputs
+    failed_at = max(len(outputs) - 1, 0)
+    for i, f in enumerate(members):
+        if failure is not None and i >= failed_at:
+            report.record(f.filename, 0, failure if i == failed_at else
+                          "not verified: decoding of its solid block stopped at an earlier member")
+        elif i < len(outputs):
+            output = outputs[i]
+            report.record(f.filename, output.length,
+                          _check_member(f.uncompressed, f.crc32, output.length, output.crc))
+        else:
+            report.record(f.filename, 0, "not decoded")
+
+def _test_iso(archive_path, archive_format, report, progress, workers):
+    # ISO 9660 stores no checksums; reading every extent still catches truncated images
+    with IsoFile(archive_path) as iso:
+        infos = iso.infolist()
+    _test_entries_parallel(lambda: IsoFile(archive_path), infos, report, progress, workers)
+
+def _test_cab(archive_path, archive_format, report, progress, workers):
+    """Decode each CAB folder once, verifying the data block checksums; LZX/Quantum go to patool."""
+    with CabFile(archive_path, verify=True) as cab:
+        if not cab.can_decode:
+            return _test_with_patool(archive_path, archive_format, report, progress, workers)
+        progress.start(sum(info.file_size for info in cab.infolist()), basis="read")
+        failed_folders = {}
+        for info, reader in cab.iter_members():
+            if info.folder in failed_folders:
+                report.record(info.filename, 0, f"not verified: {failed_folders[info.folder]}")
+                continue
+            message = f"Testing {info.filename}"
+            try:
+                size, _ = _discard_stream(reader, lambda count: progress.advance(read=count, message=message))
+            except Exception as e:
+                # The rest of the folder's stream cannot be decoded either
+                failed_folders[info.folder] = f"decoding of its folder stopped at {info.filename}"
+                report.record(info.filename, 0, str(e) or type(e).__name__)
+                continue
+            report.record(info.filename, size, _check_member(info.file_size, None, size, None))
+
+def _test_tar(archive_path, archive_format, report, progress, workers):
+    """
+    Read a tarball in one forward pass. Tar stores no member checksums; sizes
+    are checked here, and gzip, bzip2 and xz verify their own CRCs as the
+    stream is decoded.
+    """
+    progress.start(source_size(archive_path), basis="read")
+    opener = _TAR_STREAM_OPENERS.get(TAR_COMPRESSION[archive_format])
+    with open_source(archive_path) as raw:
+        counted = CountingReader(raw, lambda count: progress.advance(read=count))
+        with (opener(counted) if opener else contextlib.nullcontext(counted)) as stream, \
+                tarfile.open(fileobj=stream, mode='r|') as tarf:
+            for member in tarf:
+                if not member.isreg():
+                    continue
+                progress.advance(message=f"Testing {member.name}")
+                try:
+                    with tarf.extractfile(member) as src:
+                        size, _ = _discard_stream(src)
+                except Exception as e:
+                    # The stream cannot be followed past a damaged member
+                    report.record(member.name, 0, str(e) or type(e).__name__)
+                    break
+                report.record(member.name, size, _check_member(member.size, None, size, None))
+
+def _test_compressed_file(archive_path, archive_format, report, progress, workers):
+    """Decode a single-file bz2/xz/lzma stream; the codec checks its own CRC."""
+    progress.start(os.path.getsize(archive_path), basis="read")
+    name = os.path.splitext(os.path.basename(archive_path))[0]
+    progress.advance(message=f"Testing {name}")
+    with open(archive_path, 'rb') as raw:
+        try:
+            with _SINGLE_FILE_STREAM_OPENERS[archive_format](
+                    CountingReader(raw, lambda count: progress.advance(read=count))) as src:
+                size, _ = _discard_stream(src)
+        except Exception as e:
+            report.record(name, 0, str(e) or type(e).__name__)
+            return
+    report.record(name, size)
+
+def _test_with_patool(archive_path, archive_format, report, progress, workers):
+    """Formats without a Python reader are tested by their external tool."""
+    try:
+        import patoolib
+    except ImportError:
+        raise ImportError(f"patool is required for {archive_format} format support")
+    patoolib.test_archive(archive_path, verbosity=-1)
+    for entry in _list_archive_type(archive_format, archive_path):
+        if not entry.is_dir:
+            report.record(entry.name, entry.size)
+
+# lzma.LZMAFile detects .xz and legacy .lzma streams alike
+_SINGLE_FILE_STREAM_OPENERS = {"bz2": _open_bz2_stream, "xz": _open_xz_stream, "lzma": _open_xz_stream}
+
+_ARCHIVE_TESTERS = {
+    "zip": _test_zip,
+    "rar": _test_rar,
+    "7z": _test_7z,
+    "tar": _test_tar,
+    "tar.gz": _test_tar,
+    "tar.bz2": _test_tar,
+    "tar.xz": _test_tar,
+    "bz2": _test_compressed_file,
+    "xz": _test_compressed_file,
+    "lzma": _test_compressed_file,
+    "zipx": _test_with_patool,
+    "iso": _test_iso,
+    "cab": _test_cab,
+    "arj": _test_with_patool,
+    "lzh": _test_with_patool,
+}
+
+def add_to_archive(archive_path, files_to_add, progress_callback=None, options=None):
+    """
+    Add files to an existing archive file.
+
+    All files are added in one pass over the archive (one rar run for RAR), so
+    pass them together rather than calling this once per file.
+
+    Args:
+        archive_path (str): Path to the existing archive file.
+        files_to_add (str or list): Path of the file to add, or a list of paths.
+        progress_callback (function): Optional callback for progress updates.
+        options (CompressionOptions): Optional settings for backends that use them (rar threads, level).
+    """
+    try:
+        archive_format = _get_archive_type(archive_path)
+        if not archive_format:
+            raise ValueError(f"Unknown archive format for adding: {archive_path}")
+
+        adder = _ARCHIVE_ADDERS.get(archive_format)
+        if adder is None:
+            raise ValueError(f"Unsupported archive format for adding files: {archive_format}")
+        if isinstance(files_to_add, (str, os.PathLike)):
+            files_to_add = [files_to_add]
+        files_to_add = [os.fspath(path) for path in files_to_add]
+        if not files_to_add:
+            raise ValueError("No files to add")
+        adder(archive_path, files_to_add, progress_callback, options or CompressionOptions())
+
         if progress_callback:
-            progress_callback(f"File added to tar.xz archive", 100)
-        
+            if len(files_to_add) == 1:
+                progress_callback(f"File added to archive: {files_to_add[0]}", 100)
+            else:
+                progress_callback(f"{len(files_to_add)} files added to archive", 100)
         return True
+
+    except Exception as e:
+        if progress_callback:
+            progress_callback(f"Error adding to archive: {str(e)}", -1)
+        return False
+
+def _add_to_zip(zip_path, files_to_add, progress_callback=None, options=None):
+    """
+    Rewrite the ZIP with ``files_to_add`` appended. Existing entries are copied
+    with their compressed data, timestamps and modes unchanged; only the new
+    files are compressed, concurrently.
+    """
+    options = options or CompressionOptions()
+    temp_zip_path = zip_path + ".temp"
+    kept = 0
+    written = 0
+
+    def on_entry_written(entry):
+        nonlocal written
+        written += 1
+        if progress_callback and written > kept:
+            added = written - kept
+            progress_callback(f"Added {entry.arcname} to ZIP", added * 100 // len(files_to_add))
+
+    try:
+        with open(zip_path, 'rb') as src, zipfile.ZipFile(src) as src_zip, \
+                ParallelZipWriter(temp_zip_path, compresslevel=options.zlib_level(), workers=options.threads,
+                                  on_entry_written=on_entry_written) as zipw:
+            infos = src_zip.infolist()
+            kept = len(infos)
+            for info in infos:
+                zipw.add_compressed(raw_entry(src, info))
+            for file_to_add_path in files_to_add:
+                if options.level == 0 or _has_incompressible_extension(file_to_add_path):
+                    method = ZIP_STORED
+                else:
+                    method = ZIP_DEFLATED
+                zipw.add_file(file_to_add_path, os.path.basename(file_to_add_path), method)
+        os.replace(temp_zip_path, zip_path)
     finally:
-        shutil.rmtree(temp_dir)
+        if os.path.exists(temp_zip_path):
+            os.remove(temp_zip_path)
 
+def _add_to_7z(sz_path, files_to_add, progress_callback=None, options=None):
+    """
+    Rewrite the 7z archive with ``files_to_add`` appended. Existing folders are
+    copied packed, as they are; only the new files are compressed.
+    """
+    if progress_callback:
+        progress_callback("Starting adding to 7z archive...", 0)
+    options = options or CompressionOptions()
+    scratch = tempfile.mkdtemp(prefix=".add-", dir=os.path.dirname(os.path.abspath(sz_path)))
+    temp_path = sz_path + ".temp"
+    try:
+        with open(sz_path, 'rb') as raw, py7zr.SevenZipFile(sz_path, 'r') as src, \
+                SevenZipWriter(temp_path, **_sevenzip_writer_options(options)) as szw:
+            _copy_7z_members(src, raw, lambda name: True, szw, scratch)
+            for file_to_add_path in files_to_add:
+                szw.add_file(file_to_add_path, os.path.basename(file_to_add_path),
+                             store=_has_incompressible_extension(file_to_add_path))
+        os.replace(temp_path, sz_path)
+    finally:
+        shutil.rmtree(scratch, ignore_errors=True)
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+    if progress_callback:
+        progress_callback("Files added to 7z archive.", 100)
+
+def _add_to_tar(tar_path, files_to_add, progress_callback=None, options=None):
+    _rewrite_tar_adding(tar_path, None, files_to_add, "TAR", progress_callback, options)
+
+def _add_to_tar_gz(archive_path, files_to_add, progress_callback=None, options=None):
+    """Add files to tar.gz archive."""
+    _rewrite_tar_adding(archive_path, "gz", files_to_add, "tar.gz", progress_callback, options)
+
+def _add_to_tar_bz2(archive_path, files_to_add, progress_callback=None, options=None):
+    """Add files to tar.bz2 archive."""
+    _rewrite_tar_adding(archive_path, "bz2", files_to_add, "tar.bz2", progress_callback, options)
 
-def _add_to_zipx(archive_path, file_to_add_path, progress_callback=None):
-    """Add file to zipx archive (using patool)."""
+def _add_to_tar_xz(archive_path, files_to_add, progress_callback=None, options=None):
+    """Add files to tar.xz archive."""
+    _rewrite_tar_adding(archive_path, "xz", files_to_add, "tar.xz", progress_callback, options)
+
+def _rewrite_tar_adding(archive_path, compression, files_to_add, label, progress_callback=None, options=None):
+    """
+    Stream a tarball into a new one with ``files_to_add`` appended. Existing
+    members are copied straight from the old archive, so nothing is staged on disk.
+    """
+    options = options or CompressionOptions()
+    temp_path = archive_path + ".temp"
+    opener = _TAR_STREAM_OPENERS.get(compression)
+    try:
+        with open(archive_path, 'rb') as raw_in, \
+                (opener(raw_in) if opener else contextlib.nullcontext(raw_in)) as stream_in, \
+                tarfile.open(fileobj=stream_in, mode='r|') as tar_in, \
+                open(temp_path, 'wb') as raw_out, \
+                _open_compressed_writer(raw_out, compression, options) as stream_out, \
+                tarfile.open(fileobj=stream_out, mode='w') as tar_out:
+            for member in tar_in:
+                tar_out.addfile(member, tar_in.extractfile(member) if member.isreg() else None)
+            for i, file_to_add_path in enumerate(files_to_add, 1):
+                file_name = os.path.basename(file_to_add_path)
+                tar_out.add(file_to_add_path, arcname=file_name)
+                if progress_callback:
+                    progress_callback(f"Added {file_name} to {label}", i * 100 // len(files_to_add))
+        os.replace(temp_path, archive_path)
+    finally:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+
+
+def _add_to_zipx(archive_path, files_to_add, progress_callback=None, options=None):
+    """Add files to zipx archive (using patool)."""
     try:
         import patoolib
     except ImportError:
         raise ImportError("patool is required for zipx format support")
     
     # For zipx, we use patool to add files
-    patoolib.add_to_archive(archive_path, [file_to_add_path])
+    patoolib.add_to_archive(archive_path, list(files_to_add))
     
     if progress_callback:
-        progress_callback(f"File added to zipx archive", 100)
+        progress_callback(f"Files added to zipx archive", 100)
     
     return True
 
 
-def _add_to_cab(archive_path, file_to_add_path, progress_callback=None):
-    """Add file to CAB archive (using patool)."""
+def _add_to_cab(archive_path, files_to_add, progress_callback=None, options=None):
+    """Add files to CAB archive (using patool)."""
     try:
         import patoolib
     except ImportError:
         raise ImportError("patool is required for CAB format support")
     
     # For CAB, we use patool to add files
-    patoolib.add_to_archive(archive_path, [file_to_add_path])
+    patoolib.add_to_archive(archive_path, list(files_to_add))
     
     if progress_callback:
-        progress_callback(f"File added to CAB archive", 100)
+        progress_callback(f"Files added to CAB archive", 100)
     
     return True
 
 
-def _add_to_arj(archive_path, file_to_add_path, progress_callback=None):
-    """Add file to ARJ archive (using patool)."""
+def _add_to_arj(archive_path, files_to_add, progress_callback=None, options=None):
+    """Add files to ARJ archive (using patool)."""
     try:
         import patoolib
     except ImportError:
         raise ImportError("patool is required for ARJ format support")
     
     # For ARJ, we use patool to add files
-    patoolib.add_to_archive(archive_path, [file_to_add_path])
+    patoolib.add_to_archive(archive_path, list(files_to_add))
     
     if progress_callback:
-        progress_callback(f"File added to ARJ archive", 100)
+        progress_callback(f"Files added to ARJ archive", 100)
     
     return True
 
 
-def _add_to_lzh(archive_path, file_to_add_path, progress_callback=None):
-    """Add file to LZH archive (using patool)."""
+def _add_to_lzh(archive_path, files_to_add, progress_callback=None, options=None):
+    """Add files to LZH archive (using patool)."""
     try:
         import patoolib
     except ImportError:
         raise ImportError("patool is required for LZH format support")
     
     # For LZH, we use patool to add files
-    patoolib.add_to_archive(archive_path, [file_to_add_path])
+    patoolib.add_to_archive(archive_path, list(files_to_add))
     
     if progress_callback:
-        progress_callback(f"File added to LZH archive", 100)
+        progress_callback(f"Files added to LZH archive", 100)
     
     return True
 
+_ARCHIVE_ADDERS = {
+    "zip": _add_to_zip,
+    "rar": _add_to_rar,
+    "7z": _add_to_7z,
+    "tar": _add_to_tar,
+    "tar.gz": _add_to_tar_gz,
+    "tar.bz2": _add_to_tar_bz2,
+    "tar.xz": _add_to_tar_xz,
+    "zipx": _add_to_zipx,
+    "cab": _add_to_cab,
+    "arj": _add_to_arj,
+    "lzh": _add_to_lzh,
+}
+
+def sync_archive(archive_path, source_paths, progress_callback=None, stats_callback=None, delete_missing=False,
+                 options=None):
+    """
+    Bring an existing archive up to date with its sources.
+
+    The sources are scanned once and compared with the archive's listing: files
+    with a different size are replaced, files with only a different mtime are
+    replaced when their CRC differs (tar stores no checksum, so there the mtime
+    decides), new files are added and, with ``delete_missing``, entries whose
+    source is gone are dropped. An archive that is already in sync is not
+    rewritten; unchanged ZIP entries, and 7z folders holding only unchanged
+    files, are copied without recompressing. Archives that do not exist yet
+    are created.
+
+    Args:
+        archive_path (str): Path to the archive file.
+        source_paths (list): Files and directories the archive was created from.
+        progress_callback (function): Optional callback for progress updates.
+        stats_callback (function): Optional callback receiving ProgressStats (bytes, MB/s, ETA).
+        delete_missing (bool): Remove entries that no longer exist in the sources.
+        options (CompressionOptions): Settings for the data that has to be compressed.
+    """
+    if not os.path.exists(archive_path):
+        archive_format = _get_archive_type(archive_path)
+        return create_archive(archive_path, source_paths, archive_format, progress_callback, stats_callback,
+                              options=options)
+    progress_callback = ProgressTracker(progress_callback, stats_callback)
+    try:
+        archive_format = _get_archive_type(archive_path)
+        if archive_format not in SYNC_ARCHIVE_FORMATS:
+            raise ValueError(f"Unsupported archive format for sync: {archive_format}")
+        options = options or CompressionOptions()
+
+        if progress_callback:
+            progress_callback("Comparing archive with sources...", 0)
+        manifest = _scan_sources(source_paths, progress_callback)
+        entries = _list_archive_type(archive_format, archive_path)
+        plan = _plan_sync(manifest, entries, delete_missing, include_dirs=archive_format != "zip")
+
+        if plan:
+            progress_callback.start(sum(entry.size for entry in plan.added) +
+                                    sum(entry.size for entry in plan.replaced.values()))
+            if archive_format == "zip":
+                _sync_zip(archive_path, plan, progress_callback, options)
+            elif archive_format == "7z":
+                _sync_7z(archive_path, plan, progress_callback, options)
+            elif archive_format == "rar":
+                _sync_rar(archive_path, source_paths, delete_missing, progress_callback, options)
+            else:
+                _sync_tar(archive_path, TAR_COMPRESSION[archive_format], plan, progress_callback, options)
+
+        if progress_callback:
+            progress_callback(f"Archive synced: {len(plan.added)} added, {len(plan.replaced)} updated, "
+                              f"{len(plan.removed)} removed, {plan.unchanged} unchanged", 100)
+        return True
+
+    except Exception as e:
+        if progress_callback:
+            progress_callback(f"Error syncing archive: {str(e)}", -1)
+        return False
+
+class SyncPlan:
+    """What sync_archive has to change in an archive."""
+
+    def __init__(self):
+        self.added = []
+        self.replaced = {}
+        self.removed = set()
+        self.unchanged = 0
+
+    def __bool__(self):
+        return bool(self.added or self.replaced or self.removed)
+
+    def keeps(self, name):
+        """True for archive entries that are copied over unchanged."""
+        name = _normalize_member_name(name)
+        return name not in self.replaced and name not in self.removed
+
+def _plan_sync(manifest, entries, delete_missing, include_dirs=True):
+    existing = {_normalize_member_name(entry.name): entry for entry in entries}
+    plan = SyncPlan()
+    seen = set()
+    for entry in manifest.entries:
+        seen.add(entry.arcname)
+        if entry.is_dir and not include_dirs:
+            continue
+        current = existing.get(entry.arcname)
+        if current is None:
+            plan.added.append(entry)
+        elif _source_changed(entry, current):
+            plan.replaced[entry.arcname] = entry
+        elif not entry.is_dir:
+            plan.unchanged += 1
+    if delete_missing:
+        # Members under directories that could not be read are kept, not treated as deleted
+        unread = tuple(name + "/" for name in manifest.skipped_dirs)
+        plan.removed = {name for name in existing if name not in seen and not name.startswith(unread)}
+    return plan
+
+def _source_changed(entry, current):
+    if entry.is_dir or current.is_dir:
+        return entry.is_dir != current.is_dir
+    if entry.size != current.size:
+        return True
+    if current.mtime is not None and abs(current.mtime - entry.mtime) < SYNC_MTIME_TOLERANCE:
+        return False
+    if current.crc is None:
+        return True
+    return _file_crc(entry.path) != current.crc
+
+def _file_crc(path):
+    crc = 0
+    with open(path, 'rb') as f:
+        while True:
+            chunk = f.read(1024 * 1024)
+            if not chunk:
+                return crc
+            crc = zlib.crc32(chunk, crc)
+
+def _zip_method(entry, options):
+    if options.level == 0 or _has_incompressible_extension(entry.path):
+        return ZIP_STORED
+    return ZIP_DEFLATED
+
+def _sync_zip(archive_path, plan, progress, options):
+    """Rewrite the ZIP, copying kept entries' compressed data and deflating only new content."""
+    temp_path = archive_path + ".sync"
+
+    def on_read(count):
+        progress.advance(read=count)
+
+    try:
+        with open(archive_path, 'rb') as src, zipfile.ZipFile(src) as src_zip, \
+                ParallelZipWriter(temp_path, compresslevel=options.zlib_level(), workers=options.threads,
+                                  on_read=on_read) as zipw:
+            for info in src_zip.infolist():
+                name = _normalize_member_name(info.filename)
+                if plan.keeps(name):
+                    zipw.add_compressed(raw_entry(src, info))
+                elif name in plan.replaced:
+                    entry = plan.replaced[name]
+                    progress.advance(message=f"Updating {entry.arcname}")
+                    zipw.add_file(entry.path, entry.arcname, _zip_method(entry, options),
+                                  mtime=entry.mtime, mode=entry.mode)
+            for entry in plan.added:
+                progress.advance(message=f"Adding {entry.arcname}")
+                zipw.add_file(entry.path, entry.arcname, _zip_method(entry, options),
+                              mtime=entry.mtime, mode=entry.mode)
+        os.replace(temp_path, archive_path)
+    finally:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+
+def _sync_tar(archive_path, compression, plan, progress, options):
+    """
+    Update a tarball. Plain tars that only gain files are appended to in place;
+    otherwise the archive is streamed once into a new one, copying kept members
+    and reading only new or changed files from disk.
+    """
+    if compression is None and not plan.replaced and not plan.removed:
+        with tarfile.open(archive_path, 'a') as tarf:
+            for entry in plan.added:
+                _add_tar_entry(tarf, entry, progress, lambda count: progress.advance(read=count))
+        return
+
+    temp_path = archive_path + ".sync"
+    opener = _TAR_STREAM_OPENERS.get(compression)
+    try:
+        with open(archive_path, 'rb') as raw_in, \
+                (opener(raw_in) if opener else contextlib.nullcontext(raw_in)) as stream_in, \
+                tarfile.open(fileobj=stream_in, mode='r|') as tar_in, \
+                open(temp_path, 'wb') as raw_out, \
+                _open_compressed_writer(raw_out, compression, options) as stream_out, \
+                tarfile.open(fileobj=stream_out, mode='w') as tar_out:
+            for member in tar_in:
+                name = _normalize_member_name(member.name)
+                if plan.keeps(name):
+                    tar_out.addfile(member, tar_in.extractfile(member) if member.isreg() else None)
+                elif name in plan.replaced:
+                    _add_tar_entry(tar_out, plan.replaced[name], progress,
+                                   lambda count: progress.advance(read=count))
+            for entry in plan.added:
+                _add_tar_entry(tar_out, entry, progress, lambda count: progress.advance(read=count))
+        os.replace(temp_path, archive_path)
+    finally:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+
+def _sync_7z(archive_path, plan, progress, options):
+    """
+    Update a 7z archive by writing it again with SevenZipWriter. Folders
+    (solid blocks) holding only kept members are copied packed, byte for byte;
+    only the kept members of folders that also hold changed or removed ones
+    are decoded, into a scratch folder next to the archive, and compressed
+    again along with the new and changed files.
+    """
+    scratch = tempfile.mkdtemp(prefix=".sync-", dir=os.path.dirname(os.path.abspath(archive_path)))
+    temp_path = archive_path + ".sync"
+    try:
+        with open(archive_path, 'rb') as raw, py7zr.SevenZipFile(archive_path, 'r') as src, \
+                SevenZipWriter(temp_path, **_sevenzip_writer_options(options)) as szw:
+            _copy_7z_members(src, raw, plan.keeps, szw, scratch)
+            for entry in list(plan.replaced.values()) + plan.added:
+                if entry.is_dir:
+                    szw.add_directory(entry.arcname, mtime=entry.mtime, mode=entry.mode)
+                else:
+                    progress.advance(read=entry.size, message=f"Adding {entry.arcname}")
+                    szw.add_file(entry.path, entry.arcname, entry.size, mtime=entry.mtime, mode=entry.mode,
+                                 store=_has_incompressible_extension(entry.path))
+        os.replace(temp_path, archive_path)
+    finally:
+        shutil.rmtree(scratch, ignore_errors=True)
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+
+def _copy_7z_members(src, raw, keeps, szw, scratch):
+    """
+    Add the members of the open 7z archive ``src`` accepted by ``keeps`` to
+    the SevenZipWriter ``szw``. A folder whose members are all kept is copied
+    packed from ``raw``, the archive's file; the kept members of any other
+    folder are extracted into ``scratch`` and compressed again.
+    """
+    streams = src.header.main_streams
+    members = {}
+    for f in src.files:
+        if f.folder is not None:
+            members.setdefault(id(f.folder), []).append(f)
+    copied = set()
+    stream = 0
+    for folder in streams.unpackinfo.folders if streams is not None else []:
+        count = len(folder.packed_indices)
+        files = members.get(id(folder), [])
+        if files and all(keeps(f.filename) and f.crc32 is not None for f in files):
+            record = io.BytesIO()
+            folder.write(record)
+            offset = src.afterheader + streams.packinfo.packpos + streams.packinfo.packpositions[stream]
+            szw.add_folder(raw, offset, streams.packinfo.packsizes[stream:stream + count], record.getvalue(),
+                           folder.unpacksizes,
+                           [(f.filename, f.uncompressed, f.crc32) + _7z_member_times_mode(f) for f in files])
+            copied.add(id(folder))
+        stream += count
+
+    kept = [f for f in src.files if keeps(f.filename) and (f.folder is None or id(f.folder) not in copied)]
+    decoded = [f.filename for f in kept if f.folder is not None]
+    if decoded:
+        src.extract(path=scratch, targets=decoded)
+    for f in kept:
+        mtime, mode = _7z_member_times_mode(f)
+        if f.is_directory:
+            szw.add_directory(f.filename, mtime=mtime, mode=mode or stat.S_IFDIR | 0o755)
+        elif f.folder is None:
+            szw.add_stream(io.BytesIO(b""), f.filename, mtime=mtime, mode=mode or stat.S_IFREG | 0o644)
+        elif f.is_symlink:
+            # 7z keeps a symlink as a file holding its target, marked by the Unix mode
+            target = os.readlink(_safe_extract_path(scratch, f.filename)).encode("utf-8")
+            szw.add_stream(io.BytesIO(target), f.filename, mtime=mtime, mode=mode or stat.S_IFLNK | 0o777)
+        else:
+            path = _safe_extract_path(scratch, f.filename)
+            szw.add_file(path, f.filename, os.path.getsize(path), mtime=mtime,
+                         mode=mode or stat.S_IFREG | 0o644, store=_has_incompressible_extension(path))
+
+def _7z_member_times_mode(f):
+    """(mtime, mode) of a py7zr archive member; the mode is None unless the archive records one."""
+    mtime = f.lastwritetime.totimestamp() if f.lastwritetime is not None else 0
+    mode = (f.posix_mode | (f.st_fmt or 0)) if f.posix_mode else None
+    return mtime, mode
+
+def _sync_rar(archive_path, source_paths, delete_missing, progress, options):
+    """Let the rar tool update the archive; -as also drops entries missing from the sources."""
+    switches = ['-r'] + (['-as'] if delete_missing else []) + options.rar_switches()
+    _run_rar('u', switches, archive_path, source_paths, progress, "Updating RAR archive",
+             "Failed to update RAR archive")
+
+def transcode_archive(source_path, output_path, archive_format, progress_callback=None, stats_callback=None,
+                      options=None):
+    """
+    Convert an archive to another format without extracting it to disk.
+
+    Members are read from the source one at a time and handed straight to the
+    writer of the new archive, keeping names, timestamps and permissions. ZIP
+    members are copied into a new ZIP as compressed data, and a tarball that
+    only changes compression is re-encoded as one stream.
+
+    Args:
+        source_path (str): Path to the archive to convert ("zip", "rar", "7z" or a tarball).
+        output_path (str): Path to the archive to create.
+        archive_format (str): Format of the new archive ("zip", "7z", "tar", "tar.gz", "tar.bz2", "tar.xz").
+        progress_callback (function): Optional callback for progress updates.
+        stats_callback (function): Optional callback receiving ProgressStats (bytes, MB/s, ETA).
+        options (CompressionOptions): Settings for the data that has to be compressed.
+    """
+    progress_callback = ProgressTracker(progress_callback, stats_callback)
+    try:
+        source_format = _get_archive_type(source_path)
+        if source_format not in TRANSCODE_SOURCE_FORMATS:
+            raise ValueError(f"Unsupported archive format for conversion: {source_format}")
+        if archive_format not in TRANSCODE_TARGET_FORMATS:
+            raise ValueError(f"Unsupported archive format for conversion output: {archive_format}")
+        if os.path.exists(output_path) and os.path.samefile(source_path, output_path):
+            raise ValueError("The converted archive cannot replace its source")
+        options = options or CompressionOptions()
+
+        if progress_callback:
+            progress_callback(f"Converting {os.path.basename(source_path)} to {archive_format}...", 0)
+        try:
+            if source_format in TAR_COMPRESSION and archive_format in TAR_COMPRESSION:
+                _transcode_tar_stream(source_path, TAR_COMPRESSION[source_format], output_path,
+                                      TAR_COMPRESSION[archive_format], progress_callback, options)
+                count, skipped = None, 0
+            else:
+                count, skipped = _transcode_members(source_path, source_format, output_path, archive_format,
+                                                    progress_callback, options)
+        except BaseException:
+            if os.path.exists(output_path):
+                os.remove(output_path)
+            raise
+
+        if progress_callback:
+            message = f"Archive converted: {output_path}"
+            if count is not None:
+                message += f" ({count} entries"
+                message += f", {skipped} special files skipped)" if skipped else ")"
+            progress_callback(message, 100)
+        return True
+
+    except Exception as e:
+        if progress_callback:
+            progress_callback(f"Error converting archive: {str(e)}", -1)
+        return False
+
+def _transcode_tar_stream(source_path, source_compression, output_path, compression, progress, options):
+    """Tarball to tarball only swaps the codec, so the tar stream is copied without parsing members."""
+    progress.start(os.path.getsize(source_path), basis="read")
+    opener = _TAR_STREAM_OPENERS.get(source_compression)
+    with open(source_path, 'rb') as raw_in:
+        counted = CountingReader(raw_in, lambda count: progress.advance(read=count))
+        with (opener(counted) if opener else contextlib.nullcontext(counted)) as stream_in, \
+                open(output_path, 'wb') as raw_out, \
+                _open_compressed_writer(raw_out, compression, options) as stream_out:
+            copy_stream(stream_in, stream_out)
+
+def _transcode_members(source_path, source_format, output_path, archive_format, progress, options):
+    """Move members from a source reader to a destination writer; returns (members, skipped)."""
+    compression = TAR_COMPRESSION.get(source_format)
+    if source_format in TAR_COMPRESSION:
+        # Tarballs have no index; follow the compressed bytes consumed instead
+        progress.start(os.path.getsize(source_path), basis="read")
+        members = archive_stream.iter_tar_members(source_path, _TAR_STREAM_OPENERS.get(compression),
+                                                  lambda count: progress.advance(read=count))
+        member_bytes = False
+    else:
+        progress.start(sum(entry.size for entry in _list_archive_type(source_format, source_path)
+                           if not entry.is_dir), basis="read")
+        members = _TRANSCODE_READERS[source_format](source_path)
+        member_bytes = True
+
+    with contextlib.ExitStack() as stack:
+        if archive_format == "zip":
+            writer = archive_stream.ZipMemberWriter(output_path, compresslevel=options.zlib_level())
+        elif archive_format == "7z":
+            writer = archive_stream.SevenZipMemberWriter(output_path, **_sevenzip_writer_options(options))
+        else:
+            raw_out = stack.enter_context(open(output_path, 'wb'))
+            stream_out = stack.enter_context(_open_compressed_writer(raw_out, TAR_COMPRESSION[archive_format],
+                                                                     options))
+            writer = archive_stream.TarMemberWriter(stream_out)
 
-def list_archive_contents(archive_path, progress_callback=None):
+        count = 0
+        try:
+            try:
+                for member in members:
+                    progress.advance(message=f"Converting {member.name}")
+                    if archive_format == "zip":
+                        if options.level == 0 or _has_incompressible_extension(member.name):
+                            writer.add(member, ZIP_STORED)
+                        else:
+                            writer.add(member, ZIP_DEFLATED)
+                    elif archive_format == "7z":
+                        writer.add(member, store=_has_incompressible_extension(member.name))
+                    else:
+                        writer.add(member)
+                    count += 1
+                    if member_bytes and member.kind == archive_stream.FILE:
+                        progress.advance(read=member.size)
+            except BaseException:
+                writer.abort()
+                raise
+            writer.close()
+        finally:
+            members.close()
+    return count - writer.skipped, writer.skipped
+
+_TRANSCODE_READERS = {
+    "zip": archive_stream.iter_zip_members,
+    "rar": archive_stream.iter_rar_members,
+    "7z": archive_stream.iter_7z_members,
+}
+
+def list_archive_contents(archive_path, progress_callback=None, use_cache=True):
     """
     List the contents of an archive file.
 
     Args:
         archive_path (str): Path to the archive file.
         progress_callback (function): Optional callback for progress updates.
+        use_cache (bool): Reuse the stored listing of an unchanged archive for formats
+            that have no index and must be read in full to be listed.
 
     Returns:
-        list: List of dictionaries containing file information.
+        list: ArchiveEntry records (name, size, compressed_size, crc, mtime, mode, is_dir).
     """
     try:
-        archive_type = _get_archive_type(archive_path)
-        
-        if archive_type == "zip":
-            return _list_zip_contents(archive_path, progress_callback)
-        elif archive_type == "rar":
-            return _list_rar_contents(archive_path, progress_callback)
-        elif archive_type == "7z":
-            return _list_7z_contents(archive_path, progress_callback)
-        elif archive_type == "tar":
-            return _list_tar_contents(archive_path, progress_callback)
-        elif archive_type == "tar.gz":
-            return _list_tar_gz_contents(archive_path, progress_callback)
-        elif archive_type == "tar.bz2":
-            return _list_tar_bz2_contents(archive_path, progress_callback)
-        elif archive_type == "tar.xz":
-            return _list_tar_xz_contents(archive_path, progress_callback)
-        elif archive_type == "zipx":
-            return _list_zipx_contents(archive_path, progress_callback)
-        elif archive_type == "iso":
-            return _list_iso_contents(archive_path, progress_callback)
-        elif archive_type == "cab":
-            return _list_cab_contents(archive_path, progress_callback)
-        elif archive_type == "arj":
-            return _list_arj_contents(archive_path, progress_callback)
-        elif archive_type == "lzh":
-            return _list_lzh_contents(archive_path, progress_callback)
-        elif archive_type == "bz2":
-            return _list_bz2_contents(archive_path, progress_callback)
-        elif archive_type == "xz":
-            return _list_xz_contents(archive_path, progress_callback)
-        elif archive_type == "lzma":
-            return _list_lzma_contents(archive_path, progress_callback)
-        else:
-            raise ValueError(f"Unsupported archive format for listing: {archive_type}")
+        return _list_with_cache(_get_archive_type(archive_path), archive_path, progress_callback, use_cache)
 
     except Exception as e:
         if progress_callback:
             progress_callback(f"Error listing archive contents: {str(e)}", -1)
         return []
 
-def _list_tar_gz_contents(archive_path, progress_callback=None):
-    """List contents of tar.gz archive."""
-    import tarfile
-    
+def iter_archive_contents(archive_path, use_cache=True):
+    """
+    Yield the entries of an archive as they are read.
+
+    Unlike list_archive_contents, the first entries of a large archive arrive
+    before the rest is read, and errors are raised rather than reported.
+    Formats without an incremental lister are listed in full first.
+    """
+    archive_type = _get_archive_type(archive_path)
+    cache = get_listing_cache() if use_cache and archive_type in CACHED_LISTING_TYPES else None
+    if cache is not None:
+        contents = _cached_listing(cache, archive_path)
+        if contents is not None:
+            yield from contents
+            return
+
+    iterate = _ARCHIVE_ITERATORS.get(archive_type)
+    if iterate is None:
+        yield from _list_with_cache(archive_type, archive_path, use_cache=use_cache)
+        return
+    if cache is None:
+        yield from iterate(archive_path)
+        return
+    # The cache stores whole listings, so the entries of the formats it covers are kept
     contents = []
-    with tarfile.open(archive_path, "r:gz") as tar:
-        members = tar.getmembers()
-        total_members = len(members)
-        
-        for i, member in enumerate(members):
-            file_info = {
-                "name": member.name,
-                "size": member.size,
-                "compressed_size": member.size,  # tar doesn't have separate compressed size
-                "date": member.mtime,
-                "is_dir": member.isdir()
-            }
-            contents.append(file_info)
-            
+    for entry in iterate(archive_path):
+        contents.append(entry)
+        yield entry
+    _store_listing(cache, archive_path, contents)
+
+def _list_with_cache(archive_type, archive_path, progress_callback=None, use_cache=True):
+    cache = get_listing_cache() if use_cache and archive_type in CACHED_LISTING_TYPES else None
+
+    if cache is not None:
+        contents = _cached_listing(cache, archive_path)
+        if contents is not None:
             if progress_callback:
-                progress = int((i + 1) / total_members * 100)
-                progress_callback(f"Listing {member.name}", progress)
-    
+                progress_callback(f"Listed {len(contents)} entries (cached)", 100)
+            return contents
+
+    contents = _list_archive_type(archive_type, archive_path, progress_callback)
+    if cache is not None:
+        _store_listing(cache, archive_path, contents)
     return contents
 
+def _list_archive_type(archive_type, archive_path, progress_callback=None):
+    lister = _ARCHIVE_LISTERS.get(archive_type)
+    if lister is None:
+        raise ValueError(f"Unsupported archive format for listing: {archive_type}")
+    return lister(archive_path, progress_callback)
+
+def _cached_listing(cache, archive_path):
+    try:
+        return cache.get(archive_path)
+    except sqlite3.Error:
+        return None  # A broken cache must never stop the listing itself
+
+def _store_listing(cache, archive_path, contents):
+    try:
+        cache.put(archive_path, contents)
+    except sqlite3.Error:
+        pass
+
+def _list_zip_contents(archive_path, progress_callback=None):
+    """List contents of zip archive from its central directory."""
+    return _list_with(list_zip, archive_path, progress_callback)
+
+def _list_rar_contents(archive_path, progress_callback=None):
+    """List contents of rar archive from its headers."""
+    return _list_with(list_rar, archive_path, progress_callback)
+
+def _list_7z_contents(archive_path, progress_callback=None):
+    """List contents of 7z archive from its header database."""
+    return _list_with(list_7z, archive_path, progress_callback)
+
+def _list_tar_contents(archive_path, progress_callback=None):
+    """List contents of tar archive, seeking over member data."""
+    return _list_with(list_tar, archive_path, progress_callback)
+
+def _list_tar_gz_contents(archive_path, progress_callback=None):
+    """List contents of tar.gz archive in one streaming pass."""
+    return _list_with(list_tar, archive_path, progress_callback, "gz")
+
 def _list_tar_bz2_contents(archive_path, progress_callback=None):
-    """List contents of tar.bz2 archive."""
-    import tarfile
-    
-    contents = []
-    with tarfile.open(archive_path, "r:bz2") as tar:
-        members = tar.getmembers()
-        total_members = len(members)
-        
-        for i, member in enumerate(members):
-            file_info = {
-                "name": member.name,
-                "size": member.size,
-                "compressed_size": member.size,  # tar doesn't have separate compressed size
-                "date": member.mtime,
-                "is_dir": member.isdir()
-            }
-            contents.append(file_info)
-            
-            if progress_callback:
-                progress = int((i + 1) / total_members * 100)
-                progress_callback(f"Listing {member.name}", progress)
-    
-    return contents
+    """List contents of tar.bz2 archive in one streaming pass."""
+    return _list_with(list_tar, archive_path, progress_callback, "bz2")
 
 def _list_tar_xz_contents(archive_path, progress_callback=None):
-    """List contents of tar.xz archive."""
-    import tarfile
-    
-    contents = []
-    with tarfile.open(archive_path, "r:xz") as tar:
-        members = tar.getmembers()
-        total_members = len(members)
-        
-        for i, member in enumerate(members):
-            file_info = {
-                "name": member.name,
-                "size": member.size,
-                "compressed_size": member.size,  # tar doesn't have separate compressed size
-                "date": member.mtime,
-                "is_dir": member.isdir()
-            }
-            contents.append(file_info)
-            
-            if progress_callback:
-                progress = int((i + 1) / total_members * 100)
-                progress_callback(f"Listing {member.name}", progress)
-    
+    """List contents of tar.xz archive in one streaming pass."""
+    return _list_with(list_tar, archive_path, progress_callback, "xz")
+
+def _list_with(lister, archive_path, progress_callback=None, *args):
+    contents = lister(archive_path, *args)
+    if progress_callback:
+        progress_callback(f"Listed {len(contents)} entries", 100)
     return contents
 
 def _list_zipx_contents(archive_path, progress_callback=None):
-    """List contents of zipx archive (using patool)."""
-    try:
-        import patoolib
-    except ImportError:
-        raise ImportError("patool is required for zipx format support")
-    
-    # For zipx, we use patool to list contents
-    import tempfile
-    import json
-    
-    temp_dir = tempfile.mkdtemp()
-    try:
-        # Use patool to list archive contents
-        result = patoolib.list_archive(archive_path)
-        
-        # Parse the result (patool returns a list of file info)
-        contents = []
-        for file_info in result:
-            contents.append({
-                "name": file_info.get("filename", ""),
-                "size": file_info.get("size", 0),
-                "compressed_size": file_info.get("compressed_size", 0),
-                "date": file_info.get("date", 0),
-                "is_dir": file_info.get("isdir", False)
-            })
-        
-        if progress_callback:
-            progress_callback("Zipx archive contents listed", 100)
-        
-        return contents
-    finally:
-        import shutil
-        shutil.rmtree(temp_dir)
+    """List contents of zipx archive; the container is ZIP, so its central directory has the listing."""
+    return _list_with(list_zip, archive_path, progress_callback)
+
+def _patool_entry(file_info):
+    return ArchiveEntry(file_info.get("filename", ""), file_info.get("size", 0),
+                        file_info.get("compressed_size", 0), mtime=file_info.get("date", 0),
+                        is_dir=file_info.get("isdir", False))
 
 def _list_iso_contents(archive_path, progress_callback=None):
-    """List contents of ISO image (using patool)."""
-    try:
-        import patoolib
-    except ImportError:
-        raise ImportError("patool is required for ISO format support")
-    
-    # For ISO, we use patool to list contents
-    result = patoolib.list_archive(archive_path)
-    
-    contents = []
-    for file_info in result:
-        contents.append({
-            "name": file_info.get("filename", ""),
-            "size": file_info.get("size", 0),
-            "compressed_size": file_info.get("compressed_size", 0),
-            "date": file_info.get("date", 0),
-            "is_dir": file_info.get("isdir", False)
-        })
-    
-    if progress_callback:
-        progress_callback("ISO image contents listed", 100)
-    
-    return contents
+    """List contents of ISO image from its directory records."""
+    return _list_with(list_iso, archive_path, progress_callback)
 
 def _list_cab_contents(archive_path, progress_callback=None):
-    """List contents of CAB archive (using patool)."""
-    try:
-        import patoolib
-    except ImportError:
-        raise ImportError("patool is required for CAB format support")
-    
-    # For CAB, we use patool to list contents
-    result = patoolib.list_archive(archive_path)
-    
-    contents = []
-    for file_info in result:
-        contents.append({
-            "name": file_info.get("filename", ""),
-            "size": file_info.get("size", 0),
-            "compressed_size": file_info.get("compressed_size", 0),
-            "date": file_info.get("date", 0),
-            "is_dir": file_info.get("isdir", False)
-        })
-    
-    if progress_callback:
-        progress_callback("CAB archive contents listed", 100)
-    
-    return contents
+    """List contents of CAB archive from its file table."""
+    return _list_with(list_cab, archive_path, progress_callback)
 
 def _list_arj_contents(archive_path, progress_callback=None):
     """List contents of ARJ archive (using patool)."""
@@ -1277,13 +2662,7 @@ def _list_arj_contents(archive_path, progress_callback=None):
     
     contents = []
     for file_info in result:
-        contents.append({
-            "name": file_info.get("filename", ""),
-            "size": file_info.get("size", 0),
-            "compressed_size": file_info.get("compressed_size", 0),
-            "date": file_info.get("date", 0),
-            "is_dir": file_info.get("isdir", False)
-        })
+        contents.append(_patool_entry(file_info))
     
     if progress_callback:
         progress_callback("ARJ archive contents listed", 100)
@@ -1302,13 +2681,7 @@ def _list_lzh_contents(archive_path, progress_callback=None):
     
     contents = []
     for file_info in result:
-        contents.append({
-            "name": file_info.get("filename", ""),
-            "size": file_info.get("size", 0),
-            "compressed_size": file_info.get("compressed_size", 0),
-            "date": file_info.get("date", 0),
-            "is_dir": file_info.get("isdir", False)
-        })
+        contents.append(_patool_entry(file_info))
     
     if progress_callback:
         progress_callback("LZH archive contents listed", 100)
@@ -1327,13 +2700,8 @@ def _list_bz2_contents(archive_path, progress_callback=None):
     
     file_size = os.path.getsize(archive_path)
     
-    contents = [{
-        "name": filename,
-        "size": file_size,  # We don't know original size for bz2
-        "compressed_size": file_size,
-        "date": os.path.getmtime(archive_path),
-        "is_dir": False
-    }]
+    # bz2 does not record the original size; it is unknown without decompressing
+    contents = [ArchiveEntry(filename, None, file_size, mtime=os.path.getmtime(archive_path))]
     
     if progress_callback:
         progress_callback(f"Listing {filename}", 100)
@@ -1352,13 +2720,13 @@ def _list_xz_contents(archive_path, progress_callback=None):
     
     file_size = os.path.getsize(archive_path)
     
-    contents = [{
-        "name": filename,
-        "size": file_size,  # We don't know original size for xz
-        "compressed_size": file_size,
-        "date": os.path.getmtime(archive_path),
-        "is_dir": False
-    }]
+    # The original size is the sum of the block sizes in the stream indexes
+    with open(archive_path, 'rb') as f:
+        try:
+            size = tar_index.xz_uncompressed_size(f)
+        except (ValueError, IndexError):
+            size = None
+    contents = [ArchiveEntry(filename, size, file_size, mtime=os.path.getmtime(archive_path))]
     
     if progress_callback:
         progress_callback(f"Listing {filename}", 100)
@@ -1377,29 +2745,138 @@ def _list_lzma_contents(archive_path, progress_callback=None):
     
     file_size = os.path.getsize(archive_path)
     
-    contents = [{
-        "name": filename,
-        "size": file_size,  # We don't know original size for lzma
-        "compressed_size": file_size,
-        "date": os.path.getmtime(archive_path),
-        "is_dir": False
-    }]
+    # The .lzma header stores the original size after the properties and dictionary
+    # size; files named .lzma may also hold an xz stream, whose index records it
+    size = None
+    with open(archive_path, 'rb') as f:
+        header = f.read(13)
+        if header.startswith(b"\xfd7zXZ\x00"):
+            try:
+                size = tar_index.xz_uncompressed_size(f)
+            except (ValueError, IndexError):
+                pass
+        elif len(header) == 13 and struct.unpack_from("<Q", header, 5)[0] != _LZMA_UNKNOWN_SIZE:
+            size = struct.unpack_from("<Q", header, 5)[0]
+    contents = [ArchiveEntry(filename, size, file_size,
+                             mtime=os.path.getmtime(archive_path))]
     
     if progress_callback:
         progress_callback(f"Listing {filename}", 100)
     
     return contents
 
-def _count_files_in_sources(source_paths):
-    """Helper to count total files for progress tracking."""
-    total_files = 0
+_ARCHIVE_LISTERS = {
+    "zip": _list_zip_contents,
+    "rar": _list_rar_contents,
+    "7z": _list_7z_contents,
+    "tar": _list_tar_contents,
+    "tar.gz": _list_tar_gz_contents,
+    "tar.bz2": _list_tar_bz2_contents,
+    "tar.xz": _list_tar_xz_contents,
+    "zipx": _list_zipx_contents,
+    "iso": _list_iso_contents,
+    "cab": _list_cab_contents,
+    "arj": _list_arj_contents,
+    "lzh": _list_lzh_contents,
+    "bz2": _list_bz2_contents,
+    "xz": _list_xz_contents,
+    "lzma": _list_lzma_contents,
+}
+
+# Incremental listers, for iter_archive_contents
+_ARCHIVE_ITERATORS = {
+    "zip": iter_zip,
+    "rar": iter_rar,
+    "7z": iter_7z,
+    "tar": iter_tar,
+    "tar.gz": functools.partial(iter_tar, compression="gz"),
+    "tar.bz2": functools.partial(iter_tar, compression="bz2"),
+    "tar.xz": functools.partial(iter_tar, compression="xz"),
+    "zipx": iter_zip,
+    "iso": iter_iso,
+    "cab": iter_cab,
+}
+
+class ManifestEntry:
+    """One file or directory found while scanning the sources."""
+
+    __slots__ = ("path", "arcname", "is_dir", "size", "mode", "mtime", "inode", "uid", "gid")
+
+    def __init__(self, path, arcname, is_dir, st):
+        self.path = path
+        self.arcname = arcname
+        self.is_dir = is_dir
+        self.size = 0 if is_dir else st.st_size
+        self.mode = st.st_mode
+        self.mtime = st.st_mtime
+        self.inode = st.st_ino
+        self.uid = st.st_uid
+        self.gid = st.st_gid
+
+class SourceManifest:
+    """Everything the create backends need from the sources, gathered in one walk."""
+
+    def __init__(self):
+        self.entries = []
+        self.total_files = 0
+        self.total_bytes = 0
+        # Archive names of directories that could not be read
+        self.skipped_dirs = []
+
+    def add(self, entry):
+        self.entries.append(entry)
+        if not entry.is_dir:
+            self.total_files += 1
+            self.total_bytes += entry.size
+
+    def files(self):
+        return (entry for entry in self.entries if not entry.is_dir)
+
+def _scan_sources(source_paths, progress_callback=None):
+    """
+    Walk the sources once with os.scandir and record paths, sizes, modes and inodes.
+
+    Archive names keep the top-level directory name, e.g. "photos/2024/a.jpg" for a
+    source directory "photos". Symlinked files are followed; symlinked directories
+    are not descended into. Directories that cannot be read are left out and
+    reported through ``progress_callback`` with percentage -1.
+    """
+    manifest = SourceManifest()
     for source_path in source_paths:
-        path = Path(source_path)
-        if path.is_file():
-            total_files += 1
-        elif path.is_dir():
-            total_files += sum(1 for _ in path.rglob('*') if _.is_file())
-    return total_files
+        source_path = os.fspath(source_path)
+        try:
+            st = os.stat(source_path)
+        except OSError:
+            continue
+        arcname = os.path.basename(os.path.normpath(source_path))
+        if stat.S_ISREG(st.st_mode):
+            manifest.add(ManifestEntry(source_path, arcname, False, st))
+            continue
+        if not stat.S_ISDIR(st.st_mode):
+            continue
+        manifest.add(ManifestEntry(source_path, arcname, True, st))
+        pending = [(source_path, arcname)]
+        while pending:
+            dir_path, dir_arcname = pending.pop()
+            try:
+                with os.scandir(dir_path) as it:
+                    for dir_entry in it:
+                        entry_arcname = f"{dir_arcname}/{dir_entry.name}"
+                        try:
+                            if dir_entry.is_dir(follow_symlinks=False):
+                                manifest.add(ManifestEntry(dir_entry.path, entry_arcname, True,
+                                                           dir_entry.stat(follow_symlinks=False)))
+                                pending.append((dir_entry.path, entry_arcname))
+                            elif dir_entry.is_file():
+                                manifest.add(ManifestEntry(dir_entry.path, entry_arcname, False,
+                                                           dir_entry.stat()))
+                        except OSError:
+                            continue  # Vanished or unreadable entries are skipped
+            except OSError as e:
+                manifest.skipped_dirs.append(dir_arcname)
+                if progress_callback:
+                    progress_callback(f"Skipped unreadable directory {dir_path}: {e.strerror or e}", -1)
+    return manifest
 
 def _check_rar_command():
     """Check if rar command is available in the system."""
@@ -1411,8 +2888,23 @@ def _check_rar_command():
     except FileNotFoundError:
         return False
 
+# rar command found by _get_rar_command_name; None until one is found
+_rar_command_name = None
+
 def _get_rar_command_name():
-    """Get the appropriate rar command name based on the platform."""
+    """
+    Get the appropriate rar command name based on the platform, or None.
+
+    A command that was found is remembered for the rest of the process; when
+    none is found the next call looks again, so installing rar while the
+    application runs is picked up.
+    """
+    global _rar_command_name
+    if _rar_command_name is None:
+        _rar_command_name = _find_rar_command()
+    return _rar_command_name
+
+def _find_rar_command():
     system = platform.system()
     if system == "Windows":
         # On Windows, it might be rar.exe or unrar.exe
@@ -0,0 +1,428 @@
+"""
+Member-by-member archive streaming
+
+Readers walk an archive once and yield StreamMember records whose data can be
+read straight from the source archive; writers take those members (metadata
+plus an open data stream) and add them to a new archive. Together they move
+members between formats through memory, one member at a time, without
+extracting anything to disk (the 7z writer stages member data in one
+temporary file so it can compress its blocks in parallel).
+
+A member's data is only valid until the reader moves on to the next member.
+"""
+
+import contextlib
+import io
+import os
+import pathlib
+import queue
+import stat
+import tarfile
+import threading
+import time
+import zipfile
+import zlib
+
+import py7zr
+import py7zr.io
+import rarfile
+
+from support.parallel_zip import (ParallelZipWriter, CompressedEntry, ZIP_DEFLATED, ZIP_STORED, compress_stream,
+                                  raw_entry)
+from support.progress import CountingReader
+from support.sevenzip_writer import SevenZipWriter
+
+FILE = "file"
+DIRECTORY = "dir"
+SYMLINK = "symlink"
+OTHER = "other"
+
+# Chunks of 7z output queued between the decoder thread and the consumer
+SEVENZIP_QUEUE_SIZE = 16
+
+# 100ns intervals between 1601-01-01 (Windows FILETIME) and the Unix epoch
+_FILETIME_EPOCH = 116444736000000000
+
+
+class StreamMember:
+    """One archive member as seen by a reader."""
+
+    __slots__ = ("name", "size", "mtime", "mode", "kind", "linkname", "source", "_opener", "raw")
+
+    def __init__(self, name, size, mtime, mode, kind, linkname="", source=None, opener=None, raw=None):
+        self.name = name
+        self.size = size
+        self.mtime = mtime
+        self.mode = mode
+        self.kind = kind
+        self.linkname = linkname
+        # The reader's own record (ZipInfo, TarInfo, ...)
+        self.source = source
+        self._opener = opener
+        # Callable returning the member's compressed ZIP data, when it can be copied as-is
+        self.raw = raw
+
+    def open(self):
+        """Binary file object with the member's data."""
+        if self._opener is None:
+            return io.BytesIO()
+        return self._opener()
+
+    def permissions(self):
+        """Permission bits, with a sensible default when the archive stores none."""
+        if self.mode:
+            return stat.S_IMODE(self.mode)
+        return 0o755 if self.kind == DIRECTORY else 0o644
+
+
+def _kind_from_mode(mode, is_dir):
+    if is_dir or stat.S_ISDIR(mode):
+        return DIRECTORY
+    if stat.S_ISLNK(mode):
+        return SYMLINK
+    return FILE
+
+
+# --- Readers ---
+
+def iter_zip_members(path):
+    with open(path, "rb") as fp, zipfile.ZipFile(fp) as zf:
+        for info in zf.infolist():
+            mode = info.external_attr >> 16 if info.create_system == 3 else 0
+            kind = _kind_from_mode(mode, info.is_dir())
+            linkname = zf.read(info).decode("utf-8") if kind == SYMLINK else ""
+            mtime = time.mktime(info.date_time + (0, 0, -1))
+            yield StreamMember(info.filename.rstrip("/"), info.file_size, mtime, mode, kind, linkname, info,
+                               lambda info=info: zf.open(info), lambda info=info: raw_entry(fp, info))
+
+
+def iter_rar_members(path):
+    with rarfile.RarFile(path) as rf:
+        for info in rf.infolist():
+            mode = info.mode if info.host_os == rarfile.RAR_OS_UNIX else 0
+            if info.is_symlink():
+                kind = SYMLINK
+            else:
+                kind = DIRECTORY if info.is_dir() else FILE
+            linkname = rf.read(info).decode("utf-8") if kind == SYMLINK else ""
+            if info.mtime is not None:
+                mtime = info.mtime.timestamp()
+            else:
+                mtime = time.mktime(tuple(info.date_time) + (0, 1, -1))
+            yield StreamMember(info.filename.rstrip("/"), info.file_size, mtime, mode, kind, linkname, info,
+                               lambda info=info: rf.open(info))
+
+
+def iter_tar_members(path, open_stream=None, on_read=None):
+    """
+    Walk a tarball in one forward pass; ``open_stream`` wraps the raw file in a
+    codec reader (e.g. gzip.GzipFile) for compressed tarballs. ``on_read`` is
+    called with the number of (compressed) bytes read from the file.
+    """
+    with open(path, "rb") as raw_file:
+        raw = CountingReader(raw_file, on_read) if on_read else raw_file
+        with (open_stream(raw) if open_stream else contextlib.nullcontext(raw)) as stream, \
+                tarfile.open(fileobj=stream, mode="r|") as tar:
+            yield from _tar_stream_members(tar)
+
+
+def _tar_stream_members(tar):
+    for info in tar:
+        if info.isdir():
+            kind = DIRECTORY
+        elif info.issym():
+            kind = SYMLINK
+        elif info.isreg():
+            kind = FILE
+        else:
+            kind = OTHER
+        yield StreamMember(info.name.rstrip("/"), info.size, info.mtime, info.mode, kind, info.linkname, info,
+                           (lambda info=info: tar.extractfile(info)) if kind == FILE else None)
+
+
+class _QueueReader(io.RawIOBase):
+    """Reads the chunks of one 7z member as the decoder thread produces them."""
+
+    def __init__(self, events):
+        self._events = events
+        self._buffer = b""
+        self._done = False
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        while not self._buffer and not self._done:
+            kind, payload = self._events.get()
+            if kind == "data":
+                self._buffer = payload
+            elif kind == "error":
+                self._done = True
+                raise payload
+            else:
+                self._done = True
+        count = min(len(buffer), len(self._buffer))
+        buffer[:count] = self._buffer[:count]
+        self._buffer = self._buffer[count:]
+        return count
+
+    def drain(self):
+        while self.readinto(bytearray(1024 * 1024)):
+            pass
+
+
+class _QueueWriter(py7zr.io.Py7zIO):
+    """py7zr output object that hands each written chunk to the consumer."""
+
+    def __init__(self, filename, events, cancelled):
+        self.filename = filename
+        self._events = events
+        self._cancelled = cancelled
+        self._size = 0
+        self._ended = False
+
+    def write(self, s):
+        if self._cancelled.is_set():
+            raise EOFError("Reading the 7z archive was stopped")
+        if s:
+            self._events.put(("data", bytes(s)))
+            self._size += len(s)
+        return len(s)
+
+    def read(self, size=None):
+        return b""
+
+    def seek(self, offset, whence=0):
+        return 0
+
+    def flush(self):
+        pass
+
+    def size(self):
+        return self._size
+
+    def close(self):
+        self.end()
+
+    def end(self):
+        if not self._ended:
+            self._ended = True
+            self._events.put(("end", None))
+
+
+class _QueueWriterFactory(py7zr.io.WriterFactory):
+    def __init__(self, events):
+        self._events = events
+        self._current = None
+        self.cancelled = threading.Event()
+
+    def create(self, filename):
+        if self._current is not None:
+            self._current.end()
+        self._current = _QueueWriter(filename, self._events, self.cancelled)
+        self._events.put(("start", filename))
+        return self._current
+
+    def finish(self):
+        if self._current is not None:
+            self._current.end()
+
+
+def iter_7z_members(path):
+    """
+    Walk a 7z archive. py7zr decodes on a worker thread that passes the output
+    through a bounded queue, so only a few chunks are held in memory at a time.
+    """
+    events = queue.Queue(maxsize=SEVENZIP_QUEUE_SIZE)
+    factory = _QueueWriterFactory(events)
+    with open(path, "rb") as fp:
+        # An open file object keeps py7zr's decoding sequential, in archive order
+        szf = py7zr.SevenZipFile(fp, "r")
+        files = list(szf.files)
+        members = {}
+        for f in files:
+            mtime = (int(f.lastwritetime) - _FILETIME_EPOCH) / 10_000_000 if f.lastwritetime is not None else 0
+            mode = f.posix_mode or 0
+            if mode and f.st_fmt:
+                mode |= f.st_fmt
+            if f.is_directory:
+                kind = DIRECTORY
+            elif f.is_symlink:
+                kind = SYMLINK
+            else:
+                kind = FILE
+            members[f.filename] = StreamMember(f.filename, f.uncompressed or 0, mtime, mode, kind, source=f)
+
+        # Directories and empty files carry no data
+        for member in members.values():
+            if member.kind == DIRECTORY or (member.kind == FILE and not member.size):
+                yield member
+
+        def decode():
+            try:
+                szf.extractall(factory=factory)
+                factory.finish()
+                events.put(("done", None))
+            except BaseException as e:
+                events.put(("error", e))
+
+        by_name = dict(members)
+        for member in members.values():
+            by_name.setdefault(_7z_output_key(member.name), member)
+
+        worker = threading.Thread(target=decode, name="7z-decoder", daemon=True)
+        worker.start()
+        pending = {m.name for m in members.values() if m.kind == SYMLINK or (m.kind == FILE and m.size)}
+        try:
+            while True:
+                kind, payload = events.get()
+                if kind == "done":
+                    break
+                if kind == "error":
+                    raise payload
+                if kind != "start":
+                    continue
+                member = _match_7z_member(by_name, payload)
+                reader = _QueueReader(events)
+                if member is None or member.name not in pending:
+                    # Empty files and directories also get an output; they were yielded above
+                    reader.drain()
+                    continue
+                pending.discard(member.name)
+                if member.kind == SYMLINK:
+                    member.linkname = reader.read().decode("utf-8")
+                    yield member
+                    continue
+                member._opener = lambda reader=reader: io.BufferedReader(reader, 1024 * 1024)
+                yield member
+                # Whatever the consumer did not read still has to leave the queue
+                reader.drain()
+        finally:
+            # Stop the decoder if the consumer gave up early, and unblock it
+            factory.cancelled.set()
+            while worker.is_alive():
+                try:
+                    events.get(timeout=0.1)
+                except queue.Empty:
+                    pass
+            szf.close()
+
+
+def _7z_output_key(name):
+    """Member or py7zr output name without leading "/", "." parts or backslashes."""
+    return "/".join(part for part in pathlib.PurePath(name).as_posix().split("/") if part not in ("", "."))
+
+
+def _match_7z_member(by_name, filename):
+    """py7zr names outputs by their would-be extraction path; map it back to the member."""
+    member = by_name.get(filename) or by_name.get(_7z_output_key(filename))
+    if member is None and os.path.isabs(filename):
+        # Older py7zr releases join the output name to the working directory
+        member = by_name.get(_7z_output_key(os.path.relpath(filename)))
+    return member
+
+
+# --- Writers ---
+
+class ZipMemberWriter:
+    """
+    Writes members to a ZIP archive. Members that come from another ZIP are
+    copied as compressed data; everything else is deflated on the fly.
+    """
+
+    def __init__(self, path, compresslevel=None, on_entry_written=None):
+        kwargs = {} if compresslevel is None else {"compresslevel": compresslevel}
+        # Member data is only valid until the reader moves on, so every entry is written as it is added
+        self._zipw = ParallelZipWriter(path, workers=1, max_pending=1, on_entry_written=on_entry_written, **kwargs)
+        self.skipped = 0
+
+    def add(self, member, method=ZIP_DEFLATED):
+        if member.raw is not None:
+            self._zipw.add_compressed(member.raw())
+            return
+        if member.kind == DIRECTORY:
+            self._zipw.add_compressed(CompressedEntry(member.name + "/", ZIP_STORED, 0, 0, 0, member.mtime,
+                                                      stat.S_IFDIR | member.permissions(), io.BytesIO()))
+        elif member.kind == SYMLINK:
+            target = member.linkname.encode("utf-8")
+            self._zipw.add_compressed(CompressedEntry(member.name, ZIP_STORED, zlib.crc32(target), len(target),
+                                                      len(target), member.mtime, stat.S_IFLNK | 0o777,
+                                                      io.BytesIO(target)))
+        elif member.kind == FILE:
+            with member.open() as data:
+                self._zipw.add_compressed(compress_stream(data, member.name, method, self._zipw.compresslevel,
+                                                          member.mtime, stat.S_IFREG | member.permissions(),
+                                                          detect_incompressible=True))
+        else:
+            self.skipped += 1
+
+    def close(self):
+        self._zipw.close()
+
+    def abort(self):
+        self._zipw.abort()
+
+
+class TarMemberWriter:
+    """Writes members to a tar stream; tar sources keep their full TarInfo (owner, links)."""
+
+    def __init__(self, fileobj):
+        self._tar = tarfile.open(fileobj=fileobj, mode="w")
+        self.skipped = 0
+
+    def add(self, member):
+        if isinstance(member.source, tarfile.TarInfo):
+            info = member.source
+        else:
+            info = tarfile.TarInfo(member.name)
+            info.mtime = member.mtime
+            info.mode = member.permissions()
+            if member.kind == DIRECTORY:
+                info.type = tarfile.DIRTYPE
+            elif member.kind == SYMLINK:
+                info.type = tarfile.SYMTYPE
+                info.linkname = member.linkname
+            elif member.kind == FILE:
+                info.size = member.size
+            else:
+                self.skipped += 1
+                return
+        if info.isreg():
+            with member.open() as data:
+                self._tar.addfile(info, data)
+        else:
+            self._tar.addfile(info)
+
+    def close(self):
+        self._tar.close()
+
+    def abort(self):
+        self._tar.close()
+
+
+class SevenZipMemberWriter:
+    """
+    Writes members to a 7z archive through SevenZipWriter: solid blocks with a
+    filter chain per file type, compressed in parallel when the writer closes.
+    Member data is staged in a temporary file until then.
+    """
+
+    def __init__(self, path, **kwargs):
+        self._szw = SevenZipWriter(path, **kwargs)
+        self.skipped = 0
+
+    def add(self, member, store=False):
+        if member.kind == FILE:
+            with member.open() as data:
+                self._szw.add_stream(data, member.name, mtime=member.mtime,
+                                     mode=stat.S_IFREG | member.permissions(), store=store)
+        elif member.kind == DIRECTORY:
+            self._szw.add_directory(member.name, mtime=member.mtime, mode=stat.S_IFDIR | member.permissions())
+        else:
+            self.skipped += 1
+
+    def close(self):
+        self._szw.close()
+
+    def abort(self):
+        self._szw.abort()
\ No newline at end of file
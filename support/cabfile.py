@@ -0,0 +1,320 @@
+"""
+Microsoft Cabinet (CAB) reader
+
+CabFile memory-maps a cabinet and parses its folder and file tables, so a
+listing never decompresses anything. Uncompressed and MSZIP folders are
+decoded in-process with zlib: MSZIP is a series of deflate blocks of up to
+32 KiB, each primed with the output of the one before. Files in a folder
+share one compressed stream, so reading moves forward through the folder and
+keeps the decoder position for the next member; jumping back restarts the
+folder. LZX and Quantum folders raise NotImplementedError.
+"""
+
+import io
+import mmap
+import struct
+import time
+import zlib
+
+_HEADER = struct.Struct("<4s4xL4xL4xBBHHHHH")
+_RESERVE = struct.Struct("<HBB")
+_FOLDER = struct.Struct("<LHH")
+_FILE = struct.Struct("<LLHHHH")
+_DATA = struct.Struct("<LHH")
+
+_FLAG_PREV_CABINET = 0x0001
+_FLAG_NEXT_CABINET = 0x0002
+_FLAG_RESERVE_PRESENT = 0x0004
+
+_ATTR_DIRECTORY = 0x10
+_ATTR_NAME_IS_UTF = 0x80
+# iFolder values for files continued from or into another cabinet of a set
+_FOLDER_CONTINUED = 0xFFFD
+
+COMPRESS_NONE = 0
+COMPRESS_MSZIP = 1
+COMPRESS_QUANTUM = 2
+COMPRESS_LZX = 3
+_COMPRESS_NAMES = {COMPRESS_QUANTUM: "Quantum", COMPRESS_LZX: "LZX"}
+
+_MSZIP_WINDOW = 32 * 1024
+
+
+class BadCabFile(Exception):
+    """The file is not a readable cabinet, or its data is damaged."""
+
+
+class CabInfo:
+    """One file in a cabinet."""
+
+    __slots__ = ("filename", "file_size", "folder", "offset", "mtime", "attributes")
+
+    def __init__(self, filename, file_size, folder, offset, mtime, attributes):
+        self.filename = filename
+        self.file_size = file_size
+        self.folder = folder
+        # Position of the file in its folder's uncompressed stream
+        self.offset = offset
+        self.mtime = mtime
+        self.attributes = attributes
+
+    @property
+    def compress_size(self):
+        # Files share their folder's compressed stream
+        return self.file_size
+
+    def is_dir(self):
+        return False
+
+    def __repr__(self):
+        return f"CabInfo({self.filename!r}, size={self.file_size}, folder={self.folder})"
+
+
+class _Folder:
+    __slots__ = ("data_offset", "block_count", "compression")
+
+    def __init__(self, data_offset, block_count, compression):
+        self.data_offset = data_offset
+        self.block_count = block_count
+        self.compression = compression
+
+
+class CabFile:
+    """Reader for a single cabinet (not a multi-cabinet set)."""
+
+    def __init__(self, path, verify=False):
+        self._fp = open(path, "rb")
+        self.verify = verify
+        self._map = None
+        self._decoders = {}
+        try:
+            try:
+                self._map = mmap.mmap(self._fp.fileno(), 0, access=mmap.ACCESS_READ)
+            except ValueError:
+                raise BadCabFile("Empty file")
+            self._read_tables()
+        except BaseException:
+            self.close()
+            raise
+        self._by_name = {info.filename: info for info in self._members}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def close(self):
+        self._decoders.clear()
+        if self._map is not None:
+            self._map.close()
+            self._map = None
+        self._fp.close()
+
+    @property
+    def can_decode(self):
+        """True when every folder uses a compression method this reader can decode."""
+        return all(folder.compression in (COMPRESS_NONE, COMPRESS_MSZIP) for folder in self._folders)
+
+    def infolist(self):
+        return list(self._members)
+
+    def namelist(self):
+        return [info.filename for info in self._members]
+
+    def getinfo(self, name):
+        try:
+            return self._by_name[name]
+        except KeyError:
+            raise KeyError(f"There is no item named {name!r} in the cabinet")
+
+    def read(self, member):
+        info = member if isinstance(member, CabInfo) else self.getinfo(member)
+        decoder = self._decoder_at(info)
+        data = decoder.read(info.file_size)
+        if len(data) != info.file_size:
+            raise BadCabFile(f"Truncated data for {info.filename}")
+        return data
+
+    def open(self, member):
+        return io.BytesIO(self.read(member))
+
+    def iter_members(self):
+        """
+        Yield (CabInfo, reader) in folder order, decoding each folder once.
+        A reader is only valid until the next member is yielded.
+        """
+        for info in sorted(self._members, key=lambda info: (info.folder, info.offset)):
+            yield info, _MemberReader(self._decoder_at(info), info.file_size)
+
+    def _decoder_at(self, info):
+        """Folder decoder positioned at the start of ``info``, reusing one that has not gone past it."""
+        decoder = self._decoders.get(info.folder)
+        if decoder is None or decoder.position > info.offset:
+            folder = self._folders[info.folder]
+            if folder.compression not in (COMPRESS_NONE, COMPRESS_MSZIP):
+                name = _COMPRESS_NAMES.get(folder.compression, str(folder.compression))
+                raise NotImplementedError(f"{name} compressed cabinets are not supported")
+            decoder = self._decoders[info.folder] = _FolderDecoder(self, folder)
+        decoder.skip(info.offset - decoder.position)
+        return decoder
+
+    # --- Tables ---
+
+    def _read_tables(self):
+        data = self._map
+        if len(data) < _HEADER.size:
+            raise BadCabFile("Not a cabinet: file too short")
+        (signature, cabinet_size, files_offset, _minor, _major, folder_count, file_count, flags, _set_id,
+         _index) = _HEADER.unpack_from(data, 0)
+        if signature != b"MSCF":
+            raise BadCabFile("Not a cabinet: bad signature")
+        pos = _HEADER.size
+        folder_reserve = self.data_reserve = 0
+        if flags & _FLAG_RESERVE_PRESENT:
+            header_reserve, folder_reserve, self.data_reserve = _RESERVE.unpack_from(data, pos)
+            pos += _RESERVE.size + header_reserve
+        for flag in (_FLAG_PREV_CABINET, _FLAG_NEXT_CABINET):
+            if flags & flag:
+                # Cabinet and disk names of the neighbouring cabinet
+                for _ in range(2):
+                    pos = data.find(b"\0", pos) + 1
+
+        self._folders = []
+        for _ in range(folder_count):
+            data_offset, block_count, compression = _FOLDER.unpack_from(data, pos)
+            self._folders.append(_Folder(data_offset, block_count, compression & 0x000F))
+            pos += _FOLDER.size + folder_reserve
+
+        self._members = []
+        pos = files_offset
+        for _ in range(file_count):
+            size, offset, folder, date, tm, attributes = _FILE.unpack_from(data, pos)
+            end = data.find(b"\0", pos + _FILE.size)
+            if end < 0:
+                raise BadCabFile("Truncated file table")
+            raw_name = data[pos + _FILE.size:end]
+            pos = end + 1
+            if folder >= _FOLDER_CONTINUED:
+                raise NotImplementedError("Cabinets spanning several files are not supported")
+            if folder >= folder_count:
+                raise BadCabFile(f"File refers to missing folder {folder}")
+            name = raw_name.decode("utf-8" if attributes & _ATTR_NAME_IS_UTF else "cp437", "replace")
+            self._members.append(CabInfo(name.replace("\\", "/"), size, folder, offset, _dos_time(date, tm),
+                                         attributes))
+
+
+class _FolderDecoder:
+    """Forward-only decoder for one folder's chain of CFDATA blocks."""
+
+    def __init__(self, cab, folder):
+        self._map = cab._map
+        self._data_reserve = cab.data_reserve
+        self._verify = cab.verify
+        self._folder = folder
+        self._next_block = 0
+        self._block_pos = folder.data_offset
+        self._history = b""
+        self._buffer = b""
+        self.position = 0
+
+    def read(self, size):
+        parts = []
+        while size > 0:
+            if not self._buffer and not self._decode_block():
+                break
+            part = self._buffer[:size]
+            self._buffer = self._buffer[len(part):]
+            parts.append(part)
+            size -= len(part)
+            self.position += len(part)
+        return b"".join(parts)
+
+    def skip(self, size):
+        while size > 0:
+            if not self._buffer and not self._decode_block():
+                raise BadCabFile("Folder data ends before the file")
+            count = min(size, len(self._buffer))
+            self._buffer = self._buffer[count:]
+            size -= count
+            self.position += count
+
+    def _decode_block(self):
+        if self._next_block >= self._folder.block_count:
+            return False
+        pos = self._block_pos
+        checksum, compressed_size, uncompressed_size = _DATA.unpack_from(self._map, pos)
+        start = pos + _DATA.size + self._data_reserve
+        block = self._map[start:start + compressed_size]
+        if len(block) != compressed_size:
+            raise BadCabFile("Truncated data block")
+        if self._verify and checksum and _checksum(block, _checksum(self._map[pos + 4:start], 0)) != checksum:
+            raise BadCabFile(f"Checksum mismatch in data block {self._next_block}")
+        self._block_pos = start + compressed_size
+        self._next_block += 1
+
+        if self._folder.compression == COMPRESS_NONE:
+            out = block
+        else:
+            if block[:2] != b"CK":
+                raise BadCabFile("Bad MSZIP block signature")
+            try:
+                decompressor = zlib.decompressobj(-zlib.MAX_WBITS, zdict=self._history) if self._history else \
+                    zlib.decompressobj(-zlib.MAX_WBITS)
+                out = decompressor.decompress(block[2:])
+            except zlib.error as e:
+                raise BadCabFile(f"Damaged MSZIP data: {e}")
+            self._history = (self._history + out)[-_MSZIP_WINDOW:]
+        if len(out) != uncompressed_size:
+            raise BadCabFile("Data block decoded to the wrong size")
+        self._buffer = out
+        return True
+
+
+class _MemberReader(io.RawIOBase):
+    """Reads one member out of its folder decoder."""
+
+    def __init__(self, decoder, size):
+        self._decoder = decoder
+        self._remaining = size
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        if not self._remaining:
+            return 0
+        data = self._decoder.read(min(len(buffer), self._remaining))
+        if not data:
+            raise BadCabFile("Folder data ends before the file")
+        buffer[:len(data)] = data
+        self._remaining -= len(data)
+        return len(data)
+
+
+def _checksum(data, seed):
+    """The CFDATA checksum: XOR of little-endian 32-bit words, with the tail bytes packed big-end first."""
+    words = len(data) // 4
+    # XOR all words at once by folding the block, read as one integer, in halves
+    value = int.from_bytes(data[:words * 4], "little")
+    width = words
+    while width > 1:
+        half = width // 2
+        value = (value & ((1 << (half * 32)) - 1)) ^ (value >> (half * 32))
+        if width % 2:
+            # The odd top word ends up above the folded half; bring it down too
+            value = (value & ((1 << (half * 32)) - 1)) ^ (value >> (half * 32))
+        width = half
+    checksum = value ^ seed
+    tail = 0
+    for byte in data[words * 4:]:
+        tail = (tail << 8) | byte
+    return checksum ^ tail
+
+
+def _dos_time(date, tm):
+    try:
+        return time.mktime(((date >> 9) + 1980, (date >> 5) & 0xF, date & 0x1F,
+                            tm >> 11, (tm >> 5) & 0x3F, (tm & 0x1F) * 2, 0, 1, -1))
+    except (OverflowError, ValueError):
+        return 0
@@ -0,0 +1,116 @@
+"""
+Compression options shared by all archive backends
+
+CompressionOptions describes the speed/ratio trade-off once and maps it to
+each backend's native knobs (zlib level, bz2 compresslevel, lzma presets and
+filters, 7z filter chains, rar switches).
+"""
+
+import lzma
+import zlib
+from dataclasses import dataclass
+from typing import List, Optional
+
+import py7zr
+
+from support.sevenzip_writer import COPY
+
+PRESET_NAMES = ("fastest", "fast", "normal", "maximum")
+
+_PRESET_LEVELS = {
+    "fastest": 1,
+    "fast": 3,
+    "normal": 6,
+    "maximum": 9,
+}
+
+
+@dataclass
+class CompressionOptions:
+    """
+    Speed/ratio settings for archive creation.
+
+    Attributes:
+        level: 0 (store) to 9 (best ratio); None keeps each library's default.
+        dictionary_size: LZMA/LZMA2/RAR dictionary size in bytes.
+        solid_block_size: Maximum bytes per solid block (7z). Not passed to rar, whose solid
+            groups (-s<N>) are counted in files rather than bytes.
+        threads: Worker threads for backends that can use them.
+        volume_size: Split the output into volumes of this many bytes (zip, 7z, tar, rar).
+        filters: 7z filter chain for every block (lzma filter dicts ending in LZMA2, e.g. BCJ
+            or delta first); None picks one per file type.
+        indexed: Write tar.gz/tar.bz2/tar.xz with a codec restart every few MiB so members
+            can be read without decoding from the start (see support.tar_index). The
+            output is a concatenation of gzip members / bz2 or xz streams, which tarfile's
+            streaming mode ("r|*") cannot read, and each restart discards the xz window.
+    """
+
+    level: Optional[int] = None
+    dictionary_size: Optional[int] = None
+    solid_block_size: Optional[int] = None
+    threads: Optional[int] = None
+    volume_size: Optional[int] = None
+    filters: Optional[List[dict]] = None
+    indexed: bool = False
+
+    @classmethod
+    def preset(cls, name):
+        """Options for one of PRESET_NAMES ("fastest", "fast", "normal", "maximum")."""
+        try:
+            return cls(level=_PRESET_LEVELS[name.lower()])
+        except KeyError:
+            raise ValueError(f"Unknown compression preset: {name}")
+
+    def zlib_level(self):
+        """Level for zlib/deflate (ZIP, gzip)."""
+        return zlib.Z_DEFAULT_COMPRESSION if self.level is None else self.level
+
+    def gzip_level(self):
+        """compresslevel for gzip streams; keeps tarfile's default of 9."""
+        return 9 if self.level is None else self.level
+
+    def bz2_level(self):
+        """compresslevel for bz2, which only accepts 1-9."""
+        return 9 if self.level is None else max(1, self.level)
+
+    def lzma_preset(self):
+        """Preset for lzma/xz."""
+        return lzma.PRESET_DEFAULT if self.level is None else self.level
+
+    def lzma_filters(self):
+        """LZMA2 filter chain for xz streams, honouring the dictionary size."""
+        lzma2 = {"id": lzma.FILTER_LZMA2, "preset": self.lzma_preset()}
+        if self.dictionary_size:
+            lzma2["dict_size"] = self.dictionary_size
+        return [lzma2]
+
+    def py7zr_filters(self):
+        """
+        Filter chain for py7zr, or None to keep py7zr's defaults. Only used to
+        append to an existing 7z, which SevenZipWriter cannot do; new and
+        rewritten archives use sevenzip_filters().
+        """
+        if self.level == 0:
+            return [{"id": py7zr.FILTER_COPY}]
+        if self.level is None and not self.dictionary_size:
+            return None
+        return self.lzma_filters()
+
+    def sevenzip_filters(self):
+        """Filter chain forced on every 7z block, or None to choose one per file."""
+        if self.level == 0:
+            return COPY
+        return self.filters
+
+    def rar_switches(self):
+        """Command line switches for the rar tool."""
+        switches = []
+        if self.level is not None:
+            switches.append(f"-m{round(self.level * 5 / 9)}")
+        if self.dictionary_size:
+            switches.append(f"-md{max(1, self.dictionary_size // 1024)}k")
+        if self.threads:
+            switches.append(f"-mt{self.threads}")
+        if self.volume_size:
+            switches.append(f"-v{self.volume_size}b")
+        return switches
@@ -0,0 +1,351 @@
+"""
+Virtual tree model for archive listings
+
+ArchiveContentsModel turns the flat ArchiveEntry records produced by the
+listing engine into a directory tree without creating a widget item per
+entry. Entries arrive in chunks through ``append_entries``; directories only
+expose their rows to the view in batches via canFetchMore/fetchMore, so the
+first rows show immediately and expanding a huge folder stays cheap.
+
+Sorting and filtering are computed on a background thread from a snapshot
+of the tree and applied on the GUI thread when ready; results made stale by
+a newer request are dropped.
+"""
+
+import threading
+import time
+
+from PySide6.QtCore import QAbstractItemModel, QModelIndex, Qt, Signal
+
+# Rows revealed to the view per fetchMore call
+FETCH_BATCH_SIZE = 1000
+
+COLUMNS = ("Name", "Size", "Packed", "Modified")
+
+
+class _Node:
+    """A file or directory in the listing tree."""
+
+    __slots__ = ("name", "path", "parent", "entry", "is_dir", "children", "child_dirs",
+                 "visible", "seen", "fetched", "row", "size", "compressed_size")
+
+    def __init__(self, name, path, parent, entry=None, is_dir=False):
+        self.name = name
+        self.path = path
+        self.parent = parent
+        self.entry = entry
+        self.is_dir = is_dir
+        self.children = [] if is_dir else None
+        self.child_dirs = {} if is_dir else None
+        # Children in display order after sorting/filtering, and how many the view has fetched
+        self.visible = [] if is_dir else None
+        self.seen = 0
+        self.fetched = 0
+        self.row = -1
+        # Formats that do not record the original size (bz2) list it as None
+        self.size = 0 if entry is None else entry.size or 0
+        self.compressed_size = 0 if entry is None else entry.compressed_size
+
+
+def _format_size(num_bytes):
+    value = float(num_bytes or 0)
+    for unit in ("B", "KB", "MB", "GB"):
+        if value < 1024:
+            return f"{value:.0f} {unit}" if unit == "B" else f"{value:.1f} {unit}"
+        value /= 1024
+    return f"{value:.1f} TB"
+
+
+def _sort_key(column):
+    if column == 1:
+        return lambda node: node.size
+    if column == 2:
+        return lambda node: node.compressed_size
+    if column == 3:
+        return lambda node: (node.entry is not None and node.entry.mtime) or 0
+    return lambda node: node.name.casefold()
+
+
+class ArchiveContentsModel(QAbstractItemModel):
+    """Lazily populated tree of archive entries."""
+
+    # Emitted from the worker thread; Qt queues it back to the model's thread
+    _arrangement_ready = Signal(int, object, bool)
+    loading_finished = Signal(int)
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._root = _Node("", "", None, is_dir=True)
+        self._dirs = [self._root]
+        self._entry_count = 0
+        self._sort_column = -1
+        self._sort_order = Qt.SortOrder.AscendingOrder
+        self._filter_text = ""
+        self._generation = 0
+        self._changing = False
+        self._arrangement_ready.connect(self._apply_arrangement)
+
+    # --- Loading ---
+    def clear(self):
+        self._changing = True
+        try:
+            self.beginResetModel()
+            self._root = _Node("", "", None, is_dir=True)
+            self._dirs = [self._root]
+            self._entry_count = 0
+            self._generation += 1
+            self.endResetModel()
+        finally:
+            self._changing = False
+
+    def entry_count(self):
+        return self._entry_count
+
+    def append_entries(self, entries):
+        """Add a chunk of ArchiveEntry records to the tree."""
+        touched = set()
+        for entry in entries:
+            if self._insert(entry, touched) is not None:
+                self._entry_count += 1
+        for parent in touched:
+            self._reveal_new_children(parent)
+        # Show the first rows right away instead of waiting for the view to ask
+        if self._root.fetched < FETCH_BATCH_SIZE and self.canFetchMore(QModelIndex()):
+            self.fetchMore(QModelIndex())
+
+    def finish_loading(self):
+        """Called once all chunks are in; applies any pending sort or filter."""
+        if self._sort_column >= 0 or self._filter_text:
+            self._schedule_arrangement(reset=bool(self._filter_text))
+        self.loading_finished.emit(self._entry_count)
+
+    def _insert(self, entry, touched):
+        parts = [part for part in entry.name.replace("\\", "/").split("/") if part]
+        if not parts:
+            return None
+        parent = self._root
+        for part in parts[:-1]:
+            parent = self._directory(parent, part, touched)
+        name = parts[-1]
+        if entry.is_dir:
+            node = self._directory(parent, name, touched)
+            node.entry = entry
+            return node
+        node = _Node(name, entry.name, parent, entry)
+        parent.children.append(node)
+        touched.add(parent)
+        # Directory sizes are the sum of what they contain
+        ancestor = parent
+        while ancestor is not None:
+            ancestor.size += node.size
+            ancestor.compressed_size += node.compressed_size
+            ancestor = ancestor.parent
+        return node
+
+    def _directory(self, parent, name, touched):
+        node = parent.child_dirs.get(name)
+        if node is None:
+            path = f"{parent.path}{name}/"
+            node = _Node(name, path, parent, is_dir=True)
+            parent.child_dirs[name] = node
+            parent.children.append(node)
+            touched.add(parent)
+            self._dirs.append(node)
+        return node
+
+    def _reveal_new_children(self, parent):
+        """Append new children to the display list; the view fetches them lazily."""
+        self._extend_visible(parent, self._unseen_children(parent))
+
+    def _unseen_children(self, parent, known=None):
+        """Children added after the first ``known`` (default: since the last reveal)."""
+        new = parent.children[parent.seen if known is None else known:]
+        parent.seen = len(parent.children)
+        if self._filter_text:
+            new = [child for child in new if self._filter_text in child.name.casefold()]
+        return new
+
+    @staticmethod
+    def _extend_visible(parent, children):
+        start = len(parent.visible)
+        for row, child in enumerate(children, start):
+            child.row = row
+        parent.visible.extend(children)
+
+    @staticmethod
+    def _set_visible(parent, children):
+        for child in parent.visible:
+            child.row = -1
+        for row, child in enumerate(children):
+            child.row = row
+        parent.visible = children
+
+    # --- Sorting and filtering ---
+    def sort(self, column, order=Qt.SortOrder.AscendingOrder):
+        self._sort_column = column
+        self._sort_order = order
+        self._schedule_arrangement(reset=False)
+
+    def set_filter(self, text):
+        """Show only entries whose name contains ``text`` (and their parent folders)."""
+        self._filter_text = text.strip().casefold()
+        self._schedule_arrangement(reset=True)
+
+    def _schedule_arrangement(self, reset):
+        self._generation += 1
+        generation = self._generation
+        # Snapshot the child lists so appends on the GUI thread don't race the worker
+        snapshot = [(node, list(node.children)) for node in self._dirs]
+        column, order, text = self._sort_column, self._sort_order, self._filter_text
+        worker = threading.Thread(target=self._arrange,
+                                  args=(generation, snapshot, column, order, text, reset),
+                                  daemon=True)
+        worker.start()
+
+    def _arrange(self, generation, snapshot, column, order, text, reset):
+        """Compute the display order of every directory (runs on a worker thread)."""
+        keep = None
+        if text:
+            keep = set()
+            for node, children in snapshot:
+                for child in children:
+                    if text in child.name.casefold():
+                        keep.add(child)
+                        # Folders leading to a match stay visible
+                        parent = child.parent
+                        while parent is not None and parent not in keep:
+                            keep.add(parent)
+                            parent = parent.parent
+        key = _sort_key(column) if column >= 0 else None
+        reverse = order == Qt.SortOrder.DescendingOrder
+        arrangement = {}
+        for node, children in snapshot:
+            if generation != self._generation:
+                return
+            known = len(children)
+            if keep is not None:
+                children = [child for child in children if child in keep]
+            if key is not None:
+                children.sort(key=key, reverse=reverse)
+                # Folders stay on top whichever way the column is sorted
+                children = [child for child in children if child.is_dir] + \
+                           [child for child in children if not child.is_dir]
+            arrangement[node] = (children, known)
+        self._arrangement_ready.emit(generation, arrangement, reset)
+
+    def _apply_arrangement(self, generation, arrangement, reset):
+        if generation != self._generation:
+            return
+        self._changing = True
+        try:
+            if reset:
+                self.beginResetModel()
+            else:
+                self.layoutAboutToBeChanged.emit()
+                old_indexes = self.persistentIndexList()
+                old_nodes = [index.internalPointer() if index.isValid() else None for index in old_indexes]
+
+            for node, (children, known) in arrangement.items():
+                # Rows that arrived after the snapshot go at the end until the next arrangement
+                self._set_visible(node, children + self._unseen_children(node, known))
+                node.fetched = 0 if reset else min(node.fetched, len(node.visible))
+
+            if reset:
+                self.endResetModel()
+            else:
+                new_indexes = [self._index_for(node, index.column()) if node is not None else QModelIndex()
+                               for index, node in zip(old_indexes, old_nodes)]
+                self.changePersistentIndexList(old_indexes, new_indexes)
+                self.layoutChanged.emit()
+        finally:
+            self._changing = False
+        if self.canFetchMore(QModelIndex()):
+            self.fetchMore(QModelIndex())
+
+    def _index_for(self, node, column=0):
+        parent = node.parent
+        if parent is None:
+            return QModelIndex()
+        row = node.row
+        if row < 0 or row >= parent.fetched or parent.visible[row] is not node:
+            return QModelIndex()
+        return self.createIndex(row, column, node)
+
+    # --- QAbstractItemModel interface ---
+    def _node(self, index):
+        return index.internalPointer() if index.isValid() else self._root
+
+    def index(self, row, column, parent=QModelIndex()):
+        node = self._node(parent)
+        if not node.is_dir or row < 0 or row >= node.fetched or not 0 <= column < len(COLUMNS):
+            return QModelIndex()
+        return self.createIndex(row, column, node.visible[row])
+
+    def parent(self, index):
+        if not index.isValid():
+            return QModelIndex()
+        return self._index_for(index.internalPointer().parent)
+
+    def rowCount(self, parent=QModelIndex()):
+        if parent.isValid() and parent.column() != 0:
+            return 0
+        node = self._node(parent)
+        return node.fetched if node.is_dir else 0
+
+    def columnCount(self, parent=QModelIndex()):
+        return len(COLUMNS)
+
+    def hasChildren(self, parent=QModelIndex()):
+        node = self._node(parent)
+        return node.is_dir and bool(node.visible)
+
+    def canFetchMore(self, parent):
+        node = self._node(parent)
+        return not self._changing and node.is_dir and node.fetched < len(node.visible)
+
+    def fetchMore(self, parent):
+        node = self._node(parent)
+        remaining = len(node.visible) - node.fetched
+        # Views may ask for more from inside our own change notifications
+        if remaining <= 0 or self._changing:
+            return
+        count = min(remaining, FETCH_BATCH_SIZE)
+        self._changing = True
+        try:
+            self.beginInsertRows(parent, node.fetched, node.fetched + count - 1)
+            node.fetched += count
+            self.endInsertRows()
+        finally:
+            self._changing = False
+
+    def data(self, index, role=Qt.ItemDataRole.DisplayRole):
+        if not index.isValid():
+            return None
+        node = index.internalPointer()
+        column = index.column()
+        if role == Qt.ItemDataRole.DisplayRole:
+            if column == 0:
+                return node.name
+            if column == 1:
+                if node.entry is not None and node.entry.size is None:
+                    return ""
+                return _format_size(node.size)
+            if column == 2:
+                return _format_size(node.compressed_size)
+            if column == 3:
+                mtime = node.entry.mtime if node.entry is not None else None
+                return time.strftime("%Y-%m-%d %H:%M", time.localtime(mtime)) if mtime else ""
+        elif role == Qt.ItemDataRole.UserRole:
+            return node.path
+        elif role == Qt.ItemDataRole.TextAlignmentRole and column in (1, 2):
+            return int(Qt.AlignmentFlag.AlignRight | Qt.AlignmentFlag.AlignVCenter)
+        return None
+
+    def headerData(self, section, orientation, role=Qt.ItemDataRole.DisplayRole):
+        if orientation == Qt.Orientation.Horizontal and role == Qt.ItemDataRole.DisplayRole:
+            return COLUMNS[section]
+        return None
+
+    def path_for_index(self, index):
+        """Archive path of the entry at ``index`` (directories end with '/')."""
+        return self._node(index).path if index.isValid() else ""
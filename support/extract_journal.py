@@ -0,0 +1,95 @@
+"""
+Extraction journal
+
+While an archive is extracted with the skip-identical overwrite policy, a
+small append-only journal in the destination records each member as soon as
+its file is complete, together with the size and mtime (ns) the file had
+then. If the extraction is interrupted, the next run trusts any journalled
+file that still has that size and mtime, so resuming costs one stat per
+file; files written partially are not in the journal and are extracted
+again. The journal names the archive (path, size, mtime) it belongs to and
+is discarded when that no longer matches. It is removed once the
+extraction completes.
+"""
+
+import json
+import os
+import threading
+
+JOURNAL_NAME = ".converter-extract.journal"
+
+
+class ExtractionJournal:
+    """Journal of the members of ``archive_path`` completely extracted to ``extract_to``."""
+
+    def __init__(self, archive_path, extract_to):
+        self.path = os.path.join(extract_to, JOURNAL_NAME)
+        st = os.stat(archive_path)
+        self._archive = {"archive": os.path.abspath(archive_path), "size": st.st_size,
+                         "mtime_ns": st.st_mtime_ns}
+        self._lock = threading.Lock()
+        self._done = self._load()
+        if self._done is None:
+            self._done = {}
+            self._fp = open(self.path, "w", encoding="utf-8")
+            self._write(self._archive)
+        else:
+            self._fp = open(self.path, "a", encoding="utf-8")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close(completed=exc_type is None)
+
+    def __len__(self):
+        return len(self._done)
+
+    def _load(self):
+        """Records of an earlier run on the same archive, or None when there is none to resume."""
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                lines = f.read().splitlines()
+        except (OSError, UnicodeDecodeError):
+            return None
+        try:
+            if not lines or json.loads(lines[0]) != self._archive:
+                return None
+        except ValueError:
+            return None
+        done = {}
+        for line in lines[1:]:
+            try:
+                record = json.loads(line)
+                done[record["name"]] = (record["size"], record["mtime_ns"])
+            except (ValueError, KeyError, TypeError):
+                continue  # A line cut short by the interruption
+        return done
+
+    def is_complete(self, name, st):
+        """True when ``name`` was journalled and its file, with stat result ``st``, is unchanged since."""
+        return self._done.get(name) == (st.st_size, st.st_mtime_ns)
+
+    def record(self, name, target):
+        """Record that ``name`` has been completely written to ``target``."""
+        st = os.stat(target)
+        with self._lock:
+            self._done[name] = (st.st_size, st.st_mtime_ns)
+            self._write({"name": name, "size": st.st_size, "mtime_ns": st.st_mtime_ns})
+
+    def _write(self, record):
+        self._fp.write(json.dumps(record, ensure_ascii=False) + "\n")
+        # Each line reaches the OS right away, so a crash of this process loses nothing
+        self._fp.flush()
+
+    def close(self, completed=False):
+        """Close the journal; a completed extraction needs no journal and it is removed."""
+        with self._lock:
+            if self._fp.closed:
+                return
+            self._fp.close()
+            if completed:
+                try:
+                    os.remove(self.path)
+                except OSError:
+                    pass
@@ -0,0 +1,167 @@
+"""
+Archive and image format detection from file contents
+
+detect_format reads the start of a file once and matches it against magic
+signatures, so misnamed and extension-less files are recognised without a
+library having to try them first. gzip, bzip2 and xz data is decoded just far
+enough to tell a tarball from a single compressed file. Results are cached
+per file and invalidated when its size or mtime changes.
+"""
+
+import bz2
+import functools
+import lzma
+import os
+import tarfile
+import zlib
+
+# Bytes read from the start of the file for the signature checks
+SNIFF_SIZE = 4096
+# Compressed bytes decoded at most when looking for a tar header inside gzip/bzip2/xz
+# (a bzip2 block has to be read whole before it yields any output)
+INNER_SNIFF_LIMIT = 1024 * 1024
+DETECT_CACHE_SIZE = 1024
+
+IMAGE_FORMATS = ("png", "jpeg", "gif", "bmp", "webp", "tiff", "ico", "icns", "heic", "avif")
+
+# (offset, signature, format), checked in order
+_SIGNATURES = (
+    (0, b"PK\x03\x04", "zip"),
+    (0, b"PK\x05\x06", "zip"),
+    (0, b"PK\x07\x08", "zip"),
+    (0, b"Rar!\x1a\x07\x00", "rar"),
+    (0, b"Rar!\x1a\x07\x01\x00", "rar"),
+    (0, b"7z\xbc\xaf\x27\x1c", "7z"),
+    (0, b"\x1f\x8b", "gz"),
+    (0, b"BZh", "bz2"),
+    (0, b"\xfd7zXZ\x00", "xz"),
+    (0, b"MSCF\x00\x00\x00\x00", "cab"),
+    (0, b"\x89PNG\r\n\x1a\n", "png"),
+    (0, b"\xff\xd8\xff", "jpeg"),
+    (0, b"GIF87a", "gif"),
+    (0, b"GIF89a", "gif"),
+    (0, b"II*\x00", "tiff"),
+    (0, b"MM\x00*", "tiff"),
+    (0, b"icns", "icns"),
+    (257, b"ustar", "tar"),
+)
+
+# ISO 9660 volume descriptors start at sector 16; "CD001" follows the type byte
+_ISO_OFFSETS = (0x8001, 0x8801, 0x9001)
+
+_HEIF_BRANDS = {b"heic": "heic", b"heix": "heic", b"hevc": "heic", b"mif1": "heic", b"avif": "avif"}
+
+_INNER_DECOMPRESSORS = {
+    "gz": lambda: zlib.decompressobj(16 + zlib.MAX_WBITS),
+    "bz2": bz2.BZ2Decompressor,
+    "xz": lzma.LZMADecompressor,
+}
+
+
+def detect_format(path):
+    """
+    Format of the file at ``path`` from its contents: an archive format name as
+    used by archive_manager ("zip", "tar.gz", ...), "gz" for gzip data that is
+    not a tarball, one of IMAGE_FORMATS, or None when nothing matches or the
+    file cannot be read.
+    """
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return _detect_cached(os.path.realpath(path), st.st_size, st.st_mtime_ns, st.st_ino)
+
+
+def clear_cache():
+    """Forget all cached detections."""
+    _detect_cached.cache_clear()
+
+
+@functools.lru_cache(maxsize=DETECT_CACHE_SIZE)
+def _detect_cached(path, size, mtime_ns, inode):
+    try:
+        with open(path, "rb") as f:
+            return _detect(f, path)
+    except OSError:
+        return None
+
+
+def _detect(f, path):
+    head = f.read(SNIFF_SIZE)
+    for offset, signature, name in _SIGNATURES:
+        if head.startswith(signature, offset):
+            if name == "zip" and path.lower().endswith(".zipx"):
+                # zipx is a ZIP container using newer compression methods
+                return "zipx"
+            if name in _INNER_DECOMPRESSORS:
+                f.seek(0)
+                return _detect_compressed(f, name)
+            return name
+    if _is_tar_header(head):
+        # Pre-POSIX tar has no magic; a valid header checksum identifies it
+        return "tar"
+    if head.startswith(b"RIFF") and head[8:12] == b"WEBP":
+        return "webp"
+    if head[4:8] == b"ftyp" and head[8:12] in _HEIF_BRANDS:
+        return _HEIF_BRANDS[head[8:12]]
+    if _is_iso(f):
+        return "iso"
+    if head[2:5] in (b"-lh", b"-lz") and head[6:7] == b"-":
+        return "lzh"
+    if head.startswith(b"\x60\xea"):
+        return "arj"
+    if _is_lzma_alone(head):
+        return "lzma"
+    if head.startswith(b"BM") and int.from_bytes(head[2:6], "little") == os.fstat(f.fileno()).st_size:
+        return "bmp"
+    if head.startswith(b"\x00\x00\x01\x00") and 0 < int.from_bytes(head[4:6], "little") <= 256:
+        return "ico"
+    return None
+
+
+def _detect_compressed(f, codec):
+    """Tell "tar.gz"/"tar.bz2"/"tar.xz" from a single compressed file by decoding its first header."""
+    decompressor = _INNER_DECOMPRESSORS[codec]()
+    decoded = b""
+    consumed = 0
+    try:
+        while len(decoded) < tarfile.BLOCKSIZE and consumed < INNER_SNIFF_LIMIT:
+            chunk = f.read(64 * 1024)
+            if not chunk:
+                break
+            consumed += len(chunk)
+            decoded += decompressor.decompress(chunk)
+    except (OSError, EOFError, zlib.error, lzma.LZMAError):
+        pass
+    if _is_tar_header(decoded) or decoded.startswith(b"ustar", 257):
+        return "tar." + codec
+    return codec
+
+
+def _is_tar_header(block):
+    if len(block) < tarfile.BLOCKSIZE or not block[:tarfile.BLOCKSIZE].strip(b"\0"):
+        return False
+    try:
+        tarfile.TarInfo.frombuf(block[:tarfile.BLOCKSIZE], "utf-8", "surrogateescape")
+    except tarfile.HeaderError:
+        return False
+    return True
+
+
+def _is_iso(f):
+    for offset in _ISO_OFFSETS:
+        f.seek(offset)
+        if f.read(5) == b"CD001":
+            return True
+    return False
+
+
+def _is_lzma_alone(head):
+    """LZMA-alone has no magic: check the properties byte, dictionary size and the range coder's zero byte."""
+    if len(head) < 14 or head[0] >= 9 * 5 * 5:
+        return False
+    dict_size = int.from_bytes(head[1:5], "little")
+    # The dictionary is a power of two or 3 * 2^n in files written by the usual encoders
+    if dict_size & (dict_size - 1) and (dict_size % 3 or (dict_size // 3) & (dict_size // 3 - 1)):
+        return False
+    return head[13] == 0
@@ -0,0 +1,288 @@
+"""
+ISO 9660 image reader
+
+IsoFile memory-maps an image and reads its directory records directly, so
+listing an image only touches the directory sectors and any file can be read
+at random. Names come from Rock Ridge (which also carries POSIX modes) when
+the image has it, otherwise from the Joliet tree, otherwise from the plain
+ISO 9660 names with their ";1" version suffix removed.
+"""
+
+import calendar
+import io
+import mmap
+import struct
+
+SECTOR_SIZE = 2048
+
+# Volume descriptors start at sector 16 and end with a terminator (type 255)
+_VD_FIRST_SECTOR = 16
+_VD_MAX_COUNT = 64
+_VD_PRIMARY = 1
+_VD_SUPPLEMENTARY = 2
+_VD_TERMINATOR = 255
+_ROOT_RECORD_OFFSET = 156
+_JOLIET_ESCAPES = (b"%/@", b"%/C", b"%/E")
+
+_FLAG_DIRECTORY = 0x02
+_FLAG_MULTI_EXTENT = 0x80
+
+# Directory record up to the name: length, extended attribute length, extent (LE/BE),
+# data length (LE/BE), recording date, flags, unit size, gap size, volume sequence, name length
+_RECORD = struct.Struct("<BBL4xL4x7sBBB4xB")
+# SUSP "SP" entry in the root's "." record announces Rock Ridge
+_SUSP_MARKER = b"SP\x07\x01\xbe\xef"
+
+
+class BadIsoFile(Exception):
+    """The file is not a readable ISO 9660 image."""
+
+
+class IsoInfo:
+    """One file or directory in an image."""
+
+    __slots__ = ("filename", "file_size", "mtime", "mode", "extents", "_is_dir")
+
+    def __init__(self, filename, file_size, mtime, mode, extents, is_dir):
+        self.filename = filename
+        self.file_size = file_size
+        self.mtime = mtime
+        self.mode = mode
+        # (byte offset, length) of each extent holding the data
+        self.extents = extents
+        self._is_dir = is_dir
+
+    @property
+    def compress_size(self):
+        return self.file_size
+
+    def is_dir(self):
+        return self._is_dir
+
+    def __repr__(self):
+        return f"IsoInfo({self.filename!r}, size={self.file_size}, is_dir={self._is_dir})"
+
+
+class IsoFile:
+    """Random-access reader for an ISO 9660 image."""
+
+    def __init__(self, path):
+        self._fp = open(path, "rb")
+        try:
+            try:
+                self._map = mmap.mmap(self._fp.fileno(), 0, access=mmap.ACCESS_READ)
+            except ValueError:
+                raise BadIsoFile("Empty file")
+            self._members = self._read_tree()
+        except BaseException:
+            self.close()
+            raise
+        self._by_name = {info.filename: info for info in self._members}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def close(self):
+        if getattr(self, "_map", None) is not None:
+            self._map.close()
+            self._map = None
+        self._fp.close()
+
+    def infolist(self):
+        return list(self._members)
+
+    def namelist(self):
+        return [info.filename for info in self._members]
+
+    def getinfo(self, name):
+        try:
+            return self._by_name[name.rstrip("/")]
+        except KeyError:
+            raise KeyError(f"There is no item named {name!r} in the image")
+
+    def open(self, member):
+        """Seekable binary reader over the member's data, straight from the mapped image."""
+        info = member if isinstance(member, IsoInfo) else self.getinfo(member)
+        return io.BufferedReader(_ExtentReader(self._map, info.extents, info.file_size), SECTOR_SIZE * 32)
+
+    def read(self, member):
+        info = member if isinstance(member, IsoInfo) else self.getinfo(member)
+        return b"".join(self._map[offset:offset + length] for offset, length in info.extents)
+
+    # --- Directory tree ---
+
+    def _read_tree(self):
+        primary = joliet = None
+        for index in range(_VD_MAX_COUNT):
+            start = (_VD_FIRST_SECTOR + index) * SECTOR_SIZE
+            descriptor = self._map[start:start + SECTOR_SIZE]
+            if len(descriptor) < SECTOR_SIZE or descriptor[1:6] != b"CD001":
+                break
+            if descriptor[0] == _VD_TERMINATOR:
+                break
+            if descriptor[0] == _VD_PRIMARY and primary is None:
+                primary = descriptor
+            elif descriptor[0] == _VD_SUPPLEMENTARY and descriptor[88:91] in _JOLIET_ESCAPES:
+                joliet = descriptor
+        if primary is None:
+            raise BadIsoFile("No ISO 9660 primary volume descriptor")
+
+        root = self._parse_record(primary, _ROOT_RECORD_OFFSET)
+        if self._has_rock_ridge(root):
+            return self._walk(root, "rockridge")
+        if joliet is not None:
+            return self._walk(self._parse_record(joliet, _ROOT_RECORD_OFFSET), "joliet")
+        return self._walk(root, "iso")
+
+    def _parse_record(self, buf, pos):
+        (length, ext_attr_length, extent, size, date, flags, _unit, _gap, name_length) = \
+            _RECORD.unpack_from(buf, pos)
+        name = bytes(buf[pos + 33:pos + 33 + name_length])
+        # The system use area follows the name, after a pad byte when the name length is even
+        su_start = pos + 33 + name_length + (1 - name_length % 2)
+        system_use = bytes(buf[su_start:pos + length])
+        return (extent + ext_attr_length, size, date, flags, name, system_use)
+
+    def _has_rock_ridge(self, root):
+        extent, size = root[0], root[1]
+        data = self._map[extent * SECTOR_SIZE:extent * SECTOR_SIZE + min(size, SECTOR_SIZE)]
+        if not data or not data[0]:
+            return False
+        # The first record is ".", its system use area starts with the SUSP marker
+        return _SUSP_MARKER in self._parse_record(data, 0)[5][:16]
+
+    def _walk(self, root, naming):
+        members = []
+        pending = [(root[0], root[1], "")]
+        visited = set()
+        while pending:
+            extent, size, parent = pending.pop()
+            if extent in visited:
+                continue
+            visited.add(extent)
+            start = extent * SECTOR_SIZE
+            data = self._map[start:start + size]
+            pos = 0
+            previous = None
+            while pos < len(data):
+                length = data[pos]
+                if length == 0:
+                    # Records never span sectors; the rest of this one is padding
+                    pos = (pos // SECTOR_SIZE + 1) * SECTOR_SIZE
+                    continue
+                if pos + length > len(data):
+                    break
+                record_extent, record_size, date, flags, raw_name, system_use = self._parse_record(data, pos)
+                pos += length
+                if raw_name in (b"\x00", b"\x01"):
+                    continue
+                name, mode = _record_name(raw_name, system_use, naming)
+                path = f"{parent}/{name}" if parent else name
+                extent_range = (record_extent * SECTOR_SIZE, record_size)
+                if previous is not None and previous.filename == path:
+                    # Further extent of a file too large for one
+                    previous.extents.append(extent_range)
+                    previous.file_size += record_size
+                else:
+                    is_dir = bool(flags & _FLAG_DIRECTORY)
+                    info = IsoInfo(path, 0 if is_dir else record_size, _record_time(date), mode,
+                                   [] if is_dir else [extent_range], is_dir)
+                    members.append(info)
+                    if is_dir:
+                        pending.append((record_extent, record_size, path))
+                previous = members[-1] if flags & _FLAG_MULTI_EXTENT else None
+        return members
+
+
+def _record_name(raw_name, system_use, naming):
+    mode = 0
+    if naming == "rockridge":
+        rr_name, mode = _rock_ridge_fields(system_use)
+        if rr_name is not None:
+            return rr_name, mode
+    if naming == "joliet":
+        name = raw_name.decode("utf-16-be", "replace")
+    else:
+        name = raw_name.decode("ascii", "replace")
+    name = name.split(";", 1)[0]
+    if naming != "joliet" and name.endswith("."):
+        # ISO 9660 writes "NAME." for files without an extension
+        name = name[:-1]
+    return name, mode
+
+
+def _rock_ridge_fields(system_use):
+    """Name (NM) and POSIX mode (PX) from a record's SUSP entries."""
+    name_parts = []
+    mode = 0
+    pos = 0
+    while pos + 4 <= len(system_use):
+        signature = system_use[pos:pos + 2]
+        length = system_use[pos + 2]
+        if length < 4:
+            break
+        if signature == b"NM":
+            flags = system_use[pos + 4]
+            # Flags 2 and 4 mark "." and ".."
+            if not flags & 0x06:
+                name_parts.append(system_use[pos + 5:pos + length])
+        elif signature == b"PX" and length >= 12:
+            mode = struct.unpack_from("<L", system_use, pos + 4)[0]
+        elif signature == b"ST":
+            break
+        pos += length
+    name = b"".join(name_parts).decode("utf-8", "surrogateescape") if name_parts else None
+    return name, mode
+
+
+def _record_time(date):
+    """Seconds since the epoch from a 7-byte recording date (years since 1900 ... GMT offset)."""
+    year, month, day, hour, minute, second, offset = struct.unpack("<6Bb", date)
+    if not month or not day:
+        return 0
+    try:
+        return calendar.timegm((1900 + year, month, day, hour, minute, second)) - offset * 15 * 60
+    except (OverflowError, ValueError):
+        return 0
+
+
+class _ExtentReader(io.RawIOBase):
+    """Reads a member's extents out of the mapped image."""
+
+    def __init__(self, image, extents, size):
+        self._image = image
+        self._extents = extents
+        self._size = size
+        self._position = 0
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def tell(self):
+        return self._position
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        if whence == io.SEEK_CUR:
+            offset += self._position
+        elif whence == io.SEEK_END:
+            offset += self._size
+        self._position = max(0, offset)
+        return self._position
+
+    def readinto(self, buffer):
+        skip = self._position
+        for offset, length in self._extents:
+            if skip >= length:
+                skip -= length
+                continue
+            count = min(len(buffer), length - skip)
+            buffer[:count] = self._image[offset + skip:offset + skip + count]
+            self._position += count
+            return count
+        return 0
@@ -0,0 +1,181 @@
+"""
+Persistent archive listing cache
+
+Listings are stored in a SQLite database under ~/.converter/cache, keyed by
+the archive's resolved path together with its size, mtime (ns) and inode, so
+an unchanged archive is listed from the cache instead of being read again.
+The cache is bounded by an estimate of its payload size and evicts the
+least recently used archives first.
+"""
+
+import os
+import sqlite3
+import threading
+import time
+
+from support.archive_listing import ArchiveEntry
+
+DEFAULT_CACHE_PATH = os.path.expanduser("~/.converter/cache/listing.sqlite3")
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+
+# Rough per-row overhead used to estimate how much space a listing takes
+_ROW_OVERHEAD = 48
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS archives (
+    id INTEGER PRIMARY KEY,
+    path TEXT NOT NULL UNIQUE,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    inode INTEGER NOT NULL,
+    entry_count INTEGER NOT NULL,
+    payload_bytes INTEGER NOT NULL,
+    last_used REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS entries (
+    archive_id INTEGER NOT NULL,
+    seq INTEGER NOT NULL,
+    name TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    compressed_size INTEGER NOT NULL,
+    crc INTEGER,
+    mtime REAL,
+    mode INTEGER NOT NULL,
+    is_dir INTEGER NOT NULL,
+    PRIMARY KEY (archive_id, seq)
+) WITHOUT ROWID;
+"""
+
+
+def _archive_key(archive_path):
+    path = os.path.realpath(archive_path)
+    st = os.stat(path)
+    return path, st.st_size, st.st_mtime_ns, st.st_ino
+
+
+class ListingCache:
+    """SQLite-backed store of archive listings."""
+
+    def __init__(self, path=DEFAULT_CACHE_PATH, max_bytes=DEFAULT_MAX_BYTES):
+        self.path = path
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._initialized = False
+
+    def _connect(self):
+        if self.path != ":memory:":
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        conn = sqlite3.connect(self.path, timeout=10)
+        if not self._initialized:
+            conn.execute("PRAGMA auto_vacuum = INCREMENTAL")
+            conn.execute("PRAGMA journal_mode = WAL")
+            conn.executescript(_SCHEMA)
+            self._initialized = True
+        conn.execute("PRAGMA synchronous = NORMAL")
+        return conn
+
+    def get(self, archive_path):
+        """Cached ArchiveEntry list for an unchanged archive, or None."""
+        path, size, mtime_ns, inode = _archive_key(archive_path)
+        with self._lock:
+            conn = self._connect()
+            try:
+                row = conn.execute("SELECT id, size, mtime_ns, inode FROM archives WHERE path = ?",
+                                   (path,)).fetchone()
+                if row is None:
+                    return None
+                if row[1:] != (size, mtime_ns, inode):
+                    # The archive changed since it was cached
+                    self._delete(conn, row[0])
+                    conn.commit()
+                    return None
+                conn.execute("UPDATE archives SET last_used = ? WHERE id = ?", (time.time(), row[0]))
+                conn.commit()
+                rows = conn.execute("SELECT name, size, compressed_size, crc, mtime, mode, is_dir "
+                                    "FROM entries WHERE archive_id = ? ORDER BY seq", (row[0],))
+                return [ArchiveEntry(name, entry_size, compressed_size, crc, mtime, mode, bool(is_dir))
+                        for name, entry_size, compressed_size, crc, mtime, mode, is_dir in rows]
+            finally:
+                conn.close()
+
+    def put(self, archive_path, entries):
+        """Store the listing of ``archive_path`` and evict old listings if over budget."""
+        path, size, mtime_ns, inode = _archive_key(archive_path)
+        payload = sum(len(entry.name) + _ROW_OVERHEAD for entry in entries)
+        if payload > self.max_bytes:
+            return
+        with self._lock:
+            conn = self._connect()
+            try:
+                row = conn.execute("SELECT id FROM archives WHERE path = ?", (path,)).fetchone()
+                if row is not None:
+                    self._delete(conn, row[0])
+                cursor = conn.execute(
+                    "INSERT INTO archives (path, size, mtime_ns, inode, entry_count, payload_bytes, last_used) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (path, size, mtime_ns, inode, len(entries), payload, time.time()))
+                archive_id = cursor.lastrowid
+                conn.executemany(
+                    "INSERT INTO entries VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    ((archive_id, seq, entry.name, entry.size, entry.compressed_size, entry.crc,
+                      entry.mtime, entry.mode or 0, int(entry.is_dir))
+                     for seq, entry in enumerate(entries)))
+                self._evict(conn, keep_id=archive_id)
+                conn.commit()
+            finally:
+                conn.close()
+
+    def invalidate(self, archive_path):
+        """Forget the cached listing of one archive."""
+        path = os.path.realpath(archive_path)
+        with self._lock:
+            conn = self._connect()
+            try:
+                row = conn.execute("SELECT id FROM archives WHERE path = ?", (path,)).fetchone()
+                if row is not None:
+                    self._delete(conn, row[0])
+                    conn.commit()
+            finally:
+                conn.close()
+
+    def clear(self):
+        """Drop every cached listing."""
+        with self._lock:
+            conn = self._connect()
+            try:
+                conn.execute("DELETE FROM entries")
+                conn.execute("DELETE FROM archives")
+                conn.commit()
+                conn.execute("PRAGMA incremental_vacuum")
+            finally:
+                conn.close()
+
+    def _delete(self, conn, archive_id):
+        conn.execute("DELETE FROM entries WHERE archive_id = ?", (archive_id,))
+        conn.execute("DELETE FROM archives WHERE id = ?", (archive_id,))
+
+    def _evict(self, conn, keep_id):
+        """Remove least recently used listings until the payload fits ``max_bytes``."""
+        total = conn.execute("SELECT COALESCE(SUM(payload_bytes), 0) FROM archives").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        rows = conn.execute("SELECT id, payload_bytes FROM archives WHERE id != ? ORDER BY last_used",
+                            (keep_id,)).fetchall()
+        for archive_id, payload in rows:
+            if total <= self.max_bytes:
+                break
+            self._delete(conn, archive_id)
+            total -= payload
+        conn.commit()
+        conn.execute("PRAGMA incremental_vacuum")
+
+
+_default_cache = None
+
+
+def get_listing_cache():
+    """The shared cache at DEFAULT_CACHE_PATH."""
+    global _default_cache
+    if _default_cache is None:
+        _default_cache = ListingCache()
+    return _default_cache
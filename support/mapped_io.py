@@ -0,0 +1,230 @@
+"""
+Memory-mapped archive input
+
+Large local archives are mapped once instead of being read through buffered
+file objects. MappedReader is a seekable file object over the mapping: every
+read is a single copy out of the page cache with no system call, and any
+number of readers (one per extraction thread) share the one mapping. Members
+stored without compression are not read at all: MappedFile.copy_to moves
+their bytes from the archive to the output file inside the kernel with
+copy_file_range or sendfile, and only falls back to writing from the mapping
+where neither is available.
+"""
+
+import contextlib
+import errno
+import io
+import mmap
+import os
+import stat
+import zlib
+
+# Archives smaller than this are read through ordinary buffered files
+MAPPED_READ_MIN_SIZE = 32 * 1024 * 1024
+# Bytes moved per copy_file_range/sendfile call, so progress keeps flowing
+COPY_CHUNK_SIZE = 16 * 1024 * 1024
+
+# Errors meaning "this kind of in-kernel copy is not possible here", as opposed to I/O failures
+_UNSUPPORTED_COPY_ERRORS = {errno.EXDEV, errno.ENOSYS, errno.EINVAL, errno.EOPNOTSUPP, errno.EBADF,
+                            getattr(errno, "ENOTSUP", errno.EOPNOTSUPP)}
+# In-kernel copy methods that failed with ENOSYS and are not tried again
+_unavailable = set()
+
+
+def open_mapped(path, min_size=MAPPED_READ_MIN_SIZE):
+    """MappedFile for a regular file of at least ``min_size`` bytes, or None where mapping does not apply."""
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    if not stat.S_ISREG(st.st_mode) or st.st_size < max(min_size, 1):
+        return None
+    try:
+        return MappedFile(path)
+    except (OSError, ValueError):
+        return None
+
+
+@contextlib.contextmanager
+def open_input(path):
+    """Readable binary file object for an archive: mapped when it is large enough, buffered otherwise."""
+    mapped = open_mapped(path)
+    if mapped is None:
+        with open(path, "rb") as f:
+            yield f
+        return
+    with mapped:
+        yield mapped.reader()
+
+
+class MappedFile:
+    """A read-only mapping of a whole file."""
+
+    def __init__(self, path):
+        self._fp = open(path, "rb")
+        try:
+            self._map = mmap.mmap(self._fp.fileno(), 0, access=mmap.ACCESS_READ)
+        except BaseException:
+            self._fp.close()
+            raise
+        if hasattr(self._map, "madvise") and hasattr(mmap, "MADV_SEQUENTIAL"):
+            # Archives are mostly read front to back; let the kernel read ahead aggressively
+            self._map.madvise(mmap.MADV_SEQUENTIAL)
+        self._view = memoryview(self._map)
+        self.size = len(self._map)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def close(self):
+        if self._view is not None:
+            self._view.release()
+            self._view = None
+            self._map.close()
+        self._fp.close()
+
+    def fileno(self):
+        return self._fp.fileno()
+
+    def view(self, offset, size):
+        """memoryview of ``size`` bytes at ``offset``, without copying; release it before closing the file."""
+        return self._view[offset:offset + size]
+
+    def reader(self):
+        """A new independent, seekable reader positioned at the start of the file."""
+        return MappedReader(self)
+
+    def copy_to(self, dst, offset, size, on_write=None, crc=False):
+        """
+        Copy ``size`` bytes at ``offset`` to the current position of the file
+        object ``dst``. Returns the CRC-32 of the bytes when ``crc`` is set
+        (computed over the mapping, so the data never passes through a
+        Python buffer), otherwise None.
+        """
+        if not size:
+            # Empty members can carry any offset (ISO writers use 0 or leave junk)
+            return 0 if crc else None
+        if offset < 0 or offset + size > self.size:
+            raise EOFError(f"Range {offset}+{size} lies outside the {self.size} byte file")
+        dst.flush()
+        dst_fd = dst.fileno()
+        checksum = 0
+        done = 0
+        while done < size:
+            count = min(COPY_CHUNK_SIZE, size - done)
+            _copy_range(self, offset + done, count, dst_fd)
+            if crc:
+                with self.view(offset + done, count) as chunk:
+                    checksum = zlib.crc32(chunk, checksum)
+            done += count
+            if on_write:
+                on_write(count)
+        return checksum if crc else None
+
+
+class MappedReader(io.RawIOBase):
+    """Seekable file object reading out of a MappedFile; closing it leaves the mapping open."""
+
+    def __init__(self, mapped):
+        self._mapped = mapped
+        self._position = 0
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def tell(self):
+        return self._position
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        if whence == io.SEEK_CUR:
+            offset += self._position
+        elif whence == io.SEEK_END:
+            offset += self._mapped.size
+        elif whence != io.SEEK_SET:
+            raise ValueError(f"Invalid whence ({whence})")
+        if offset < 0:
+            raise ValueError(f"Negative seek position {offset}")
+        self._position = offset
+        return offset
+
+    def read(self, size=-1):
+        start = min(self._position, self._mapped.size)
+        end = self._mapped.size if size is None or size < 0 else min(self._mapped.size, start + size)
+        with self._mapped.view(start, end - start) as chunk:
+            data = chunk.tobytes()
+        self._position = end
+        return data
+
+    def readall(self):
+        return self.read()
+
+    def readinto(self, buffer):
+        start = min(self._position, self._mapped.size)
+        with memoryview(buffer) as target, self._mapped.view(start, len(target)) as chunk:
+            count = len(chunk)
+            target[:count] = chunk
+        self._position = start + count
+        return count
+
+
+def _copy_range(mapped, offset, count, dst_fd):
+    """Write ``count`` bytes at ``offset`` of the mapped file to ``dst_fd`` at its current position."""
+    src_fd = mapped.fileno()
+    for method, copy in (("copy_file_range", _copy_file_range), ("sendfile", _sendfile)):
+        if method in _unavailable or not hasattr(os, method):
+            continue
+        try:
+            copied = copy(src_fd, offset, count, dst_fd)
+        except OSError as e:
+            if e.errno not in _UNSUPPORTED_COPY_ERRORS:
+                raise
+            if e.errno == errno.ENOSYS:
+                _unavailable.add(method)
+            continue
+        if copied == count:
+            return
+        # A partial copy before the error left the rest for the next method
+        offset += copied
+        count -= copied
+    with mapped.view(offset, count) as chunk:
+        while chunk:
+            written = os.write(dst_fd, chunk)
+            chunk = chunk[written:]
+
+
+def _copy_file_range(src_fd, offset, count, dst_fd):
+    copied = 0
+    while copied < count:
+        try:
+            n = os.copy_file_range(src_fd, dst_fd, count - copied, offset + copied)
+        except OSError:
+            if not copied:
+                raise
+            # Let the caller carry on from here with another method
+            break
+        if n == 0:
+            break
+        copied += n
+    return copied
+
+
+def _sendfile(src_fd, offset, count, dst_fd):
+    copied = 0
+    while copied < count:
+        try:
+            n = os.sendfile(dst_fd, src_fd, offset + copied, count - copied)
+        except OSError:
+            if not copied:
+                raise
+            # Let the caller carry on from here with another method
+            break
+        if n == 0:
+            break
+        copied += n
+    return copied
@@ -0,0 +1,351 @@
+"""
+Parallel ZIP writer
+
+Entries are compressed concurrently in a thread pool (zlib releases the GIL
+while deflating) into raw deflate streams, then a single writer serializes
+them in submission order with the local headers, central directory and
+ZIP64 records.
+"""
+
+import os
+import struct
+import tempfile
+import time
+import zlib
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+
+ZIP_STORED = 0
+ZIP_DEFLATED = 8
+
+# Sizes/offsets above this need ZIP64 records (same limit zipfile uses)
+ZIP64_LIMIT = (1 << 31) - 1
+ZIP_FILECOUNT_LIMIT = 0xFFFF
+
+READ_CHUNK_SIZE = 1024 * 1024
+# Compressed entries larger than this spill from memory to a temp file
+SPOOL_MAX_SIZE = 8 * 1024 * 1024
+
+# Trial-deflate this much of the first block to spot already-compressed data
+SAMPLE_SIZE = 64 * 1024
+# Samples that deflate to more than this fraction of their size are stored
+INCOMPRESSIBLE_RATIO = 0.95
+
+_LOCAL_HEADER = struct.Struct("<4s5H3L2H")
+_CENTRAL_HEADER = struct.Struct("<4s4B4H3L5H2L")
+_END_RECORD = struct.Struct("<4s4H2LH")
+_END_RECORD64 = struct.Struct("<4sQ2H2L4Q")
+_END_LOCATOR64 = struct.Struct("<4sLQL")
+
+_FLAG_UTF8 = 0x800
+
+
+def default_workers():
+    """Number of compression threads to use when none is given."""
+    return os.cpu_count() or 1
+
+
+def is_incompressible_sample(data):
+    """True when a fast trial deflate of the start of ``data`` saves less than 5%."""
+    sample = data[:SAMPLE_SIZE]
+    if len(sample) < 4096:
+        return False
+    return len(zlib.compress(sample, 1)) >= len(sample) * INCOMPRESSIBLE_RATIO
+
+
+def dos_datetime(mtime):
+    """Convert an epoch timestamp to (dos_time, dos_date)."""
+    t = time.localtime(mtime)
+    if t.tm_year < 1980:
+        return 0, (0 << 9) | (1 << 5) | 1
+    return ((t.tm_hour << 11) | (t.tm_min << 5) | (t.tm_sec // 2),
+            ((t.tm_year - 1980) << 9) | (t.tm_mon << 5) | t.tm_mday)
+
+
+class CompressedEntry:
+    """A compressed entry waiting to be serialized by the writer."""
+
+    __slots__ = ("arcname", "method", "crc", "file_size", "compress_size",
+                 "mtime", "mode", "data")
+
+    def __init__(self, arcname, method, crc, file_size, compress_size, mtime, mode, data):
+        self.arcname = arcname
+        self.method = method
+        self.crc = crc
+        self.file_size = file_size
+        self.compress_size = compress_size
+        self.mtime = mtime
+        self.mode = mode
+        self.data = data
+
+
+def compress_file(path, arcname, method=ZIP_DEFLATED, compresslevel=zlib.Z_DEFAULT_COMPRESSION,
+                  mtime=None, mode=None, on_read=None, detect_incompressible=False):
+    """
+    Compress one file into a raw deflate (or stored) stream with its CRC.
+
+    ``on_read`` is called with the size of every chunk read from the source.
+    With ``detect_incompressible`` the first chunk is trial-compressed and the
+    entry falls back to ZIP_STORED when deflating would not pay off.
+    """
+    if mtime is None or mode is None:
+        st = os.stat(path)
+        mtime, mode = st.st_mtime, st.st_mode
+    with open(path, "rb") as f:
+        return compress_stream(f, arcname, method, compresslevel, mtime, mode, on_read, detect_incompressible)
+
+
+def compress_stream(fileobj, arcname, method=ZIP_DEFLATED, compresslevel=zlib.Z_DEFAULT_COMPRESSION,
+                    mtime=0, mode=0, on_read=None, detect_incompressible=False):
+    """Like compress_file, for data read from an open binary file object."""
+    spool = tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_SIZE)
+    compressor = zlib.compressobj(compresslevel, zlib.DEFLATED, -15) if method == ZIP_DEFLATED else None
+    crc = 0
+    file_size = 0
+    try:
+        while True:
+            chunk = fileobj.read(READ_CHUNK_SIZE)
+            if not chunk:
+                break
+            if detect_incompressible and not file_size and compressor and is_incompressible_sample(chunk):
+                method = ZIP_STORED
+                compressor = None
+            file_size += len(chunk)
+            crc = zlib.crc32(chunk, crc)
+            if on_read:
+                on_read(len(chunk))
+            spool.write(compressor.compress(chunk) if compressor else chunk)
+        if compressor:
+            spool.write(compressor.flush())
+        compress_size = spool.tell()
+        spool.seek(0)
+    except BaseException:
+        spool.close()
+        raise
+    return CompressedEntry(arcname, method, crc, file_size, compress_size, mtime, mode, spool)
+
+
+class _RawSlice:
+    """Reads ``length`` bytes at ``offset`` of a file that other slices share."""
+
+    def __init__(self, fileobj, offset, length):
+        self._fileobj = fileobj
+        self._position = offset
+        self._remaining = length
+
+    def read(self, size=-1):
+        if size < 0 or size > self._remaining:
+            size = self._remaining
+        if not size:
+            return b""
+        self._fileobj.seek(self._position)
+        data = self._fileobj.read(size)
+        self._position += len(data)
+        self._remaining -= len(data)
+        return data
+
+    def close(self):
+        pass
+
+
+def raw_entry(fileobj, info):
+    """
+    The already compressed data of a zipfile.ZipInfo as a CompressedEntry.
+
+    ``fileobj`` is the open source archive; the data is copied as-is when the
+    entry is written, without inflating and deflating it again.
+    """
+    if info.flag_bits & 0x1:
+        raise ValueError(f"Encrypted entry {info.filename} cannot be copied")
+    if info.compress_type not in (ZIP_STORED, ZIP_DEFLATED):
+        raise ValueError(f"Entry {info.filename} uses unsupported compression method {info.compress_type}")
+    fileobj.seek(info.header_offset)
+    header = fileobj.read(_LOCAL_HEADER.size)
+    if len(header) != _LOCAL_HEADER.size or header[:4] != b"PK\x03\x04":
+        raise ValueError(f"Bad local header for {info.filename}")
+    name_len, extra_len = _LOCAL_HEADER.unpack(header)[-2:]
+    data_offset = info.header_offset + _LOCAL_HEADER.size + name_len + extra_len
+    mtime = time.mktime(info.date_time + (0, 0, -1))
+    mode = info.external_attr >> 16 if info.create_system == 3 else 0
+    return CompressedEntry(info.filename, info.compress_type, info.CRC, info.file_size, info.compress_size,
+                           mtime, mode, _RawSlice(fileobj, data_offset, info.compress_size))
+
+
+class ParallelZipWriter:
+    """
+    Write a ZIP archive, compressing entries on worker threads.
+
+    Deflated entries whose first block does not compress are stored instead
+    (see ``detect_incompressible``).
+
+    Entries are written to the output in the order they were added. At most
+    ``max_pending`` compressed entries are held before the oldest is written,
+    which bounds memory use to roughly ``max_pending * SPOOL_MAX_SIZE``.
+    """
+
+    def __init__(self, output, compresslevel=zlib.Z_DEFAULT_COMPRESSION, workers=None,
+                 max_pending=None, on_entry_written=None, on_read=None, detect_incompressible=True):
+        if hasattr(output, "write"):
+            self._fp = output
+            self._own_fp = False
+        else:
+            self._fp = open(output, "wb")
+            self._own_fp = True
+        self.compresslevel = compresslevel
+        self.workers = workers or default_workers()
+        self.max_pending = max_pending or self.workers * 2
+        self.on_entry_written = on_entry_written
+        self.on_read = on_read
+        self.detect_incompressible = detect_incompressible
+        self._executor = ThreadPoolExecutor(max_workers=self.workers)
+        self._pending = deque()
+        self._central = []
+        self._offset = 0
+        self._closed = False
+
+    @property
+    def bytes_written(self):
+        """Number of bytes written to the output so far."""
+        return self._offset
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+    def add_file(self, path, arcname, method=ZIP_DEFLATED, mtime=None, mode=None):
+        """
+        Schedule ``path`` to be compressed and stored as ``arcname``.
+
+        ``mtime`` and ``mode`` may be passed when the caller already has them
+        from a directory scan; otherwise the file is stat'ed by the worker.
+        """
+        future = self._executor.submit(compress_file, path, arcname, method, self.compresslevel,
+                                       mtime, mode, self.on_read, self.detect_incompressible)
+        self._pending.append(future)
+        while len(self._pending) >= self.max_pending:
+            self._write_entry(self._pending.popleft().result())
+
+    def add_compressed(self, entry):
+        """Queue a CompressedEntry that needs no work, e.g. one from raw_entry()."""
+        future = Future()
+        future.set_result(entry)
+        self._pending.append(future)
+        while len(self._pending) >= self.max_pending:
+            self._write_entry(self._pending.popleft().result())
+
+    def close(self):
+        """Write all pending entries and the central directory."""
+        if self._closed:
+            return
+        try:
+            while self._pending:
+                self._write_entry(self._pending.popleft().result())
+            self._write_central_directory()
+        finally:
+            self._shutdown()
+
+    def abort(self):
+        """Stop without finishing the archive; pending work is discarded."""
+        if self._closed:
+            return
+        for future in self._pending:
+            future.cancel()
+        for future in self._pending:
+            if not future.cancelled():
+                try:
+                    future.result().data.close()
+                except Exception:
+                    pass
+        self._pending.clear()
+        self._shutdown()
+
+    def _shutdown(self):
+        self._closed = True
+        self._executor.shutdown(wait=True)
+        if self._own_fp:
+            self._fp.close()
+
+    def _write(self, data):
+        self._fp.write(data)
+        self._offset += len(data)
+
+    def _write_entry(self, entry):
+        name = entry.arcname.encode("utf-8")
+        flags = 0 if entry.arcname.isascii() else _FLAG_UTF8
+        dos_time, dos_date = dos_datetime(entry.mtime)
+        header_offset = self._offset
+
+        zip64 = entry.file_size > ZIP64_LIMIT or entry.compress_size > ZIP64_LIMIT
+        if zip64:
+            extra = struct.pack("<2H2Q", 0x0001, 16, entry.file_size, entry.compress_size)
+            file_size = compress_size = 0xFFFFFFFF
+        else:
+            extra = b""
+            file_size, compress_size = entry.file_size, entry.compress_size
+        version = 45 if zip64 else 20
+
+        self._write(_LOCAL_HEADER.pack(b"PK\x03\x04", version, flags, entry.method,
+                                       dos_time, dos_date, entry.crc, compress_size,
+                                       file_size, len(name), len(extra)))
+        self._write(name)
+        self._write(extra)
+        try:
+            while True:
+                chunk = entry.data.read(READ_CHUNK_SIZE)
+                if not chunk:
+                    break
+                self._write(chunk)
+        finally:
+            entry.data.close()
+        entry.data = None
+
+        self._central.append((name, flags, entry, dos_time, dos_date, header_offset))
+        if self.on_entry_written:
+            self.on_entry_written(entry)
+
+    def _write_central_directory(self):
+        cd_offset = self._offset
+        for name, flags, entry, dos_time, dos_date, header_offset in self._central:
+            extra_fields = []
+            file_size, compress_size, offset = entry.file_size, entry.compress_size, header_offset
+            if file_size > ZIP64_LIMIT:
+                extra_fields.append(file_size)
+                file_size = 0xFFFFFFFF
+            if compress_size > ZIP64_LIMIT:
+                extra_fields.append(compress_size)
+                compress_size = 0xFFFFFFFF
+            if offset > ZIP64_LIMIT:
+                extra_fields.append(offset)
+                offset = 0xFFFFFFFF
+            if extra_fields:
+                extra = struct.pack("<2H%dQ" % len(extra_fields), 0x0001,
+                                    8 * len(extra_fields), *extra_fields)
+                version = 45
+            else:
+                extra = b""
+                version = 20
+            external_attr = (entry.mode & 0xFFFF) << 16
+            self._write(_CENTRAL_HEADER.pack(b"PK\x01\x02", version, 3, version, 0, flags,
+                                             entry.method, dos_time, dos_date, entry.crc,
+                                             compress_size, file_size, len(name), len(extra),
+                                             0, 0, 0, external_attr, offset))
+            self._write(name)
+            self._write(extra)
+
+        count = len(self._central)
+        cd_size = self._offset - cd_offset
+        if count > ZIP_FILECOUNT_LIMIT or cd_size > ZIP64_LIMIT or cd_offset > ZIP64_LIMIT:
+            end64_offset = self._offset
+            self._write(_END_RECORD64.pack(b"PK\x06\x06", _END_RECORD64.size - 12, 45, 45,
+                                           0, 0, count, count, cd_size, cd_offset))
+            self._write(_END_LOCATOR64.pack(b"PK\x06\x07", 0, end64_offset, 1))
+            count = min(count, 0xFFFF)
+            cd_size = min(cd_size, 0xFFFFFFFF)
+            cd_offset = min(cd_offset, 0xFFFFFFFF)
+        self._write(_END_RECORD.pack(b"PK\x05\x06", 0, 0, count, count, cd_size, cd_offset, 0))
+        self._central = []
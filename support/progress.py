@@ -0,0 +1,227 @@
+"""
+Byte-based progress tracking for archive jobs
+
+ProgressTracker counts bytes read and written, derives instantaneous and
+average throughput plus an ETA, and forwards throttled updates to the
+classic ``progress_callback(message, percentage)`` as well as to an optional
+``stats_callback(ProgressStats)`` for callers that want structured numbers.
+"""
+
+import threading
+import time
+
+# Minimum delay between two callback invocations for byte updates
+MIN_REPORT_INTERVAL = 0.1
+# Smoothing factor for the instantaneous rate
+RATE_SMOOTHING = 0.3
+
+
+class ProgressStats:
+    """Snapshot of a running job."""
+
+    __slots__ = ("bytes_read", "bytes_written", "total_bytes", "percent", "rate",
+                 "average_rate", "eta", "elapsed")
+
+    def __init__(self, bytes_read, bytes_written, total_bytes, percent, rate, average_rate, eta, elapsed):
+        self.bytes_read = bytes_read
+        self.bytes_written = bytes_written
+        self.total_bytes = total_bytes
+        self.percent = percent
+        self.rate = rate
+        self.average_rate = average_rate
+        self.eta = eta
+        self.elapsed = elapsed
+
+    def __repr__(self):
+        return (f"ProgressStats(read={self.bytes_read}, written={self.bytes_written}, "
+                f"total={self.total_bytes}, percent={self.percent:.1f}, "
+                f"rate={format_rate(self.rate)}, eta={format_eta(self.eta)})")
+
+
+def format_rate(bytes_per_second):
+    """Human readable throughput, e.g. '12.3 MB/s'."""
+    value = float(bytes_per_second or 0)
+    for unit in ("B/s", "KB/s", "MB/s", "GB/s"):
+        if value < 1024 or unit == "GB/s":
+            return f"{value:.1f} {unit}"
+        value /= 1024
+
+
+def format_eta(seconds):
+    """Format an ETA in seconds as H:MM:SS or M:SS."""
+    if seconds is None:
+        return "--:--"
+    seconds = int(seconds + 0.5)
+    hours, rest = divmod(seconds, 3600)
+    minutes, seconds = divmod(rest, 60)
+    if hours:
+        return f"{hours}:{minutes:02d}:{seconds:02d}"
+    return f"{minutes}:{seconds:02d}"
+
+
+class ProgressTracker:
+    """
+    Thread-safe byte counter that reports progress, throughput and ETA.
+
+    ``basis`` selects which counter drives the percentage: "read" when the
+    total is known on the input side (source scan, compressed archive size),
+    "written" when it comes from the archive's declared member sizes.
+
+    A tracker can be called like a plain progress callback, so backends that
+    only report milestones keep working unchanged.
+    """
+
+    def __init__(self, progress_callback=None, stats_callback=None, total_bytes=0, basis="read",
+                 min_interval=MIN_REPORT_INTERVAL):
+        self.progress_callback = progress_callback
+        self.stats_callback = stats_callback
+        self.total_bytes = total_bytes
+        self.basis = basis
+        self.min_interval = min_interval
+        self.bytes_read = 0
+        self.bytes_written = 0
+        self._lock = threading.Lock()
+        # Callbacks run outside _lock, so they may call back into the tracker;
+        # this reentrant lock only keeps calls from worker threads one at a time
+        self._emit_lock = threading.RLock()
+        self._start = time.monotonic()
+        self._last_emit = None
+        self._last_done = 0
+        self._rate = 0.0
+        self._message = None
+
+    @classmethod
+    def wrap(cls, progress_callback):
+        """Return ``progress_callback`` if it is already a tracker, otherwise wrap it."""
+        if isinstance(progress_callback, cls):
+            return progress_callback
+        return cls(progress_callback)
+
+    def __bool__(self):
+        return bool(self.progress_callback or self.stats_callback)
+
+    def __call__(self, message, percentage):
+        self.report(message, percentage)
+
+    def start(self, total_bytes, basis=None):
+        """Set the byte total for the job and restart the clock."""
+        with self._lock:
+            self.total_bytes = total_bytes
+            if basis:
+                self.basis = basis
+            self.bytes_read = 0
+            self.bytes_written = 0
+            self._start = time.monotonic()
+            self._last_emit = None
+            self._last_done = 0
+            self._rate = 0.0
+
+    def advance(self, read=0, written=0, message=None):
+        """
+        Count bytes and report when the throttle interval has passed.
+
+        Without a ``message`` the last one given is repeated, so byte updates
+        from worker threads still move the progress bar.
+        """
+        with self._lock:
+            self.bytes_read += read
+            self.bytes_written += written
+            if message is not None:
+                self._message = message
+            now = time.monotonic()
+            if self._last_emit is not None and now - self._last_emit < self.min_interval:
+                return
+            stats = self._snapshot(now, update_rate=True)
+            self._last_emit = now
+            message = self._message
+        self._emit(message, stats.percent, stats)
+
+    def report(self, message, percentage):
+        """Forward a milestone message with an explicit percentage."""
+        with self._lock:
+            stats = self._snapshot(time.monotonic())
+        if percentage is not None and percentage >= 0:
+            stats.percent = percentage
+        self._emit_raw(message, percentage, stats)
+
+    def stats(self):
+        """Current ProgressStats snapshot."""
+        with self._lock:
+            return self._snapshot(time.monotonic())
+
+    def _done(self):
+        return self.bytes_written if self.basis == "written" else self.bytes_read
+
+    def _snapshot(self, now, update_rate=False):
+        elapsed = now - self._start
+        done = self._done()
+        if update_rate:
+            if self._last_emit is not None and now > self._last_emit:
+                instant = (done - self._last_done) / (now - self._last_emit)
+                self._rate = instant if not self._rate else (
+                    RATE_SMOOTHING * instant + (1 - RATE_SMOOTHING) * self._rate)
+            elif elapsed > 0:
+                self._rate = done / elapsed
+            self._last_done = done
+        average = done / elapsed if elapsed > 0 else 0.0
+        if self.total_bytes:
+            percent = min(100.0, done * 100.0 / self.total_bytes)
+        else:
+            percent = 0.0
+        eta = None
+        rate = self._rate or average
+        if self.total_bytes and rate > 0:
+            eta = max(0.0, (self.total_bytes - done) / rate)
+        return ProgressStats(self.bytes_read, self.bytes_written, self.total_bytes, percent,
+                             self._rate, average, eta, elapsed)
+
+    def _emit(self, message, percentage, stats):
+        if message is not None:
+            message = f"{message} - {format_rate(stats.rate)}, ETA {format_eta(stats.eta)}"
+        self._emit_raw(message, percentage, stats)
+
+    def _emit_raw(self, message, percentage, stats):
+        with self._emit_lock:
+            if self.progress_callback and message is not None:
+                self.progress_callback(message, percentage)
+            if self.stats_callback:
+                self.stats_callback(stats)
+
+
+class CountingReader:
+    """File wrapper that reports the number of bytes read through it."""
+
+    def __init__(self, fileobj, on_read):
+        self._fileobj = fileobj
+        self._on_read = on_read
+
+    def read(self, size=-1):
+        data = self._fileobj.read(size)
+        if data:
+            self._on_read(len(data))
+        return data
+
+    def readinto(self, buffer):
+        count = self._fileobj.readinto(buffer)
+        if count:
+            self._on_read(count)
+        return count
+
+    def __getattr__(self, name):
+        return getattr(self._fileobj, name)
+
+
+class CountingWriter:
+    """File wrapper that reports the number of bytes written through it."""
+
+    def __init__(self, fileobj, on_write):
+        self._fileobj = fileobj
+        self._on_write = on_write
+
+    def write(self, data):
+        count = self._fileobj.write(data)
+        self._on_write(len(data) if count is None else count)
+        return count
+
+    def __getattr__(self, name):
+        return getattr(self._fileobj, name)
@@ -0,0 +1,593 @@
+"""
+Parallel 7z writer
+
+Files are grouped into solid blocks (7z "folders") of bounded size, each with
+a filter chain suited to its contents: LZMA2 alone, BCJ in front of LZMA2 for
+executables, delta in front of LZMA2 for PCM audio, or plain copy for data
+that does not compress. Blocks are independent, so they are compressed
+concurrently in a thread pool (liblzma releases the GIL) into raw streams; a
+single writer appends them in order, then writes the header database and
+fills in the signature header at the start of the file. Data that does not
+come from a file on disk (members of another archive) is staged in one
+temporary file until its block is compressed. Folders of another 7z archive
+can also be copied in as they are, packed streams and coders unchanged.
+"""
+
+import lzma
+import os
+import stat
+import struct
+import tempfile
+import threading
+import zlib
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+from support.parallel_zip import READ_CHUNK_SIZE, SAMPLE_SIZE, SPOOL_MAX_SIZE, default_workers, is_incompressible_sample
+
+# Uncompressed bytes per solid block when none is given: small enough to keep
+# every worker busy, large enough that LZMA2 still finds long matches
+SOLID_BLOCK_SIZE = 64 * 1024 * 1024
+# Files at least this large have their start read to pick a filter chain
+ANALYZE_MIN_SIZE = 4096
+# ... and at least this large are also trial-compressed to spot incompressible data
+TRIAL_MIN_SIZE = 1024 * 1024
+
+# Filter chain for data stored as-is
+COPY = "copy"
+
+_SIGNATURE = b"7z\xbc\xaf\x27\x1c\x00\x04"
+_START_HEADER = struct.Struct("<QQL")
+
+# Property ids of the header database
+_K_END = 0x00
+_K_HEADER = 0x01
+_K_MAIN_STREAMS_INFO = 0x04
+_K_FILES_INFO = 0x05
+_K_PACK_INFO = 0x06
+_K_UNPACK_INFO = 0x07
+_K_SUBSTREAMS_INFO = 0x08
+_K_SIZE = 0x09
+_K_CRC = 0x0A
+_K_FOLDER = 0x0B
+_K_CODERS_UNPACK_SIZE = 0x0C
+_K_NUM_UNPACK_STREAM = 0x0D
+_K_EMPTY_STREAM = 0x0E
+_K_EMPTY_FILE = 0x0F
+_K_NAME = 0x11
+_K_MTIME = 0x14
+_K_ATTRIBUTES = 0x15
+
+_CODER_IDS = {
+    COPY: b"\x00",
+    lzma.FILTER_DELTA: b"\x03",
+    lzma.FILTER_X86: b"\x03\x03\x01\x03",
+    lzma.FILTER_POWERPC: b"\x03\x03\x02\x05",
+    lzma.FILTER_IA64: b"\x03\x03\x04\x01",
+    lzma.FILTER_ARM: b"\x03\x03\x05\x01",
+    lzma.FILTER_ARMTHUMB: b"\x03\x03\x07\x01",
+    lzma.FILTER_SPARC: b"\x03\x03\x08\x05",
+    lzma.FILTER_LZMA2: b"\x21",
+}
+
+# Dictionary size of each LZMA preset level
+_PRESET_DICT_SIZES = (256 << 10, 1 << 20, 2 << 20, 4 << 20, 4 << 20, 8 << 20, 8 << 20, 16 << 20, 32 << 20,
+                      64 << 20)
+
+# ELF e_machine and Mach-O cputype values with a matching branch converter
+_ELF_MACHINES = {0x03: lzma.FILTER_X86, 0x3E: lzma.FILTER_X86, 0x14: lzma.FILTER_POWERPC,
+                 0x32: lzma.FILTER_IA64, 0x28: lzma.FILTER_ARM, 0x02: lzma.FILTER_SPARC, 0x2B: lzma.FILTER_SPARC}
+_MACHO_CPUS = {7: lzma.FILTER_X86, 0x01000007: lzma.FILTER_X86, 12: lzma.FILTER_ARM, 18: lzma.FILTER_POWERPC}
+
+_FILETIME_EPOCH = 116444736000000000
+_FILE_ATTRIBUTE_DIRECTORY = 0x10
+_FILE_ATTRIBUTE_ARCHIVE = 0x20
+# High 16 bits of the attributes hold the Unix mode
+_FILE_ATTRIBUTE_UNIX_EXTENSION = 0x8000
+
+
+def lzma2_dict_size(preset, dict_size=None):
+    """Dictionary size LZMA2 uses for ``preset`` (or the explicit ``dict_size``)."""
+    if dict_size:
+        return dict_size
+    return _PRESET_DICT_SIZES[min(9, max(0, preset & ~lzma.PRESET_EXTREME))]
+
+
+def prefilter_for(head):
+    """
+    Filter to put in front of LZMA2 for a file starting with ``head``: a BCJ
+    branch converter for executables and a delta filter for PCM WAV audio, or
+    None.
+    """
+    if head.startswith(b"\x7fELF") and len(head) >= 20:
+        byteorder = "little" if head[5] == 1 else "big"
+        machine = _ELF_MACHINES.get(int.from_bytes(head[18:20], byteorder))
+        return {"id": machine} if machine else None
+    if head[:4] in (b"\xcf\xfa\xed\xfe", b"\xce\xfa\xed\xfe") and len(head) >= 8:
+        machine = _MACHO_CPUS.get(int.from_bytes(head[4:8], "little"))
+        return {"id": machine} if machine else None
+    if head.startswith(b"MZ") and len(head) >= 64:
+        # PE images; nearly all are x86 or x64
+        return {"id": lzma.FILTER_X86}
+    if head.startswith(b"RIFF") and head[8:12] == b"WAVE" and head[12:16] == b"fmt " and len(head) >= 34:
+        audio_format, _, _, _, block_align = struct.unpack_from("<HHLLH", head, 20)
+        if audio_format == 1 and 1 < block_align <= 256:
+            return {"id": lzma.FILTER_DELTA, "dist": block_align}
+    return None
+
+
+class SevenZipBlock:
+    """
+    One solid block: files compressed together through one filter chain.
+    Blocks copied from another archive have no filters; they carry the
+    folder record of that archive's header and the output size of each coder.
+    """
+
+    __slots__ = ("files", "filters", "unpack_size", "packed_size", "data", "folder", "packed_sizes",
+                 "unpack_sizes")
+
+    def __init__(self, filters):
+        self.files = []
+        self.filters = filters
+        self.unpack_size = 0
+        self.packed_size = 0
+        self.data = None
+        self.folder = None
+        self.packed_sizes = None
+        self.unpack_sizes = None
+
+
+class _Entry:
+    __slots__ = ("path", "arcname", "is_dir", "size", "mtime", "mode", "crc", "store", "filters", "offset")
+
+    def __init__(self, path, arcname, is_dir, size, mtime, mode, store=False, offset=None):
+        self.path = path
+        # Position of the data in the staging file, for entries added from a stream
+        self.offset = offset
+        self.arcname = arcname
+        self.is_dir = is_dir
+        self.size = size
+        self.mtime = mtime
+        self.mode = mode
+        self.crc = 0
+        self.store = store
+        self.filters = None
+
+
+class SevenZipWriter:
+    """
+    Write a 7z archive, compressing independent solid blocks on worker threads.
+
+    Files are only recorded by add_file; the blocks are planned and compressed
+    when the writer is closed. ``filters`` forces one chain for every block
+    (lzma module filter dicts, LZMA2 last, or COPY); by default it is chosen
+    per file. ``on_read`` receives byte counts as source data is compressed,
+    ``on_block_written`` each SevenZipBlock as it is appended to the archive.
+    The output must be seekable.
+    """
+
+    def __init__(self, output, preset=lzma.PRESET_DEFAULT, dict_size=None, solid_block_size=None, filters=None,
+                 workers=None, on_read=None, on_block_written=None, detect_incompressible=True):
+        if hasattr(output, "write"):
+            self._fp = output
+            self._own_fp = False
+        else:
+            self._fp = open(output, "wb")
+            self._own_fp = True
+        self.preset = preset
+        self.dict_size = dict_size
+        self.solid_block_size = solid_block_size or SOLID_BLOCK_SIZE
+        self.filters = filters
+        self.workers = workers or default_workers()
+        self.on_read = on_read
+        self.on_block_written = on_block_written
+        self.detect_incompressible = detect_incompressible
+        self._entries = []
+        self._copied = []
+        self._blocks = []
+        self._pending = deque()
+        self._executor = None
+        self._staging = None
+        self._staging_lock = threading.Lock()
+        self._offset = 0
+        self._closed = False
+
+    @property
+    def bytes_written(self):
+        """Number of bytes written to the output so far."""
+        return self._offset
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+    def add_directory(self, arcname, mtime=0, mode=0o755 | stat.S_IFDIR):
+        self._entries.append(_Entry(None, arcname, True, 0, mtime, mode))
+
+    def add_file(self, path, arcname, size=None, mtime=None, mode=None, store=False):
+        """
+        Record ``path`` to be stored as ``arcname``; ``store`` keeps it out of
+        the compressed blocks (for data known to be compressed already).
+        """
+        if size is None or mtime is None or mode is None:
+            st = os.stat(path)
+            size, mtime, mode = st.st_size, st.st_mtime, st.st_mode
+        self._entries.append(_Entry(path, arcname, False, size, mtime, mode, store))
+
+    def add_stream(self, fileobj, arcname, mtime=0, mode=0, store=False):
+        """
+        Record a file whose data is read from ``fileobj`` now. The data is
+        staged in a temporary file until its block is compressed at close.
+        """
+        if self._staging is None:
+            self._staging = tempfile.TemporaryFile(prefix="sevenzip-")
+        offset = self._staging.seek(0, os.SEEK_END)
+        size = 0
+        while True:
+            chunk = fileobj.read(READ_CHUNK_SIZE)
+            if not chunk:
+                break
+            self._staging.write(chunk)
+            size += len(chunk)
+        self._entries.append(_Entry(None, arcname, False, size, mtime, mode, store, offset))
+
+    def add_folder(self, fileobj, offset, packed_sizes, folder, unpack_sizes, files):
+        """
+        Copy a folder (solid block) of another 7z archive without decoding it.
+        Its packed streams, ``sum(packed_sizes)`` bytes at ``offset`` in
+        ``fileobj``, are copied when the writer is closed, so ``fileobj`` must
+        stay open until then. ``folder`` is the folder's record from that
+        archive's header (coders and bindings), ``unpack_sizes`` the output
+        size of each coder, and ``files`` the (arcname, size, crc, mtime,
+        mode) of its members in stream order.
+        """
+        block = SevenZipBlock(None)
+        block.data = (fileobj, offset)
+        block.folder = bytes(folder)
+        block.packed_sizes = list(packed_sizes)
+        block.packed_size = sum(block.packed_sizes)
+        block.unpack_sizes = list(unpack_sizes)
+        for arcname, size, crc, mtime, mode in files:
+            entry = _Entry(None, arcname, False, size, mtime, mode)
+            entry.crc = crc
+            block.files.append(entry)
+            block.unpack_size += size
+        self._copied.append(block)
+
+    def close(self):
+        """Copy the added folders, compress and write all blocks, then the header."""
+        if self._closed:
+            return
+        self._executor = ThreadPoolExecutor(max_workers=self.workers)
+        try:
+            if self._staging is not None:
+                self._staging.flush()
+            self._write(b"\0" * (len(_SIGNATURE) + 4 + _START_HEADER.size))
+            for block in self._copied:
+                self._copy_block(block)
+            files = [entry for entry in self._entries if not entry.is_dir and entry.size]
+            list(self._executor.map(self._choose_filters, files))
+            for block in self._plan_blocks(files):
+                self._pending.append(self._executor.submit(self._compress_block, block))
+                while len(self._pending) >= self.workers * 2:
+                    self._write_block(self._pending.popleft().result())
+            while self._pending:
+                self._write_block(self._pending.popleft().result())
+            self._write_header()
+        except BaseException:
+            self._discard_pending()
+            raise
+        finally:
+            self._shutdown()
+
+    def abort(self):
+        """Stop without finishing the archive; pending work is discarded."""
+        if self._closed:
+            return
+        self._discard_pending()
+        self._shutdown()
+
+    def _discard_pending(self):
+        for future in self._pending:
+            future.cancel()
+        for future in self._pending:
+            if not future.cancelled():
+                try:
+                    future.result().data.close()
+                except Exception:
+                    pass
+        self._pending.clear()
+
+    def _shutdown(self):
+        self._closed = True
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+        if self._staging is not None:
+            self._staging.close()
+        if self._own_fp:
+            self._fp.close()
+
+    # --- Planning ---
+
+    def _choose_filters(self, entry):
+        if self.filters is not None:
+            entry.filters = self.filters
+            return
+        if entry.store:
+            entry.filters = COPY
+            return
+        prefilter = None
+        if entry.size >= ANALYZE_MIN_SIZE:
+            try:
+                head = b"".join(self._read_chunks(entry, SAMPLE_SIZE if entry.size >= TRIAL_MIN_SIZE else 64))
+            except OSError:
+                head = b""
+            if self.detect_incompressible and entry.size >= TRIAL_MIN_SIZE and is_incompressible_sample(head):
+                entry.filters = COPY
+                return
+            prefilter = prefilter_for(head)
+        entry.filters = ([prefilter] if prefilter else []) + [self._lzma2_filter()]
+
+    def _lzma2_filter(self):
+        dict_size = lzma2_dict_size(self.preset, self.dict_size)
+        if self.dict_size is None:
+            # A dictionary larger than a block only costs the decoder memory
+            dict_size = min(dict_size, max(self.solid_block_size, 1 << 16))
+        return {"id": lzma.FILTER_LZMA2, "preset": self.preset, "dict_size": dict_size}
+
+    def _plan_blocks(self, files):
+        """Group files sharing a filter chain, similar files next to each other, into blocks."""
+        def sort_key(entry):
+            base, extension = os.path.splitext(entry.arcname)
+            return repr(entry.filters), extension.lower(), os.path.basename(base).lower(), entry.arcname
+
+        block = None
+        for entry in sorted(files, key=sort_key):
+            if (block is None or block.filters != entry.filters
+                    or block.unpack_size + entry.size > self.solid_block_size and block.files):
+                if block is not None:
+                    yield block
+                block = SevenZipBlock(entry.filters)
+            block.files.append(entry)
+            block.unpack_size += entry.size
+        if block is not None:
+            yield block
+
+    # --- Compression ---
+
+    def _compress_block(self, block):
+        if block.filters == COPY:
+            compressor = None
+        else:
+            compressor = lzma.LZMACompressor(format=lzma.FORMAT_RAW, filters=block.filters)
+        spool = tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_SIZE)
+        try:
+            unpack_size = 0
+            for entry in block.files:
+                crc = 0
+                size = 0
+                for chunk in self._read_chunks(entry):
+                    crc = zlib.crc32(chunk, crc)
+                    size += len(chunk)
+                    if self.on_read:
+                        self.on_read(len(chunk))
+                    spool.write(compressor.compress(chunk) if compressor else chunk)
+                # The file may have changed since it was scanned; record what was stored
+                entry.crc = crc
+                entry.size = size
+                unpack_size += size
+            if compressor:
+                spool.write(compressor.flush())
+            block.unpack_size = unpack_size
+            block.packed_size = spool.tell()
+            spool.seek(0)
+        except BaseException:
+            spool.close()
+            raise
+        block.data = spool
+        return block
+
+    def _read_chunks(self, entry, limit=None):
+        """The data of ``entry`` in chunks, from its file or the staging file; at most ``limit`` bytes."""
+        if entry.offset is None:
+            with open(entry.path, "rb") as f:
+                if limit is not None:
+                    yield f.read(limit)
+                    return
+                yield from iter(lambda: f.read(READ_CHUNK_SIZE), b"")
+            return
+        position = entry.offset
+        end = entry.offset + (entry.size if limit is None else min(entry.size, limit))
+        while position < end:
+            chunk = self._read_staged(position, min(READ_CHUNK_SIZE, end - position))
+            if not chunk:
+                return
+            position += len(chunk)
+            yield chunk
+
+    def _read_staged(self, offset, size):
+        if hasattr(os, "pread"):
+            return os.pread(self._staging.fileno(), size, offset)
+        with self._staging_lock:
+            self._staging.seek(offset)
+            return self._staging.read(size)
+
+    # --- Output ---
+
+    def _write(self, data):
+        self._fp.write(data)
+        self._offset += len(data)
+
+    def _write_block(self, block):
+        try:
+            while True:
+                chunk = block.data.read(READ_CHUNK_SIZE)
+                if not chunk:
+                    break
+                self._write(chunk)
+        finally:
+            block.data.close()
+        block.data = None
+        self._blocks.append(block)
+        if self.on_block_written:
+            self.on_block_written(block)
+
+    def _copy_block(self, block):
+        fileobj, position = block.data
+        remaining = block.packed_size
+        while remaining:
+            fileobj.seek(position)
+            chunk = fileobj.read(min(READ_CHUNK_SIZE, remaining))
+            if not chunk:
+                raise EOFError("Packed stream of a copied 7z folder ends early")
+            self._write(chunk)
+            position += len(chunk)
+            remaining -= len(chunk)
+        block.data = None
+        self._blocks.append(block)
+        if self.on_block_written:
+            self.on_block_written(block)
+
+    def _write_header(self):
+        header = self._encode_header()
+        header_offset = self._offset - len(_SIGNATURE) - 4 - _START_HEADER.size
+        self._write(header)
+        start_header = _START_HEADER.pack(header_offset, len(header), zlib.crc32(header))
+        end = self._fp.tell()
+        self._fp.seek(0)
+        self._fp.write(_SIGNATURE + struct.pack("<L", zlib.crc32(start_header)) + start_header)
+        self._fp.seek(end)
+
+    def _encode_header(self):
+        # Entries with data must follow the order of the blocks' streams
+        streams = [entry for block in self._blocks for entry in block.files]
+        in_blocks = {id(entry) for entry in streams}
+        entries = [entry for entry in self._entries if id(entry) not in in_blocks] + streams
+
+        out = bytearray([_K_HEADER])
+        if self._blocks:
+            out.append(_K_MAIN_STREAMS_INFO)
+            packed_sizes = [size for block in self._blocks for size in block.packed_sizes or [block.packed_size]]
+            out += bytes([_K_PACK_INFO]) + _number(0) + _number(len(packed_sizes)) + bytes([_K_SIZE])
+            for size in packed_sizes:
+                out += _number(size)
+            out.append(_K_END)
+
+            out += bytes([_K_UNPACK_INFO, _K_FOLDER]) + _number(len(self._blocks)) + b"\0"
+            for block in self._blocks:
+                out += block.folder if block.folder is not None else _encode_folder(block.filters)
+            out.append(_K_CODERS_UNPACK_SIZE)
+            for block in self._blocks:
+                if block.unpack_sizes is not None:
+                    out += b"".join(_number(size) for size in block.unpack_sizes)
+                else:
+                    # Every coder (BCJ, delta, LZMA2, copy) outputs as many bytes as the block holds
+                    out += _number(block.unpack_size) * _coder_count(block.filters)
+            out.append(_K_END)
+
+            out += bytes([_K_SUBSTREAMS_INFO, _K_NUM_UNPACK_STREAM])
+            for block in self._blocks:
+                out += _number(len(block.files))
+            if any(len(block.files) > 1 for block in self._blocks):
+                out.append(_K_SIZE)
+                for block in self._blocks:
+                    for entry in block.files[:-1]:
+                        out += _number(entry.size)
+            out += bytes([_K_CRC, 1])
+            for entry in streams:
+                out += struct.pack("<L", entry.crc)
+            out += bytes([_K_END, _K_END])
+
+        out.append(_K_FILES_INFO)
+        out += _number(len(entries))
+        empty_stream = [id(entry) not in in_blocks for entry in entries]
+        if any(empty_stream):
+            out += _property(_K_EMPTY_STREAM, _bit_vector(empty_stream))
+            empty_file = [not entry.is_dir for entry, empty in zip(entries, empty_stream) if empty]
+            if any(empty_file):
+                out += _property(_K_EMPTY_FILE, _bit_vector(empty_file))
+        names = b"".join(entry.arcname.encode("utf-16-le", "surrogatepass") + b"\0\0" for entry in entries)
+        out += _property(_K_NAME, b"\0" + names)
+        out += _property(_K_MTIME, b"\1\0" + b"".join(struct.pack("<Q", _filetime(entry.mtime))
+                                                     for entry in entries))
+        out += _property(_K_ATTRIBUTES, b"\1\0" + b"".join(struct.pack("<L", _attributes(entry))
+                                                          for entry in entries))
+        out += bytes([_K_END, _K_END])
+        return bytes(out)
+
+
+def _coder_count(filters):
+    return 1 if filters == COPY else len(filters)
+
+
+def _encode_folder(filters):
+    """
+    Coders of one folder in the order 7-Zip writes them: LZMA2 first, reading
+    the packed stream, then each filter reading the output of the coder
+    before it; the last coder produces the unpacked data.
+    """
+    coders = [{"id": COPY}] if filters == COPY else filters[::-1]
+    out = bytearray(_number(len(coders)))
+    for coder in coders:
+        coder_id = _CODER_IDS[coder["id"]]
+        props = _coder_properties(coder)
+        out.append(len(coder_id) | (0x20 if props else 0))
+        out += coder_id
+        if props:
+            out += _number(len(props)) + props
+    for index in range(1, len(coders)):
+        out += _number(index) + _number(index - 1)
+    return bytes(out)
+
+
+def _coder_properties(coder):
+    if coder["id"] == lzma.FILTER_LZMA2:
+        return bytes([_lzma2_dict_property(coder["dict_size"])])
+    if coder["id"] == lzma.FILTER_DELTA:
+        return bytes([coder.get("dist", 1) - 1])
+    return b""
+
+
+def _lzma2_dict_property(dict_size):
+    """The LZMA2 property byte: the smallest encoded dictionary size that holds ``dict_size``."""
+    for prop in range(40):
+        if (2 | (prop & 1)) << (prop // 2 + 11) >= dict_size:
+            return prop
+    return 40
+
+
+def _number(value):
+    """7z variable-length integer: leading 1 bits in the first byte count the extra bytes."""
+    for extra in range(8):
+        if value < 1 << (7 * (extra + 1)):
+            first = (0xFF00 >> extra) & 0xFF | value >> (8 * extra)
+            return bytes([first]) + (value & ((1 << (8 * extra)) - 1)).to_bytes(extra, "little")
+    return b"\xff" + value.to_bytes(8, "little")
+
+
+def _bit_vector(flags):
+    out = bytearray((len(flags) + 7) // 8)
+    for index, flag in enumerate(flags):
+        if flag:
+            out[index // 8] |= 0x80 >> (index % 8)
+    return bytes(out)
+
+
+def _property(property_id, data):
+    return bytes([property_id]) + _number(len(data)) + data
+
+
+def _filetime(mtime):
+    return max(0, int(mtime * 10_000_000) + _FILETIME_EPOCH)
+
+
+def _attributes(entry):
+    attributes = _FILE_ATTRIBUTE_DIRECTORY if entry.is_dir else _FILE_ATTRIBUTE_ARCHIVE
+    if entry.mode:
+        attributes |= _FILE_ATTRIBUTE_UNIX_EXTENSION | (entry.mode & 0xFFFF) << 16
+    return attributes
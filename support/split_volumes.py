@@ -0,0 +1,302 @@
+"""
+Split (multi-volume) archive files
+
+A split archive is one archive byte stream cut into numbered volumes of a
+fixed size: "backup.zip.001", "backup.zip.002", ... as written by 7-Zip and
+joinable with ``cat``. VolumeWriter produces such a set directly while the
+archive is being written, so no second pass over the data is needed: writes
+are collected into chunks and handed to a small thread pool that writes them
+to their volumes concurrently. VolumeReader presents a set as one seekable
+file, so ZIP, 7z and tar readers work on it unchanged.
+"""
+
+import io
+import os
+import re
+import threading
+from bisect import bisect_right
+from concurrent.futures import ThreadPoolExecutor
+
+# Bytes collected before a chunk is handed to a writer thread
+VOLUME_CHUNK_SIZE = 8 * 1024 * 1024
+# Writer threads, and chunks queued or being written at most (bounds memory use)
+VOLUME_WRITE_WORKERS = 4
+VOLUME_MAX_PENDING = 8
+# Volume files a reader keeps open at once
+VOLUME_MAX_OPEN = 16
+
+_VOLUME_SUFFIX = re.compile(r"\.(\d{3})$")
+
+
+def volume_path(base_path, number):
+    """Path of volume ``number`` (counting from 1) of the set written as ``base_path``."""
+    return f"{base_path}.{number:03d}"
+
+
+def split_base(path):
+    """The archive path a volume belongs to ("a.zip" for "a.zip.002"), or None for other names."""
+    match = _VOLUME_SUFFIX.search(os.fspath(path))
+    if match is None or int(match.group(1)) < 1:
+        return None
+    return os.fspath(path)[:match.start()]
+
+
+def is_split_path(path):
+    """True when ``path`` names a volume of a split set whose first volume exists."""
+    base = split_base(path)
+    return base is not None and os.path.isfile(volume_path(base, 1))
+
+
+def volume_paths(path):
+    """Existing volumes of the set ``path`` belongs to, in order."""
+    base = split_base(path)
+    if base is None:
+        raise ValueError(f"Not a volume name: {path}")
+    paths = []
+    while os.path.isfile(volume_path(base, len(paths) + 1)):
+        paths.append(volume_path(base, len(paths) + 1))
+    return paths
+
+
+def open_source(path):
+    """Binary reader for an archive: the joined volumes for a split set, else the file itself."""
+    if is_split_path(path):
+        return VolumeReader(path)
+    return open(path, "rb")
+
+
+def source_size(path):
+    """Size of an archive in bytes, counting every volume of a split set."""
+    if is_split_path(path):
+        return sum(os.path.getsize(volume) for volume in volume_paths(path))
+    return os.path.getsize(path)
+
+
+class VolumeWriter(io.RawIOBase):
+    """
+    Seekable binary file that stores its bytes in volumes of ``volume_size``
+    bytes named ``base_path``.001, .002, ...
+
+    Data is written by worker threads, so a write error surfaces on a later
+    call or on close. Seeking back (7z rewrites its start header at the end)
+    first waits for the writes in flight, so no chunk lands out of order.
+    """
+
+    def __init__(self, base_path, volume_size, workers=VOLUME_WRITE_WORKERS, max_pending=VOLUME_MAX_PENDING):
+        if not volume_size or volume_size <= 0:
+            raise ValueError(f"Invalid volume size: {volume_size}")
+        self.base_path = os.fspath(base_path)
+        self.volume_size = int(volume_size)
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="volume-writer")
+        self._slots = threading.BoundedSemaphore(max_pending)
+        self._pending = []
+        self._buffer = bytearray()
+        self._buffer_start = 0
+        self._position = 0
+        self._flushed_end = 0
+        self.size = 0
+
+    @property
+    def volume_count(self):
+        return max(1, -(-self.size // self.volume_size))
+
+    @property
+    def paths(self):
+        return [volume_path(self.base_path, number) for number in range(1, self.volume_count + 1)]
+
+    def writable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def tell(self):
+        return self._position
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        if whence == io.SEEK_CUR:
+            offset += self._position
+        elif whence == io.SEEK_END:
+            offset += self.size
+        elif whence != io.SEEK_SET:
+            raise ValueError(f"Invalid whence ({whence})")
+        if offset < 0:
+            raise ValueError(f"Negative seek position {offset}")
+        self._position = offset
+        return offset
+
+    def write(self, data):
+        if self.closed:
+            raise ValueError("write to closed file")
+        if self._position != self._buffer_start + len(self._buffer):
+            self._submit_buffer()
+            self._buffer_start = self._position
+        count = len(data)
+        self._buffer += data
+        self._position += count
+        self.size = max(self.size, self._position)
+        if len(self._buffer) >= VOLUME_CHUNK_SIZE:
+            self._submit_buffer()
+            self._buffer_start = self._position
+        return count
+
+    def flush(self):
+        if not self.closed:
+            self._submit_buffer()
+            self._buffer_start = self._position
+            self._drain()
+
+    def close(self):
+        if self.closed:
+            return
+        try:
+            self.flush()
+            self._finish_volumes()
+        finally:
+            self._executor.shutdown(wait=True)
+            super().close()
+
+    def _submit_buffer(self):
+        if not self._buffer:
+            return
+        start, data = self._buffer_start, self._buffer
+        self._buffer = bytearray()
+        if start < self._flushed_end:
+            # Overwriting earlier output: let the older chunks land first
+            self._drain()
+        self._check_failures()
+        self._slots.acquire()
+        future = self._executor.submit(self._write_range, start, data)
+        future.add_done_callback(lambda _: self._slots.release())
+        self._pending.append(future)
+        self._flushed_end = max(self._flushed_end, start + len(data))
+
+    def _check_failures(self):
+        still_pending = []
+        for future in self._pending:
+            if future.done():
+                future.result()
+            else:
+                still_pending.append(future)
+        self._pending = still_pending
+
+    def _drain(self):
+        pending, self._pending = self._pending, []
+        for future in pending:
+            future.result()
+
+    def _write_range(self, offset, data):
+        view = memoryview(data)
+        while view:
+            index, volume_offset = divmod(offset, self.volume_size)
+            count = min(len(view), self.volume_size - volume_offset)
+            fd = os.open(volume_path(self.base_path, index + 1), os.O_WRONLY | os.O_CREAT | getattr(os, "O_BINARY", 0),
+                         0o666)
+            try:
+                _write_at(fd, view[:count], volume_offset)
+            finally:
+                os.close(fd)
+            view = view[count:]
+            offset += count
+
+    def _finish_volumes(self):
+        """Give every volume its exact size and remove volumes left over from a longer earlier set."""
+        for number, path in enumerate(self.paths, 1):
+            size = min(self.volume_size, self.size - (number - 1) * self.volume_size)
+            with open(path, "ab") as f:
+                f.truncate(size)
+        number = self.volume_count + 1
+        while os.path.isfile(volume_path(self.base_path, number)):
+            os.remove(volume_path(self.base_path, number))
+            number += 1
+
+
+def _write_at(fd, data, offset):
+    if hasattr(os, "pwrite"):
+        while data:
+            written = os.pwrite(fd, data, offset)
+            data = data[written:]
+            offset += written
+        return
+    os.lseek(fd, offset, os.SEEK_SET)
+    while data:
+        data = data[os.write(fd, data):]
+
+
+class VolumeReader(io.RawIOBase):
+    """Seekable binary file reading the volumes of a split set as one stream."""
+
+    def __init__(self, path):
+        self.paths = volume_paths(path)
+        if not self.paths:
+            raise FileNotFoundError(f"First volume of {path} not found")
+        self._starts = [0]
+        for volume in self.paths:
+            self._starts.append(self._starts[-1] + os.path.getsize(volume))
+        self.size = self._starts[-1]
+        self._position = 0
+        self._open = {}
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def tell(self):
+        return self._position
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        if whence == io.SEEK_CUR:
+            offset += self._position
+        elif whence == io.SEEK_END:
+            offset += self.size
+        elif whence != io.SEEK_SET:
+            raise ValueError(f"Invalid whence ({whence})")
+        if offset < 0:
+            raise ValueError(f"Negative seek position {offset}")
+        self._position = offset
+        return offset
+
+    def readinto(self, buffer):
+        """Fill ``buffer`` across volume boundaries; short only at the end of the set."""
+        with memoryview(buffer) as target:
+            filled = 0
+            while filled < len(target) and self._position < self.size:
+                index = bisect_right(self._starts, self._position) - 1
+                f = self._volume(index)
+                f.seek(self._position - self._starts[index])
+                limit = min(len(target) - filled, self._starts[index + 1] - self._position)
+                count = f.readinto(target[filled:filled + limit])
+                if not count:
+                    raise EOFError(f"Volume {self.paths[index]} is shorter than when it was opened")
+                filled += count
+                self._position += count
+            return filled
+
+    def read(self, size=-1):
+        if size is None or size < 0:
+            size = max(0, self.size - self._position)
+        buffer = bytearray(min(size, max(0, self.size - self._position)))
+        count = self.readinto(buffer)
+        del buffer[count:]
+        return bytes(buffer)
+
+    def readall(self):
+        return self.read()
+
+    def close(self):
+        for f in self._open.values():
+            f.close()
+        self._open.clear()
+        super().close()
+
+    def _volume(self, index):
+        f = self._open.pop(index, None)
+        if f is None:
+            if len(self._open) >= VOLUME_MAX_OPEN:
+                # Close the least recently used volume
+                self._open.pop(next(iter(self._open))).close()
+            f = open(self.paths[index], "rb", buffering=0)
+        self._open[index] = f
+        return f
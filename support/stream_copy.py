@@ -0,0 +1,133 @@
+"""
+Pipelined stream copying
+
+copy_stream moves data from a readable to a writable file object with two
+threads: one fills buffers with ``readinto`` (which is where decompression or
+compression of a codec stream happens) while the calling thread writes the
+previously filled buffers out. The buffers are a fixed set of large
+bytearrays passed back and forth over bounded queues, so nothing is allocated
+per chunk and reading never runs more than a few buffers ahead of the disk.
+"""
+
+import os
+import queue
+import threading
+
+# Bytes per buffer and number of buffers in flight
+PIPELINE_BUFFER_SIZE = 4 * 1024 * 1024
+PIPELINE_BUFFERS = 4
+# Streams smaller than this are copied on the calling thread
+PIPELINE_MIN_SIZE = 8 * 1024 * 1024
+
+
+def preallocate(fileobj, size):
+    """Reserve ``size`` bytes for a new file where the platform and filesystem support it."""
+    if size <= 0 or not hasattr(os, "posix_fallocate"):
+        return False
+    try:
+        os.posix_fallocate(fileobj.fileno(), 0, size)
+        return True
+    except (OSError, AttributeError, ValueError):
+        # Unsupported filesystem or not a real file
+        return False
+
+
+def _readinto(src, buffer):
+    readinto = getattr(src, "readinto", None)
+    if readinto is not None:
+        return readinto(buffer)
+    data = src.read(len(buffer))
+    buffer[:len(data)] = data
+    return len(data)
+
+
+def copy_stream(src, dst, size_hint=None, on_read=None, on_write=None,
+                buffer_size=PIPELINE_BUFFER_SIZE, buffers=PIPELINE_BUFFERS):
+    """
+    Copy ``src`` to ``dst`` until EOF and return the number of bytes copied.
+
+    ``size_hint`` is the expected length when known; small streams skip the
+    reader thread, and the destination is preallocated and trimmed to the
+    bytes actually written. Data already written to ``dst`` before the call
+    is kept. ``on_read``/``on_write`` receive byte counts as chunks are read
+    and written.
+    """
+    preallocated = False
+    if size_hint:
+        try:
+            start = dst.tell()
+        except (OSError, AttributeError, ValueError):
+            start = None
+        if start is not None:
+            preallocated = preallocate(dst, start + size_hint)
+    if size_hint is not None and size_hint < PIPELINE_MIN_SIZE:
+        copied = _copy_inline(src, dst, min(buffer_size, max(size_hint, 64 * 1024)), on_read, on_write)
+    else:
+        copied = _copy_pipelined(src, dst, buffer_size, buffers, on_read, on_write)
+    if preallocated and copied != size_hint:
+        dst.truncate(start + copied)
+    return copied
+
+
+def _copy_inline(src, dst, buffer_size, on_read, on_write):
+    buffer = bytearray(buffer_size)
+    view = memoryview(buffer)
+    copied = 0
+    while True:
+        count = _readinto(src, buffer)
+        if not count:
+            return copied
+        if on_read:
+            on_read(count)
+        dst.write(view[:count])
+        copied += count
+        if on_write:
+            on_write(count)
+
+
+def _copy_pipelined(src, dst, buffer_size, buffers, on_read, on_write):
+    free = queue.Queue()
+    filled = queue.Queue()
+    for _ in range(buffers):
+        free.put(bytearray(buffer_size))
+    failure = []
+
+    def reader():
+        try:
+            while True:
+                buffer = free.get()
+                if buffer is None:
+                    # The writer gave up
+                    return
+                count = _readinto(src, buffer)
+                if not count:
+                    break
+                if on_read:
+                    on_read(count)
+                filled.put((buffer, count))
+        except BaseException as e:
+            failure.append(e)
+        filled.put(None)
+
+    thread = threading.Thread(target=reader, name="stream-copy-reader", daemon=True)
+    thread.start()
+    copied = 0
+    try:
+        while True:
+            item = filled.get()
+            if item is None:
+                break
+            buffer, count = item
+            dst.write(memoryview(buffer)[:count])
+            copied += count
+            if on_write:
+                on_write(count)
+            free.put(buffer)
+    except BaseException:
+        free.put(None)
+        thread.join()
+        raise
+    thread.join()
+    if failure:
+        raise failure[0]
+    return copied
@@ -0,0 +1,594 @@
+"""
+Random-access index for compressed tarballs
+
+A TarIndex maps every tar member to its offset in the uncompressed stream
+and records decompressor checkpoints: places in the compressed file where
+decoding can start from scratch. Those are gzip member and bz2 stream
+boundaries, and xz blocks (read from the stream indexes at the end of the
+file, restarted by prefixing the block with its stream header). Python's
+zlib cannot restart inflation mid-member, so a single-member gzip only has
+the checkpoint at offset 0.
+
+Indexes of compressed tarballs are saved as JSON under
+~/.converter/cache/tar-index, keyed by the archive's resolved path, so the
+folder holding the archive is never written to; the oldest are removed once
+the folder outgrows INDEX_CACHE_MAX_BYTES. Plain tars need no index: their
+headers can be read by seeking over the member data.
+SeekableCompressedWriter produces archives that start
+a new gzip member / bz2 stream / xz stream every CHECKPOINT_INTERVAL bytes;
+tarballs created with CompressionOptions(indexed=True) use it and get a
+checkpoint every few MiB.
+"""
+
+import bisect
+import bz2
+import hashlib
+import json
+import lzma
+import os
+import struct
+import tarfile
+import zlib
+
+INDEX_VERSION = 1
+INDEX_CACHE_DIR = os.path.expanduser("~/.converter/cache/tar-index")
+INDEX_CACHE_MAX_BYTES = 64 * 1024 * 1024
+
+# Uncompressed bytes between restart points written by SeekableCompressedWriter
+CHECKPOINT_INTERVAL = 8 * 1024 * 1024
+
+READ_SIZE = 256 * 1024
+# Upper bound on output produced per decompress call
+DECODE_SIZE = 1024 * 1024
+
+_XZ_HEADER_SIZE = 12
+_XZ_FOOTER_MAGIC = b"YZ"
+
+
+class _GzipMemberDecompressor:
+    """zlib decompressor for one gzip member with the bz2/lzma decompressor interface."""
+
+    def __init__(self):
+        self._d = zlib.decompressobj(31)
+        self._tail = b""
+
+    def decompress(self, data, max_length=-1):
+        if self._tail:
+            data = self._tail + data
+        out = self._d.decompress(data, max_length if max_length > 0 else 0)
+        self._tail = self._d.unconsumed_tail
+        return out
+
+    @property
+    def eof(self):
+        return self._d.eof
+
+    @property
+    def unused_data(self):
+        return self._d.unused_data
+
+    @property
+    def needs_input(self):
+        return not self._tail
+
+
+_DECOMPRESSORS = {
+    "gz": _GzipMemberDecompressor,
+    "bz2": bz2.BZ2Decompressor,
+    "xz": lambda: lzma.LZMADecompressor(lzma.FORMAT_XZ),
+}
+
+
+class _ForwardReader:
+    """Buffered forward-only reader; subclasses decode more data in ``_fill``."""
+
+    def __init__(self, position):
+        self._buffer = bytearray()
+        self._exhausted = False
+        self.position = position
+
+    def _fill(self):
+        """Append decoded bytes to ``_buffer``; set ``_exhausted`` at the end."""
+        raise NotImplementedError
+
+    def tell(self):
+        return self.position
+
+    def seek(self, offset, whence=os.SEEK_SET):
+        if whence == os.SEEK_CUR:
+            offset += self.position
+        elif whence != os.SEEK_SET:
+            raise OSError("Only forward seeks from the start or current position are supported")
+        if offset < self.position:
+            raise OSError("Cannot seek backwards in a compressed stream")
+        remaining = offset - self.position
+        while remaining:
+            skipped = len(self.read(min(remaining, DECODE_SIZE)))
+            if not skipped:
+                break
+            remaining -= skipped
+        return self.position
+
+    def read(self, size=-1):
+        if size is None or size < 0:
+            chunks = []
+            while True:
+                chunk = self.read(DECODE_SIZE)
+                if not chunk:
+                    return b"".join(chunks)
+                chunks.append(chunk)
+        while len(self._buffer) < size and not self._exhausted:
+            self._fill()
+        data = bytes(self._buffer[:size])
+        del self._buffer[:size]
+        self.position += len(data)
+        return data
+
+    def readinto(self, buffer):
+        data = self.read(len(buffer))
+        buffer[:len(data)] = data
+        return len(data)
+
+
+class _SequentialDecoder(_ForwardReader):
+    """
+    Decompress concatenated gzip members or bz2/xz streams front to back.
+
+    Records a checkpoint (compressed offset, uncompressed offset) wherever a
+    new member or stream starts.
+    """
+
+    def __init__(self, fileobj, compression, compressed_offset=0, position=0):
+        super().__init__(position)
+        self._raw = fileobj
+        self._new_decompressor = _DECOMPRESSORS[compression]
+        self._decompressor = self._new_decompressor()
+        self._raw.seek(compressed_offset)
+        self._fed_end = compressed_offset
+        self._pending = b""
+        self._started = False
+        self.checkpoints = [(compressed_offset, position)]
+
+    def _next_input(self):
+        if self._pending:
+            data, self._pending = self._pending, b""
+            return data
+        data = self._raw.read(READ_SIZE)
+        self._fed_end += len(data)
+        return data
+
+    def _fill(self):
+        if self._decompressor.needs_input:
+            data = self._next_input()
+            if not self._started:
+                # Skip padding between members/streams (xz stream padding, zero-filled gzip tails)
+                stripped = data.lstrip(b"\0")
+                if not stripped:
+                    if not data:
+                        self._exhausted = True
+                    return
+                data = stripped
+                self._started = True
+            out = self._decompressor.decompress(data, DECODE_SIZE)
+            if not data and not out and not self._decompressor.eof:
+                raise EOFError("Compressed file ended before the end-of-stream marker was reached")
+        else:
+            out = self._decompressor.decompress(b"", DECODE_SIZE)
+        self._buffer += out
+
+        if self._decompressor.eof:
+            leftover = self._decompressor.unused_data
+            self._pending = leftover
+            self._decompressor = self._new_decompressor()
+            self._started = False
+            # Where the next member starts, once any padding is skipped
+            padding = len(leftover) - len(leftover.lstrip(b"\0"))
+            offset = self._fed_end - len(leftover) + padding
+            self.checkpoints.append((offset, self.position + len(self._buffer)))
+
+
+class _XzBlockReader(_ForwardReader):
+    """Decode xz blocks one at a time, starting from a given block."""
+
+    def __init__(self, fileobj, blocks, first_block, position):
+        super().__init__(position)
+        self._raw = fileobj
+        self._blocks = blocks
+        self._next_block = first_block
+        self._headers = {}
+
+    def _stream_header(self, stream_offset):
+        header = self._headers.get(stream_offset)
+        if header is None:
+            self._raw.seek(stream_offset)
+            header = self._headers[stream_offset] = self._raw.read(_XZ_HEADER_SIZE)
+        return header
+
+    def _fill(self):
+        if self._next_block >= len(self._blocks):
+            self._exhausted = True
+            return
+        compressed_offset, _, stream_offset, block_size = self._blocks[self._next_block]
+        self._next_block += 1
+        decompressor = lzma.LZMADecompressor(lzma.FORMAT_XZ)
+        # A stream header followed by one block decodes that block on its own
+        self._buffer += decompressor.decompress(self._stream_header(stream_offset))
+        self._raw.seek(compressed_offset)
+        remaining = block_size
+        while remaining:
+            data = self._raw.read(min(remaining, READ_SIZE))
+            if not data:
+                raise EOFError("xz block is truncated")
+            remaining -= len(data)
+            self._buffer += decompressor.decompress(data)
+
+
+def _read_varint(data, pos):
+    value = 0
+    shift = 0
+    while True:
+        byte = data[pos]
+        pos += 1
+        value |= (byte & 0x7F) << shift
+        if not byte & 0x80:
+            return value, pos
+        shift += 7
+
+
+def xz_blocks(fileobj):
+    """
+    Blocks of a (possibly multi-stream) xz file, read from the stream indexes.
+
+    Returns a list of (compressed_offset, uncompressed_offset, stream_offset,
+    compressed_size) in file order, without decompressing anything.
+    """
+    blocks = []
+    uncompressed_offset = 0
+    for stream_offset, records in _xz_streams(fileobj):
+        offset = stream_offset + _XZ_HEADER_SIZE
+        for size, uncompressed in records:
+            blocks.append((offset, uncompressed_offset, stream_offset, size))
+            offset += size
+            uncompressed_offset += uncompressed
+    return blocks
+
+
+def xz_uncompressed_size(fileobj):
+    """Decompressed size of an xz file, summed from its stream indexes."""
+    return sum(uncompressed for _, records in _xz_streams(fileobj) for _, uncompressed in records)
+
+
+def _xz_streams(fileobj):
+    """(stream_offset, [(padded block size, uncompressed size), ...]) of every stream, in file order."""
+    fileobj.seek(0, os.SEEK_END)
+    pos = fileobj.tell()
+    streams = []
+    while pos > 0:
+        # Stream padding is a multiple of four zero bytes
+        fileobj.seek(pos - 4)
+        if fileobj.read(4) == b"\0\0\0\0":
+            pos -= 4
+            continue
+        fileobj.seek(pos - _XZ_HEADER_SIZE)
+        footer = fileobj.read(_XZ_HEADER_SIZE)
+        if len(footer) != _XZ_HEADER_SIZE or footer[10:] != _XZ_FOOTER_MAGIC:
+            raise ValueError("Not an xz file: stream footer not found")
+        index_size = (struct.unpack_from("<L", footer, 4)[0] + 1) * 4
+        index_offset = pos - _XZ_HEADER_SIZE - index_size
+        fileobj.seek(index_offset)
+        index = fileobj.read(index_size)
+        if not index or index[0] != 0:
+            raise ValueError("Corrupt xz index")
+        count, p = _read_varint(index, 1)
+        records = []
+        for _ in range(count):
+            unpadded, p = _read_varint(index, p)
+            uncompressed, p = _read_varint(index, p)
+            records.append(((unpadded + 3) & ~3, uncompressed))
+        stream_offset = index_offset - sum(size for size, _ in records) - _XZ_HEADER_SIZE
+        streams.append((stream_offset, records))
+        pos = stream_offset
+    return streams[::-1]
+
+
+class _OffsetView:
+    """Present a reader so that ``base`` appears as offset 0 (for tarfile)."""
+
+    def __init__(self, reader, base):
+        self._reader = reader
+        self._base = base
+
+    def tell(self):
+        return self._reader.tell() - self._base
+
+    def seek(self, offset, whence=os.SEEK_SET):
+        if whence == os.SEEK_SET:
+            offset += self._base
+        return self._reader.seek(offset, whence) - self._base
+
+    def read(self, size=-1):
+        return self._reader.read(size)
+
+    def readinto(self, buffer):
+        return self._reader.readinto(buffer)
+
+
+def detect_compression(archive_path):
+    """"gz", "bz2", "xz" or None (plain tar) from the file's magic bytes."""
+    with open(archive_path, "rb") as f:
+        magic = f.read(6)
+    if magic.startswith(b"\x1f\x8b"):
+        return "gz"
+    if magic.startswith(b"BZh"):
+        return "bz2"
+    if magic.startswith(b"\xfd7zXZ\x00"):
+        return "xz"
+    return None
+
+
+def index_path_for(archive_path):
+    """Cache file holding the index of ``archive_path``."""
+    key = hashlib.sha1(os.path.realpath(archive_path).encode("utf-8", "surrogateescape")).hexdigest()
+    return os.path.join(INDEX_CACHE_DIR, key + ".json")
+
+
+def _prune_index_cache(keep):
+    """Remove the least recently used indexes until the cache fits INDEX_CACHE_MAX_BYTES."""
+    try:
+        with os.scandir(INDEX_CACHE_DIR) as it:
+            files = [(entry.stat().st_mtime, entry.stat().st_size, entry.path) for entry in it
+                     if entry.is_file() and entry.name.endswith(".json")]
+    except OSError:
+        return
+    total = sum(size for _, size, _ in files)
+    for _, size, path in sorted(files):
+        if total <= INDEX_CACHE_MAX_BYTES:
+            break
+        if path == keep:
+            continue
+        try:
+            os.remove(path)
+        except OSError:
+            continue
+        total -= size
+
+
+class TarIndex:
+    """Member offsets and decompressor checkpoints of one tarball."""
+
+    def __init__(self, compression, archive_size, archive_mtime_ns, checkpoints, members):
+        self.compression = compression
+        self.archive_size = archive_size
+        self.archive_mtime_ns = archive_mtime_ns
+        # (compressed_offset, uncompressed_offset[, stream_offset, compressed_size]) sorted by offset
+        self.checkpoints = checkpoints
+        # name -> (header_offset, data_offset, size)
+        self.members = members
+        self._checkpoint_offsets = [checkpoint[1] for checkpoint in checkpoints]
+
+    @classmethod
+    def build(cls, archive_path, compression=None):
+        """Scan the archive once and record every member and checkpoint."""
+        if compression is None:
+            compression = detect_compression(archive_path)
+        st = os.stat(archive_path)
+        members = {}
+        with open(archive_path, "rb") as raw:
+            blocks = None
+            if compression == "xz":
+                try:
+                    blocks = xz_blocks(raw)
+                except (ValueError, IndexError, OSError):
+                    blocks = None  # Damaged index: fall back to stream boundaries
+            reader = _SequentialDecoder(raw, compression) if compression else raw
+            raw.seek(0)
+            with tarfile.open(fileobj=reader, mode="r:") as tar:
+                for member in tar:
+                    members[member.name] = (member.offset, member.offset_data, member.size)
+                    tar.members = []
+            if not compression:
+                checkpoints = [[0, 0]]
+            elif blocks:
+                checkpoints = [list(block) for block in blocks]
+            else:
+                # The decoder also notes where a next member would start after the last one
+                checkpoints = [list(checkpoint) for checkpoint in reader.checkpoints
+                               if checkpoint[0] < st.st_size]
+        return cls(compression, st.st_size, st.st_mtime_ns, checkpoints, members)
+
+    @classmethod
+    def load(cls, archive_path):
+        """The cached index if there is one and it still matches the archive, else None."""
+        path = index_path_for(archive_path)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            st = os.stat(archive_path)
+        except (OSError, ValueError):
+            return None
+        if (data.get("version") != INDEX_VERSION or data.get("archive_size") != st.st_size
+                or data.get("archive_mtime_ns") != st.st_mtime_ns):
+            return None
+        try:
+            # The file mtime records when the index was last used, for pruning
+            os.utime(path)
+        except OSError:
+            pass
+        members = {name: tuple(values) for name, *values in data["members"]}
+        return cls(data["compression"], data["archive_size"], data["archive_mtime_ns"],
+                   data["checkpoints"], members)
+
+    def save(self, archive_path):
+        """Write the index to the cache folder."""
+        data = {
+            "version": INDEX_VERSION,
+            "compression": self.compression,
+            "archive_size": self.archive_size,
+            "archive_mtime_ns": self.archive_mtime_ns,
+            "checkpoints": self.checkpoints,
+            "members": [[name, *values] for name, values in self.members.items()],
+        }
+        path = index_path_for(archive_path)
+        os.makedirs(INDEX_CACHE_DIR, exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(data, f, separators=(",", ":"))
+        os.replace(tmp_path, path)
+        _prune_index_cache(keep=path)
+
+    @property
+    def stream_size(self):
+        """Uncompressed bytes up to the end of the last member's data."""
+        return max((data_offset + size for _, data_offset, size in self.members.values()), default=0)
+
+    def decode_cost(self, name):
+        """Uncompressed bytes decoded to read member ``name`` on its own: from its checkpoint to its end."""
+        header_offset, data_offset, size = self.members[name]
+        if not self.compression:
+            return data_offset - header_offset + size
+        k = max(bisect.bisect_right(self._checkpoint_offsets, header_offset) - 1, 0)
+        return data_offset + size - self._checkpoint_offsets[k]
+
+    def open_reader(self, raw, offset):
+        """A reader over the uncompressed stream starting at the last checkpoint before ``offset``."""
+        if not self.compression:
+            return raw
+        k = max(bisect.bisect_right(self._checkpoint_offsets, offset) - 1, 0)
+        checkpoint = self.checkpoints[k]
+        if len(checkpoint) == 4:
+            return _XzBlockReader(raw, self.checkpoints, k, checkpoint[1])
+        return _SequentialDecoder(raw, self.compression, checkpoint[0], checkpoint[1])
+
+    def open_member(self, raw, name):
+        """
+        TarFile positioned on member ``name`` and its TarInfo.
+
+        Only the data from the nearest checkpoint up to the member is decoded.
+        """
+        try:
+            header_offset, _, _ = self.members[name]
+        except KeyError:
+            raise KeyError(f"{name} not found in archive")
+        reader = self.open_reader(raw, header_offset)
+        reader.seek(header_offset)
+        tar = tarfile.open(fileobj=_OffsetView(reader, header_offset), mode="r:")
+        member = tar.next()
+        return tar, member
+
+
+def load_or_build_index(archive_path, compression=None, save=True):
+    """
+    Load the cached index, building it when missing or stale. Indexes of
+    compressed tarballs are then saved to the cache; a plain tar's is cheap
+    to rebuild and is only kept in memory.
+    """
+    index = TarIndex.load(archive_path)
+    if index is None:
+        index = TarIndex.build(archive_path, compression)
+        if save and index.compression:
+            try:
+                index.save(archive_path)
+            except OSError:
+                pass  # Read-only location: keep the index in memory only
+    return index
+
+
+def read_member(archive_path, name, index=None):
+    """Contents of one regular-file member, decoding only from the nearest checkpoint."""
+    index = index or load_or_build_index(archive_path)
+    with open(archive_path, "rb") as raw:
+        tar, member = index.open_member(raw, name)
+        with tar:
+            f = tar.extractfile(member)
+            if f is None:
+                raise ValueError(f"{name} is not a regular file")
+            return f.read()
+
+
+def extract_member(archive_path, name, extract_to, index=None):
+    """Extract one member below ``extract_to`` and return its path."""
+    index = index or load_or_build_index(archive_path)
+    with open(archive_path, "rb") as raw:
+        tar, member = index.open_member(raw, name)
+        with tar:
+            if hasattr(tarfile, "data_filter"):
+                tar.extract(member, extract_to, filter="data")
+            else:
+                tar.extract(member, extract_to)
+    return os.path.join(extract_to, member.name)
+
+
+class SeekableCompressedWriter:
+    """
+    gzip/bz2/xz writer that starts a new member or stream every ``interval`` bytes.
+
+    The output is a concatenation that gzip, bzip2, xz and the Python gzip/bz2/lzma
+    modules read transparently, but each boundary is a checkpoint for TarIndex,
+    so single members can later be read without decoding from the start. tarfile's
+    streaming mode ("r|*") stops at the first boundary, and an xz dictionary
+    larger than ``interval`` is of no use since every stream starts empty.
+    """
+
+    def __init__(self, fileobj, compression, compresslevel=9, filters=None, interval=CHECKPOINT_INTERVAL):
+        self._fileobj = fileobj
+        self.compression = compression
+        self.compresslevel = compresslevel
+        self.filters = filters
+        self.interval = interval
+        self._compressor = None
+        self._member_size = 0
+        self._position = 0
+        self.closed = False
+
+    def _new_compressor(self):
+        if self.compression == "gz":
+            return zlib.compressobj(self.compresslevel, zlib.DEFLATED, 31)
+        if self.compression == "bz2":
+            return bz2.BZ2Compressor(self.compresslevel)
+        return lzma.LZMACompressor(lzma.FORMAT_XZ, filters=self.filters)
+
+    def write(self, data):
+        view = memoryview(data)
+        written = len(view)
+        while view:
+            if self._compressor is None:
+                self._compressor = self._new_compressor()
+                self._member_size = 0
+            take = min(len(view), self.interval - self._member_size)
+            out = self._compressor.compress(view[:take])
+            if out:
+                self._fileobj.write(out)
+            self._member_size += take
+            self._position += take
+            view = view[take:]
+            if self._member_size >= self.interval:
+                self._finish_member()
+        return written
+
+    def _finish_member(self):
+        out = self._compressor.flush()
+        if out:
+            self._fileobj.write(out)
+        self._compressor = None
+
+    def tell(self):
+        """Uncompressed bytes written so far (tarfile tracks its offset with this)."""
+        return self._position
+
+    def flush(self):
+        pass
+
+    def close(self):
+        if self.closed:
+            return
+        if self._compressor is None:
+            # An empty input still needs one valid member/stream
+            self._compressor = self._new_compressor()
+        self._finish_member()
+        self.closed = True
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
@@ -0,0 +1,129 @@
+"""Adding files to existing archives"""
+
+import os
+import sys
+import tarfile
+import time
+import zipfile
+
+import py7zr
+import pytest
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from support.archive_manager import add_to_archive
+
+MODES = {"tar": "w", "tar.gz": "w:gz", "tar.bz2": "w:bz2", "tar.xz": "w:xz"}
+
+
+def _read_back(archive, archive_format, scratch):
+    if archive_format == "zip":
+        with zipfile.ZipFile(archive) as zf:
+            return {name: zf.read(name) for name in zf.namelist()}
+    if archive_format == "7z":
+        with py7zr.SevenZipFile(archive) as szf:
+            szf.extractall(scratch)
+            return {name: (scratch / name).read_bytes() for name in os.listdir(scratch)}
+    with tarfile.open(archive, "r:*") as tar:
+        return {m.name: tar.extractfile(m).read() for m in tar if m.isfile()}
+
+
+def _make_archive(archive, archive_format, member):
+    if archive_format == "zip":
+        with zipfile.ZipFile(archive, "w", zipfile.ZIP_DEFLATED) as zf:
+            zf.write(member, "notes.txt")
+    elif archive_format == "7z":
+        with py7zr.SevenZipFile(archive, "w") as szf:
+            szf.write(member, "notes.txt")
+    else:
+        with tarfile.open(archive, MODES[archive_format]) as tar:
+            tar.add(member, arcname="notes.txt")
+
+
+@pytest.mark.parametrize("archive_format", ["zip", "7z", "tar.gz", "tar.bz2", "tar.xz"])
+def test_many_files_are_added_in_one_call(tmp_path, archive_format):
+    member = tmp_path / "member" / "notes.txt"
+    member.parent.mkdir()
+    member.write_text("archived notes")
+    archive = tmp_path / f"a.{archive_format}"
+    _make_archive(archive, archive_format, member)
+    new_dir = tmp_path / "new"
+    new_dir.mkdir()
+    added = {f"f{i}.txt": f"added {i}\n".encode() * (i + 1) for i in range(25)}
+    for name, data in added.items():
+        (new_dir / name).write_bytes(data)
+    messages = []
+
+    assert add_to_archive(str(archive), [str(new_dir / name) for name in added],
+                          lambda message, percent: messages.append((message, percent)))
+
+    assert _read_back(archive, archive_format, tmp_path / "out") == {"notes.txt": b"archived notes", **added}
+    assert messages[-1] == ("25 files added to archive", 100)
+
+
+def test_a_single_path_is_accepted(tmp_path):
+    member = tmp_path / "notes.txt"
+    member.write_text("archived notes")
+    archive = tmp_path / "a.zip"
+    _make_archive(archive, "zip", member)
+    new_file = tmp_path / "added.txt"
+    new_file.write_text("added")
+    assert add_to_archive(str(archive), str(new_file))
+    assert _read_back(archive, "zip", tmp_path / "out") == {"notes.txt": b"archived notes", "added.txt": b"added"}
+    assert not add_to_archive(str(archive), [])
+
+
+def test_zip_entries_are_copied_untouched(tmp_path):
+    archive = tmp_path / "a.zip"
+    with zipfile.ZipFile(archive, "w") as zf:
+        # Deflated at a level the rewrite would not pick, so re-deflating would change the data
+        info = zipfile.ZipInfo("docs/notes.txt", date_time=(2001, 2, 3, 4, 5, 6))
+        info.create_system = 3
+        info.external_attr = 0o100751 << 16
+        zf.writestr(info, b"notes " * 5000, zipfile.ZIP_DEFLATED, compresslevel=1)
+        zf.writestr(zipfile.ZipInfo("photo.jpg", date_time=(2010, 1, 1, 0, 0, 0)), os.urandom(2000))
+    with zipfile.ZipFile(archive) as zf:
+        before = {i.filename: (i.CRC, i.compress_size, i.compress_type, i.date_time, i.external_attr)
+                  for i in zf.infolist()}
+    new_file = tmp_path / "added.txt"
+    new_file.write_text("added " * 1000)
+    os.utime(new_file, (1_600_000_000, 1_600_000_000))
+
+    assert add_to_archive(str(archive), [str(new_file)])
+
+    with zipfile.ZipFile(archive) as zf:
+        assert zf.testzip() is None
+        after = {i.filename: (i.CRC, i.compress_size, i.compress_type, i.date_time, i.external_attr)
+                 for i in zf.infolist()}
+        added = zf.getinfo("added.txt")
+        assert zf.read("added.txt") == b"added " * 1000
+    assert {name: after[name] for name in before} == before
+    assert added.compress_type == zipfile.ZIP_DEFLATED
+    assert added.date_time == time.localtime(1_600_000_000)[:6]
+
+
+@pytest.mark.parametrize("archive_format", sorted(MODES))
+def test_add_to_tar_keeps_members_and_leaves_neighbours_alone(tmp_path, archive_format):
+    archive = tmp_path / f"a.{archive_format}"
+    # Same name as a member of the archive, right next to it
+    neighbour = tmp_path / "notes.txt"
+    neighbour.write_text("not part of the archive")
+    member = tmp_path / "member" / "notes.txt"
+    member.parent.mkdir()
+    member.write_text("archived notes")
+    with tarfile.open(archive, MODES[archive_format]) as tar:
+        tar.add(member, arcname="notes.txt")
+        tar.add(member, arcname="docs/notes.txt")
+    new_file = tmp_path / "new" / "added.txt"
+    new_file.parent.mkdir()
+    new_file.write_text("added")
+    before = sorted(os.listdir(tmp_path))
+
+    assert add_to_archive(str(archive), [str(new_file)])
+
+    assert neighbour.read_text() == "not part of the archive"
+    assert sorted(os.listdir(tmp_path)) == before
+    assert not (tmp_path / "docs").exists()
+    with tarfile.open(archive, "r:*") as tar:
+        contents = {m.name: tar.extractfile(m).read() for m in tar if m.isfile()}
+    assert contents == {"notes.txt": b"archived notes", "docs/notes.txt": b"archived notes", "added.txt": b"added"}
@@ -0,0 +1,141 @@
+"""Read-only filesystem view of archives"""
+
+import os
+import stat
+import sys
+import zipfile
+
+import pytest
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from support.archive_fs import ArchiveFS
+from support.archive_manager import create_archive, extract_archive
+
+_CONTENTS = {
+    "readme.txt": b"read me\n",
+    "docs/guide.txt": b"guide\n" * 200,
+    "docs/img/logo.bin": os.urandom(3000),
+    "bin/tool": b"#!/bin/sh\necho hi\n",
+}
+
+
+def _source_tree(tmp_path):
+    src = tmp_path / "src"
+    for name, data in _CONTENTS.items():
+        (src / name).parent.mkdir(parents=True, exist_ok=True)
+        (src / name).write_bytes(data)
+    os.chmod(src / "bin" / "tool", 0o755)
+    os.utime(src / "readme.txt", (1_600_000_000, 1_600_000_000))
+    return src
+
+
+@pytest.mark.parametrize("archive_format", ["zip", "7z", "tar", "tar.gz", "tar.xz"])
+def test_archive_reads_like_a_directory_tree(tmp_path, archive_format):
+    src = _source_tree(tmp_path)
+    archive = str(tmp_path / f"a.{archive_format}")
+    assert create_archive(archive, [str(src)], archive_format)
+
+    with ArchiveFS(archive) as fs:
+        assert fs.listdir() == ["src"]
+        assert fs.listdir("src/") == ["bin", "docs", "readme.txt"]
+        assert fs.listdir("/src/docs") == ["guide.txt", "img"]
+        assert fs.isdir("src/docs/img") and not fs.isfile("src/docs/img")
+        assert fs.isfile("src/readme.txt") and fs.exists("./src/readme.txt")
+        assert not fs.exists("src/missing.txt")
+        for name, data in _CONTENTS.items():
+            assert fs.read_bytes(f"src/{name}") == data
+        with fs.open("src/docs/guide.txt", "r") as f:
+            assert f.readline() == "guide\n"
+
+        info = fs.stat("src/docs/guide.txt")
+        assert stat.S_ISREG(info.st_mode) and info.st_size == len(_CONTENTS["docs/guide.txt"])
+        assert stat.S_ISDIR(fs.stat("src/docs").st_mode)
+        if archive_format != "7z":
+            assert fs.stat("src/bin/tool").st_mode & 0o111
+        assert abs(fs.stat("src/readme.txt").st_mtime - 1_600_000_000) <= 2
+
+        walked = {top: (dirs, files) for top, dirs, files in fs.walk("src")}
+        assert walked == {
+            "src": (["bin", "docs"], ["readme.txt"]),
+            "src/bin": ([], ["tool"]),
+            "src/docs": (["img"], ["guide.txt"]),
+            "src/docs/img": ([], ["logo.bin"]),
+        }
+
+        with pytest.raises(FileNotFoundError):
+            fs.stat("src/missing.txt")
+        with pytest.raises(NotADirectoryError):
+            fs.listdir("src/readme.txt")
+        with pytest.raises(IsADirectoryError):
+            fs.read_bytes("src/docs")
+        with pytest.raises(ValueError):
+            fs.open("src/readme.txt", "wb")
+
+
+def test_directories_implied_by_member_paths(tmp_path):
+    path = tmp_path / "a.zip"
+    with zipfile.ZipFile(path, "w") as zf:
+        zf.writestr("a/b/c.txt", "deep")
+        zf.writestr("top.txt", "top")
+    with ArchiveFS(str(path)) as fs:
+        assert fs.listdir() == ["a", "top.txt"]
+        assert fs.listdir("a") == ["b"]
+        assert stat.S_ISDIR(fs.stat("a/b").st_mode)
+        pruned = []
+        for top, dirs, files in fs.walk():
+            pruned.append(top)
+            dirs[:] = [d for d in dirs if d != "b"]
+        assert pruned == ["", "a"]
+
+
+def test_member_cache_is_bounded_by_bytes(tmp_path, monkeypatch):
+    path = tmp_path / "a.zip"
+    with zipfile.ZipFile(path, "w") as zf:
+        for i in range(5):
+            zf.writestr(f"f{i}.bin", bytes([i]) * 1000)
+        zf.writestr("huge.bin", b"x" * 5000)
+    reads = []
+    with ArchiveFS(str(path), cache_bytes=2500) as fs:
+        original = fs._read_member
+        monkeypatch.setattr(fs, "_read_member", lambda name: reads.append(name) or original(name))
+        fs.read_bytes("f0.bin")
+        fs.read_bytes("f1.bin")
+        fs.read_bytes("f0.bin")
+        assert reads == ["f0.bin", "f1.bin"]
+        # f1 is the least recently used, so it makes room for f2
+        fs.read_bytes("f2.bin")
+        fs.read_bytes("f0.bin")
+        fs.read_bytes("f1.bin")
+        assert reads == ["f0.bin", "f1.bin", "f2.bin", "f1.bin"]
+        assert fs._cached_bytes <= 2500
+        # Members larger than the whole cache are never kept
+        fs.read_bytes("huge.bin")
+        fs.read_bytes("huge.bin")
+        assert reads.count("huge.bin") == 2
+
+
+def test_views_match_extraction_with_stats_and_exec_policy(tmp_path):
+    src = _source_tree(tmp_path)
+    archive = str(tmp_path / "a.tar.gz")
+    assert create_archive(archive, [str(src)], "tar.gz")
+    stats = []
+    assert extract_archive(archive, str(tmp_path / "out"), stats_callback=stats.append, exec_policy="detect")
+    # Tarballs are read in one pass, so progress counts the compressed bytes
+    assert stats[-1].bytes_read == os.path.getsize(archive)
+
+    with ArchiveFS(archive) as fs:
+        for top, _, files in fs.walk():
+            for name in files:
+                member = f"{top}/{name}" if top else name
+                extracted = tmp_path / "out" / member
+                assert extracted.read_bytes() == fs.read_bytes(member)
+                # Only the script gets an execute bit under the "detect" policy
+                assert bool(os.stat(extracted).st_mode & 0o100) == (name == "tool")
+
+
+def test_unreadable_archives_raise_oserror(tmp_path):
+    path = tmp_path / "broken.zip"
+    path.write_bytes(b"PK\x03\x04 not really a zip")
+    with pytest.raises(OSError):
+        ArchiveFS(str(path))
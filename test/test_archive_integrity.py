@@ -0,0 +1,73 @@
+"""Integrity checks with test_archive"""
+
+import lzma
+import os
+import sys
+import zipfile
+
+import pytest
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Imported through the module so pytest does not collect test_archive itself
+from support import archive_manager
+from support.archive_manager import create_archive
+
+
+def _make_sources(root):
+    root.mkdir()
+    for i in range(12):
+        (root / f"f{i}.bin").write_bytes(os.urandom(2000) * (i + 1))
+
+
+@pytest.mark.parametrize("archive_format", ["zip", "7z", "tar", "tar.gz", "tar.bz2", "tar.xz"])
+def test_intact_archives_pass(tmp_path, archive_format):
+    _make_sources(tmp_path / "src")
+    archive = str(tmp_path / f"a.{archive_format}")
+    assert create_archive(archive, [str(tmp_path / "src")], archive_format)
+    messages = []
+    report = archive_manager.test_archive(archive, workers=3,
+                                          progress_callback=lambda message, percentage: messages.append(message))
+    assert report, report.corrupted or report.error
+    assert report.tested >= 12
+    assert report.tested_bytes == sum(2000 * (i + 1) for i in range(12))
+    assert messages[-1].startswith("Archive OK")
+    # Nothing was extracted
+    assert sorted(os.listdir(tmp_path)) == sorted(["src", f"a.{archive_format}"])
+
+
+def test_corrupted_zip_member_is_reported(tmp_path):
+    path = tmp_path / "a.zip"
+    with zipfile.ZipFile(path, "w", zipfile.ZIP_STORED) as zf:
+        for i in range(5):
+            zf.writestr(f"f{i}.bin", os.urandom(4000))
+    with zipfile.ZipFile(path) as zf:
+        info = zf.getinfo("f3.bin")
+    data = bytearray(path.read_bytes())
+    # Local header (30 bytes) and the name come before the stored data
+    data[info.header_offset + 30 + len(info.filename) + 100] ^= 0xFF
+    path.write_bytes(bytes(data))
+
+    report = archive_manager.test_archive(str(path), workers=2)
+    assert not report
+    assert list(report.corrupted) == ["f3.bin"]
+    assert report.tested == 5
+
+
+def test_corrupted_7z_is_reported(tmp_path):
+    _make_sources(tmp_path / "src")
+    archive = tmp_path / "a.7z"
+    assert create_archive(str(archive), [str(tmp_path / "src")], "7z")
+    data = bytearray(archive.read_bytes())
+    data[len(data) // 3] ^= 0xFF
+    archive.write_bytes(bytes(data))
+    report = archive_manager.test_archive(str(archive))
+    assert not report
+    assert report.corrupted or report.error
+
+
+def test_truncated_single_file_xz_fails(tmp_path):
+    path = tmp_path / "a.bin.xz"
+    path.write_bytes(lzma.compress(os.urandom(100_000))[:-200])
+    report = archive_manager.test_archive(str(path))
+    assert not report
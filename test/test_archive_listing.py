@@ -0,0 +1,78 @@
+"""Metadata-only archive listings"""
+
+import bz2
+import io
+import lzma
+import os
+import sys
+import tarfile
+import zipfile
+
+import pytest
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from support.archive_manager import iter_archive_contents, list_archive_contents
+
+NAMES = [f"dir{i % 3}/file{i}.txt" for i in range(50)]
+
+
+def _write_zip(path):
+    with zipfile.ZipFile(path, "w", zipfile.ZIP_DEFLATED) as zf:
+        for name in NAMES:
+            zf.writestr(name, name * 10)
+
+
+def _write_tar_gz(path):
+    with tarfile.open(path, "w:gz") as tar:
+        for name in NAMES:
+            data = (name * 10).encode()
+            info = tarfile.TarInfo(name)
+            info.size = len(data)
+            tar.addfile(info, io.BytesIO(data))
+
+
+@pytest.mark.parametrize("suffix, write", [(".zip", _write_zip), (".tar.gz", _write_tar_gz)])
+def test_iter_archive_contents_matches_the_full_listing(tmp_path, suffix, write):
+    path = str(tmp_path / f"a{suffix}")
+    write(path)
+    entries = list(iter_archive_contents(path, use_cache=False))
+    assert [entry.name for entry in entries] == NAMES
+    assert [entry.size for entry in entries] == [len(name) * 10 for name in NAMES]
+    listed = list_archive_contents(path, use_cache=False)
+    assert [(e.name, e.size) for e in listed] == [(e.name, e.size) for e in entries]
+
+
+def test_iter_archive_contents_yields_before_the_listing_ends(tmp_path):
+    path = str(tmp_path / "a.zip")
+    _write_zip(path)
+    # Cut the central directory short: the first entries still arrive, then the error
+    with open(path, "r+b") as f:
+        data = f.read()
+    eocd = data.rfind(b"PK\x05\x06")
+    count = len(NAMES) + 10
+    patched = data[:eocd + 8] + count.to_bytes(2, "little") + count.to_bytes(2, "little") + data[eocd + 12:]
+    with open(path, "wb") as f:
+        f.write(patched)
+    entries = iter_archive_contents(path, use_cache=False)
+    assert next(entries).name == NAMES[0]
+    with pytest.raises(ValueError, match="Truncated"):
+        list(entries)
+
+
+def test_iter_archive_contents_raises_for_unknown_formats(tmp_path):
+    path = tmp_path / "notes.txt"
+    path.write_text("not an archive")
+    with pytest.raises(ValueError):
+        list(iter_archive_contents(str(path)))
+
+
+
+def test_single_file_listings_report_the_original_size(tmp_path):
+    data = os.urandom(4096) * 50
+    (tmp_path / "a.xz").write_bytes(lzma.compress(data[:1000]) + lzma.compress(data[1000:]))
+    (tmp_path / "a.bz2").write_bytes(bz2.compress(data))
+    (tmp_path / "a.lzma").write_bytes(lzma.compress(data, format=lzma.FORMAT_ALONE))
+    sizes = {name: list_archive_contents(str(tmp_path / name))[0].size for name in ("a.xz", "a.bz2", "a.lzma")}
+    # bz2 does not store the size, and neither does a streamed .lzma header
+    assert sizes == {"a.xz": len(data), "a.bz2": None, "a.lzma": None}
@@ -0,0 +1,34 @@
+"""Member-by-member reading of 7z archives"""
+
+import os
+import sys
+
+import py7zr
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from support import archive_stream
+
+
+def test_iter_7z_members_matches_every_output_to_its_member(tmp_path):
+    path = tmp_path / "a.7z"
+    expected = {f"d{i % 7}/f{i}.txt": f"file {i}\n".encode() * (i % 5) for i in range(300)}
+    with py7zr.SevenZipFile(path, "w") as szf:
+        for name, data in expected.items():
+            szf.writestr(data, name)
+
+    seen = {}
+    for member in archive_stream.iter_7z_members(str(path)):
+        if member.kind == archive_stream.FILE:
+            with member.open() as f:
+                seen[member.name] = f.read()
+    assert seen == expected
+
+
+def test_match_7z_member_normalises_output_names():
+    member = archive_stream.StreamMember("dir/a.txt", 1, 0, 0, archive_stream.FILE)
+    by_name = {member.name: member}
+    assert archive_stream._match_7z_member(by_name, "dir/a.txt") is member
+    assert archive_stream._match_7z_member(by_name, "./dir//a.txt") is member
+    assert archive_stream._match_7z_member(by_name, os.path.join(os.getcwd(), "dir", "a.txt")) is member
+    assert archive_stream._match_7z_member(by_name, "dir/b.txt") is None
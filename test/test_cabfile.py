@@ -0,0 +1,129 @@
+"""Cabinets read by the built-in CAB reader"""
+
+import os
+import struct
+import sys
+import zlib
+
+import pytest
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from support.archive_manager import extract_archive, list_archive_contents
+from support.cabfile import COMPRESS_LZX, COMPRESS_MSZIP, COMPRESS_NONE, BadCabFile, CabFile
+
+# 2020-09-13 12:26:40 in DOS date/time form
+_DOS_DATE = (40 << 9) | (9 << 5) | 13
+_DOS_TIME = (12 << 11) | (26 << 5) | 20
+
+
+def _checksum(data, seed=0):
+    """Reference CFDATA checksum, one 32-bit word at a time."""
+    words = len(data) // 4
+    checksum = seed
+    for i in range(words):
+        checksum ^= struct.unpack_from("<L", data, i * 4)[0]
+    tail = 0
+    for byte in data[words * 4:]:
+        tail = (tail << 8) | byte
+    return checksum ^ tail
+
+
+def _data_blocks(payload, compression):
+    blocks = []
+    history = b""
+    for start in range(0, len(payload), 32 * 1024):
+        chunk = payload[start:start + 32 * 1024]
+        if compression == COMPRESS_MSZIP:
+            compressor = zlib.compressobj(6, zlib.DEFLATED, -zlib.MAX_WBITS, zdict=history) if history else \
+                zlib.compressobj(6, zlib.DEFLATED, -zlib.MAX_WBITS)
+            block = b"CK" + compressor.compress(chunk) + compressor.flush()
+            history = (history + chunk)[-32 * 1024:]
+        else:
+            block = chunk
+        sizes = struct.pack("<HH", len(block), len(chunk))
+        blocks.append(struct.pack("<L", _checksum(block, _checksum(sizes))) + sizes + block)
+    return blocks
+
+
+def _build_cabinet(path, folders):
+    """``folders`` is a list of (compression, {name: data}); names use backslashes like real cabinets."""
+    header_size = 36
+    folder_table = header_size + 8 * len(folders)
+    file_entries = []
+    folder_payloads = []
+    for index, (compression, files) in enumerate(folders):
+        offset = 0
+        for name, data in files.items():
+            file_entries.append(struct.pack("<LLHHHH", len(data), offset, index, _DOS_DATE, _DOS_TIME, 0x20) +
+                                name.encode() + b"\0")
+            offset += len(data)
+        folder_payloads.append(_data_blocks(b"".join(files.values()), compression))
+    files_offset = folder_table
+    data_offset = files_offset + sum(len(entry) for entry in file_entries)
+    folder_records = []
+    data = b""
+    for (compression, _), blocks in zip(folders, folder_payloads):
+        folder_records.append(struct.pack("<LHH", data_offset + len(data), len(blocks), compression))
+        data += b"".join(blocks)
+    body = b"".join(folder_records) + b"".join(file_entries) + data
+    header = struct.pack("<4s4xL4xL4xBBHHHHH", b"MSCF", header_size + len(body), files_offset, 3, 1,
+                         len(folders), len(file_entries), 0, 1234, 0)
+    path.write_bytes(header + body)
+
+
+def _folders():
+    stored = {"readme.txt": b"read me\n" * 50, "docs\\guide.txt": b"guide\n" * 300}
+    packed = {"data\\big.bin": os.urandom(20_000) * 4, "data\\small.txt": b"small", "empty.txt": b""}
+    return [(COMPRESS_NONE, stored), (COMPRESS_MSZIP, packed)]
+
+
+def test_stored_and_mszip_folders_read_back(tmp_path):
+    folders = _folders()
+    path = tmp_path / "a.cab"
+    _build_cabinet(path, folders)
+    expected = {name.replace("\\", "/"): data for _, files in folders for name, data in files.items()}
+
+    with CabFile(str(path), verify=True) as cab:
+        assert cab.can_decode
+        assert cab.namelist() == list(expected)
+        # Reading backwards restarts the folder decoder
+        for name in reversed(list(expected)):
+            assert cab.read(name) == expected[name]
+        assert {info.filename: reader.read() for info, reader in cab.iter_members()} == expected
+
+    entries = list_archive_contents(str(path), use_cache=False)
+    assert {entry.name: entry.size for entry in entries} == {name: len(data) for name, data in expected.items()}
+    assert extract_archive(str(path), str(tmp_path / "out"))
+    for name, data in expected.items():
+        assert (tmp_path / "out" / name).read_bytes() == data
+
+
+def test_damaged_blocks_fail_the_checksum(tmp_path):
+    path = tmp_path / "a.cab"
+    _build_cabinet(path, _folders())
+    data = bytearray(path.read_bytes())
+    data[-100] ^= 0xFF
+    path.write_bytes(bytes(data))
+    with CabFile(str(path), verify=True) as cab, pytest.raises(BadCabFile):
+        cab.read("data/big.bin")
+
+
+def test_lzx_folders_are_not_decoded(tmp_path):
+    path = tmp_path / "a.cab"
+    _build_cabinet(path, [(COMPRESS_NONE, {"a.txt": b"a"})])
+    data = bytearray(path.read_bytes())
+    # Mark the folder as LZX compressed
+    struct.pack_into("<H", data, 36 + 6, COMPRESS_LZX)
+    path.write_bytes(bytes(data))
+    with CabFile(str(path)) as cab:
+        assert not cab.can_decode
+        with pytest.raises(NotImplementedError):
+            cab.read("a.txt")
+
+
+def test_non_cabinets_are_rejected(tmp_path):
+    path = tmp_path / "a.cab"
+    path.write_bytes(b"not a cabinet at all, just text" * 3)
+    with pytest.raises(BadCabFile):
+        CabFile(str(path))
@@ -0,0 +1,80 @@
+"""CompressionOptions and how each create backend applies it"""
+
+import gzip
+import lzma
+import os
+import sys
+import tarfile
+import zipfile
+
+import py7zr
+import pytest
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from support.archive_manager import create_archive
+from support.compression_options import CompressionOptions
+
+
+def test_presets_and_backend_knobs():
+    assert CompressionOptions.preset("Fastest").level == 1
+    assert CompressionOptions.preset("maximum").level == 9
+    with pytest.raises(ValueError):
+        CompressionOptions.preset("turbo")
+
+    defaults = CompressionOptions()
+    assert defaults.py7zr_filters() is None
+    assert defaults.gzip_level() == 9
+    assert defaults.rar_switches() == []
+
+    options = CompressionOptions(level=0, dictionary_size=1 << 20, threads=4)
+    assert options.bz2_level() == 1
+    assert options.lzma_filters() == [{"id": lzma.FILTER_LZMA2, "preset": 0, "dict_size": 1 << 20}]
+    assert options.py7zr_filters() == [{"id": py7zr.FILTER_COPY}]
+    assert options.rar_switches() == ["-m0", "-md1024k", "-mt4"]
+
+
+def _sources(root):
+    root.mkdir()
+    for i in range(5):
+        (root / f"f{i}.txt").write_bytes(f"line {i}\n".encode() * 20000)
+
+
+def test_level_zero_stores_zip_entries(tmp_path):
+    _sources(tmp_path / "src")
+    output = str(tmp_path / "out.zip")
+    assert create_archive(output, [str(tmp_path / "src")], "zip", options=CompressionOptions(level=0))
+    with zipfile.ZipFile(output) as zf:
+        assert {info.compress_type for info in zf.infolist()} == {zipfile.ZIP_STORED}
+        assert zf.read("src/f3.txt") == b"line 3\n" * 20000
+
+
+@pytest.mark.parametrize("archive_format", ["tar.gz", "tar.bz2", "tar.xz", "7z"])
+def test_levels_reach_the_codec(tmp_path, archive_format):
+    _sources(tmp_path / "src")
+    sizes = {}
+    for level in (1, 9):
+        output = str(tmp_path / f"out{level}.{archive_format}")
+        assert create_archive(output, [str(tmp_path / "src")], archive_format,
+                              options=CompressionOptions(level=level))
+        sizes[level] = os.path.getsize(output)
+        if archive_format == "7z":
+            with py7zr.SevenZipFile(output) as szf:
+                szf.extractall(tmp_path / f"out{level}")
+            assert (tmp_path / f"out{level}" / "src" / "f1.txt").read_bytes() == b"line 1\n" * 20000
+        else:
+            with tarfile.open(output) as tar:
+                assert tar.extractfile("src/f1.txt").read() == b"line 1\n" * 20000
+    assert sizes[9] <= sizes[1]
+
+
+def test_gzip_header_records_the_level(tmp_path):
+    _sources(tmp_path / "src")
+    output = str(tmp_path / "out.tar.gz")
+    assert create_archive(output, [str(tmp_path / "src")], "tar.gz", options=CompressionOptions(level=1))
+    with open(output, "rb") as f:
+        header = f.read(10)
+    # XFL 4 marks the fastest deflate level
+    assert header[8] == 4
+    with gzip.open(output) as f:
+        assert f.read(512)
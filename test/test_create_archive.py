@@ -0,0 +1,89 @@
+"""Creating archives from source folders"""
+
+import errno
+import os
+import sys
+import zipfile
+
+import py7zr
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from support import archive_manager
+from support.archive_manager import create_archive
+
+
+def test_already_compressed_files_are_stored_in_zip(tmp_path):
+    src = tmp_path / "src"
+    src.mkdir()
+    (src / "photo.jpg").write_bytes(b"jpeg" * 5000)
+    (src / "noise.bin").write_bytes(os.urandom(128 * 1024))
+    (src / "notes.txt").write_bytes(b"notes\n" * 5000)
+    messages = []
+    output = str(tmp_path / "out.zip")
+    assert create_archive(output, [str(src)], "zip", lambda message, percentage: messages.append(message))
+
+    with zipfile.ZipFile(output) as zf:
+        # By extension, and by a trial deflate of the first block
+        assert zf.getinfo("src/photo.jpg").compress_type == zipfile.ZIP_STORED
+        assert zf.getinfo("src/noise.bin").compress_type == zipfile.ZIP_STORED
+        assert zf.getinfo("src/notes.txt").compress_type == zipfile.ZIP_DEFLATED
+        assert zf.read("src/photo.jpg") == b"jpeg" * 5000
+    assert any(message.startswith("Stored 2 already-compressed files") for message in messages)
+
+
+def test_mostly_compressed_7z_uses_copy_mode(tmp_path):
+    src = tmp_path / "src"
+    src.mkdir()
+    for i in range(3):
+        (src / f"clip{i}.mp4").write_bytes(os.urandom(200 * 1024))
+    (src / "readme.txt").write_text("readme")
+    output = str(tmp_path / "out.7z")
+    assert create_archive(output, [str(src)], "7z")
+    with py7zr.SevenZipFile(output) as szf:
+        assert "COPY" in szf.archiveinfo().method_names
+        szf.extractall(tmp_path / "out")
+    assert (tmp_path / "out" / "src" / "readme.txt").read_text() == "readme"
+
+
+def test_unreadable_directory_is_skipped_and_reported(tmp_path, monkeypatch):
+    src = tmp_path / "src"
+    (src / "locked").mkdir(parents=True)
+    (src / "locked" / "secret.txt").write_text("hidden")
+    (src / "open").mkdir()
+    (src / "open" / "a.txt").write_text("visible")
+    scandir = os.scandir
+
+    def guarded_scandir(path):
+        if os.path.basename(path) == "locked":
+            raise PermissionError(errno.EACCES, "Permission denied", path)
+        return scandir(path)
+
+    # Running as root ignores permission bits, so refuse the directory here instead
+    monkeypatch.setattr(archive_manager.os, "scandir", guarded_scandir)
+    messages = []
+    output = str(tmp_path / "out.zip")
+    assert create_archive(output, [str(src)], "zip", lambda message, percentage: messages.append((message, percentage)))
+
+    assert set(zipfile.ZipFile(output).namelist()) >= {"src/open/a.txt"}
+    assert "src/locked/secret.txt" not in zipfile.ZipFile(output).namelist()
+    assert any(percentage == -1 and "locked" in message for message, percentage in messages)
+
+
+def test_sync_keeps_members_of_unreadable_directories(tmp_path, monkeypatch):
+    src = tmp_path / "src"
+    (src / "locked").mkdir(parents=True)
+    (src / "locked" / "secret.txt").write_text("hidden")
+    (src / "a.txt").write_text("visible")
+    output = str(tmp_path / "out.zip")
+    assert create_archive(output, [str(src)], "zip")
+    scandir = os.scandir
+
+    def guarded_scandir(path):
+        if os.path.basename(path) == "locked":
+            raise PermissionError(errno.EACCES, "Permission denied", path)
+        return scandir(path)
+
+    monkeypatch.setattr(archive_manager.os, "scandir", guarded_scandir)
+    assert archive_manager.sync_archive(output, [str(src)], delete_missing=True)
+    assert "src/locked/secret.txt" in zipfile.ZipFile(output).namelist()
@@ -0,0 +1,333 @@
+"""Extracting archives into a destination folder"""
+
+import bz2
+import gzip
+import io
+import lzma
+import os
+import stat
+import sys
+import tarfile
+import zipfile
+
+import pytest
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from support import archive_manager
+from support.archive_manager import create_archive, extract_archive, extract_members
+from support.extract_journal import JOURNAL_NAME, ExtractionJournal
+
+
+def _write_zip(path, contents):
+    with zipfile.ZipFile(path, "w", zipfile.ZIP_DEFLATED) as zf:
+        zf.writestr("empty_dir/", b"")
+        for name, data in contents.items():
+            zf.writestr(name, data)
+
+
+def _contents():
+    contents = {f"d{i % 4}/sub/f{i}.txt": f"file {i}\n".encode() * (i * 40 + 1) for i in range(60)}
+    contents["big.bin"] = os.urandom(512 * 1024)
+    return contents
+
+
+def test_zip_members_extract_concurrently(tmp_path):
+    contents = _contents()
+    path = str(tmp_path / "a.zip")
+    _write_zip(path, contents)
+    percentages = []
+    assert extract_archive(path, str(tmp_path / "out"), lambda message, percentage: percentages.append(percentage))
+    for name, data in contents.items():
+        assert (tmp_path / "out" / name).read_bytes() == data
+    assert (tmp_path / "out" / "empty_dir").is_dir()
+    assert percentages[-1] == 100
+
+
+def test_parallel_extraction_opens_one_handle_per_worker(tmp_path):
+    contents = _contents()
+    path = str(tmp_path / "a.zip")
+    _write_zip(path, contents)
+    opened = []
+
+    def open_archive():
+        opened.append(1)
+        return zipfile.ZipFile(path)
+
+    with zipfile.ZipFile(path) as zf:
+        infos = zf.infolist()
+    archive_manager._extract_entries_parallel(open_archive, infos, str(tmp_path / "out"), workers=3)
+    assert 1 <= len(opened) <= 3
+    for name, data in contents.items():
+        assert (tmp_path / "out" / name).read_bytes() == data
+
+
+def test_member_names_stay_inside_the_destination(tmp_path):
+    path = str(tmp_path / "evil.zip")
+    with zipfile.ZipFile(path, "w") as zf:
+        zf.writestr("../outside.txt", b"x")
+        zf.writestr("/abs/inside.txt", b"y")
+    assert extract_archive(path, str(tmp_path / "out"))
+    assert not (tmp_path / "outside.txt").exists()
+    assert (tmp_path / "out" / "outside.txt").read_bytes() == b"x"
+    assert (tmp_path / "out" / "abs" / "inside.txt").read_bytes() == b"y"
+
+
+def _selection_sources(root):
+    contents = {
+        "docs/readme.txt": b"readme",
+        "docs/guide/intro.txt": b"intro",
+        "conf/app.cfg": b"[app]",
+        "conf/db.cfg": b"[db]",
+        "bin/tool": b"tool",
+    }
+    for name, data in contents.items():
+        (root / name).parent.mkdir(parents=True, exist_ok=True)
+        (root / name).write_bytes(data)
+    return contents
+
+
+@pytest.mark.parametrize("archive_format", ["zip", "7z", "tar", "tar.gz", "tar.xz"])
+def test_extract_members_by_name_folder_and_pattern(tmp_path, archive_format):
+    src = tmp_path / "src"
+    _selection_sources(src)
+    archive = str(tmp_path / f"a.{archive_format}")
+    assert create_archive(archive, [str(src)], archive_format)
+
+    out = tmp_path / "out"
+    assert extract_members(archive, ["src/docs", "src/conf/*.cfg", "./src/bin/tool"], str(out))
+    extracted = sorted(os.path.relpath(os.path.join(root, name), out).replace(os.sep, "/")
+                       for root, _, files in os.walk(out) for name in files)
+    assert extracted == ["src/bin/tool", "src/conf/app.cfg", "src/conf/db.cfg",
+                         "src/docs/guide/intro.txt", "src/docs/readme.txt"]
+    assert (out / "src" / "conf" / "db.cfg").read_bytes() == b"[db]"
+
+    only = tmp_path / "only"
+    assert extract_members(archive, ["src/docs/readme.txt"], str(only))
+    assert [name for _, _, files in os.walk(only) for name in files] == ["readme.txt"]
+
+
+def test_extract_members_without_a_match_fails(tmp_path):
+    src = tmp_path / "src"
+    _selection_sources(src)
+    archive = str(tmp_path / "a.zip")
+    assert create_archive(archive, [str(src)], "zip")
+    messages = []
+    assert not extract_members(archive, ["missing.txt"], str(tmp_path / "out"),
+                               lambda message, percentage: messages.append((message, percentage)))
+    assert messages[-1][1] == -1 and "No archive members" in messages[-1][0]
+
+
+def test_single_file_codecs_extract_through_a_scratch_folder(tmp_path):
+    (tmp_path / "data.txt.xz").write_bytes(lzma.compress(b"payload"))
+    out = tmp_path / "out"
+    assert extract_members(str(tmp_path / "data.txt.xz"), ["data.txt"], str(out))
+    assert os.listdir(out) == ["data.txt"]
+    assert (out / "data.txt").read_bytes() == b"payload"
+
+
+def _tar_bytes(contents):
+    buffer = io.BytesIO()
+    with tarfile.open(fileobj=buffer, mode="w") as tar:
+        for name, data in contents.items():
+            info = tarfile.TarInfo(name)
+            info.size = len(data)
+            info.mode = 0o644
+            tar.addfile(info, io.BytesIO(data))
+    return buffer.getvalue()
+
+
+@pytest.mark.parametrize("suffix, compress", [
+    (".tar", lambda data: data),
+    (".tar.gz", gzip.compress),
+    (".tar.bz2", bz2.compress),
+    (".tar.xz", lzma.compress),
+])
+def test_tarballs_extract_in_one_pass(tmp_path, suffix, compress):
+    contents = {f"d{i % 3}/f{i}.txt": f"file {i}\n".encode() * (i * 100 + 1) for i in range(30)}
+    path = tmp_path / f"a{suffix}"
+    path.write_bytes(compress(_tar_bytes(contents)))
+    stats = []
+    assert extract_archive(str(path), str(tmp_path / "out"), stats_callback=stats.append)
+    for name, data in contents.items():
+        assert (tmp_path / "out" / name).read_bytes() == data
+    # Progress follows the compressed bytes consumed
+    assert stats[-1].bytes_read == path.stat().st_size
+
+
+def test_multi_member_gzip_tarball_is_read_to_the_end(tmp_path):
+    contents = {f"f{i}.txt": os.urandom(3000) for i in range(10)}
+    data = _tar_bytes(contents)
+    # Split at a header boundary into two gzip members, as checkpointed writers do
+    cut = 512 * 20
+    path = tmp_path / "a.tar.gz"
+    path.write_bytes(gzip.compress(data[:cut]) + gzip.compress(data[cut:]))
+    assert extract_archive(str(path), str(tmp_path / "out"))
+    for name, content in contents.items():
+        assert (tmp_path / "out" / name).read_bytes() == content
+
+
+def test_tar_members_cannot_escape_the_destination(tmp_path):
+    path = tmp_path / "evil.tar"
+    path.write_bytes(_tar_bytes({"../escaped.txt": b"x"}))
+    assert not extract_archive(str(path), str(tmp_path / "out"))
+    assert not (tmp_path / "escaped.txt").exists()
+
+
+def _write_unix_zip(path, members):
+    with zipfile.ZipFile(path, "w") as zf:
+        for name, (mode, data) in members.items():
+            info = zipfile.ZipInfo(name)
+            info.create_system = 3
+            info.external_attr = (stat.S_IFREG | mode) << 16
+            zf.writestr(info, data)
+
+
+_MODE_MEMBERS = {
+    "run.sh": (0o755, b"#!/bin/sh\necho hi\n"),
+    "notes.txt": (0o644, b"notes"),
+    "suid": (0o4755, b"\x7fELF binary"),
+    "shared.txt": (0o666, b"shared"),
+    "script.py": (0o644, b"#!/usr/bin/env python3\n"),
+}
+
+
+def _modes(root):
+    return {name: stat.S_IMODE(os.stat(os.path.join(root, name)).st_mode) for name in _MODE_MEMBERS}
+
+
+def test_zip_modes_come_from_the_archive(tmp_path):
+    path = str(tmp_path / "a.zip")
+    _write_unix_zip(path, _MODE_MEMBERS)
+    assert extract_archive(path, str(tmp_path / "out"))
+    # setuid and group/other write are dropped, as with tarfile's 'data' filter
+    assert _modes(tmp_path / "out") == {"run.sh": 0o755, "notes.txt": 0o644, "suid": 0o755,
+                                        "shared.txt": 0o644, "script.py": 0o644}
+
+
+@pytest.mark.parametrize("exec_policy, expected", [
+    ("all", {"run.sh": 0o755, "notes.txt": 0o755, "suid": 0o755, "shared.txt": 0o755, "script.py": 0o755}),
+    ("detect", {"run.sh": 0o755, "notes.txt": 0o644, "suid": 0o755, "shared.txt": 0o644, "script.py": 0o755}),
+])
+def test_exec_policies(tmp_path, exec_policy, expected):
+    path = str(tmp_path / "a.zip")
+    _write_unix_zip(path, _MODE_MEMBERS)
+    assert extract_archive(path, str(tmp_path / "zip"), exec_policy=exec_policy)
+    assert _modes(tmp_path / "zip") == expected
+
+    # The tar members are all stored as 0644, so only the policy adds execute permission
+    contents = {name: data for name, (_, data) in _MODE_MEMBERS.items()}
+    tar_path = tmp_path / "a.tar.gz"
+    tar_path.write_bytes(gzip.compress(_tar_bytes(contents)))
+    assert extract_archive(str(tar_path), str(tmp_path / "tar"), exec_policy=exec_policy)
+    assert _modes(tmp_path / "tar") == expected
+
+
+def test_unknown_exec_policy_is_rejected(tmp_path):
+    path = str(tmp_path / "a.zip")
+    _write_unix_zip(path, _MODE_MEMBERS)
+    assert not extract_archive(path, str(tmp_path / "out"), exec_policy="sometimes")
+
+
+def _extract_skipping(archive, dest):
+    messages = []
+    ok = extract_archive(str(archive), str(dest), lambda message, percentage: messages.append(message),
+                         overwrite="skip_identical")
+    return ok, messages
+
+
+def test_skip_identical_only_restores_changed_files(tmp_path):
+    archive = tmp_path / "a.zip"
+    with zipfile.ZipFile(archive, "w") as zf:
+        for i in range(10):
+            zf.writestr(f"dir/f{i}.txt", f"file {i}\n" * 100)
+    dest = tmp_path / "out"
+    assert _extract_skipping(archive, dest)[0]
+    (dest / "dir" / "f3.txt").write_text("changed")
+    os.remove(dest / "dir" / "f7.txt")
+    # Same size and an old mtime: only the CRC tells it apart
+    (dest / "dir" / "f5.txt").write_text("FILE 5\n" * 100)
+    os.utime(dest / "dir" / "f5.txt", (1_000_000_000, 1_000_000_000))
+
+    ok, messages = _extract_skipping(archive, dest)
+
+    assert ok
+    assert "Skipping 7 of 10 files already extracted" in messages
+    for i in range(10):
+        assert (dest / "dir" / f"f{i}.txt").read_text() == f"file {i}\n" * 100
+    assert not (dest / JOURNAL_NAME).exists()
+
+
+def test_interrupted_extraction_resumes_from_its_journal(tmp_path, monkeypatch):
+    # Entries without an mtime or CRC can only be recognised through the journal
+    contents = {f"f{i}.bin": bytes([i]) * 1000 for i in range(10)}
+    archive = tmp_path / "a.tar.gz"
+    archive.write_bytes(gzip.compress(_tar_bytes(contents)))
+    dest = tmp_path / "out"
+    record = archive_manager.ExtractionJournal.record
+    recorded = []
+
+    def interrupted_record(journal, name, target):
+        if len(recorded) == 4:
+            raise KeyboardInterrupt
+        recorded.append(name)
+        record(journal, name, target)
+
+    monkeypatch.setattr(archive_manager.ExtractionJournal, "record", interrupted_record)
+    with pytest.raises(KeyboardInterrupt):
+        extract_archive(str(archive), str(dest), overwrite="skip_identical")
+    assert (dest / JOURNAL_NAME).exists()
+    monkeypatch.setattr(archive_manager.ExtractionJournal, "record", record)
+
+    ok, messages = _extract_skipping(archive, dest)
+
+    assert ok
+    assert "Skipping 4 of 10 files already extracted" in messages
+    for name, data in contents.items():
+        assert (dest / name).read_bytes() == data
+    assert not (dest / JOURNAL_NAME).exists()
+
+
+def test_journal_of_another_archive_is_ignored(tmp_path):
+    contents = {f"f{i}.bin": bytes([i]) * 1000 for i in range(3)}
+    archive = tmp_path / "a.tar"
+    archive.write_bytes(_tar_bytes(contents))
+    dest = tmp_path / "out"
+    dest.mkdir()
+    with ExtractionJournal(str(archive), str(dest)) as journal:
+        for name, data in contents.items():
+            (dest / name).write_bytes(b"x" * len(data))
+            journal.record(name, str(dest / name))
+        # Leave the journal behind, as an interrupted run would
+        journal.close(completed=False)
+    assert (dest / JOURNAL_NAME).exists()
+    # The archive changes, so the journal no longer vouches for the files
+    archive.write_bytes(_tar_bytes(contents) + bytes(512))
+
+    ok, messages = _extract_skipping(archive, dest)
+
+    assert ok
+    assert not any(message.startswith("Skipping") for message in messages)
+    for name, data in contents.items():
+        assert (dest / name).read_bytes() == data
+
+
+def test_skip_identical_single_file_formats(tmp_path):
+    data = b"payload\n" * 1000
+    (tmp_path / "a.xz").write_bytes(lzma.compress(data))
+    (tmp_path / "b.bz2").write_bytes(bz2.compress(data))
+    dest = tmp_path / "out"
+    _extract_skipping(tmp_path / "a.xz", dest)
+    _extract_skipping(tmp_path / "b.bz2", dest)
+
+    # xz records the original size, so the file is recognised; bz2 does not and is extracted again
+    assert any(message.startswith("Skipping 1 of 1") for message in _extract_skipping(tmp_path / "a.xz", dest)[1])
+    assert not any(message.startswith("Skipping") for message in _extract_skipping(tmp_path / "b.bz2", dest)[1])
+    assert (dest / "a").read_bytes() == data
+    assert (dest / "b").read_bytes() == data
+
+
+def test_unknown_overwrite_policy_is_rejected(tmp_path):
+    path = tmp_path / "a.zip"
+    _write_zip(path, {"a.txt": b"a"})
+    assert not extract_archive(str(path), str(tmp_path / "out"), overwrite="newer")
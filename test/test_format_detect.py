@@ -0,0 +1,100 @@
+"""Format detection from file contents"""
+
+import bz2
+import gzip
+import io
+import lzma
+import os
+import sys
+import tarfile
+import zipfile
+
+import py7zr
+import pytest
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from support import format_detect
+from support.archive_manager import _get_archive_type, extract_archive
+from support.format_detect import detect_format
+
+
+def _tar_bytes(fmt=tarfile.PAX_FORMAT):
+    buffer = io.BytesIO()
+    with tarfile.open(fileobj=buffer, mode="w", format=fmt) as tar:
+        info = tarfile.TarInfo("a.txt")
+        info.size = 5
+        tar.addfile(info, io.BytesIO(b"hello"))
+    return buffer.getvalue()
+
+
+def _v7_tar_bytes():
+    """A tar without the ustar magic, as pre-POSIX tools wrote them."""
+    data = bytearray(_tar_bytes(tarfile.USTAR_FORMAT))
+    data[257:265] = bytes(8)
+    data[148:156] = b" " * 8
+    data[148:156] = b"%06o\0 " % sum(data[:512])
+    return bytes(data)
+
+
+def _zip_bytes():
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w") as zf:
+        zf.writestr("a.txt", "hello")
+    return buffer.getvalue()
+
+
+def _7z_bytes(tmp_path):
+    path = tmp_path / "made.7z"
+    with py7zr.SevenZipFile(path, "w") as szf:
+        szf.writestr(b"hello", "a.txt")
+    return path.read_bytes()
+
+
+@pytest.mark.parametrize("make, expected", [
+    (lambda tmp: _zip_bytes(), "zip"),
+    (_7z_bytes, "7z"),
+    (lambda tmp: _tar_bytes(), "tar"),
+    (lambda tmp: _v7_tar_bytes(), "tar"),
+    (lambda tmp: gzip.compress(_tar_bytes()), "tar.gz"),
+    (lambda tmp: bz2.compress(_tar_bytes()), "tar.bz2"),
+    (lambda tmp: lzma.compress(_tar_bytes()), "tar.xz"),
+    (lambda tmp: gzip.compress(b"plain text"), "gz"),
+    (lambda tmp: bz2.compress(b"plain text"), "bz2"),
+    (lambda tmp: lzma.compress(b"plain text"), "xz"),
+    (lambda tmp: lzma.compress(b"plain text", format=lzma.FORMAT_ALONE), "lzma"),
+    (lambda tmp: b"\x89PNG\r\n\x1a\n" + bytes(100), "png"),
+    (lambda tmp: b"\xff\xd8\xff\xe0" + bytes(100), "jpeg"),
+    (lambda tmp: b"just some text, no archive here", None),
+])
+def test_detect_format_ignores_the_file_name(tmp_path, make, expected):
+    # A misleading name: detection has to come from the contents
+    path = tmp_path / "download.dat"
+    path.write_bytes(make(tmp_path))
+    assert detect_format(str(path)) == expected
+
+
+def test_iso_volume_descriptor(tmp_path):
+    path = tmp_path / "disc.bin"
+    path.write_bytes(bytes(0x8001) + b"CD001" + bytes(2048))
+    assert detect_format(str(path)) == "iso"
+
+
+def test_results_are_refreshed_when_the_file_changes(tmp_path):
+    format_detect.clear_cache()
+    path = tmp_path / "a.bin"
+    path.write_bytes(_zip_bytes())
+    assert detect_format(str(path)) == "zip"
+    path.write_bytes(gzip.compress(_tar_bytes()) + b"padding")
+    assert detect_format(str(path)) == "tar.gz"
+    assert detect_format(str(tmp_path / "missing.zip")) is None
+
+
+def test_misnamed_archives_are_extracted_by_their_contents(tmp_path):
+    path = tmp_path / "backup.zip"
+    path.write_bytes(gzip.compress(_tar_bytes()))
+    assert _get_archive_type(str(path)) == "tar.gz"
+    assert extract_archive(str(path), str(tmp_path / "out"))
+    assert (tmp_path / "out" / "a.txt").read_bytes() == b"hello"
+    # Files that do not exist yet are named by their extension
+    assert _get_archive_type(str(tmp_path / "new.tar.xz")) == "tar.xz"
@@ -0,0 +1,131 @@
+"""ISO 9660 images read by the built-in reader"""
+
+import os
+import stat
+import struct
+import sys
+
+import pytest
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from support.archive_listing import list_iso
+from support.archive_manager import extract_archive, extract_members
+from support.iso9660 import BadIsoFile, IsoFile
+
+SECTOR = 2048
+# 2020-09-13 12:26:40 UTC as a 7-byte recording date
+_DATE = bytes([120, 9, 13, 12, 26, 40, 0])
+_TIMESTAMP = 1_600_000_000
+
+
+def _both(fmt, value):
+    return struct.pack("<" + fmt, value) + struct.pack(">" + fmt, value)
+
+
+def _record(name, extent, size, is_dir=False, system_use=b"", flags=0):
+    pad = b"\0" if len(name) % 2 == 0 else b""
+    length = 33 + len(name) + len(pad) + len(system_use)
+    length += length % 2
+    body = (bytes([length, 0]) + _both("L", extent) + _both("L", size) + _DATE +
+            bytes([(0x02 if is_dir else 0) | flags, 0, 0]) + _both("H", 1) + bytes([len(name)]) + name + pad +
+            system_use)
+    return body.ljust(length, b"\0")
+
+
+def _rock_ridge(name, mode):
+    nm = b"NM" + bytes([5 + len(name), 1, 0]) + name
+    px = b"PX" + bytes([36, 1]) + _both("L", mode) + _both("L", 1) + _both("L", 0) + _both("L", 0)
+    return px + nm
+
+
+def _build_image(path, rock_ridge=False):
+    """
+    Root: README.TXT, DOCS/ (holding GUIDE.TXT) and BIG.BIN stored as two extents.
+    Sector layout: 16 primary descriptor, 17 terminator, 18 root, 19 DOCS, 20+ file data.
+    """
+    files = {
+        "README.TXT": (b"read me\n" * 100, "readme.txt", 0o100644),
+        "GUIDE.TXT": (b"guide\n" * 1000, "User Guide.txt", 0o100755),
+    }
+    big_parts = [os.urandom(SECTOR * 2), os.urandom(777)]
+    data_sectors = {}
+    next_sector = 20
+    for key, (data, _, _) in files.items():
+        data_sectors[key] = next_sector
+        next_sector += -(-len(data) // SECTOR)
+    big_sectors = []
+    for part in big_parts:
+        big_sectors.append(next_sector)
+        next_sector += -(-len(part) // SECTOR)
+
+    def su(name, mode):
+        return _rock_ridge(name.encode(), mode) if rock_ridge else b""
+
+    root_dot_su = b"SP\x07\x01\xbe\xef\x00" if rock_ridge else b""
+    root = (_record(b"\x00", 18, SECTOR, True, root_dot_su) + _record(b"\x01", 18, SECTOR, True) +
+            _record(b"README.TXT;1", data_sectors["README.TXT"], len(files["README.TXT"][0]),
+                    system_use=su("readme.txt", 0o100644)) +
+            _record(b"DOCS", 19, SECTOR, True, su("docs", 0o40755)) +
+            _record(b"BIG.BIN;1", big_sectors[0], len(big_parts[0]), system_use=su("big.bin", 0o100600),
+                    flags=0x80) +
+            _record(b"BIG.BIN;1", big_sectors[1], len(big_parts[1]), system_use=su("big.bin", 0o100600)))
+    docs = (_record(b"\x00", 19, SECTOR, True) + _record(b"\x01", 18, SECTOR, True) +
+            _record(b"GUIDE.TXT;1", data_sectors["GUIDE.TXT"], len(files["GUIDE.TXT"][0]),
+                    system_use=su("User Guide.txt", 0o100755)))
+
+    image = bytearray(next_sector * SECTOR)
+    primary = bytearray(SECTOR)
+    primary[0:7] = b"\x01CD001\x01"
+    primary[156:156 + 34] = _record(b"\x00", 18, SECTOR, True)
+    image[16 * SECTOR:17 * SECTOR] = primary
+    image[17 * SECTOR:17 * SECTOR + 7] = b"\xffCD001\x01"
+    image[18 * SECTOR:18 * SECTOR + len(root)] = root
+    image[19 * SECTOR:19 * SECTOR + len(docs)] = docs
+    for key, (data, _, _) in files.items():
+        start = data_sectors[key] * SECTOR
+        image[start:start + len(data)] = data
+    for sector, part in zip(big_sectors, big_parts):
+        image[sector * SECTOR:sector * SECTOR + len(part)] = part
+    path.write_bytes(bytes(image))
+    return files, b"".join(big_parts)
+
+
+def test_plain_iso_names_and_data(tmp_path):
+    path = tmp_path / "disc.iso"
+    files, big = _build_image(path)
+    with IsoFile(str(path)) as iso:
+        assert sorted(iso.namelist()) == ["BIG.BIN", "DOCS", "DOCS/GUIDE.TXT", "README.TXT"]
+        assert iso.read("README.TXT") == files["README.TXT"][0]
+        assert iso.getinfo("DOCS/").is_dir()
+        assert iso.getinfo("BIG.BIN").file_size == len(big)
+        assert iso.read("BIG.BIN") == big
+        with iso.open("BIG.BIN") as f:
+            f.seek(SECTOR * 2 - 10)
+            assert f.read(20) == big[SECTOR * 2 - 10:SECTOR * 2 + 10]
+        assert iso.getinfo("README.TXT").mtime == _TIMESTAMP
+
+
+def test_rock_ridge_names_and_modes(tmp_path):
+    path = tmp_path / "disc.iso"
+    files, big = _build_image(path, rock_ridge=True)
+    entries = {entry.name: entry for entry in list_iso(str(path))}
+    assert sorted(entries) == ["big.bin", "docs", "docs/User Guide.txt", "readme.txt"]
+    assert entries["docs/User Guide.txt"].size == len(files["GUIDE.TXT"][0])
+    assert entries["docs"].is_dir
+
+    assert extract_archive(str(path), str(tmp_path / "out"))
+    assert (tmp_path / "out" / "docs" / "User Guide.txt").read_bytes() == files["GUIDE.TXT"][0]
+    assert (tmp_path / "out" / "big.bin").read_bytes() == big
+    assert stat.S_IMODE(os.stat(tmp_path / "out" / "docs" / "User Guide.txt").st_mode) == 0o755
+    assert stat.S_IMODE(os.stat(tmp_path / "out" / "big.bin").st_mode) == 0o600
+
+    assert extract_members(str(path), ["*.txt"], str(tmp_path / "some"))
+    assert sorted(os.listdir(tmp_path / "some")) == ["docs", "readme.txt"]
+
+
+def test_files_without_a_volume_descriptor_are_rejected(tmp_path):
+    path = tmp_path / "bad.iso"
+    path.write_bytes(bytes(40 * SECTOR))
+    with pytest.raises(BadIsoFile):
+        IsoFile(str(path))
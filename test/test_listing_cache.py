@@ -0,0 +1,49 @@
+"""Persistent listing cache"""
+
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from support.archive_listing import ArchiveEntry
+from support.listing_cache import ListingCache
+
+
+def _archive(path, data=b"archive"):
+    path.write_bytes(data)
+    return str(path)
+
+
+def test_round_trip_and_invalidation_on_change(tmp_path):
+    cache = ListingCache(str(tmp_path / "cache" / "listing.sqlite3"))
+    archive = _archive(tmp_path / "a.tar.gz")
+    entries = [ArchiveEntry("dir/", 0, is_dir=True, mode=0o40755),
+               ArchiveEntry("dir/a.txt", 10, 4, crc=123, mtime=1_600_000_000.0, mode=0o100644)]
+    assert cache.get(archive) is None
+    cache.put(archive, entries)
+
+    cached = cache.get(archive)
+    assert [(e.name, e.size, e.compressed_size, e.crc, e.mtime, e.mode, e.is_dir) for e in cached] == \
+        [(e.name, e.size, e.compressed_size, e.crc, e.mtime, e.mode, e.is_dir) for e in entries]
+
+    # A rewritten archive no longer matches its key
+    _archive(tmp_path / "a.tar.gz", b"rewritten archive")
+    assert cache.get(archive) is None
+
+
+def test_least_recently_used_listings_are_evicted(tmp_path):
+    entries = [ArchiveEntry(f"file{i}.txt", i) for i in range(100)]
+    payload = sum(len(entry.name) + 48 for entry in entries)
+    cache = ListingCache(str(tmp_path / "listing.sqlite3"), max_bytes=payload * 2)
+    archives = [_archive(tmp_path / f"a{i}.tar.gz", bytes([i])) for i in range(3)]
+    cache.put(archives[0], entries)
+    cache.put(archives[1], entries)
+    assert cache.get(archives[0]) is not None
+    cache.put(archives[2], entries)
+
+    assert cache.get(archives[1]) is None
+    assert cache.get(archives[0]) is not None and cache.get(archives[2]) is not None
+    cache.invalidate(archives[0])
+    assert cache.get(archives[0]) is None
+    cache.clear()
+    assert cache.get(archives[2]) is None
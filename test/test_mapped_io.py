@@ -0,0 +1,124 @@
+"""Memory-mapped archive input"""
+
+import io
+import os
+import sys
+import tarfile
+import zipfile
+import zlib
+
+import pytest
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from support import archive_manager, mapped_io
+from support.archive_manager import extract_archive
+from support.mapped_io import MappedFile, open_input, open_mapped
+
+
+@pytest.fixture
+def map_everything(monkeypatch):
+    """Map archives of any size, so small test archives take the mapped paths."""
+    monkeypatch.setattr(archive_manager, "open_mapped", lambda path: open_mapped(path, min_size=1))
+
+
+def test_reader_seeks_and_reads_like_a_file(tmp_path):
+    data = os.urandom(10_000)
+    path = tmp_path / "a.bin"
+    path.write_bytes(data)
+    with MappedFile(str(path)) as mapped:
+        reader = mapped.reader()
+        assert reader.read(10) == data[:10]
+        reader.seek(-20, io.SEEK_END)
+        assert reader.read() == data[-20:]
+        assert reader.read(5) == b""
+        reader.seek(100)
+        reader.seek(50, io.SEEK_CUR)
+        buffer = bytearray(30)
+        assert reader.readinto(buffer) == 30
+        assert bytes(buffer) == data[150:180]
+        # Readers are independent of one another
+        assert mapped.reader().read(4) == data[:4]
+        assert reader.tell() == 180
+        with pytest.raises(ValueError):
+            reader.seek(-1)
+        with io.BufferedReader(mapped.reader()) as buffered:
+            assert buffered.read() == data
+
+
+def test_copy_to_writes_at_the_current_position(tmp_path):
+    data = os.urandom(50_000)
+    path = tmp_path / "a.bin"
+    path.write_bytes(data)
+    written = []
+    with MappedFile(str(path)) as mapped, open(tmp_path / "out.bin", "wb") as dst:
+        dst.write(b"head")
+        assert mapped.copy_to(dst, 1000, 20_000, on_write=written.append, crc=True) == \
+            zlib.crc32(data[1000:21_000])
+        assert mapped.copy_to(dst, 0, 0, crc=True) == 0
+        with pytest.raises(EOFError):
+            mapped.copy_to(dst, 40_000, 20_000)
+    assert (tmp_path / "out.bin").read_bytes() == b"head" + data[1000:21_000]
+    assert sum(written) == 20_000
+
+
+def test_copy_falls_back_to_writing_from_the_mapping(tmp_path, monkeypatch):
+    data = os.urandom(5000)
+    path = tmp_path / "a.bin"
+    path.write_bytes(data)
+    monkeypatch.setattr(mapped_io, "_unavailable", {"copy_file_range", "sendfile"})
+    with MappedFile(str(path)) as mapped, open(tmp_path / "out.bin", "wb") as dst:
+        mapped.copy_to(dst, 10, 4000)
+    assert (tmp_path / "out.bin").read_bytes() == data[10:4010]
+
+
+def test_small_and_special_files_are_not_mapped(tmp_path):
+    path = tmp_path / "a.bin"
+    path.write_bytes(b"x" * 100)
+    assert open_mapped(str(path)) is None
+    assert open_mapped(str(tmp_path)) is None
+    assert open_mapped(str(tmp_path / "missing")) is None
+    (tmp_path / "empty").write_bytes(b"")
+    assert open_mapped(str(tmp_path / "empty"), min_size=0) is None
+    with open_mapped(str(path), min_size=100) as mapped:
+        assert mapped.size == 100
+    with open_input(str(path)) as f:
+        assert f.read() == b"x" * 100
+
+
+def test_zip_extraction_through_the_mapping(tmp_path, map_everything):
+    stored = os.urandom(30_000)
+    packed = b"compress me " * 5000
+    path = tmp_path / "a.zip"
+    with zipfile.ZipFile(path, "w") as zf:
+        zf.writestr("stored.bin", stored, compress_type=zipfile.ZIP_STORED)
+        zf.writestr("dir/packed.txt", packed, compress_type=zipfile.ZIP_DEFLATED)
+        zf.writestr("empty.txt", b"", compress_type=zipfile.ZIP_STORED)
+    assert extract_archive(str(path), str(tmp_path / "out"))
+    assert (tmp_path / "out" / "stored.bin").read_bytes() == stored
+    assert (tmp_path / "out" / "dir" / "packed.txt").read_bytes() == packed
+    assert (tmp_path / "out" / "empty.txt").read_bytes() == b""
+
+
+def test_corrupted_stored_zip_member_fails_its_crc(tmp_path, map_everything):
+    stored = os.urandom(30_000)
+    path = tmp_path / "a.zip"
+    with zipfile.ZipFile(path, "w") as zf:
+        zf.writestr("stored.bin", stored, compress_type=zipfile.ZIP_STORED)
+    data = bytearray(path.read_bytes())
+    data[data.find(stored[:64]) + 100] ^= 0xFF
+    path.write_bytes(bytes(data))
+    assert not extract_archive(str(path), str(tmp_path / "out"))
+
+
+def test_plain_tar_extraction_through_the_mapping(tmp_path, map_everything):
+    contents = {"a.bin": os.urandom(20_000), "dir/b.txt": b"hello" * 1000, "empty": b""}
+    path = tmp_path / "a.tar"
+    with tarfile.open(path, "w") as tar:
+        for name, data in contents.items():
+            info = tarfile.TarInfo(name)
+            info.size = len(data)
+            tar.addfile(info, io.BytesIO(data))
+    assert extract_archive(str(path), str(tmp_path / "out"))
+    for name, data in contents.items():
+        assert (tmp_path / "out" / name).read_bytes() == data
@@ -0,0 +1,95 @@
+"""ZIP archives written by ParallelZipWriter, read back with zipfile"""
+
+import os
+import sys
+import zipfile
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from support import parallel_zip
+from support.archive_manager import create_archive
+from support.parallel_zip import ParallelZipWriter
+
+
+def _write_sources(root):
+    contents = {
+        "text.txt": b"hello world\n" * 5000,
+        "noise.bin": os.urandom(256 * 1024),
+        "empty.txt": b"",
+        "unicodé.txt": "café\n".encode() * 100,
+    }
+    for i in range(30):
+        contents[f"many/f{i}.txt"] = f"file {i}\n".encode() * (i * 50 + 1)
+    for name, data in contents.items():
+        (root / name).parent.mkdir(parents=True, exist_ok=True)
+        (root / name).write_bytes(data)
+    return contents
+
+
+def _write_zip(path, src, contents):
+    written = []
+    with ParallelZipWriter(str(path), workers=3, max_pending=4, on_entry_written=written.append) as zw:
+        for name in contents:
+            zw.add_file(str(src / name), name)
+    return written
+
+
+def test_entries_read_back_in_order(tmp_path):
+    src = tmp_path / "src"
+    contents = _write_sources(src)
+    path = tmp_path / "out.zip"
+    written = _write_zip(path, src, contents)
+
+    assert [entry.arcname for entry in written] == list(contents)
+    with zipfile.ZipFile(path) as zf:
+        assert zf.testzip() is None
+        assert zf.namelist() == list(contents)
+        for name, data in contents.items():
+            assert zf.read(name) == data
+        assert zf.getinfo("text.txt").compress_type == zipfile.ZIP_DEFLATED
+        # Random data does not deflate, so it is stored
+        assert zf.getinfo("noise.bin").compress_type == zipfile.ZIP_STORED
+        assert zf.getinfo("unicodé.txt").flag_bits & 0x800
+
+
+def test_zip64_records_read_back(tmp_path, monkeypatch):
+    # Lower the limits so small entries, offsets and counts take the ZIP64 paths
+    monkeypatch.setattr(parallel_zip, "ZIP64_LIMIT", 1000)
+    monkeypatch.setattr(parallel_zip, "ZIP_FILECOUNT_LIMIT", 10)
+    src = tmp_path / "src"
+    contents = _write_sources(src)
+    path = tmp_path / "out.zip"
+    _write_zip(path, src, contents)
+
+    data = path.read_bytes()
+    assert b"PK\x06\x06" in data and b"PK\x06\x07" in data
+    with zipfile.ZipFile(path) as zf:
+        assert zf.namelist() == list(contents)
+        for name, content in contents.items():
+            assert zf.read(name) == content
+
+
+def test_abort_leaves_the_output_unfinished(tmp_path):
+    src = tmp_path / "src"
+    contents = _write_sources(src)
+    path = tmp_path / "out.zip"
+    try:
+        with ParallelZipWriter(str(path), workers=2) as zw:
+            for name in contents:
+                zw.add_file(str(src / name), name)
+            raise RuntimeError("stop")
+    except RuntimeError:
+        pass
+    assert b"PK\x05\x06" not in path.read_bytes()
+
+
+def test_create_archive_writes_a_zip_of_the_sources(tmp_path):
+    src = tmp_path / "src"
+    contents = _write_sources(src)
+    output = str(tmp_path / "out.zip")
+    messages = []
+    assert create_archive(output, [str(src)], "zip", lambda message, percentage: messages.append(percentage))
+    with zipfile.ZipFile(output) as zf:
+        for name, data in contents.items():
+            assert zf.read(f"src/{name}") == data
+    assert messages[-1] == 100
@@ -0,0 +1,110 @@
+"""Byte-based progress tracking"""
+
+import io
+import os
+import sys
+import threading
+import zipfile
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from support.archive_manager import create_archive, extract_archive
+from support.progress import CountingReader, CountingWriter, ProgressTracker, format_eta, format_rate
+
+
+def test_advance_reports_percentage_rate_and_eta():
+    messages, stats = [], []
+    tracker = ProgressTracker(lambda message, percentage: messages.append((message, percentage)), stats.append,
+                              min_interval=0)
+    tracker.start(1000)
+    tracker.advance(read=250, message="Adding a.txt")
+    tracker.advance(read=250)
+
+    assert [percentage for _, percentage in messages] == [25.0, 50.0]
+    assert all(message.startswith("Adding a.txt - ") and "ETA" in message for message, _ in messages)
+    assert stats[-1].bytes_read == 500 and stats[-1].total_bytes == 1000
+    assert stats[-1].eta is not None and stats[-1].rate > 0
+
+
+def test_written_basis_and_throttling():
+    percentages = []
+    tracker = ProgressTracker(lambda message, percentage: percentages.append(percentage), min_interval=3600)
+    tracker.start(100, basis="written")
+    tracker.advance(read=80, written=10, message="x")
+    # Within the throttle interval nothing more is reported, but the bytes are counted
+    tracker.advance(written=40)
+    assert percentages == [10.0]
+    assert tracker.stats().percent == 50.0
+
+
+def test_report_forwards_milestones_unchanged():
+    messages = []
+    tracker = ProgressTracker(lambda message, percentage: messages.append((message, percentage)))
+    tracker("Error: boom", -1)
+    tracker.report("Done", 100)
+    assert messages == [("Error: boom", -1), ("Done", 100)]
+    assert ProgressTracker.wrap(tracker) is tracker
+    assert not ProgressTracker()
+
+
+def test_callbacks_may_call_back_into_the_tracker():
+    seen = []
+
+    def on_progress(message, percentage):
+        # A UI reading the totals, or a wrapper counting bytes of its own
+        seen.append(tracker.stats().bytes_read)
+        if message == "Halfway":
+            tracker.advance(read=1)
+
+    tracker = ProgressTracker(on_progress, lambda stats: tracker.stats(), min_interval=0)
+    tracker.start(1000)
+
+    def run():
+        tracker.advance(read=500, message="Reading")
+        tracker.report("Halfway", 50)
+
+    worker = threading.Thread(target=run, daemon=True)
+    worker.start()
+    worker.join(5)
+    assert not worker.is_alive(), "a callback re-entering the tracker deadlocked"
+    assert seen == [500, 500, 501]
+    assert tracker.stats().bytes_read == 501
+
+
+def test_counting_wrappers():
+    counted = []
+    reader = CountingReader(io.BytesIO(b"x" * 10), counted.append)
+    assert reader.read(4) == b"xxxx"
+    assert reader.readinto(bytearray(10)) == 6
+    writer = CountingWriter(io.BytesIO(), counted.append)
+    writer.write(b"abc")
+    assert counted == [4, 6, 3]
+    assert writer.getvalue() == b"abc"
+
+
+def test_formatting():
+    assert format_rate(1536) == "1.5 KB/s"
+    assert format_eta(None) == "--:--"
+    assert format_eta(75) == "1:15"
+    assert format_eta(3725) == "1:02:05"
+
+
+def test_create_and_extract_report_byte_totals(tmp_path):
+    src = tmp_path / "src"
+    src.mkdir()
+    total = 0
+    for i in range(20):
+        data = os.urandom(1000 + i * 100)
+        (src / f"f{i}.bin").write_bytes(data)
+        total += len(data)
+    output = str(tmp_path / "out.zip")
+    create_stats = []
+    assert create_archive(output, [str(src)], "zip", stats_callback=create_stats.append)
+    assert create_stats[-1].total_bytes == total
+    assert create_stats[-1].bytes_read == total
+
+    extract_stats = []
+    assert extract_archive(output, str(tmp_path / "out"), stats_callback=extract_stats.append)
+    assert extract_stats[-1].bytes_written == total
+    with zipfile.ZipFile(output) as zf:
+        assert sum(info.file_size for info in zf.infolist()) == total
@@ -0,0 +1,101 @@
+"""Running the rar command, against a stand-in script that records its arguments"""
+
+import json
+import os
+import sys
+
+import pytest
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from support import archive_manager
+from support.archive_manager import add_to_archive
+
+_FAKE_RAR = """#!{python}
+import json, sys
+args = sys.argv[1:]
+listed = []
+for arg in args:
+    if arg.startswith("@"):
+        with open(arg[1:], encoding="utf-8") as f:
+            listed = f.read().splitlines()
+with open({log!r}, "w") as f:
+    json.dump({{"args": args, "listed": listed}}, f)
+sys.stdout.write("Adding  a  \\b\\b\\b\\b 10%\\b\\b\\b\\b 55%\\b\\b\\b\\b100%\\n")
+if {fail}:
+    sys.stdout.write("Cannot open archive\\n")
+    sys.exit(3)
+"""
+
+
+@pytest.fixture
+def fake_rar(tmp_path, monkeypatch):
+    def install(fail=False):
+        script = tmp_path / "rar"
+        log = tmp_path / "rar.json"
+        script.write_text(_FAKE_RAR.format(python=sys.executable, log=str(log), fail=fail))
+        script.chmod(0o755)
+        monkeypatch.setattr(archive_manager, "_get_rar_command_name", lambda: str(script))
+        return lambda: json.loads(log.read_text())
+    return install
+
+
+def _files(tmp_path, count, name_length=10):
+    paths = []
+    for i in range(count):
+        path = tmp_path / "files" / (f"{i:04d}".ljust(name_length, "x") + ".txt")
+        path.parent.mkdir(exist_ok=True)
+        path.write_text(str(i))
+        paths.append(str(path))
+    return paths
+
+
+def test_all_files_go_to_one_rar_run(tmp_path, fake_rar):
+    recorded = fake_rar()
+    files = _files(tmp_path, 20)
+    messages = []
+    assert add_to_archive(str(tmp_path / "a.rar"), files, lambda *update: messages.append(update))
+    args = recorded()["args"]
+    assert args[:2] == ["a", "-y"]
+    assert args[-21:] == [str(tmp_path / "a.rar")] + files
+    # rar's own percentages are passed on, held below 100 until it exits
+    assert ("Adding to RAR archive... 100%", 99) in messages
+
+
+def test_long_path_lists_go_through_a_list_file(tmp_path, fake_rar, monkeypatch):
+    recorded = fake_rar()
+    monkeypatch.setattr(archive_manager, "RAR_MAX_COMMAND_LENGTH", 500)
+    files = _files(tmp_path, 30, name_length=40)
+    assert add_to_archive(str(tmp_path / "a.rar"), files)
+    run = recorded()
+    assert "-sc8l" in run["args"]
+    assert run["args"][-1].startswith("@")
+    assert run["listed"] == files
+    assert not os.path.exists(run["args"][-1][1:])
+
+
+def test_rar_failures_report_its_last_messages(tmp_path, fake_rar):
+    fake_rar(fail=True)
+    messages = []
+    assert not add_to_archive(str(tmp_path / "a.rar"), _files(tmp_path, 2),
+                              lambda message, percent: messages.append(message))
+    assert messages[-1].endswith("Cannot open archive")
+
+
+def test_only_a_found_rar_command_is_remembered(monkeypatch):
+    monkeypatch.setattr(archive_manager, "_rar_command_name", None)
+    monkeypatch.setattr(archive_manager.platform, "system", lambda: "Linux")
+    probes = []
+    installed = [False]
+
+    def check():
+        probes.append(installed[0])
+        return installed[0]
+
+    monkeypatch.setattr(archive_manager, "_check_rar_command", check)
+    assert archive_manager._get_rar_command_name() is None
+    # rar installed while the application runs
+    installed[0] = True
+    assert archive_manager._get_rar_command_name() == "rar"
+    assert archive_manager._get_rar_command_name() == "rar"
+    assert probes == [False, True]
@@ -0,0 +1,123 @@
+"""7z archives written by SevenZipWriter, read back with py7zr"""
+
+import io
+import lzma
+import os
+import struct
+import sys
+import time
+import zipfile
+
+import py7zr
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from support.archive_manager import create_archive, sync_archive, transcode_archive
+from support.sevenzip_writer import COPY, SevenZipWriter, prefilter_for
+
+
+def _wav(frames):
+    data = b"".join(struct.pack("<hh", i % 300, -(i % 300)) for i in range(frames))
+    fmt = struct.pack("<HHLLHH", 1, 2, 44100, 44100 * 4, 4, 16)
+    return b"RIFF" + struct.pack("<L", 36 + len(data)) + b"WAVEfmt " + struct.pack("<L", 16) + fmt + \
+        b"data" + struct.pack("<L", len(data)) + data
+
+
+def _elf():
+    header = bytearray(64)
+    header[:4] = b"\x7fELF"
+    header[4], header[5] = 2, 1
+    header[18:20] = (0x3E).to_bytes(2, "little")
+    return bytes(header) + bytes(range(256)) * 64
+
+
+def _read_all(path, dest):
+    with py7zr.SevenZipFile(path) as szf:
+        szf.extractall(dest)
+        return {f.filename: f for f in szf.files}
+
+
+def test_prefilter_for_executables_and_audio():
+    assert prefilter_for(_elf()) == {"id": lzma.FILTER_X86}
+    assert prefilter_for(_wav(100)) == {"id": lzma.FILTER_DELTA, "dist": 4}
+    assert prefilter_for(b"plain text" * 100) is None
+
+
+def test_blocks_read_back_with_py7zr(tmp_path):
+    src = tmp_path / "src"
+    src.mkdir()
+    contents = {
+        "text.txt": b"hello world\n" * 5000,
+        "tool": _elf(),
+        "sound.wav": _wav(20000),
+        "noise.bin": os.urandom(2 * 1024 * 1024),
+        "empty.txt": b"",
+    }
+    for i in range(40):
+        contents[f"many/f{i}.txt"] = f"file {i}\n".encode() * (i * 30 + 1)
+    for name, data in contents.items():
+        (src / name).parent.mkdir(parents=True, exist_ok=True)
+        (src / name).write_bytes(data)
+
+    blocks = []
+    path = tmp_path / "out.7z"
+    # A small block size forces several blocks per filter chain
+    with SevenZipWriter(str(path), solid_block_size=64 * 1024, workers=3, on_block_written=blocks.append) as szw:
+        szw.add_directory("many", mtime=1_600_000_000)
+        for name in contents:
+            szw.add_file(str(src / name), name)
+        szw.add_stream(io.BytesIO(b"streamed data\n" * 1000), "streamed.txt", mtime=1_700_000_000, mode=0o100640)
+
+    assert len(blocks) > 4
+    chains = [block.filters for block in blocks]
+    assert COPY in chains
+    assert any(chain != COPY and chain[0]["id"] == lzma.FILTER_X86 for chain in chains)
+    assert any(chain != COPY and chain[0]["id"] == lzma.FILTER_DELTA for chain in chains)
+
+    infos = _read_all(path, tmp_path / "out")
+    for name, data in contents.items():
+        assert (tmp_path / "out" / name).read_bytes() == data
+    assert (tmp_path / "out" / "streamed.txt").read_bytes() == b"streamed data\n" * 1000
+    assert infos["many"].is_directory
+    assert infos["streamed.txt"].posix_mode == 0o640
+    assert abs(infos["streamed.txt"].lastwritetime.totimestamp() - 1_700_000_000) < 1
+
+
+def test_create_archive_writes_7z_with_modes_and_times(tmp_path):
+    src = tmp_path / "src"
+    src.mkdir()
+    for i in range(10):
+        (src / f"f{i}.txt").write_text(f"file {i}\n" * 100)
+    os.chmod(src / "f3.txt", 0o751)
+    os.utime(src / "f4.txt", (1_600_000_000, 1_600_000_000))
+    archive = str(tmp_path / "a.7z")
+    assert create_archive(archive, [str(src)], "7z")
+    infos = _read_all(archive, tmp_path / "out")
+    for i in range(10):
+        assert (tmp_path / "out" / "src" / f"f{i}.txt").read_text() == f"file {i}\n" * 100
+    assert infos["src/f3.txt"].posix_mode == 0o751
+    assert abs(infos["src/f4.txt"].lastwritetime.totimestamp() - 1_600_000_000) < 1
+
+
+def test_sync_and_transcode_write_through_sevenzip_writer(tmp_path):
+    src = tmp_path / "src"
+    src.mkdir()
+    for i in range(10):
+        (src / f"f{i}.txt").write_text(f"file {i}\n" * 100)
+    archive = str(tmp_path / "a.7z")
+    assert create_archive(archive, [str(src)], "7z")
+    time.sleep(1.1)
+    (src / "f2.txt").write_text("changed")
+    os.remove(src / "f5.txt")
+    assert sync_archive(archive, [str(src)], delete_missing=True)
+    _read_all(archive, tmp_path / "synced")
+    assert sorted(os.listdir(tmp_path / "synced" / "src")) == sorted(os.listdir(src))
+    assert (tmp_path / "synced" / "src" / "f2.txt").read_text() == "changed"
+
+    zip_path = tmp_path / "b.zip"
+    with zipfile.ZipFile(zip_path, "w") as zf:
+        for i in range(10):
+            zf.writestr(f"d/g{i}.txt", f"g{i}" * 100)
+    assert transcode_archive(str(zip_path), str(tmp_path / "b.7z"), "7z")
+    _read_all(tmp_path / "b.7z", tmp_path / "transcoded")
+    assert (tmp_path / "transcoded" / "d" / "g7.txt").read_text() == "g7" * 100
@@ -0,0 +1,63 @@
+"""Split archives written through VolumeWriter and read back through VolumeReader"""
+
+import os
+import sys
+
+import pytest
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from support import split_volumes
+from support.archive_manager import create_archive, extract_archive, list_archive_contents
+from support.compression_options import CompressionOptions
+from support.split_volumes import VolumeReader, VolumeWriter, volume_paths
+
+
+def test_writer_and_reader_round_trip_across_volumes(tmp_path, monkeypatch):
+    # Small chunks so writes are split between worker threads and volume boundaries
+    monkeypatch.setattr(split_volumes, "VOLUME_CHUNK_SIZE", 1000)
+    data = os.urandom(25_000)
+    base = str(tmp_path / "blob.bin")
+    with VolumeWriter(base, 4096) as writer:
+        for start in range(0, len(data), 777):
+            writer.write(data[start:start + 777])
+        # Seek back and patch the start, as the 7z writer does with its header
+        writer.seek(10)
+        writer.write(b"PATCHED")
+    expected = data[:10] + b"PATCHED" + data[17:]
+
+    paths = volume_paths(base + ".001")
+    assert [os.path.basename(path) for path in paths] == [f"blob.bin.{n:03d}" for n in range(1, 8)]
+    assert all(os.path.getsize(path) == 4096 for path in paths[:-1])
+    with VolumeReader(base + ".003") as reader:
+        assert reader.read() == expected
+        reader.seek(4090)
+        assert reader.read(20) == expected[4090:4110]
+
+
+def test_rewriting_a_set_removes_leftover_volumes(tmp_path):
+    base = str(tmp_path / "blob.bin")
+    with VolumeWriter(base, 100) as writer:
+        writer.write(b"x" * 450)
+    with VolumeWriter(base, 100) as writer:
+        writer.write(b"y" * 150)
+    assert len(volume_paths(base + ".001")) == 2
+
+
+@pytest.mark.parametrize("archive_format", ["zip", "7z", "tar", "tar.gz"])
+def test_split_archives_list_and_extract(tmp_path, archive_format):
+    src = tmp_path / "src"
+    src.mkdir()
+    contents = {f"f{i}.bin": os.urandom(3000 + i * 500) for i in range(12)}
+    for name, data in contents.items():
+        (src / name).write_bytes(data)
+    output = str(tmp_path / f"out.{archive_format}")
+    assert create_archive(output, [str(src)], archive_format, options=CompressionOptions(volume_size=16 * 1024))
+    assert not os.path.exists(output)
+    assert len(volume_paths(output + ".001")) > 2
+
+    names = {entry.name for entry in list_archive_contents(output + ".001", use_cache=False)}
+    assert {f"src/{name}" for name in contents} <= names
+    assert extract_archive(output + ".001", str(tmp_path / "out"))
+    for name, data in contents.items():
+        assert (tmp_path / "out" / "src" / name).read_bytes() == data
@@ -0,0 +1,61 @@
+"""Pipelined stream copying"""
+
+import io
+import os
+import sys
+
+import pytest
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from support.stream_copy import copy_stream
+
+
+class _FailingReader(io.RawIOBase):
+    def __init__(self, good_bytes):
+        self.remaining = good_bytes
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        if not self.remaining:
+            raise OSError("corrupt stream")
+        count = min(len(buffer), self.remaining)
+        buffer[:count] = b"x" * count
+        self.remaining -= count
+        return count
+
+
+@pytest.mark.parametrize("size_hint", [None, 100, 10 * 1024 * 1024])
+def test_copies_everything_in_order(tmp_path, size_hint):
+    data = os.urandom(3 * 1024 * 1024 + 123)
+    read, written = [], []
+    with open(tmp_path / "out", "wb") as dst:
+        copied = copy_stream(io.BytesIO(data), dst, size_hint=size_hint, on_read=read.append,
+                             on_write=written.append, buffer_size=256 * 1024, buffers=3)
+    assert copied == len(data)
+    assert sum(read) == sum(written) == len(data)
+    assert (tmp_path / "out").read_bytes() == data
+
+
+def test_preallocated_file_is_trimmed_to_the_data(tmp_path):
+    data = b"abc" * 1000
+    with open(tmp_path / "out", "wb") as dst:
+        # A declared size larger than the stream (a lying header) must not leave padding
+        copy_stream(io.BytesIO(data), dst, size_hint=len(data) * 4)
+    assert (tmp_path / "out").read_bytes() == data
+
+
+def test_trimming_keeps_data_written_before_the_copy(tmp_path):
+    # Extraction with exec_policy="detect" writes the first bytes itself to sniff executables
+    data = b"abc" * 1000
+    with open(tmp_path / "out", "wb") as dst:
+        dst.write(b"#!/b")
+        copy_stream(io.BytesIO(data), dst, size_hint=len(data) * 4)
+    assert (tmp_path / "out").read_bytes() == b"#!/b" + data
+
+
+def test_reader_errors_reach_the_caller(tmp_path):
+    with open(tmp_path / "out", "wb") as dst, pytest.raises(OSError, match="corrupt"):
+        copy_stream(_FailingReader(600 * 1024), dst, buffer_size=256 * 1024, buffers=2)
@@ -0,0 +1,188 @@
+"""Bringing existing archives up to date with their sources"""
+
+import os
+import sys
+import tarfile
+import zipfile
+
+import py7zr
+import pytest
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from support.archive_manager import create_archive, sync_archive
+from support.compression_options import CompressionOptions
+
+# Sources are dated well in the past so later edits get a clearly newer mtime
+_OLD = 1_600_000_000
+
+
+def _make_sources(root):
+    root.mkdir()
+    for i in range(8):
+        path = root / f"f{i}.txt"
+        path.write_text(f"file {i}\n" * (200 + i))
+        os.utime(path, (_OLD, _OLD))
+
+
+def _edit_sources(root):
+    """Change f2, delete f5, add new.txt and touch f3 without changing its content."""
+    (root / "f2.txt").write_text("changed")
+    os.remove(root / "f5.txt")
+    (root / "new.txt").write_text("new file")
+    os.utime(root / "f3.txt", (_OLD + 3600, _OLD + 3600))
+
+
+def _expected(root):
+    return {f"src/{name}": (root / name).read_bytes() for name in os.listdir(root)}
+
+
+def _read_members(archive, archive_format, dest):
+    if archive_format == "zip":
+        with zipfile.ZipFile(archive) as zf:
+            return {info.filename: zf.read(info) for info in zf.infolist() if not info.is_dir()}
+    if archive_format == "7z":
+        with py7zr.SevenZipFile(archive) as szf:
+            szf.extractall(dest)
+    else:
+        with tarfile.open(archive) as tar:
+            tar.extractall(dest)
+    return {os.path.relpath(os.path.join(root, name), dest).replace(os.sep, "/"):
+            open(os.path.join(root, name), "rb").read()
+            for root, _, files in os.walk(dest) for name in files}
+
+
+@pytest.mark.parametrize("archive_format", ["zip", "7z", "tar", "tar.gz", "tar.xz"])
+def test_sync_adds_replaces_and_removes(tmp_path, archive_format):
+    src = tmp_path / "src"
+    _make_sources(src)
+    archive = str(tmp_path / f"a.{archive_format}")
+    assert create_archive(archive, [str(src)], archive_format)
+    _edit_sources(src)
+
+    messages = []
+    assert sync_archive(archive, [str(src)], lambda message, percentage: messages.append(message),
+                        delete_missing=True)
+    assert _read_members(archive, archive_format, tmp_path / "out") == _expected(src)
+    # f3 only got a new mtime; formats with a stored CRC keep the entry
+    updated = 1 if archive_format in ("zip", "7z") else 2
+    assert messages[-1] == f"Archive synced: 1 added, {updated} updated, 1 removed, {7 - updated} unchanged"
+
+
+@pytest.mark.parametrize("archive_format", ["zip", "7z", "tar"])
+def test_sync_without_delete_keeps_missing_entries(tmp_path, archive_format):
+    src = tmp_path / "src"
+    _make_sources(src)
+    archive = str(tmp_path / f"a.{archive_format}")
+    assert create_archive(archive, [str(src)], archive_format)
+    os.remove(src / "f5.txt")
+    (src / "new.txt").write_text("new file")
+
+    assert sync_archive(archive, [str(src)])
+    members = _read_members(archive, archive_format, tmp_path / "out")
+    assert members["src/f5.txt"] == b"file 5\n" * 205
+    assert members["src/new.txt"] == b"new file"
+
+
+def test_unchanged_zip_entries_are_copied_without_recompressing(tmp_path):
+    src = tmp_path / "src"
+    _make_sources(src)
+    archive = str(tmp_path / "a.zip")
+    assert create_archive(archive, [str(src)], "zip")
+    with zipfile.ZipFile(archive) as zf:
+        before = {info.filename: (info.CRC, info.compress_size, info.date_time, info.external_attr)
+                  for info in zf.infolist()}
+    _edit_sources(src)
+
+    assert sync_archive(archive, [str(src)], delete_missing=True)
+    with zipfile.ZipFile(archive) as zf:
+        after = {info.filename: (info.CRC, info.compress_size, info.date_time, info.external_attr)
+                 for info in zf.infolist()}
+    for name in ("src/f0.txt", "src/f3.txt", "src/f7.txt"):
+        assert after[name] == before[name]
+    assert after["src/f2.txt"] != before["src/f2.txt"]
+
+
+def _packed_folders(archive):
+    """Packed bytes of the folder holding each member of a 7z archive."""
+    with py7zr.SevenZipFile(archive) as szf:
+        streams = szf.header.main_streams
+        start = szf.afterheader + streams.packinfo.packpos
+        packed = {}
+        stream = 0
+        for folder in streams.unpackinfo.folders:
+            count = len(folder.packed_indices)
+            offset = start + streams.packinfo.packpositions[stream]
+            packed[id(folder)] = (offset, sum(streams.packinfo.packsizes[stream:stream + count]))
+            stream += count
+        members = {f.filename: packed[id(f.folder)] for f in szf.files if f.folder is not None}
+    with open(archive, "rb") as f:
+        data = f.read()
+    return {name: data[offset:offset + size] for name, (offset, size) in members.items()}
+
+
+def test_unchanged_7z_folders_are_copied_byte_for_byte(tmp_path):
+    src = tmp_path / "src"
+    _make_sources(src)
+    archive = str(tmp_path / "a.7z")
+    # Blocks too small for two files: every file gets a folder of its own
+    assert create_archive(archive, [str(src)], "7z", options=CompressionOptions(solid_block_size=2000))
+    before = _packed_folders(archive)
+    _edit_sources(src)
+
+    assert sync_archive(archive, [str(src)], delete_missing=True)
+    after = _packed_folders(archive)
+    for name in ("src/f0.txt", "src/f3.txt", "src/f7.txt"):
+        assert after[name] == before[name]
+    assert "src/f5.txt" not in after
+    assert _read_members(archive, "7z", tmp_path / "out") == _expected(src)
+
+
+def test_7z_gains_several_files(tmp_path):
+    src = tmp_path / "src"
+    _make_sources(src)
+    archive = str(tmp_path / "a.7z")
+    assert create_archive(archive, [str(src)], "7z")
+    before = _packed_folders(archive)
+    for i in range(25):
+        (src / f"new{i}.txt").write_text(f"new file {i}\n" * 50)
+    (src / "empty.txt").write_text("")
+
+    assert sync_archive(archive, [str(src)])
+    assert _read_members(archive, "7z", tmp_path / "out") == _expected(src)
+    assert _packed_folders(archive)["src/f0.txt"] == before["src/f0.txt"]
+
+
+def test_archives_in_sync_are_not_rewritten(tmp_path):
+    src = tmp_path / "src"
+    _make_sources(src)
+    archive = tmp_path / "a.zip"
+    assert create_archive(str(archive), [str(src)], "zip")
+    before = archive.stat()
+    messages = []
+    assert sync_archive(str(archive), [str(src)], lambda message, percentage: messages.append(message))
+    after = archive.stat()
+    assert (after.st_ino, after.st_mtime_ns, after.st_size) == (before.st_ino, before.st_mtime_ns, before.st_size)
+    assert messages[-1] == "Archive synced: 0 added, 0 updated, 0 removed, 8 unchanged"
+
+
+def test_plain_tar_gains_files_in_place(tmp_path):
+    src = tmp_path / "src"
+    _make_sources(src)
+    archive = tmp_path / "a.tar"
+    assert create_archive(str(archive), [str(src)], "tar")
+    inode = archive.stat().st_ino
+    (src / "new.txt").write_text("new file")
+
+    assert sync_archive(str(archive), [str(src)])
+    assert archive.stat().st_ino == inode
+    with tarfile.open(archive) as tar:
+        assert tar.extractfile("src/new.txt").read() == b"new file"
+
+
+def test_missing_archive_is_created(tmp_path):
+    src = tmp_path / "src"
+    _make_sources(src)
+    archive = str(tmp_path / "a.zip")
+    assert sync_archive(archive, [str(src)])
+    assert _read_members(archive, "zip", None) == _expected(src)
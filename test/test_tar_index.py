@@ -0,0 +1,96 @@
+"""Tarballs written by the archive manager, plain and indexed"""
+
+import os
+import sys
+import tarfile
+
+import pytest
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from support import tar_index
+from support.archive_manager import create_archive, read_archive_member
+from support.compression_options import CompressionOptions
+
+FORMATS = ("tar.gz", "tar.bz2", "tar.xz")
+
+
+@pytest.fixture(autouse=True)
+def index_cache(tmp_path, monkeypatch):
+    cache = tmp_path / "cache"
+    monkeypatch.setattr(tar_index, "INDEX_CACHE_DIR", str(cache))
+    return cache
+
+
+@pytest.fixture
+def source(tmp_path):
+    src = tmp_path / "src"
+    (src / "sub").mkdir(parents=True)
+    # Larger than CHECKPOINT_INTERVAL, so an indexed archive gets several checkpoints
+    (src / "big.bin").write_bytes(os.urandom(64 * 1024) * 160)
+    for i in range(20):
+        (src / "sub" / f"f{i}.txt").write_text(f"file {i}\n" * (i + 1))
+    return src
+
+
+def _members(path, mode):
+    with tarfile.open(path, mode) as tar:
+        return {member.name: tar.extractfile(member).read() for member in tar if member.isfile()}
+
+
+@pytest.mark.parametrize("archive_format", FORMATS)
+def test_created_tarball_reads_as_a_stream(tmp_path, source, archive_format):
+    path = str(tmp_path / f"out.{archive_format}")
+    assert create_archive(path, [str(source)], archive_format)
+    streamed = _members(path, "r|*")
+    assert streamed == _members(path, "r:*")
+    assert streamed["src/big.bin"] == (source / "big.bin").read_bytes()
+    assert len(tar_index.TarIndex.build(path).checkpoints) == 1
+
+
+@pytest.mark.parametrize("archive_format", FORMATS)
+def test_indexed_tarball_reads_members_from_checkpoints(tmp_path, source, archive_format):
+    path = str(tmp_path / f"out.{archive_format}")
+    assert create_archive(path, [str(source)], archive_format, options=CompressionOptions(indexed=True))
+    index = tar_index.load_or_build_index(path)
+    assert len(index.checkpoints) > 1
+    assert os.path.isfile(tar_index.index_path_for(path))
+    # Nothing is written next to the user's archive
+    assert sorted(os.listdir(tmp_path)) == ["cache", f"out.{archive_format}", "src"]
+    last = "src/sub/f19.txt"
+    assert index.decode_cost(last) < index.stream_size
+    assert tar_index.read_member(path, last, tar_index.TarIndex.load(path)) == (source / "sub" / "f19.txt").read_bytes()
+    assert tar_index.read_member(path, "src/big.bin", index) == (source / "big.bin").read_bytes()
+
+
+def test_plain_tar_members_are_read_without_an_index(tmp_path, source, index_cache):
+    path = str(tmp_path / "out.tar")
+    assert create_archive(path, [str(source)], "tar")
+    before = sorted(os.listdir(tmp_path))
+    assert read_archive_member(path, "src/sub/f7.txt") == (source / "sub" / "f7.txt").read_bytes()
+    with pytest.raises(ValueError):
+        read_archive_member(path, "src/sub")
+    assert sorted(os.listdir(tmp_path)) == before
+    assert not index_cache.exists()
+
+
+def test_cached_indexes_follow_the_archive_and_are_pruned(tmp_path, source, index_cache, monkeypatch):
+    paths = []
+    for i in range(3):
+        paths.append(str(tmp_path / f"out{i}.tar.gz"))
+        assert create_archive(paths[-1], [str(source)], "tar.gz")
+        assert read_archive_member(paths[-1], "src/sub/f3.txt") == (source / "sub" / "f3.txt").read_bytes()
+    assert len(os.listdir(index_cache)) == 3
+    os.utime(tar_index.index_path_for(paths[0]), (1, 1))
+
+    # A rewritten archive no longer matches its index
+    assert create_archive(paths[1], [str(source / "sub")], "tar.gz")
+    assert tar_index.TarIndex.load(paths[1]) is None
+
+    index_size = os.path.getsize(tar_index.index_path_for(paths[2]))
+    monkeypatch.setattr(tar_index, "INDEX_CACHE_MAX_BYTES", index_size * 2 + index_size // 2)
+    tar_index.load_or_build_index(paths[1])
+    # The least recently used index made room for the new one
+    assert not os.path.exists(tar_index.index_path_for(paths[0]))
+    assert os.path.exists(tar_index.index_path_for(paths[1]))
+    assert os.path.exists(tar_index.index_path_for(paths[2]))
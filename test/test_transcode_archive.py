@@ -0,0 +1,95 @@
+"""Converting archives from one format to another"""
+
+import os
+import stat
+import sys
+import tarfile
+import zipfile
+
+import py7zr
+import pytest
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from support.archive_manager import create_archive, transcode_archive
+
+_MTIME = 1_600_000_000
+
+
+def _make_sources(root):
+    contents = {f"d{i % 3}/f{i}.txt": f"file {i}\n".encode() * (i * 50 + 1) for i in range(20)}
+    contents["run.sh"] = b"#!/bin/sh\necho hi\n"
+    for name, data in contents.items():
+        path = root / name
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_bytes(data)
+        os.chmod(path, 0o755 if name == "run.sh" else 0o644)
+        os.utime(path, (_MTIME, _MTIME))
+    return {f"src/{name}": data for name, data in contents.items()}
+
+
+def _read_back(path, archive_format, dest):
+    """{name: (data, mode, mtime)} of the regular files in an archive."""
+    if archive_format == "zip":
+        with zipfile.ZipFile(path) as zf:
+            return {info.filename: (zf.read(info), stat.S_IMODE(info.external_attr >> 16), info.date_time)
+                    for info in zf.infolist() if not info.is_dir()}
+    if archive_format == "7z":
+        with py7zr.SevenZipFile(path) as szf:
+            szf.extractall(dest)
+    else:
+        with tarfile.open(path) as tar:
+            tar.extractall(dest)
+    result = {}
+    for root, _, files in os.walk(dest):
+        for name in files:
+            full = os.path.join(root, name)
+            st = os.stat(full)
+            result[os.path.relpath(full, dest).replace(os.sep, "/")] = \
+                (open(full, "rb").read(), stat.S_IMODE(st.st_mode), int(st.st_mtime))
+    return result
+
+
+@pytest.mark.parametrize("source_format, target_format", [
+    ("zip", "tar.gz"),
+    ("zip", "7z"),
+    ("zip", "zip"),
+    ("7z", "zip"),
+    ("7z", "tar.xz"),
+    ("tar", "zip"),
+    ("tar.gz", "tar.xz"),
+    ("tar.bz2", "tar"),
+])
+def test_members_keep_their_data_modes_and_times(tmp_path, source_format, target_format):
+    expected = _make_sources(tmp_path / "src")
+    source = str(tmp_path / f"in.{source_format}")
+    assert create_archive(source, [str(tmp_path / "src")], source_format)
+    output = str(tmp_path / f"out.{target_format}")
+    messages = []
+    assert transcode_archive(source, output, target_format,
+                             lambda message, percentage: messages.append((message, percentage)))
+    assert messages[-1][1] == 100
+
+    members = _read_back(output, target_format, tmp_path / "out")
+    assert {name: data for name, (data, _, _) in members.items()} == expected
+    if target_format != "7z":
+        assert members["src/run.sh"][1] == 0o755
+        assert members["src/d0/f0.txt"][1] == 0o644
+    if target_format != "zip":
+        assert members["src/d1/f1.txt"][2] == _MTIME
+
+
+def test_conversion_refuses_to_replace_its_source(tmp_path):
+    _make_sources(tmp_path / "src")
+    source = str(tmp_path / "in.zip")
+    assert create_archive(source, [str(tmp_path / "src")], "zip")
+    assert not transcode_archive(source, source, "zip")
+    with zipfile.ZipFile(source) as zf:
+        assert zf.testzip() is None
+
+
+def test_failed_conversion_leaves_no_output(tmp_path):
+    (tmp_path / "in.zip").write_bytes(b"PK\x03\x04 broken")
+    output = tmp_path / "out.tar.gz"
+    assert not transcode_archive(str(tmp_path / "in.zip"), str(output), "tar.gz")
+    assert not output.exists()